@@ -0,0 +1,119 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many bytes and writes it takes to keep a terminal up to date with
+a dashboard of L{twisted.conch.insults.window} widgets, where a few values
+change every frame, and how much CPU time it takes, when the widgets draw
+directly on an L{twisted.conch.insults.insults.ServerProtocol} and when they
+draw on an L{twisted.conch.insults.helper.ScreenBuffer} which is refreshed
+once per frame.
+
+Usage: python insults.py [frames] [width] [height]
+"""
+
+from __future__ import division, print_function
+
+import os
+import sys
+
+from twisted.conch.insults import helper, insults, window
+from twisted.python.compat import intToBytes
+from twisted.test.proto_helpers import StringTransport
+
+
+
+class CountingTransport(StringTransport):
+    """
+    Count the bytes and writes, without keeping them.
+    """
+    bytes = writes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.writes += 1
+
+
+
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+
+
+def dashboard():
+    """
+    Build a dashboard with a few counters, a scrolling area of text and a
+    list, in bordered boxes.
+
+    @return: The top window, and a function which changes what the
+        dashboard shows for a frame number.
+    """
+    top = window.TopWindow(lambda: None, lambda f: None)
+    counters = [window.TextOutput((16, 1)) for i in range(4)]
+    counterBox = window.HBox()
+    for counter in counters:
+        counterBox.addChild(window.Border(counter))
+
+    text = window.TextOutputArea(longLines=window.TextOutputArea.TRUNCATE)
+    text.setText(b''.join([
+        b'Request ' + intToBytes(i) + b' took 0.25 seconds\n'
+        for i in range(40)]))
+    viewport = window.Viewport(text)
+    selection = window.Selection(
+        [b'service ' + intToBytes(i) for i in range(20)],
+        lambda item: None, 10)
+    areas = window.HBox()
+    areas.addChild(window.Border(viewport))
+    areas.addChild(window.Border(selection))
+
+    vbox = window.VBox()
+    vbox.addChild(counterBox)
+    vbox.addChild(areas)
+    top.addChild(vbox)
+
+    def update(frame):
+        counters[frame % len(counters)].setText(
+            intToBytes(frame * 7) + b' requests')
+        viewport.yOffset = frame % 20
+    return top, update
+
+
+
+def run(name, frames, width, height, buffered):
+    transport = CountingTransport()
+    terminal = insults.ServerProtocol()
+    terminal.makeConnection(transport)
+    top, update = dashboard()
+    if buffered:
+        screen = helper.ScreenBuffer(terminal, width, height)
+    else:
+        screen = terminal
+
+    top.draw(width, height, screen)
+    if buffered:
+        screen.refresh()
+    transport.bytes = transport.writes = 0
+
+    start = cpuTime()
+    for frame in range(frames):
+        update(frame)
+        top.draw(width, height, screen)
+        if buffered:
+            screen.refresh()
+    cpu = cpuTime() - start
+    print('%-16s %d frames: %.1f bytes/frame, %.1f writes/frame, '
+          '%.3f ms CPU/frame' % (
+              name, frames, transport.bytes / frames,
+              transport.writes / frames, cpu * 1000 / frames))
+
+
+
+def main(frames=2000, width=80, height=24):
+    run('direct', frames, width, height, False)
+    run('screen buffer', frames, width, height, True)
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,222 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how a L{twisted.conch.ssh.transport.SSHServerTransport} copes with a
+storm of new connections: how long it takes to finish the key exchanges of
+many clients connecting at once, and for how long at most the reactor is kept
+from doing anything else meanwhile, which is how long every established
+session would stall.
+
+The clients run in a separate process, so that only the server's share of
+the key exchanges is done by the reactor being measured.  The storm is
+repeated with the key exchange computations done in the reactor thread, in a
+thread pool, and in a thread pool with precomputed ephemeral keys.
+
+Usage: python kex.py [connections] [kexAlgorithm]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from twisted.conch.ssh import factory, keys, transport
+from twisted.internet import defer, reactor, task
+from twisted.internet.protocol import ClientFactory, ProcessProtocol
+from twisted.python.threadpool import ThreadPool
+
+
+
+class CountingServerTransport(transport.SSHServerTransport):
+    """
+    Tell the factory when a key exchange is over.
+    """
+    def ssh_NEWKEYS(self, packet):
+        transport.SSHServerTransport.ssh_NEWKEYS(self, packet)
+        self.factory.secured()
+
+
+
+class StormServerFactory(factory.SSHFactory):
+    """
+    Count key exchanges, and fire C{finished} once there have been
+    C{connections} of them.
+    """
+    protocol = CountingServerTransport
+
+    def __init__(self, privateKey, kexAlgorithm, connections):
+        self.privateKeys = {b'ssh-rsa': privateKey}
+        self.publicKeys = {b'ssh-rsa': privateKey.public()}
+        self.primes = None
+        self.kexAlgorithm = kexAlgorithm
+        self.remaining = connections
+        self.finished = defer.Deferred()
+
+
+    def buildProtocol(self, addr):
+        protocol = factory.SSHFactory.buildProtocol(self, addr)
+        protocol.supportedKeyExchanges = [self.kexAlgorithm]
+        return protocol
+
+
+    def secured(self):
+        self.remaining -= 1
+        if not self.remaining:
+            self.finished.callback(None)
+
+
+
+class StallMeter(object):
+    """
+    Find the longest time the reactor takes to run a call which is due every
+    C{interval} seconds.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.longest = 0
+        self.last = None
+        self.call = task.LoopingCall(self.tick)
+
+
+    def tick(self):
+        now = time.time()
+        if self.last is not None:
+            self.longest = max(self.longest, now - self.last - self.interval)
+        self.last = now
+
+
+    def start(self):
+        self.call.start(self.interval)
+
+
+    def stop(self):
+        self.call.stop()
+
+
+
+class Clients(ProcessProtocol):
+    """
+    Report what the client process prints.
+    """
+    def outReceived(self, data):
+        sys.stdout.write(data.decode('ascii'))
+
+
+    def errReceived(self, data):
+        sys.stderr.write(data.decode('ascii'))
+
+
+
+def storm(privateKey, kexAlgorithm, connections, name, threadPool=None,
+          ephemeralKeys=None):
+    """
+    Have a client process open C{connections} connections at once, and
+    report how the server copes.
+
+    @return: A L{Deferred} which fires when every key exchange is over.
+    """
+    serverFactory = StormServerFactory(privateKey, kexAlgorithm, connections)
+    serverFactory.threadPool = threadPool
+    serverFactory.ephemeralKeys = ephemeralKeys
+    port = reactor.listenTCP(0, serverFactory, backlog=connections,
+                             interface='127.0.0.1')
+
+    meter = StallMeter()
+    meter.start()
+    start = time.time()
+    reactor.spawnProcess(
+        Clients(), sys.executable,
+        [sys.executable, __file__, 'clients', str(port.getHost().port),
+         str(connections), kexAlgorithm.decode('ascii')],
+        env=None)
+
+    def report(ignored):
+        elapsed = time.time() - start
+        meter.stop()
+        print('%-36s %d key exchanges in %.3f seconds (%d/sec), '
+              'longest reactor stall %.1f ms' % (
+                  name, connections, elapsed, connections / elapsed,
+                  meter.longest * 1000))
+        return port.stopListening()
+    return serverFactory.finished.addCallback(report)
+
+
+
+class StormClientTransport(transport.SSHClientTransport):
+    """
+    Accept any host key, disconnect once the key exchange is over, and fire
+    the factory's C{done} once disconnected.
+    """
+    def verifyHostKey(self, hostKey, fingerprint):
+        return defer.succeed(True)
+
+
+    def connectionSecure(self):
+        self.transport.loseConnection()
+
+
+    def connectionLost(self, reason):
+        transport.SSHClientTransport.connectionLost(self, reason)
+        self.factory.done.callback(None)
+
+
+
+def clients(port, connections, kexAlgorithm):
+    """
+    Open C{connections} connections to C{port} at once, then exit once they
+    have all finished their key exchanges.
+    """
+    done = []
+    for i in range(connections):
+        clientFactory = ClientFactory()
+        clientFactory.protocol = StormClientTransport
+        clientFactory.protocol.supportedKeyExchanges = [kexAlgorithm]
+        clientFactory.done = defer.Deferred()
+        done.append(clientFactory.done)
+        reactor.connectTCP('127.0.0.1', port, clientFactory)
+    d = defer.gatherResults(done)
+    d.addErrback(lambda f: f.printTraceback())
+    d.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+
+def main(connections=200, kexAlgorithm='ecdh-sha2-nistp256'):
+    kexAlgorithm = kexAlgorithm.encode('ascii')
+    privateKey = keys.Key(rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend()))
+    threadPool = ThreadPool(4, 4, 'kex')
+    threadPool.start()
+    reactor.addSystemEventTrigger('before', 'shutdown', threadPool.stop)
+    ephemeralKeys = transport.EphemeralKeyPool(64, threadPool)
+
+    storms = [
+        ('in the reactor thread', None, None),
+        ('in a thread pool', threadPool, None),
+        ('with precomputed ephemeral keys', threadPool, ephemeralKeys),
+    ]
+
+    def next(ignored=None):
+        if storms:
+            name, pool, ephemeral = storms.pop(0)
+            d = storm(privateKey, kexAlgorithm, connections, name, pool,
+                      ephemeral)
+            d.addCallback(next)
+            d.addErrback(lambda f: (f.printTraceback(), reactor.stop()))
+        else:
+            reactor.stop()
+    reactor.callWhenRunning(next)
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['clients']:
+        clients(int(sys.argv[2]), int(sys.argv[3]),
+                sys.argv[4].encode('ascii'))
+    else:
+        main(*[int(arg) for arg in sys.argv[1:2]] + sys.argv[2:3])
@@ -0,0 +1,157 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly L{twisted.conch.ssh.filetransfer.FileTransferClient.get}
+and L{twisted.conch.ssh.filetransfer.FileTransferClient.put} transfer a file
+to and from a L{twisted.conch.ssh.filetransfer.FileTransferServer} in the same
+process, over a loopback TCP connection, with one request and with many
+outstanding at once.
+
+The SFTP protocol is spoken directly over TCP, without SSH, so that only the
+SFTP client and server are measured.  A round trip time is simulated by
+delaying what the server sends, since that is what limits a transfer with one
+request outstanding.
+
+Usage: python sftp.py [megabytes] [latency] [requests...]
+
+The latency is in milliseconds.
+"""
+
+from __future__ import division, print_function
+
+import io
+import sys
+
+from zope.interface import implementer
+
+from twisted.conch.interfaces import ISFTPFile, ISFTPServer
+from twisted.conch.ssh.filetransfer import (
+    FileTransferClient, FileTransferServer)
+from twisted.internet import defer, reactor
+from twisted.internet.protocol import ClientFactory, Factory
+
+
+
+@implementer(ISFTPFile)
+class MemoryFile(object):
+    """
+    A file kept in a L{bytearray}.
+    """
+    def __init__(self, data):
+        self.data = data
+
+
+    def readChunk(self, offset, length):
+        if offset >= len(self.data):
+            raise EOFError()
+        return bytes(self.data[offset:offset + length])
+
+
+    def writeChunk(self, offset, data):
+        self.data[offset:offset + len(data)] = data
+
+
+    def close(self):
+        pass
+
+
+
+@implementer(ISFTPServer)
+class MemoryServer(object):
+    """
+    Serve one file, C{content}, whatever name it is opened by.
+    """
+    def __init__(self, content):
+        self.content = content
+
+
+    def gotVersion(self, otherVersion, extData):
+        return {}
+
+
+    def openFile(self, filename, flags, attrs):
+        return MemoryFile(self.content)
+
+
+
+class DelayedServer(FileTransferServer):
+    """
+    Delay everything the server sends by the factory's C{latency}.
+    """
+    def connectionMade(self):
+        latency = self.factory.latency
+        if latency:
+            write = self.transport.write
+            pending = []
+            def delayedWrite(data):
+                pending.append(data)
+                reactor.callLater(latency, lambda: write(pending.pop(0)))
+            self.transport.write = delayedWrite
+
+
+
+class BenchmarkClient(FileTransferClient):
+    """
+    Fire the factory's C{connected} with the client once the server has sent
+    its version.
+    """
+    def gotServerVersion(self, serverVersion, extData):
+        self.factory.connected.callback(self)
+
+
+
+def transfer(client, direction, size, requests, latency):
+    """
+    Download or upload C{size} bytes with C{requests} outstanding, and report
+    how long it took.
+    """
+    if direction == 'get':
+        d = client.get(b'file', io.BytesIO(), requests=requests)
+    else:
+        d = client.put(b'file', io.BytesIO(b'x' * size), requests=requests)
+
+    def report(statistics):
+        print('%s, %3d ms, %3d requests: %d MB in %.3f seconds (%.1f MB/s), '
+              '%d requests made' % (
+                  direction, latency * 1000, requests,
+                  statistics.size // 2 ** 20, statistics.elapsed,
+                  statistics.rate / 2 ** 20, statistics.requests))
+    return d.addCallback(report)
+
+
+
+@defer.inlineCallbacks
+def run(megabytes, latency, requests):
+    size = megabytes * 2 ** 20
+    serverFactory = Factory()
+    serverFactory.protocol = lambda: DelayedServer(
+        avatar=MemoryServer(bytearray(b'x' * size)))
+    serverFactory.latency = latency
+    port = reactor.listenTCP(0, serverFactory, interface='127.0.0.1')
+
+    clientFactory = ClientFactory()
+    clientFactory.protocol = BenchmarkClient
+    clientFactory.connected = defer.Deferred()
+    reactor.connectTCP('127.0.0.1', port.getHost().port, clientFactory)
+    client = yield clientFactory.connected
+
+    for direction in ['get', 'put']:
+        for count in requests:
+            yield transfer(client, direction, size, count, latency)
+    client.transport.loseConnection()
+    yield port.stopListening()
+
+
+
+def main(megabytes=16, latency=20, *requests):
+    requests = list(requests) or [1, 4, 16, 64]
+    d = run(megabytes, latency / 1000, requests)
+    d.addErrback(lambda f: f.printTraceback())
+    d.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,118 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly L{twisted.conch.telnet.TelnetTransport} takes application
+data out of what it receives, for a large paste of long lines and for binary
+data with escaped I{IAC}s, and how quickly it escapes what is written to it,
+for a tail of a log file written line by line and in batches of lines.
+
+Usage: python telnet.py [megabytes] [chunkSize]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from zope.interface import implementer
+
+from twisted.conch import telnet
+from twisted.test.proto_helpers import StringTransport
+
+
+
+@implementer(telnet.ITelnetProtocol)
+class Counter(telnet.TelnetProtocol):
+    """
+    Count the application data received.
+    """
+    received = 0
+    calls = 0
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        self.calls += 1
+
+
+
+class CountingTransport(StringTransport):
+    """
+    Count the bytes written, without keeping them.
+    """
+    written = 0
+
+    def write(self, data):
+        self.written += len(data)
+
+
+
+def report(name, size, elapsed, details=''):
+    print('%-28s %d MB in %.3f seconds (%.1f MB/s)%s' % (
+        name, size // 2 ** 20, elapsed, size / 2 ** 20 / elapsed, details))
+
+
+
+def receive(name, data, total, chunkSize):
+    """
+    Deliver C{total} bytes, repeating C{data}, to a L{TelnetTransport} in
+    C{chunkSize} reads.
+    """
+    transport = telnet.TelnetTransport(Counter)
+    transport.makeConnection(CountingTransport())
+    chunks = [data[i:i + chunkSize] for i in range(0, len(data), chunkSize)]
+    count = total // len(data)
+
+    start = time.time()
+    for i in range(count):
+        for chunk in chunks:
+            transport.dataReceived(chunk)
+    elapsed = time.time() - start
+    report(name, len(data) * count, elapsed,
+           ', %d dataReceived calls' % (transport.protocol.calls,))
+
+
+
+def send(name, lines, total, batch):
+    """
+    Write C{total} bytes of C{lines} to a L{TelnetTransport}, C{batch} lines
+    at a time with C{writeSequence}, or one at a time with C{write}.
+    """
+    transport = telnet.TelnetTransport(Counter)
+    transport.makeConnection(CountingTransport())
+    size = sum(len(line) for line in lines)
+    count = total // size
+
+    start = time.time()
+    for i in range(count):
+        if batch == 1:
+            for line in lines:
+                transport.write(line)
+        else:
+            for j in range(0, len(lines), batch):
+                transport.writeSequence(lines[j:j + batch])
+    elapsed = time.time() - start
+    report(name, size * count, elapsed)
+
+
+
+def main(megabytes=64, chunkSize=2 ** 16):
+    total = megabytes * 2 ** 20
+    paste = b''.join([
+        ('    some pasted source code, line number %06d, and so on\r\n' % (
+            i,)).encode('ascii')
+        for i in range(20000)])
+    binary = bytes(bytearray(range(255))).replace(b'\r', b'') * 1000
+    binary = binary.replace(b'\xfe', b'\xff\xff')
+    lines = [('2017-09-20 12:00:00+0000 [-] Request %06d took 0.25s\n' % (
+        i,)).encode('ascii') for i in range(10000)]
+
+    receive('paste', paste, total, chunkSize)
+    receive('binary with escaped IAC', binary, total, chunkSize)
+    send('log tail, write', lines, total, 1)
+    send('log tail, writeSequence', lines, total, 100)
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
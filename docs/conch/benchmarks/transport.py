@@ -0,0 +1,298 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly data uploaded over an SSH channel, the way scp or SFTP
+would upload a file, is received by a server in the same process, over a
+loopback connection between a L{twisted.conch.ssh.transport.SSHClientTransport}
+and a L{twisted.conch.ssh.transport.SSHServerTransport}, and how much CPU
+time it takes to.
+
+User authentication is skipped, so that only the key exchange, the channel
+and the transport are measured.  A round trip time can be simulated by
+delaying what the server sends, including its window adjustments, to show
+how growing the server's channel window up to C{localWindowMaximum} helps.
+
+The time taken by L{twisted.conch.ssh.transport.SSHTransportBase} alone to
+take many small packets out of one large read, without any network or
+encryption involved, is reported too.
+
+Usage: python transport.py [megabytes] [chunkSize] [packets] [latency]
+
+The latency is in milliseconds.
+"""
+
+from __future__ import division, print_function
+
+import os
+import sys
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from zope.interface import implementer
+
+from twisted.conch.ssh import channel, connection, factory, keys, transport
+from twisted.internet import defer, reactor
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.protocol import ClientFactory
+from twisted.test.proto_helpers import StringTransport
+
+
+
+class Sink(channel.SSHChannel):
+    """
+    Count the bytes received on the channel, and fire C{finished} with the
+    count when the other side closes it.
+    """
+    name = b'bench'
+
+    def __init__(self, finished, *args, **kw):
+        channel.SSHChannel.__init__(self, *args, **kw)
+        self.finished = finished
+        self.received = 0
+        self.calls = 0
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        self.calls += 1
+
+
+    def closeReceived(self):
+        self.finished.callback((self.received, self.calls))
+        self.loseConnection()
+
+
+
+class SinkConnection(connection.SSHConnection):
+    """
+    Accept I{bench} channels, without any avatar, as a L{Sink}.
+    """
+    def channel_bench(self, windowSize, maxPacket, data):
+        return Sink(self.transport.factory.finished,
+                    remoteWindow=windowSize, remoteMaxPacket=maxPacket,
+                    localWindowMaximum=self.transport.factory.windowMaximum)
+
+
+
+class DelayedServerTransport(transport.SSHServerTransport):
+    """
+    Delay everything the server sends by the factory's C{latency}.
+    """
+    def connectionMade(self):
+        latency = self.factory.latency
+        if latency:
+            write = self.transport.write
+            pending = []
+            def delayedWrite(data):
+                pending.append(data)
+                reactor.callLater(latency, lambda: write(pending.pop(0)))
+            self.transport.write = delayedWrite
+        transport.SSHServerTransport.connectionMade(self)
+
+
+
+class BenchmarkServerFactory(factory.SSHFactory):
+    """
+    Run L{SinkConnection} directly, without user authentication.
+    """
+    protocol = DelayedServerTransport
+
+    def __init__(self, privateKey, finished, windowMaximum, latency):
+        self.privateKeys = {b'ssh-rsa': privateKey}
+        self.publicKeys = {b'ssh-rsa': privateKey.public()}
+        self.primes = None
+        self.finished = finished
+        self.windowMaximum = windowMaximum
+        self.latency = latency
+
+
+    def getService(self, transport, service):
+        return SinkConnection
+
+
+
+@implementer(IPushProducer)
+class Sender(object):
+    """
+    Write C{total} bytes to a channel in C{chunkSize} writes, for as long as
+    the channel does not pause it, then close the channel.
+    """
+    def __init__(self, channel, total, chunkSize):
+        self.channel = channel
+        self.remaining = total
+        self.chunk = b'x' * chunkSize
+        self.paused = False
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+        while not self.paused and self.remaining > 0:
+            self.channel.write(self.chunk)
+            self.remaining -= len(self.chunk)
+        if self.remaining <= 0 and self.channel.producer is self:
+            self.channel.unregisterProducer()
+            self.channel.loseConnection()
+
+
+    def stopProducing(self):
+        self.remaining = 0
+
+
+
+class Upload(channel.SSHChannel):
+    """
+    Upload data written by a L{Sender}, then close the connection.
+    """
+    name = b'bench'
+
+    def __init__(self, total, chunkSize, *args, **kw):
+        channel.SSHChannel.__init__(self, *args, **kw)
+        self.sender = Sender(self, total, chunkSize)
+
+
+    def channelOpen(self, specificData):
+        self.registerProducer(self.sender, True)
+        if not self.sender.paused:
+            self.sender.resumeProducing()
+
+
+    def closed(self):
+        self.conn.transport.loseConnection()
+
+
+
+class UploadConnection(connection.SSHConnection):
+    """
+    Open an L{Upload} channel as soon as the service starts.
+    """
+    def serviceStarted(self):
+        connection.SSHConnection.serviceStarted(self)
+        self.openChannel(Upload(*self.transport.factory.upload))
+
+
+
+class BenchmarkClientTransport(transport.SSHClientTransport):
+    """
+    Accept any host key, and start L{UploadConnection} without user
+    authentication.
+    """
+    def verifyHostKey(self, hostKey, fingerprint):
+        return defer.succeed(True)
+
+
+    def connectionSecure(self):
+        self.requestService(UploadConnection())
+
+
+
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+
+
+class PacketCounter(transport.SSHTransportBase):
+    """
+    Count the packets received, without starting a key exchange.
+    """
+    packets = 0
+
+    def sendKexInit(self):
+        pass
+
+
+    def dispatchMessage(self, messageNum, payload):
+        self.packets += 1
+
+
+
+def parseOnly(packets):
+    """
+    Deliver C{packets} 100 byte I{CHANNEL_DATA} packets to a
+    L{PacketCounter} in a single call to C{dataReceived}.
+    """
+    protocol = PacketCounter()
+    protocol.makeConnection(StringTransport())
+    protocol.dataReceived(b'SSH-2.0-Benchmark\r\n')
+    protocol.transport.clear()
+    for i in range(packets):
+        protocol.sendPacket(connection.MSG_CHANNEL_DATA, b'x' * 100)
+    data = protocol.transport.value()
+
+    start = time.time()
+    protocol.dataReceived(data)
+    elapsed = time.time() - start
+    print('parsing only: %d packets in %.3f seconds (%d packets/sec)' % (
+        protocol.packets, elapsed, protocol.packets / elapsed))
+
+
+
+def upload(privateKey, cipher, total, chunkSize, windowMaximum=0, latency=0):
+    """
+    Upload C{total} bytes from a client to a server over loopback SSH, using
+    C{cipher} in both directions.
+
+    @return: A L{Deferred} which fires when the upload is done.
+    """
+    finished = defer.Deferred()
+    serverFactory = BenchmarkServerFactory(
+        privateKey, finished, windowMaximum, latency)
+    port = reactor.listenTCP(0, serverFactory, interface='127.0.0.1')
+
+    clientFactory = ClientFactory()
+    clientFactory.upload = (total, chunkSize)
+    clientFactory.protocol = BenchmarkClientTransport
+    clientFactory.protocol.supportedCiphers = [cipher]
+    reactor.connectTCP('127.0.0.1', port.getHost().port, clientFactory)
+
+    start = time.time()
+    cpuStart = cpuTime()
+
+    def report(result):
+        received, calls = result
+        elapsed = time.time() - start
+        cpu = cpuTime() - cpuStart
+        print('%-12s %6d byte writes, %3d ms, %8d byte window maximum: '
+              '%d MB in %.3f seconds (%.1f MB/s), %.3f CPU seconds, '
+              '%d dataReceived calls' % (
+                  cipher.decode('ascii'), chunkSize, latency * 1000,
+                  windowMaximum, received // 2 ** 20, elapsed,
+                  received / 2 ** 20 / elapsed, cpu, calls))
+        return port.stopListening()
+    return finished.addCallback(report)
+
+
+
+def main(megabytes=64, chunkSize=2 ** 15, packets=40000, latency=20):
+    parseOnly(packets)
+
+    privateKey = keys.Key(rsa.generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend()))
+    latency /= 1000
+    uploads = [(b'aes128-ctr', 0, 0), (b'aes256-ctr', 0, 0),
+               (b'aes256-cbc', 0, 0), (b'aes128-ctr', 0, latency),
+               (b'aes128-ctr', 2 ** 24, latency)]
+
+    def next(ignored=None):
+        if uploads:
+            cipher, windowMaximum, delay = uploads.pop(0)
+            d = upload(privateKey, cipher, megabytes * 2 ** 20, chunkSize,
+                       windowMaximum, delay)
+            d.addCallback(next)
+            d.addErrback(lambda f: (f.printTraceback(), reactor.stop()))
+        else:
+            reactor.stop()
+    reactor.callWhenRunning(next)
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,280 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many L{twisted.protocols.amp} commands a client and a server in
+the same process can exchange per second, with a given number of commands
+outstanding at once, how quickly L{twisted.protocols.amp.BinaryBoxProtocol}
+parses a buffer full of boxes, and how quickly a large value can be uploaded
+with L{twisted.protocols.amp.Stream}, with a slow consumer or not.
+
+The client and server are connected by in-memory transports, and everything
+one writes is delivered to the other in a single read per round, so the
+numbers are those of AMP itself rather than of the network.
+
+Usage: python amp.py [calls] [outstanding...]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from zope.interface import implementer
+
+from twisted.internet.defer import Deferred
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from twisted.protocols import amp
+from twisted.test.proto_helpers import StringTransport
+
+
+
+class Store(amp.Command):
+    arguments = [(b'key', amp.Unicode()),
+                 (b'value', amp.String()),
+                 (b'ttl', amp.Integer()),
+                 (b'replace', amp.Boolean(optional=True))]
+    response = [(b'version', amp.Integer()),
+                (b'stored', amp.Boolean())]
+
+
+
+class Upload(amp.Command):
+    arguments = [(b'data', amp.Stream())]
+    response = [(b'size', amp.Integer())]
+
+
+
+@implementer(IConsumer)
+class Sink(object):
+    """
+    Count the bytes written, pausing the producer after every C{pauseEvery}
+    bytes until L{release} is called.
+    """
+    def __init__(self, pauseEvery=None):
+        self.received = 0
+        self.pauseEvery = pauseEvery
+        self.paused = False
+
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+
+    def unregisterProducer(self):
+        pass
+
+
+    def write(self, data):
+        self.received += len(data)
+        if self.pauseEvery and self.received % self.pauseEvery < len(data):
+            self.paused = True
+            self.producer.pauseProducing()
+
+
+    def release(self):
+        if self.paused:
+            self.paused = False
+            self.producer.resumeProducing()
+            return True
+        return False
+
+
+
+class Server(amp.AMP):
+    version = 0
+    sink = None
+
+    @Store.responder
+    def store(self, key, value, ttl, replace):
+        self.version += 1
+        return {'version': self.version, 'stored': True}
+
+
+    @Upload.responder
+    def upload(self, data):
+        d = data.deliverTo(self.sink)
+        d.addCallback(lambda ignored: {'size': self.sink.received})
+        return d
+
+
+
+@implementer(IPushProducer)
+class Source(object):
+    """
+    Produce C{total} bytes in 16KiB writes for as long as it is not paused.
+    """
+    paused = False
+
+    def __init__(self, total):
+        self.remaining = total
+        self.chunk = b'x' * 2 ** 14
+
+
+    def startProducing(self, consumer):
+        self.consumer = consumer
+        self.finished = Deferred()
+        finished = self.finished
+        self.resumeProducing()
+        return finished
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+        while self.remaining > 0 and not self.paused:
+            self.consumer.write(self.chunk)
+            self.remaining -= len(self.chunk)
+        if self.remaining <= 0 and self.finished is not None:
+            finished, self.finished = self.finished, None
+            finished.callback(None)
+
+
+    def stopProducing(self):
+        self.remaining = 0
+
+
+
+class Pipe(StringTransport):
+    """
+    A transport which keeps what is written until it is pumped to the peer.
+    """
+    def __init__(self):
+        StringTransport.__init__(self)
+        self.chunks = []
+
+
+    def write(self, data):
+        self.chunks.append(data)
+
+
+    def pump(self, peer):
+        if not self.chunks:
+            return False
+        data = b''.join(self.chunks)
+        del self.chunks[:]
+        peer.dataReceived(data)
+        return True
+
+
+
+def roundTrips(calls, outstanding):
+    """
+    Make C{calls} calls from a client to a server, keeping C{outstanding} of
+    them in flight at once.
+    """
+    client = amp.AMP()
+    server = Server()
+    clientTransport = Pipe()
+    serverTransport = Pipe()
+    client.makeConnection(clientTransport)
+    server.makeConnection(serverTransport)
+
+    state = {'sent': 0, 'answered': 0}
+    value = b'v' * 100
+
+    def send(ignored=None):
+        if state['sent'] < calls:
+            state['sent'] += 1
+            d = client.callRemote(
+                Store, key=u'key-%d' % (state['sent'],), value=value, ttl=60)
+            d.addCallback(answered)
+
+    def answered(result):
+        state['answered'] += 1
+        send()
+
+    start = time.time()
+    for i in range(outstanding):
+        send()
+    while clientTransport.pump(server) | serverTransport.pump(client):
+        pass
+    elapsed = time.time() - start
+    assert state['answered'] == calls, state
+    print('%4d outstanding: %6d calls in %.3f seconds (%.0f calls/s)' % (
+        outstanding, calls, elapsed, calls / elapsed))
+
+
+
+class Counter(object):
+    received = 0
+
+    def startReceivingBoxes(self, sender):
+        pass
+
+
+    def ampBoxReceived(self, box):
+        self.received += 1
+
+
+
+def parse(boxes):
+    """
+    Parse C{boxes} boxes received in 64KiB reads.
+    """
+    box = amp.AmpBox({b'_command': b'Store', b'_ask': b'1a2b',
+                      b'key': b'key-12345', b'value': b'v' * 100,
+                      b'ttl': b'60'})
+    data = box.serialize() * boxes
+    chunks = [data[i:i + 2 ** 16] for i in range(0, len(data), 2 ** 16)]
+    counter = Counter()
+    protocol = amp.BinaryBoxProtocol(counter)
+    protocol.makeConnection(StringTransport())
+
+    start = time.time()
+    for chunk in chunks:
+        protocol.dataReceived(chunk)
+    elapsed = time.time() - start
+    assert counter.received == boxes
+    print('parse: %d boxes in %.3f seconds (%.0f boxes/s, %.1f MB/s)' % (
+        boxes, elapsed, boxes / elapsed, len(data) / 2 ** 20 / elapsed))
+
+
+
+def stream(megabytes, pauseEvery=None):
+    """
+    Upload C{megabytes} with a L{Stream} argument, to a consumer which pauses
+    after every C{pauseEvery} bytes until the next round.
+    """
+    client = amp.AMP()
+    server = Server()
+    server.sink = Sink(pauseEvery)
+    clientTransport = Pipe()
+    serverTransport = Pipe()
+    client.makeConnection(clientTransport)
+    server.makeConnection(serverTransport)
+    total = megabytes * 2 ** 20
+    result = []
+    maxBuffered = [0]
+
+    start = time.time()
+    client.callRemote(Upload, data=Source(total)).addCallback(result.append)
+    while True:
+        maxBuffered[0] = max(maxBuffered[0], sum(
+            len(chunk) for chunk in clientTransport.chunks))
+        moved = clientTransport.pump(server) | serverTransport.pump(client)
+        if not (moved | server.sink.release()):
+            break
+    elapsed = time.time() - start
+    assert result == [{'size': total}], result
+    print('stream%s: %d MB in %.3f seconds (%.1f MB/s), at most %d KB '
+          'buffered' % (
+              ', slow consumer' if pauseEvery else '', megabytes, elapsed,
+              megabytes / elapsed, maxBuffered[0] // 1024))
+
+
+
+def main(calls=50000, *outstanding):
+    for window in outstanding or (1, 10, 100):
+        roundTrips(calls, window)
+    parse(calls * 4)
+    stream(256)
+    stream(64, 2 ** 16)
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,167 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many events per second L{twisted.logger.Logger} can emit through
+a L{twisted.logger.LogPublisher} to some typical stacks of observers, writing
+to in-memory files, and how many L{twisted.python.log.msg} can emit to a
+legacy observer.
+
+How quickly a JSON log file of those events can be searched with
+L{twisted.logger.IndexedJSONLogFile}, compared to reading all of it with
+L{twisted.logger.eventsFromJSONLogFile}, is reported too.
+
+Usage: python logger.py [events]
+"""
+
+from __future__ import division, print_function
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from twisted.logger import (
+    FilteringLogObserver, IndexedJSONLogFile, LogBeginner, LogLevel,
+    LogLevelFilterPredicate, LogPublisher, Logger, eventsFromJSONLogFile,
+    jsonFileLogObserver, textFileLogObserver,
+)
+from twisted.python import log
+from twisted.python.compat import NativeStringIO
+
+
+
+def textObservers():
+    return [textFileLogObserver(io.StringIO())]
+
+
+
+def threeTextObservers():
+    return [textFileLogObserver(io.StringIO()),
+            textFileLogObserver(io.StringIO(), timeFormat="%H:%M:%S"),
+            textFileLogObserver(io.StringIO(), timeFormat=None)]
+
+
+
+def textAndJSONObservers():
+    return [textFileLogObserver(io.StringIO()),
+            jsonFileLogObserver(io.StringIO())]
+
+
+
+def filteredObservers(level=LogLevel.info):
+    def filtered(observer):
+        return FilteringLogObserver(
+            observer, [LogLevelFilterPredicate(defaultLogLevel=level)])
+    return [filtered(observer) for observer in threeTextObservers()]
+
+
+
+def filteredOut():
+    return filteredObservers(LogLevel.warn)
+
+
+
+class NotWarnings(object):
+    showwarning = None
+
+
+
+def beginner(observers, level):
+    """
+    Create a L{LogPublisher} for C{observers}, as the global one would be, and
+    have its L{LogBeginner} publish events at or above C{level}.
+    """
+    publisher = LogPublisher()
+    logBeginner = LogBeginner(publisher, io.StringIO(), sys, NotWarnings())
+    logBeginner.beginLoggingTo(observers, redirectStandardIO=False)
+    logBeginner.levels.setLogLevelForNamespace(None, level)
+    return publisher
+
+
+
+def report(name, events, elapsed):
+    print('%-30s %d events in %.3f seconds (%d events/sec)' % (
+        name, events, elapsed, events / elapsed))
+
+
+
+def benchmark(name, observers, events, publisher=None):
+    if publisher is None:
+        publisher = LogPublisher(*observers)
+    log = Logger(namespace="benchmark", observer=publisher)
+    start = time.time()
+    for i in range(events):
+        log.info("Request {number} for {path} took {elapsed:.3f} seconds",
+                 number=i, path="/some/resource", elapsed=0.25)
+    report(name, events, time.time() - start)
+
+
+
+def legacy(name, events, level=LogLevel.info):
+    """
+    Log messages with L{twisted.python.log.msg} to a legacy file observer.
+    """
+    publisher = beginner([], level)
+    legacyPublisher = log.LogPublisher(publisher, publisher)
+    legacyPublisher.addObserver(log.FileLogObserver(NativeStringIO()).emit)
+    start = time.time()
+    for i in range(events):
+        legacyPublisher.msg("Request", i, "for /some/resource took 0.25s")
+    report(name, events, time.time() - start)
+
+
+
+def timed(name, f, *args):
+    start = time.time()
+    count = len(list(f(*args)))
+    elapsed = time.time() - start
+    print('%-30s %d events in %.3f seconds' % (name, count, elapsed))
+
+
+
+def searchJSON(events):
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'log.json')
+        with io.open(path, 'w', encoding='utf-8') as logFile:
+            log = Logger(namespace="benchmark",
+                         observer=jsonFileLogObserver(logFile))
+            for i in range(events):
+                level = LogLevel.warn if i % 100 == 0 else LogLevel.info
+                log.emit(level, "Request {number} took {elapsed} seconds",
+                         number=i, elapsed=0.25)
+
+        def readAll():
+            with io.open(path, 'rb') as logFile:
+                return [event for event in eventsFromJSONLogFile(logFile)
+                        if event["log_level"] == LogLevel.warn]
+
+        indexed = IndexedJSONLogFile(path)
+        timed('read all, keep warnings', readAll)
+        timed('index', indexed.updateIndex)
+        timed('indexed warnings', indexed.events, None, None, None,
+              LogLevel.warn)
+    finally:
+        shutil.rmtree(directory)
+
+
+
+def main(events=20000):
+    benchmark('one text observer', textObservers(), events)
+    benchmark('three text observers', threeTextObservers(), events)
+    benchmark('text and JSON observers', textAndJSONObservers(), events)
+    benchmark('three filtered observers', filteredObservers(), events)
+    benchmark('all filtered out', filteredOut(), events)
+    benchmark('below beginner level', None, events,
+              beginner(threeTextObservers(), LogLevel.warn))
+    legacy('log.msg', events)
+    legacy('log.msg below level', events, LogLevel.warn)
+    searchJSON(events)
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,137 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly L{twisted.spread.pb} echoes large lists and dictionaries
+between a client and a server in the same process, and how much of that is
+spent in L{twisted.spread.jelly} and L{twisted.spread.banana}.
+
+The client and server are connected by in-memory transports, and everything
+one writes is delivered to the other in a single read per round, so the
+numbers are those of Perspective Broker rather than of the network.
+
+Usage: python pb.py [calls]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from twisted.spread import banana, jelly, pb
+from twisted.test.proto_helpers import StringTransport
+
+
+
+class Echoer(pb.Root):
+    def remote_echo(self, value):
+        return value
+
+
+
+class Pipe(StringTransport):
+    """
+    A transport which keeps what is written until it is pumped to the peer.
+    """
+    def __init__(self):
+        StringTransport.__init__(self)
+        self.chunks = []
+
+
+    def write(self, data):
+        self.chunks.append(data)
+
+
+    def pump(self, peer):
+        if not self.chunks:
+            return False
+        data = b''.join(self.chunks)
+        del self.chunks[:]
+        peer.dataReceived(data)
+        return True
+
+
+
+PAYLOADS = [
+    ('small list', [1, b'two', 3.0]),
+    ('10000 ints', list(range(10000))),
+    ('10000 strings', [b'value-%d' % (i,) for i in range(10000)]),
+    ('10000 floats', [i / 7 for i in range(10000)]),
+    ('1000 entry dict', dict((b'key-%d' % (i,), [i, b'v', i / 3])
+                             for i in range(1000))),
+]
+
+
+
+def roundTrips(calls, name, payload):
+    """
+    Make C{calls} calls echoing C{payload}, one after the other.
+    """
+    client = pb.PBClientFactory().buildProtocol(None)
+    server = pb.PBServerFactory(Echoer()).buildProtocol(None)
+    clientTransport = Pipe()
+    serverTransport = Pipe()
+    client.makeConnection(clientTransport)
+    server.makeConnection(serverTransport)
+
+    def pump():
+        while clientTransport.pump(server) | serverTransport.pump(client):
+            pass
+
+    pump()
+    roots = []
+    client.factory.getRootObject().addCallback(roots.append)
+    pump()
+    root, = roots
+
+    results = []
+    start = time.time()
+    for i in range(calls):
+        root.callRemote('echo', payload).addCallback(results.append)
+        pump()
+    elapsed = time.time() - start
+    assert len(results) == calls and results[-1] == payload, results[-1:]
+    print('%-16s %6d calls in %.3f seconds (%.0f calls/s)' % (
+        name + ':', calls, elapsed, calls / elapsed))
+
+
+
+def codecs(calls, name, payload):
+    """
+    Jelly, encode, decode and unjelly C{payload} C{calls} times each.
+    """
+    timings = []
+    start = time.time()
+    for i in range(calls):
+        sexp = jelly.jelly(payload)
+    timings.append(time.time() - start)
+    start = time.time()
+    for i in range(calls):
+        encoded = banana.encode(sexp)
+    timings.append(time.time() - start)
+    start = time.time()
+    for i in range(calls):
+        decoded = banana.decode(encoded)
+    timings.append(time.time() - start)
+    start = time.time()
+    for i in range(calls):
+        result = jelly.unjelly(decoded)
+    timings.append(time.time() - start)
+    assert result == payload
+    print('%-16s jelly %6.0f/s, encode %6.0f/s, decode %6.0f/s, '
+          'unjelly %6.0f/s' % ((name + ':',) + tuple(
+              calls / elapsed for elapsed in timings)))
+
+
+
+def main(calls=200):
+    for name, payload in PAYLOADS:
+        roundTrips(calls if name != 'small list' else calls * 20,
+                   name, payload)
+    for name, payload in PAYLOADS:
+        codecs(calls, name, payload)
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
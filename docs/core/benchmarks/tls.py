@@ -0,0 +1,145 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly L{twisted.protocols.tls.TLSMemoryBIOProtocol} transfers
+bulk data over a TLS connection on loopback, between a client and a server in
+the same process, and how much CPU time it takes to.
+
+The data is written by a producer in chunks of a given size, so the cost of
+many small application writes can be compared with that of a few large ones.
+
+Usage: python tls.py [megabytes] [chunkSize...]
+"""
+
+from __future__ import division, print_function
+
+import os
+import sys
+import time
+
+from zope.interface import implementer
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.interfaces import IPullProducer
+from twisted.internet.protocol import ClientFactory, Factory, Protocol
+from twisted.internet.ssl import CertificateOptions, PrivateCertificate
+from twisted.protocols.tls import TLSMemoryBIOFactory
+from twisted.python.filepath import FilePath
+import twisted.test
+
+
+
+@implementer(IPullProducer)
+class Sender(Protocol):
+    """
+    Write C{total} bytes in C{chunkSize} writes, about 64KiB per call to
+    C{resumeProducing}, then close the connection.
+    """
+    def __init__(self, total, chunkSize):
+        self.remaining = total
+        self.chunk = b'x' * chunkSize
+        self.writesPerCall = max(1, 2 ** 16 // chunkSize)
+
+
+    def connectionMade(self):
+        self.transport.registerProducer(self, False)
+
+
+    def resumeProducing(self):
+        for i in range(self.writesPerCall):
+            if self.remaining <= 0:
+                self.transport.unregisterProducer()
+                self.transport.loseConnection()
+                return
+            self.transport.write(self.chunk)
+            self.remaining -= len(self.chunk)
+
+
+    def stopProducing(self):
+        pass
+
+
+
+class Receiver(Protocol):
+    """
+    Count the bytes received, and fire C{finished} with the count when the
+    connection is closed.
+    """
+    def __init__(self, finished):
+        self.finished = finished
+        self.received = 0
+        self.calls = 0
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        self.calls += 1
+
+
+    def connectionLost(self, reason):
+        self.finished.callback((self.received, self.calls))
+
+
+
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+
+
+def transfer(options, total, chunkSize):
+    """
+    Transfer C{total} bytes from a server to a client over loopback TLS.
+
+    @return: A L{Deferred} which fires when the transfer is done.
+    """
+    serverFactory = Factory()
+    serverFactory.protocol = lambda: Sender(total, chunkSize)
+    port = reactor.listenTCP(
+        0, TLSMemoryBIOFactory(options, False, serverFactory),
+        interface='127.0.0.1')
+
+    finished = Deferred()
+    clientFactory = ClientFactory()
+    clientFactory.protocol = lambda: Receiver(finished)
+    reactor.connectTCP(
+        '127.0.0.1', port.getHost().port,
+        TLSMemoryBIOFactory(CertificateOptions(), True, clientFactory))
+
+    start = time.time()
+    cpuStart = cpuTime()
+
+    def report(result):
+        received, calls = result
+        elapsed = time.time() - start
+        cpu = cpuTime() - cpuStart
+        print('%6d byte writes: %d MB in %.3f seconds (%.1f MB/s), '
+              '%.3f CPU seconds, %d dataReceived calls' % (
+                  chunkSize, received // 2 ** 20, elapsed,
+                  received / 2 ** 20 / elapsed, cpu, calls))
+        return port.stopListening()
+    return finished.addCallback(report)
+
+
+
+def main(megabytes=256, *chunkSizes):
+    pem = FilePath(twisted.test.__file__).sibling('server.pem').getContent()
+    options = PrivateCertificate.loadPEM(pem).options()
+    chunkSizes = list(chunkSizes) or [2 ** 16, 2 ** 12, 2 ** 9]
+
+    def next(ignored=None):
+        if chunkSizes:
+            d = transfer(options, megabytes * 2 ** 20, chunkSizes.pop(0))
+            d.addCallback(next)
+            d.addErrback(lambda f: (f.printTraceback(), reactor.stop()))
+        else:
+            reactor.stop()
+    reactor.callWhenRunning(next)
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,147 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly L{twisted.web.client.Agent} issues requests for a small
+JSON document to a Twisted Web server in the same process, over persistent
+HTTP/1.1 connections on loopback.
+
+The time taken by the client alone to parse the same response, replayed into
+an L{HTTP11ClientProtocol} without any network or server involved, is
+reported too.
+
+Usage: python client.py [requests] [concurrency] [responseHeaders]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, gatherResults, inlineCallbacks
+from twisted.internet.protocol import Protocol
+from twisted.test.proto_helpers import StringTransport
+from twisted.web.client import Agent, HTTPConnectionPool
+from twisted.web.http_headers import Headers
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+from twisted.web._newclient import HTTP11ClientProtocol, Request
+
+
+
+BODY = b'{"id": 12345, "name": "example", "tags": ["a", "b"]}'
+
+
+
+class JSONDocument(Resource):
+    isLeaf = True
+
+    def __init__(self, headers):
+        Resource.__init__(self)
+        self.headers = [(b'X-Benchmark-Header-%d' % (i,), b'value %d' % (i,))
+                        for i in range(headers)]
+
+
+    def render_GET(self, request):
+        request.setHeader(b'content-type', b'application/json')
+        for name, value in self.headers:
+            request.setHeader(name, value)
+        return BODY
+
+
+
+class BodyCollector(Protocol):
+    """
+    Collect a response body, and fire C{finished} when it is complete.
+    """
+    def __init__(self, finished):
+        self.finished = finished
+        self.data = []
+
+
+    def dataReceived(self, data):
+        self.data.append(data)
+
+
+    def connectionLost(self, reason):
+        self.finished.callback(b''.join(self.data))
+
+
+
+def readBody(response):
+    finished = Deferred()
+    response.deliverBody(BodyCollector(finished))
+    return finished
+
+
+
+@inlineCallbacks
+def worker(agent, url, count):
+    for i in range(count):
+        response = yield agent.request(b'GET', url)
+        yield readBody(response)
+
+
+
+def parseOnly(requests, responseHeaders):
+    """
+    Replay a response into an L{HTTP11ClientProtocol} C{requests} times.
+    """
+    response = b''.join(
+        [b'HTTP/1.1 200 OK\r\n',
+         b'Content-Type: application/json\r\n',
+         b'Content-Length: %d\r\n' % (len(BODY),)] +
+        [b'X-Benchmark-Header-%d: value %d\r\n' % (i, i)
+         for i in range(responseHeaders)] +
+        [b'\r\n', BODY])
+    request = Request(b'GET', b'/', Headers({b'host': [b'localhost']}), None,
+                      persistent=True)
+    transport = StringTransport()
+    protocol = HTTP11ClientProtocol()
+    protocol.makeConnection(transport)
+
+    start = time.time()
+    for i in range(requests):
+        protocol.request(request).addCallback(readBody)
+        protocol.dataReceived(response)
+        transport.clear()
+    elapsed = time.time() - start
+    print('parsing only: %d responses in %.3f seconds (%d responses/sec)' % (
+        requests, elapsed, requests / elapsed))
+
+
+
+def main(requests=20000, concurrency=10, responseHeaders=8):
+    parseOnly(requests, responseHeaders)
+
+    site = Site(JSONDocument(responseHeaders))
+    site.noisy = False
+    port = reactor.listenTCP(0, site, interface='127.0.0.1')
+    url = b'http://127.0.0.1:%d/' % (port.getHost().port,)
+
+    pool = HTTPConnectionPool(reactor)
+    pool.maxPersistentPerHost = concurrency
+    agent = Agent(reactor, pool=pool)
+    perWorker = requests // concurrency
+
+    def report(ignored, start):
+        elapsed = time.time() - start
+        total = perWorker * concurrency
+        print('end to end: %d requests, %d at a time, in %.3f seconds '
+              '(%d requests/sec)' % (
+                  total, concurrency, elapsed, total / elapsed))
+
+    start = time.time()
+    d = gatherResults(
+        [worker(agent, url, perWorker) for i in range(concurrency)])
+    d.addCallback(report, start)
+    d.addErrback(lambda f: f.printTraceback())
+    d.addBoth(lambda ignored: pool.closeCachedConnections())
+    d.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
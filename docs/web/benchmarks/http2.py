@@ -0,0 +1,142 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how quickly a Twisted Web server answers many concurrent HTTP/2
+requests on a single connection over loopback.
+
+The server speaks HTTP/2 with prior knowledge, so no TLS is involved; the
+client is a minimal protocol built directly on the h2 library.
+
+Usage: python http2.py [streams] [responseSize] [rounds]
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+import h2.config
+import h2.connection
+import h2.events
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.protocol import ClientFactory, Protocol
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+from twisted.web._http2 import H2Connection
+
+
+
+class Payload(Resource):
+    isLeaf = True
+
+    def __init__(self, size):
+        Resource.__init__(self)
+        self.body = b'x' * size
+
+    def render_GET(self, request):
+        return self.body
+
+
+
+class H2Site(Site):
+    """
+    A L{Site} which speaks HTTP/2 on every connection.
+    """
+    def buildProtocol(self, addr):
+        channel = H2Connection()
+        channel.factory = self
+        channel.site = self
+        channel.requestFactory = self.requestFactory
+        channel.timeOut = None
+        return channel
+
+
+
+class BenchmarkClient(Protocol):
+    """
+    Issue C{rounds} batches of C{streams} concurrent GET requests, waiting for
+    each batch to complete before starting the next.
+    """
+    def __init__(self, streams, rounds, finished):
+        self.streams = streams
+        self.rounds = rounds
+        self.finished = finished
+        self.outstanding = 0
+        self.received = 0
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=True))
+
+
+    def connectionMade(self):
+        self.conn.initiate_connection()
+        self.conn.increment_flow_control_window(2 ** 30)
+        self.start = time.time()
+        self.sendBatch()
+
+
+    def sendBatch(self):
+        for i in range(self.streams):
+            streamID = self.conn.get_next_available_stream_id()
+            self.conn.send_headers(streamID, [
+                (b':method', b'GET'),
+                (b':authority', b'localhost'),
+                (b':scheme', b'http'),
+                (b':path', b'/'),
+            ], end_stream=True)
+            self.outstanding += 1
+        self.transport.write(self.conn.data_to_send())
+
+
+    def dataReceived(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.DataReceived):
+                self.received += len(event.data)
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                self.outstanding -= 1
+        if not self.outstanding:
+            self.rounds -= 1
+            if self.rounds:
+                self.sendBatch()
+            else:
+                elapsed = time.time() - self.start
+                self.transport.loseConnection()
+                self.finished.callback((elapsed, self.received))
+                return
+        dataToSend = self.conn.data_to_send()
+        if dataToSend:
+            self.transport.write(dataToSend)
+
+
+
+def main(streams=100, responseSize=16384, rounds=50):
+    site = H2Site(Payload(responseSize))
+    site.h2MaxConcurrentStreams = streams
+    port = reactor.listenTCP(0, site, interface='127.0.0.1')
+
+    finished = Deferred()
+    factory = ClientFactory()
+    factory.protocol = lambda: BenchmarkClient(streams, rounds, finished)
+    reactor.connectTCP('127.0.0.1', port.getHost().port, factory)
+
+    def report(result):
+        elapsed, received = result
+        requests = streams * rounds
+        print('%d streams, %d byte responses: %d requests in %.3f seconds '
+              '(%d requests/sec, %.1f MB/sec)' % (
+                  streams, responseSize, requests, elapsed,
+                  requests / elapsed, received / elapsed / 2 ** 20))
+
+    finished.addCallback(report)
+    finished.addErrback(lambda f: f.printTraceback())
+    finished.addBoth(lambda ignored: reactor.stop())
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,92 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compare resolving requests against a tree of 1000 routes built from nested
+L{Resource.putChild} calls with resolving them using a L{RoutingResource}.
+"""
+
+from __future__ import division, print_function
+
+import time
+
+from twisted.python.compat import range
+from twisted.web.resource import Resource, getChildForRequest
+from twisted.web.routing import RoutingResource
+from twisted.web.test.requesthelper import DummyRequest
+
+
+class SectionResource(Resource):
+    """
+    A resource which stands in for the parameter segment of a route in the
+    L{Resource.putChild} tree by returning the same child for any name.
+
+    @ivar pages: The resource returned for every dynamic child.
+    """
+    def __init__(self):
+        Resource.__init__(self)
+        self.pages = Resource()
+
+    def getChild(self, name, request):
+        return self.pages
+
+
+
+def routes(count):
+    """
+    Generate C{count} routes, each four segments deep, with a parameter in the
+    third segment.
+    """
+    for n in range(count):
+        yield (b"/api/v%d/section%d/{user}/page%d" % (n % 10, n % 100, n))
+
+
+
+def buildTree(count):
+    root = Resource()
+    for route in routes(count):
+        api, version, section, parameter, page = route.split(b"/")[1:]
+        node = root
+        for segment, factory in ((api, Resource), (version, Resource),
+                                 (section, SectionResource)):
+            child = node.children.get(segment)
+            if child is None:
+                child = factory()
+                node.putChild(segment, child)
+            node = child
+        node.pages.putChild(page, Resource())
+    return root
+
+
+
+def buildRouter(count):
+    root = RoutingResource()
+    for route in routes(count):
+        root.addRoute(route, Resource())
+    return root
+
+
+
+def benchmark(name, root, paths, iterations):
+    before = time.time()
+    for i in range(iterations):
+        for path in paths:
+            getChildForRequest(root, DummyRequest(path))
+    after = time.time()
+    count = iterations * len(paths)
+    print('%s: %d lookups in %.3f seconds (%d lookups/sec)' % (
+        name, count, after - before, count / (after - before)))
+
+
+
+def main(count=1000, iterations=20):
+    paths = [
+        route.replace(b"{user}", b"alice").split(b"/")[1:]
+        for route in routes(count)]
+    benchmark('Resource.putChild', buildTree(count), paths, iterations)
+    benchmark('RoutingResource', buildRouter(count), paths, iterations)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ from __future__ import absolute_import, division
 import sys
 import binascii
 import errno
+import os
 
 try:
     import pwd
@@ -390,32 +391,29 @@ def readAuthorizedKeyFile(fileobj, parseKey=keys.Key.fromString):
 
 
 
-def _keysFromFilepaths(filepaths, parseKey):
+def _fileSignature(filepath):
     """
-    Helper function that turns an iterable of filepaths into a generator of
-    keys.  If any file cannot be read, a message is logged but it is
-    otherwise ignored.
-
-    @param filepaths: iterable of L{twisted.python.filepath.FilePath}.
-    @type filepaths: iterable
-
-    @param parseKey: a callable that takes a string and returns a
-        L{twisted.conch.ssh.keys.Key}
-    @type parseKey: L{callable}
-
-    @return: generator of L{twisted.conch.ssh.keys.Key}
-    @rtype: generator
-
-    @since: 15.0
+    Identify the current version of a file well enough to tell when it has
+    been changed or replaced.
+
+    @param filepath: The file.
+    @type filepath: L{twisted.python.filepath.FilePath}
+
+    @raise OSError: If the file cannot be examined, most likely because it
+        does not exist.
+
+    @return: A value which compares unequal to the one returned before the
+        file was modified, truncated, or replaced by another file.  The
+        modification and status change times are included at the highest
+        resolution available, so that a file rewritten in place with the same
+        size is noticed unless both are within the file system's timestamp
+        granularity.
+    @rtype: L{tuple}
     """
-    for fp in filepaths:
-        if fp.exists():
-            try:
-                with fp.open() as f:
-                    for key in readAuthorizedKeyFile(f, parseKey):
-                        yield key
-            except (IOError, OSError) as e:
-                log.msg("Unable to read {0}: {1!s}".format(fp.path, e))
+    st = os.stat(filepath.path)
+    return (st.st_mtime, getattr(st, "st_mtime_ns", None),
+            st.st_ctime, getattr(st, "st_ctime_ns", None),
+            st.st_size, st.st_ino, st.st_dev)
 
 
 
@@ -452,6 +450,14 @@ class UNIXAuthorizedKeysFiles(object):
     If any of the files cannot be read, a message is logged but that file is
     otherwise ignored.
 
+    The keys parsed from each file are kept until the file's modification
+    time, status change time, size or inode changes, so that they are not
+    parsed again for every authentication attempt.
+
+    @ivar _cache: A L{dict} mapping the path of each file read to a
+        2-L{tuple} of the signature L{_fileSignature} gave it when it was
+        read, and the L{list} of keys parsed from it.
+
     @since: 15.0
     """
     def __init__(self, userdb=None, parseKey=keys.Key.fromString):
@@ -469,6 +475,7 @@ class UNIXAuthorizedKeysFiles(object):
         """
         self._userdb = userdb
         self._parseKey = parseKey
+        self._cache = {}
         if userdb is None:
             self._userdb = pwd
 
@@ -481,8 +488,41 @@ class UNIXAuthorizedKeysFiles(object):
 
         root = FilePath(passwd.pw_dir).child('.ssh')
         files = ['authorized_keys', 'authorized_keys2']
-        return _keysFromFilepaths((root.child(f) for f in files),
-                                  self._parseKey)
+        authorizedKeys = []
+        for f in files:
+            authorizedKeys.extend(self._keysFromFilepath(root.child(f)))
+        return authorizedKeys
+
+
+    def _keysFromFilepath(self, fp):
+        """
+        Get the keys in an authorized keys file, parsing it only if it has
+        changed since it was last parsed.
+
+        @param fp: The file.
+        @type fp: L{twisted.python.filepath.FilePath}
+
+        @return: The keys in C{fp}, or nothing if it does not exist or cannot
+            be read, in which case a message is logged.
+        @rtype: L{list} of L{twisted.conch.ssh.keys.Key}
+        """
+        try:
+            signature = _fileSignature(fp)
+        except OSError:
+            self._cache.pop(fp.path, None)
+            return []
+        cached = self._cache.get(fp.path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            with fp.open() as f:
+                parsed = list(readAuthorizedKeyFile(f, self._parseKey))
+        except (IOError, OSError) as e:
+            log.msg("Unable to read {0}: {1!s}".format(fp.path, e))
+            self._cache.pop(fp.path, None)
+            return []
+        self._cache[fp.path] = (signature, parsed)
+        return parsed
 
 
 
@@ -18,6 +18,7 @@ import sys
 
 from zope.interface import implementer
 
+from twisted.conch.checkers import _fileSignature
 from twisted.conch.interfaces import IKnownHostEntry
 from twisted.conch.error import HostKeyChanged, UserRejectedKey, InvalidEntry
 from twisted.conch.ssh.keys import Key, BadKeyError, FingerprintFormats
@@ -356,7 +357,20 @@ class KnownHostsFile(object):
     @type _clobber: L{bool}
 
     @ivar _savePath: See C{savePath} parameter of L{__init__}.
+
+    @ivar _fileCache: L{None}, or a 3-L{tuple} of the signature
+        L{twisted.conch.checkers._fileSignature} gave the save path when it
+        was last read, the L{list} of entries read from it, and a L{dict}
+        mapping hostnames to the L{list} of C{(index, entry)} pairs of the
+        entries which match them.  The entries are only parsed again, and the
+        hostnames only matched again, which for hashed entries means
+        computing an HMAC per entry, when the signature changes.
+
+    @ivar _maximumIndexedHosts: The number of hostnames after which the
+        hostname index is emptied rather than grown further.
     """
+    _fileCache = None
+    _maximumIndexedHosts = 1024
 
     def __init__(self, savePath):
         """
@@ -396,11 +410,34 @@ class KnownHostsFile(object):
         if self._clobber:
             return
 
+        for entry in self._loadFile()[0]:
+            yield entry
+
+
+    def _loadFile(self):
+        """
+        Get the entries in the save path, parsing it only if it has changed
+        since it was last parsed.
+
+        @return: A 2-L{tuple} of the L{list} of entries in the file and the
+            L{dict} indexing them by hostname, which is empty if the file
+            cannot be read.
+        """
+        try:
+            signature = _fileSignature(self._savePath)
+        except OSError:
+            self._fileCache = None
+            return [], {}
+        if self._fileCache is not None and self._fileCache[0] == signature:
+            return self._fileCache[1:]
+
         try:
             fp = self._savePath.open()
         except IOError:
-            return
+            self._fileCache = None
+            return [], {}
 
+        entries = []
         with fp:
             for line in fp:
                 try:
@@ -410,7 +447,41 @@ class KnownHostsFile(object):
                         entry = PlainEntry.fromString(line)
                 except (DecodeError, InvalidEntry, BadKeyError):
                     entry = UnparsedEntry(line)
-                yield entry
+                entries.append(entry)
+        self._fileCache = (signature, entries, {})
+        return self._fileCache[1:]
+
+
+    def _entriesForHost(self, hostname):
+        """
+        Find the entries for a hostname, in the order L{iterentries} gives
+        them.
+
+        @param hostname: A hostname or IP address literal.
+        @type hostname: L{bytes}
+
+        @return: A L{list} of C{(index, entry)}, where C{index} is the 0-based
+            line number of the entry in the file, or a negative number for
+            an entry which has been added but not saved.
+        """
+        matches = [
+            (index, entry)
+            for index, entry in enumerate(self._added, -len(self._added))
+            if entry.matchesHost(hostname)]
+        if self._clobber:
+            return matches
+
+        entries, index = self._loadFile()
+        if isinstance(hostname, unicode):
+            hostname = hostname.encode("utf-8")
+        found = index.get(hostname)
+        if found is None:
+            found = [(lineidx, entry) for lineidx, entry in enumerate(entries)
+                     if entry.matchesHost(hostname)]
+            if len(index) >= self._maximumIndexedHosts:
+                index.clear()
+            index[hostname] = found
+        return matches + found
 
 
     def hasHostKey(self, hostname, key):
@@ -430,8 +501,8 @@ class KnownHostsFile(object):
         @raise HostKeyChanged: if the host key found for the given hostname
             does not match the given key.
         """
-        for lineidx, entry in enumerate(self.iterentries(), -len(self._added)):
-            if entry.matchesHost(hostname) and entry.keyType == key.sshType():
+        for lineidx, entry in self._entriesForHost(hostname):
+            if entry.keyType == key.sshType():
                 if entry.matchesKey(key):
                     return True
                 else:
@@ -18,7 +18,7 @@ from incremental import Version
 
 from twisted.internet import defer, protocol, reactor
 from twisted.python import log, _textattributes
-from twisted.python.compat import iterbytes
+from twisted.python.compat import intToBytes, iterbytes
 from twisted.python.deprecate import deprecated, deprecatedModuleAttribute
 from twisted.conch.insults import insults
 
@@ -513,5 +513,560 @@ class ExpectableBuffer(TerminalBuffer):
         self._checkExpected()
         return d
 
+
+
+# The style of a cell of a ScreenBuffer is (charset, bold, underline, blink,
+# reverseVideo, foreground, background), with None for the terminal's default
+# colors.
+_DEFAULT_STYLE = (insults.CS_US, False, False, False, False, None, None)
+_BLANK = (b' ', _DEFAULT_STYLE)
+
+_BOOLEAN_RENDITIONS = ((1, insults.BOLD), (2, insults.UNDERLINE),
+                       (3, insults.BLINK), (4, insults.REVERSE_VIDEO))
+
+_CHARSET_DESIGNATIONS = {
+    insults.CS_UK: b'A',
+    insults.CS_US: b'B',
+    insults.CS_DRAWING: b'0',
+    insults.CS_ALTERNATE: b'1',
+    insults.CS_ALTERNATE_SPECIAL: b'2'}
+
+_DESIGNATED_CHARSETS = dict(
+    (designation, charSet)
+    for (charSet, designation) in _CHARSET_DESIGNATIONS.items())
+
+_CONTROL = re.compile(b'([\x00-\x1f\x7f])')
+# A character encoded as UTF-8: a leading byte and its continuation bytes,
+# or any other byte by itself.
+_CHARACTER = re.compile(b'[\xc0-\xff][\x80-\xbf]{0,3}|.', re.DOTALL)
+_ESCAPE = re.compile(
+    b'\x1b(?:\\[([0-9;]*)([@-~])|([()])([\x20-\x7e])|([\x20-\x7e]))')
+
+# Unchanged cells between two changed ones are written again rather than
+# skipped over when there are no more of them than this, since moving the
+# cursor takes about as many bytes.
+_REWRITTEN_GAP = 4
+
+
+
+def _styleChange(old, new):
+    """
+    Find the escape sequences which change the character set and graphic
+    rendition of a terminal from one L{ScreenBuffer} cell style to another.
+
+    @return: The escape sequences, as L{bytes}.
+    """
+    sequences = []
+    if old[0] != new[0]:
+        sequences.append(b'\x1b(' + _CHARSET_DESIGNATIONS[new[0]])
+    if old[1:] != new[1:]:
+        attributes = []
+        if ([i for i in range(1, 5) if old[i] and not new[i]] or
+                (old[5] is not None and new[5] is None) or
+                (old[6] is not None and new[6] is None)):
+            attributes.append(b'0')
+            old = _DEFAULT_STYLE
+        for i, attribute in _BOOLEAN_RENDITIONS:
+            if new[i] and not old[i]:
+                attributes.append(intToBytes(attribute))
+        if new[5] != old[5]:
+            attributes.append(intToBytes(FOREGROUND + new[5]))
+        if new[6] != old[6]:
+            attributes.append(intToBytes(BACKGROUND + new[6]))
+        sequences.append(b'\x1b[' + b';'.join(attributes) + b'm')
+    return b''.join(sequences)
+
+
+
+class ScreenBuffer(object):
+    """
+    A virtual screen which widgets, such as those of
+    L{twisted.conch.insults.window}, can draw on as if it were a terminal, and
+    which only sends the terminal what changed when it is refreshed.
+
+    Drawing only updates the cells of the screen and notes which lines were
+    damaged.  L{refresh} compares the damaged lines with what the terminal was
+    last sent, and updates the cells which differ, moving the cursor and
+    changing the graphic rendition as little as it can, in a single write.
+    L{schedule} refreshes no more often than every C{minimumInterval} seconds,
+    so that a burst of changes is sent as one frame.
+
+    Only the drawing part of L{insults.ITerminalTransport} is supported:
+    moving, saving and restoring the cursor, selecting character sets and
+    graphic renditions, writing and erasing.  The same escape sequences are
+    interpreted when written, but no other ones, and no control characters
+    other than carriage returns, line feeds, backspaces and shifts.
+
+    Text is encoded as UTF-8, and each character takes one cell, however many
+    bytes encode it.  Characters which terminals display two columns wide
+    are not accounted for.
+
+    @ivar terminal: The L{insults.ITerminalTransport} refreshed.
+
+    @ivar width: The number of columns of the screen.
+
+    @ivar height: The number of lines of the screen.
+
+    @ivar x: The column of the cursor, which is C{width} after a character
+        was written in the last column.
+
+    @ivar y: The line of the cursor.
+
+    @ivar minimumInterval: The least number of seconds between the previous
+        refresh and one made by L{schedule}.
+
+    @ivar scheduler: The
+        L{IReactorTime<twisted.internet.interfaces.IReactorTime>} used by
+        L{schedule}.
+    """
+    def __init__(self, terminal, width=80, height=24, minimumInterval=0,
+                 scheduler=reactor):
+        self.terminal = terminal
+        self.minimumInterval = minimumInterval
+        self.scheduler = scheduler
+        self.x = self.y = 0
+        self._rendition = _DEFAULT_STYLE[1:]
+        self._charsets = {insults.G0: insults.CS_US,
+                          insults.G1: insults.CS_US}
+        self._activeCharset = insults.G0
+        self._styles = {_DEFAULT_STYLE: _DEFAULT_STYLE}
+        self._updateStyle()
+        self._painters = []
+        self._refreshCall = None
+        self._lastRefresh = None
+        self.resize(width, height)
+
+
+    def resize(self, width, height):
+        """
+        Change the size of the screen, and clear it.
+
+        The next refresh clears and repaints the whole terminal.
+        """
+        self.width = width
+        self.height = height
+        self.x = min(self.x, width - 1)
+        self.y = min(self.y, height - 1)
+        self._lines = [[_BLANK] * width for i in range(height)]
+        self.invalidate()
+
+
+    def invalidate(self):
+        """
+        Forget what the terminal shows, so that the next refresh clears and
+        repaints all of it, for when something else wrote to the terminal.
+        """
+        self._shown = None
+        self._damaged = set(range(self.height))
+        self._cursor = None
+        self._terminalStyle = None
+
+
+    def _updateStyle(self):
+        """
+        Find the style of the characters written from now on, after the
+        graphic rendition or character sets changed.
+        """
+        style = (self._charsets[self._activeCharset],) + self._rendition
+        self._style = self._styles.setdefault(style, style)
+
+
+    def _damage(self, first, last):
+        self._damaged.update(range(first, last))
+
+
+    def _lineFeed(self):
+        if self.y < self.height - 1:
+            self.y += 1
+        else:
+            del self._lines[0]
+            self._lines.append([_BLANK] * self.width)
+            self._damage(0, self.height)
+
+
+    def _put(self, data):
+        characters = _CHARACTER.findall(data)
+        style = self._style
+        start = 0
+        while start < len(characters):
+            if self.x >= self.width:
+                self.x = 0
+                self._lineFeed()
+            x = self.x
+            n = min(self.width - x, len(characters) - start)
+            self._lines[self.y][x:x + n] = [
+                (ch, style) for ch in characters[start:start + n]]
+            self._damaged.add(self.y)
+            self.x = x + n
+            start += n
+
+
+    def write(self, data):
+        """
+        Write characters at the cursor, wrapping at the end of lines and
+        scrolling at the bottom of the screen.
+
+        Line feeds move the cursor to the beginning of the next line, as
+        L{insults.ServerProtocol} sends them as carriage return / line feed
+        pairs.  The escape sequences which widgets write, to move the cursor,
+        select character sets and graphic renditions and erase, are
+        interpreted; others are ignored.
+
+        @param data: The text to write; L{bytes} are taken to be UTF-8.
+        @type data: L{bytes} or L{unicode}
+        """
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        if _CONTROL.search(data) is None:
+            self._put(data)
+            return
+        if b'\x1b' not in data:
+            self._writeText(data)
+            return
+        position = 0
+        for match in _ESCAPE.finditer(data):
+            self._writeText(data[position:match.start()])
+            self._escape(*match.groups())
+            position = match.end()
+        self._writeText(data[position:])
+
+
+    def _writeText(self, data):
+        for piece in _CONTROL.split(data):
+            if piece == b'\r':
+                self.x = 0
+            elif piece == b'\n':
+                self.x = 0
+                self._lineFeed()
+            elif piece == b'\x08':
+                self.cursorBackward()
+            elif piece == b'\x14':
+                self.shiftOut()
+            elif piece == b'\x15':
+                self.shiftIn()
+            elif piece and not _CONTROL.match(piece):
+                self._put(piece)
+
+
+    def _escape(self, parameters, final, which, designation, short):
+        """
+        Interpret an escape sequence matched by C{_ESCAPE}.
+        """
+        if final is not None:
+            arguments = [int(a or 0) for a in parameters.split(b';')]
+            n = max(1, arguments[0])
+            if final == b'm':
+                self.selectGraphicRendition(*arguments)
+            elif final == b'H' or final == b'f':
+                column = arguments[1] if len(arguments) > 1 else 1
+                self.cursorPosition(max(1, column) - 1, n - 1)
+            elif final == b'A':
+                self.cursorUp(n)
+            elif final == b'B':
+                self.cursorDown(n)
+            elif final == b'C':
+                self.cursorForward(n)
+            elif final == b'D':
+                self.cursorBackward(n)
+            elif final == b'K' and arguments[0] == 0:
+                self.eraseToLineEnd()
+            elif final == b'K' and arguments[0] == 1:
+                self.eraseToLineBeginning()
+            elif final == b'K' and arguments[0] == 2:
+                self.eraseLine()
+            elif final == b'J' and arguments[0] == 0:
+                self.eraseToDisplayEnd()
+            elif final == b'J' and arguments[0] == 1:
+                self.eraseToDisplayBeginning()
+            elif final == b'J' and arguments[0] == 2:
+                self.eraseDisplay()
+        elif which is not None:
+            charSet = _DESIGNATED_CHARSETS.get(designation)
+            if charSet is not None:
+                self.selectCharacterSet(
+                    charSet, insults.G0 if which == b'(' else insults.G1)
+        elif short == b'7':
+            self.saveCursor()
+        elif short == b'8':
+            self.restoreCursor()
+        elif short == b'D':
+            self._lineFeed()
+        elif short == b'E':
+            self.x = 0
+            self._lineFeed()
+
+
+    def cursorUp(self, n=1):
+        self.y = max(0, self.y - n)
+
+
+    def cursorDown(self, n=1):
+        self.y = min(self.height - 1, self.y + n)
+
+
+    def cursorForward(self, n=1):
+        self.x = min(self.width - 1, self.x + n)
+
+
+    def cursorBackward(self, n=1):
+        self.x = max(0, min(self.x, self.width - 1) - n)
+
+
+    def cursorPosition(self, column, line):
+        self.x = max(0, min(self.width - 1, column))
+        self.y = max(0, min(self.height - 1, line))
+
+
+    def cursorHome(self):
+        self.x = self.y = 0
+
+
+    def saveCursor(self):
+        """
+        Save the cursor position, the graphic rendition and the character
+        sets, as a VT102 does.
+        """
+        self._savedCursor = (self.x, self.y, self._rendition,
+                             dict(self._charsets), self._activeCharset)
+
+
+    def restoreCursor(self):
+        (self.x, self.y, self._rendition, self._charsets,
+         self._activeCharset) = self._savedCursor
+        del self._savedCursor
+        self._updateStyle()
+
+
+    def selectCharacterSet(self, charSet, which):
+        if charSet not in _CHARSET_DESIGNATIONS:
+            raise ValueError(
+                "Invalid `charSet' argument to selectCharacterSet")
+        self._charsets[which] = charSet
+        self._updateStyle()
+
+
+    def shiftIn(self):
+        self._activeCharset = insults.G0
+        self._updateStyle()
+
+
+    def shiftOut(self):
+        self._activeCharset = insults.G1
+        self._updateStyle()
+
+
+    def selectGraphicRendition(self, *attributes):
+        (bold, underline, blink, reverseVideo,
+         foreground, background) = self._rendition
+        for a in attributes:
+            try:
+                v = int(a)
+            except ValueError:
+                v = None
+            if v == insults.NORMAL:
+                bold = underline = blink = reverseVideo = False
+                foreground = background = None
+            elif v == insults.BOLD:
+                bold = True
+            elif v == insults.UNDERLINE:
+                underline = True
+            elif v == insults.BLINK:
+                blink = True
+            elif v == insults.REVERSE_VIDEO:
+                reverseVideo = True
+            elif v is not None and FOREGROUND <= v < FOREGROUND + N_COLORS:
+                foreground = v - FOREGROUND
+            elif v == FOREGROUND + 9:
+                foreground = None
+            elif v is not None and BACKGROUND <= v < BACKGROUND + N_COLORS:
+                background = v - BACKGROUND
+            elif v == BACKGROUND + 9:
+                background = None
+            else:
+                log.msg("Unknown graphic rendition attribute: " + repr(a))
+        self._rendition = (bold, underline, blink, reverseVideo,
+                           foreground, background)
+        self._updateStyle()
+
+
+    def eraseLine(self):
+        self._lines[self.y] = [_BLANK] * self.width
+        self._damaged.add(self.y)
+
+
+    def eraseToLineEnd(self):
+        x = min(self.x, self.width - 1)
+        self._lines[self.y][x:] = [_BLANK] * (self.width - x)
+        self._damaged.add(self.y)
+
+
+    def eraseToLineBeginning(self):
+        x = min(self.x, self.width - 1)
+        self._lines[self.y][:x + 1] = [_BLANK] * (x + 1)
+        self._damaged.add(self.y)
+
+
+    def eraseDisplay(self):
+        self._lines = [[_BLANK] * self.width for i in range(self.height)]
+        self._damage(0, self.height)
+
+
+    def eraseToDisplayEnd(self):
+        self.eraseToLineEnd()
+        for y in range(self.y + 1, self.height):
+            self._lines[y] = [_BLANK] * self.width
+        self._damage(self.y + 1, self.height)
+
+
+    def eraseToDisplayBeginning(self):
+        self.eraseToLineBeginning()
+        for y in range(self.y):
+            self._lines[y] = [_BLANK] * self.width
+        self._damage(0, self.y)
+
+
+    def _moveCursor(self, output, x, y):
+        """
+        Move the terminal's cursor with the shortest escape sequence.
+        """
+        if self._cursor == (x, y):
+            return
+        moves = [b'\x1b[' + intToBytes(y + 1) + b';' + intToBytes(x + 1) +
+                 b'H']
+        if self._cursor is not None and self._cursor[1] == y:
+            column = self._cursor[0]
+            if x > column:
+                moves.append(b'\x1b[' + intToBytes(x - column) + b'C')
+            else:
+                moves.append(b'\x1b[' + intToBytes(column - x) + b'D')
+            if x == 0:
+                moves.append(b'\r')
+        output.append(min(moves, key=len))
+        self._cursor = (x, y)
+
+
+    def _writeCells(self, output, y, line, start, stop):
+        """
+        Write the cells of a line from C{start} to C{stop}.
+        """
+        self._moveCursor(output, start, y)
+        style = self._terminalStyle
+        characters = []
+        for ch, cellStyle in line[start:stop]:
+            if cellStyle is not style:
+                if characters:
+                    output.append(b''.join(characters))
+                    characters = []
+                output.append(_styleChange(style, cellStyle))
+                style = cellStyle
+            characters.append(ch)
+        output.append(b''.join(characters))
+        self._terminalStyle = style
+        if stop < self.width:
+            self._cursor = (stop, y)
+        else:
+            # Terminals differ about where the cursor is after writing in
+            # the last column.
+            self._cursor = None
+
+
+    def _updateLine(self, output, y, line, shown):
+        """
+        Update the cells of line C{y} which differ from what the terminal
+        shows.
+        """
+        runs = []
+        for x in range(self.width):
+            if line[x] != shown[x]:
+                if runs and x - runs[-1][1] <= _REWRITTEN_GAP:
+                    runs[-1][1] = x + 1
+                else:
+                    runs.append([x, x + 1])
+
+        end = self.width
+        while end and line[end - 1] == _BLANK:
+            end -= 1
+
+        for start, stop in runs:
+            if stop <= end:
+                self._writeCells(output, y, line, start, stop)
+            else:
+                # The rest of the line is blank, so erase it rather than
+                # write spaces.
+                self._writeCells(output, y, line, start, max(start, end))
+                default = (self._terminalStyle[0],) + _DEFAULT_STYLE[1:]
+                default = self._styles.setdefault(default, default)
+                output.append(_styleChange(self._terminalStyle, default))
+                self._terminalStyle = default
+                output.append(b'\x1b[K')
+                break
+
+
+    def refresh(self):
+        """
+        Update the terminal to show what was drawn on this screen, with a
+        single write of what changed since the previous refresh.
+        """
+        self._lastRefresh = self.scheduler.seconds()
+        output = []
+        if self._shown is None:
+            output.append(b'\x1b[0m\x1b(B\x1b[2J')
+            self._terminalStyle = _DEFAULT_STYLE
+            self._shown = [[_BLANK] * self.width for i in range(self.height)]
+        for y in sorted(self._damaged):
+            line = self._lines[y]
+            if line != self._shown[y]:
+                self._updateLine(output, y, line, self._shown[y])
+                self._shown[y] = list(line)
+        self._damaged.clear()
+        cursor = (min(self.x, self.width - 1), self.y)
+        if output or cursor != self._cursor:
+            self._moveCursor(output, *cursor)
+            self.terminal.write(b''.join(output))
+
+
+    def schedule(self, painter=None):
+        """
+        Arrange for C{painter} to be called and the screen to be refreshed
+        as soon as possible, but no sooner than C{minimumInterval} seconds
+        after the previous refresh.
+
+        Painters given while a refresh is pending are all called before it,
+        so this can be given as the scheduler of a
+        L{twisted.conch.insults.window.TopWindow}.
+
+        @param painter: A no-argument callable which draws on this screen, or
+            L{None} to only refresh it.
+        """
+        if painter is not None:
+            self._painters.append(painter)
+        if self._refreshCall is None:
+            delay = 0
+            if self._lastRefresh is not None:
+                delay = max(0, self._lastRefresh + self.minimumInterval -
+                            self.scheduler.seconds())
+            self._refreshCall = self.scheduler.callLater(
+                delay, self._scheduledRefresh)
+
+
+    def _scheduledRefresh(self):
+        self._refreshCall = None
+        painters, self._painters = self._painters, []
+        for painter in painters:
+            painter()
+        self.refresh()
+
+
+    def cancel(self):
+        """
+        Cancel the pending scheduled refresh, if any, for when the terminal
+        is disconnected.
+        """
+        if self._refreshCall is not None:
+            self._refreshCall.cancel()
+            self._refreshCall = None
+        self._painters = []
+
 __all__ = [
-    'CharacterAttribute',  'TerminalBuffer', 'ExpectableBuffer']
+    'CharacterAttribute',  'TerminalBuffer', 'ExpectableBuffer',
+    'ScreenBuffer']
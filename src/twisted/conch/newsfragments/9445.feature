@@ -0,0 +1 @@
+twisted.conch.ssh.transport.SSHTransportBase now takes the packets out of its receive buffer in time linear in the amount of data received, rather than quadratic when one read holds many packets, and a benchmark for bulk uploads over SSH has been added in docs/conch/benchmarks/transport.py.
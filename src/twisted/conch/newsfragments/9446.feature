@@ -0,0 +1 @@
+twisted.conch.ssh.channel.SSHChannel now accepts a localWindowMaximum argument, up to which its local window grows while the other side sends data faster than the window allows; it is now an IPushProducer, which stops replenishing the window while paused, and an IConsumer, which pauses its producer while the remote window is used up.
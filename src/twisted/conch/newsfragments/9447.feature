@@ -0,0 +1 @@
+twisted.conch.ssh.filetransfer.FileTransferClient now has get and put methods which download and upload whole files with many requests outstanding and adaptively sized chunks, and FileTransferServer can read and write files in a thread pool.
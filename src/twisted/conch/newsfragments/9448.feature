@@ -0,0 +1 @@
+twisted.conch.checkers.UNIXAuthorizedKeysFiles now parses each authorized_keys file again only when it changes, and twisted.conch.client.knownhosts.KnownHostsFile parses its file again only when it changes and indexes its entries by hostname, so hashed entries are not hashed again for every lookup.
@@ -0,0 +1 @@
+twisted.conch.ssh.factory.SSHFactory now has threadPool and ephemeralKeys attributes, so that the Diffie-Hellman and elliptic curve computations and host key signatures of key exchanges can be done in a thread pool, with ephemeral key pairs precomputed by a twisted.conch.ssh.transport.EphemeralKeyPool.
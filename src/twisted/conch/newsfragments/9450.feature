@@ -0,0 +1 @@
+twisted.conch.insults.helper.ScreenBuffer is a virtual screen which insults widgets can draw on, and which sends the terminal only the changes since the previous frame, in a single write, no more often than a given interval.
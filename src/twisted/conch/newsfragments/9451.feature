@@ -0,0 +1 @@
+twisted.conch.telnet.Telnet.dataReceived now delivers runs of application data, including complete newlines, without looking at them byte by byte, and twisted.conch.telnet.TelnetTransport.writeSequence now escapes what it writes and writes it at once.
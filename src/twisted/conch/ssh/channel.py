@@ -11,15 +11,24 @@ Maintainer: Paul Swartz
 
 from __future__ import division, absolute_import
 
+import time
+
 from zope.interface import implementer
 
 from twisted.python import log
 from twisted.python.compat import nativeString, intToBytes
 from twisted.internet import interfaces
+from twisted.internet._producer_helpers import _PullToPush
+
 
+# The data type of the calls kept among the data received while a channel is
+# paused.
+_CALL = object()
 
 
-@implementer(interfaces.ITransport)
+
+@implementer(interfaces.ITransport, interfaces.IConsumer,
+             interfaces.IPushProducer)
 class SSHChannel(log.Logger):
     """
     A class that represents a multiplexed channel over an SSH connection.
@@ -28,12 +37,23 @@ class SSHChannel(log.Logger):
     will accept.  There is also a maximum packet size for any individual data
     packet going each way.
 
+    The local window grows, up to C{localWindowMaximum}, while the other side
+    sends more than a window's worth of data every C{_windowTuningInterval}
+    seconds, so that a fast link with a long round trip time is not held back
+    by waiting for window adjustments.  While the channel is paused with
+    L{pauseProducing}, the local window is not replenished, so the other side
+    stops sending once it has used it up.
+
     @ivar name: the name of the channel.
     @type name: L{bytes}
     @ivar localWindowSize: the maximum size of the local window in bytes.
     @type localWindowSize: L{int}
     @ivar localWindowLeft: how many bytes are left in the local window.
     @type localWindowLeft: L{int}
+    @ivar localWindowMaximum: the largest size in bytes the local window may
+        grow to.  If it is no larger than C{localWindowSize}, the local window
+        never grows.
+    @type localWindowMaximum: L{int}
     @ivar localMaxPacket: the maximum size of packet we will accept in bytes.
     @type localMaxPacket: L{int}
     @ivar remoteWindowLeft: how many bytes are left in the remote window.
@@ -51,15 +71,27 @@ class SSHChannel(log.Logger):
     @type localClosed: L{bool}
     @ivar remoteClosed: True if the other size isn't accepting more data.
     @type remoteClosed: L{bool}
+    @ivar producer: the producer registered with L{registerProducer}, if any.
+        A non-streaming producer is wrapped in a streaming one.
+    @type producer: L{interfaces.IPushProducer} or L{None}
     """
 
     name = None # only needed for client channels
+    producer = None
+    _producerPaused = False
+    _pausedData = None
+    _windowReplenished = None
+    _windowTuningInterval = 1.0
+    _now = staticmethod(time.time)
 
     def __init__(self, localWindow = 0, localMaxPacket = 0,
                        remoteWindow = 0, remoteMaxPacket = 0,
-                       conn = None, data=None, avatar = None):
+                       conn = None, data=None, avatar = None,
+                       localWindowMaximum = 0):
         self.localWindowSize = localWindow or 131072
         self.localWindowLeft = self.localWindowSize
+        self.localWindowMaximum = max(localWindowMaximum,
+                                      self.localWindowSize)
         self.localMaxPacket = localMaxPacket or 32768
         self.remoteWindowLeft = remoteWindow
         self.remoteMaxPacket = remoteMaxPacket
@@ -143,6 +175,10 @@ class SSHChannel(log.Logger):
             self.extBuf = []
             for (type, data) in b:
                 self.writeExtended(type, data)
+        if (self._producerPaused and self.areWriting and not self.buf and
+                not self.extBuf):
+            self._producerPaused = False
+            self.producer.resumeProducing()
 
 
     def requestReceived(self, requestType, data):
@@ -223,6 +259,7 @@ class SSHChannel(log.Logger):
                 data[self.remoteWindowLeft:])
             self.areWriting = 0
             self.stopWriting()
+            self._pauseProducer()
             top = self.remoteWindowLeft
         rmp = self.remoteMaxPacket
         write = self.conn.sendData
@@ -254,6 +291,7 @@ class SSHChannel(log.Logger):
                                 [[dataType, data[self.remoteWindowLeft:]]])
             self.areWriting = 0
             self.stopWriting()
+            self._pauseProducer()
         while len(data) > self.remoteMaxPacket:
             self.conn.sendExtendedData(self, dataType,
                                              data[:self.remoteMaxPacket])
@@ -318,3 +356,173 @@ class SSHChannel(log.Logger):
         Called when the remote buffer has more room, as a hint to continue
         writing.
         """
+
+
+    def registerProducer(self, producer, streaming):
+        """
+        Register a producer of the data written to this channel.  It is paused
+        whenever the remote window is used up, so that data written by it
+        does not pile up in the channel's buffers, and resumed once the
+        buffered data has been sent.
+
+        @see: L{interfaces.IConsumer.registerProducer}
+
+        @raise RuntimeError: If a producer is already registered.
+        """
+        if self.producer is not None:
+            raise RuntimeError(
+                "Cannot register producer %s, because producer %s was never "
+                "unregistered." % (producer, self.producer))
+        if not streaming:
+            producer = _PullToPush(producer, self)
+        self.producer = producer
+        self._producerPaused = False
+        if not streaming:
+            producer.startStreaming()
+        if not self.areWriting:
+            self._pauseProducer()
+
+
+    def unregisterProducer(self):
+        """
+        Unregister the producer registered with L{registerProducer}.
+
+        @see: L{interfaces.IConsumer.unregisterProducer}
+        """
+        if self.producer is None:
+            return
+        if isinstance(self.producer, _PullToPush):
+            self.producer.stopStreaming()
+        self.producer = None
+        self._producerPaused = False
+
+
+    def _pauseProducer(self):
+        """
+        Pause the registered producer, if any, until the remote window has
+        room for more data.
+        """
+        if self.producer is not None and not self._producerPaused:
+            self._producerPaused = True
+            self.producer.pauseProducing()
+
+
+    def pauseProducing(self):
+        """
+        Stop delivering the data received on this channel, and stop
+        replenishing the local window, so that the other side stops sending
+        once it has used up the window.  Data which arrives while the channel
+        is paused, and the EOF and close which follow it, are kept until
+        L{resumeProducing} is called.
+
+        @see: L{interfaces.IPushProducer.pauseProducing}
+        """
+        if self._pausedData is None:
+            self._pausedData = []
+
+
+    def resumeProducing(self):
+        """
+        Deliver the data received while the channel was paused, and then
+        replenish the local window with a single window adjustment.
+
+        @see: L{interfaces.IPushProducer.resumeProducing}
+        """
+        pausedData, self._pausedData = self._pausedData, None
+        for i, (dataType, data) in enumerate(pausedData or ()):
+            if self._pausedData is not None:
+                # Paused again by the data delivered so far.
+                self._pausedData[:0] = pausedData[i:]
+                return
+            self._deliver(dataType, data)
+        if self._pausedData is None:
+            self._replenishWindow()
+
+
+    def stopProducing(self):
+        """
+        Close the channel.
+
+        @see: L{interfaces.IPushProducer.stopProducing}
+        """
+        self.loseConnection()
+
+
+    def _dataArrived(self, dataType, data):
+        """
+        Handle data which the other side sent on this channel, after it has
+        been taken out of the local window.
+
+        @param dataType: the type code of extended data, or L{None} for
+            regular data.
+        @type dataType: L{int} or L{None}
+
+        @type data: L{bytes}
+        """
+        if self._pausedData is not None:
+            self._pausedData.append((dataType, data))
+            return
+        self._replenishWindow()
+        self._deliver(dataType, data)
+
+
+    def _afterPausedData(self, f, *args):
+        """
+        Call a function now, or, if the channel is paused, once the data
+        received before it has been delivered.  This is how the EOF and close
+        which the other side sends after its data are handled in order.
+
+        @param f: the function.
+
+        @param args: the positional arguments to call it with.
+        """
+        if self._pausedData is not None:
+            self._pausedData.append((_CALL, (f, args)))
+            return
+        f(*args)
+
+
+    def _deliver(self, dataType, data):
+        """
+        Pass received data to L{dataReceived} or L{extReceived}, or make a
+        call held back by L{_afterPausedData}.
+
+        @param dataType: the type code of extended data, L{None} for regular
+            data, or C{_CALL} for a call.
+        @type dataType: L{int} or L{None}
+
+        @type data: L{bytes}, or a 2-tuple of a function and its arguments
+        """
+        if dataType is None:
+            self.dataReceived(data)
+        elif dataType is _CALL:
+            f, args = data
+            f(*args)
+        else:
+            self.extReceived(dataType, data)
+
+
+    def _replenishWindow(self):
+        """
+        Once less than half of the local window is left, tell the other side
+        to send as much data again as it has used.
+
+        If more than a window's worth of data has been received since the
+        previous adjustment, at the rate it came in, in C{_windowTuningInterval}
+        seconds, the other side is probably being held back by the window, and
+        it is doubled, up to C{localWindowMaximum}.
+        """
+        if self.localWindowLeft >= self.localWindowSize // 2:
+            return
+        if self.localWindowSize < self.localWindowMaximum:
+            now = self._now()
+            if self._windowReplenished is not None:
+                used = self.localWindowSize - self.localWindowLeft
+                elapsed = now - self._windowReplenished
+                if used * self._windowTuningInterval > (
+                        self.localWindowSize * elapsed):
+                    self.localWindowSize = min(self.localWindowSize * 2,
+                                               self.localWindowMaximum)
+            self._windowReplenished = now
+        self.conn.adjustWindow(self,
+                               self.localWindowSize - self.localWindowLeft)
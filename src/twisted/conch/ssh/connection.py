@@ -241,12 +241,7 @@ class SSHConnection(service.SSHService):
             #packet = packet[:channel.localWindowLeft+4]
         data = common.getNS(packet[4:])[0]
         channel.localWindowLeft -= dataLength
-        if channel.localWindowLeft < channel.localWindowSize // 2:
-            self.adjustWindow(channel, channel.localWindowSize - \
-                                       channel.localWindowLeft)
-            #log.msg('local window left: %s/%s' % (channel.localWindowLeft,
-            #                                    channel.localWindowSize))
-        log.callWithLogger(channel, channel.dataReceived, data)
+        log.callWithLogger(channel, channel._dataArrived, None, data)
 
     def ssh_CHANNEL_EXTENDED_DATA(self, packet):
         """
@@ -270,21 +265,20 @@ class SSHConnection(service.SSHService):
             return
         data = common.getNS(packet[8:])[0]
         channel.localWindowLeft -= dataLength
-        if channel.localWindowLeft < channel.localWindowSize // 2:
-            self.adjustWindow(channel, channel.localWindowSize -
-                                       channel.localWindowLeft)
-        log.callWithLogger(channel, channel.extReceived, typeCode, data)
+        log.callWithLogger(channel, channel._dataArrived, typeCode, data)
 
     def ssh_CHANNEL_EOF(self, packet):
         """
         The other side is not sending any more data.  Payload::
             uint32  local channel number
 
-        Notify the channel by calling its eofReceived() method.
+        Notify the channel by calling its eofReceived() method, once the data
+        it received before has been delivered.
         """
         localChannel = struct.unpack('>L', packet[:4])[0]
         channel = self.channels[localChannel]
-        log.callWithLogger(channel, channel.eofReceived)
+        channel._afterPausedData(
+            log.callWithLogger, channel, channel.eofReceived)
 
     def ssh_CHANNEL_CLOSE(self, packet):
         """
@@ -292,11 +286,21 @@ class SSHConnection(service.SSHService):
         more data.  Payload::
             uint32  local channel number
 
-        Notify the channnel by calling its closeReceived() method.  If
-        the channel has also sent a close message, call self.channelClosed().
+        Notify the channnel by calling its closeReceived() method, once the
+        data it received before has been delivered.  If the channel has also
+        sent a close message, call self.channelClosed().
         """
         localChannel = struct.unpack('>L', packet[:4])[0]
         channel = self.channels[localChannel]
+        channel._afterPausedData(self._channelCloseReceived, channel)
+
+    def _channelCloseReceived(self, channel):
+        """
+        Handle the close message for a channel, as described by
+        L{ssh_CHANNEL_CLOSE}.
+
+        @type channel: subclass of C{SSHChannel}
+        """
         log.callWithLogger(channel, channel.closeReceived)
         channel.remoteClosed = True
         if channel.localClosed and channel.remoteClosed:
@@ -23,8 +23,24 @@ import random
 class SSHFactory(protocol.Factory):
     """
     A Factory for SSH servers.
+
+    @ivar threadPool: The thread pool in which the transports built do the
+        computations and host key signatures of key exchanges, or L{None} to
+        do them in the reactor thread.
+    @type threadPool: L{twisted.python.threadpool.ThreadPool}
+
+    @ivar reactor: The reactor used with C{threadPool}, or L{None} for the
+        global reactor.
+
+    @ivar ephemeralKeys: The pool of precomputed ephemeral key pairs the
+        transports built use for key exchanges, or L{None} to generate a key
+        pair for each key exchange.
+    @type ephemeralKeys: L{transport.EphemeralKeyPool}
     """
     protocol = transport.SSHServerTransport
+    threadPool = None
+    reactor = None
+    ephemeralKeys = None
 
     services = {
         b'ssh-userauth':userauth.SSHUserAuthServer,
@@ -56,6 +72,9 @@ class SSHFactory(protocol.Factory):
         """
         t = protocol.Factory.buildProtocol(self, addr)
         t.supportedPublicKeys = self.privateKeys.keys()
+        t.threadPool = self.threadPool
+        t.reactor = self.reactor
+        t.ephemeralKeys = self.ephemeralKeys
         if not self.primes:
             log.msg('disabling non-fixed-group key exchange algorithms '
                     'because we cannot find moduli file')
@@ -7,12 +7,14 @@ from __future__ import division, absolute_import
 
 import errno
 import struct
+import time
 
 from zope.interface import implementer
 
 from twisted.conch.interfaces import ISFTPServer, ISFTPFile
+from twisted.internet.interfaces import IConsumer, IPushProducer
 from twisted.conch.ssh.common import NS, getNS
-from twisted.internet import defer, protocol
+from twisted.internet import defer, protocol, threads
 from twisted.python import failure, log
 from twisted.python.compat import (
     _PY3, range, itervalues, nativeString, networkString)
@@ -124,12 +126,73 @@ class FileTransferBase(protocol.Protocol):
 
 
 class FileTransferServer(FileTransferBase):
-
-    def __init__(self, data=None, avatar=None):
+    """
+    The server side of the SFTP protocol, which serves the files of an
+    L{ISFTPServer}.
+
+    @ivar threadPool: The thread pool in which the C{readChunk},
+        C{writeChunk} and C{close} methods of open files are called, so that
+        disk I/O does not block the reactor, or L{None} to call them in the
+        reactor thread.  Only files whose methods block, rather than return
+        L{Deferred}s, can be used with a thread pool.  The calls for each
+        file are made one at a time, in the order the requests arrived.
+        The thread pool is not used for the files of an avatar which
+        switches the effective user of the process to access them, like
+        L{twisted.conch.unix.UnixConchUser}, since every thread shares it.
+    @type threadPool: L{twisted.python.threadpool.ThreadPool}
+
+    @ivar reactor: The reactor used when calling file methods in a thread,
+        or L{None} to use the global reactor.
+
+    @ivar _fileLocks: A L{dict} mapping the handles of open files to the
+        L{defer.DeferredLock} which serializes the calls made in a thread
+        for them.
+    """
+    threadPool = None
+    reactor = None
+
+    def __init__(self, data=None, avatar=None, threadPool=None, reactor=None):
         FileTransferBase.__init__(self)
         self.client = ISFTPServer(avatar) # yay interfaces
         self.openFiles = {}
         self.openDirs = {}
+        self._fileLocks = {}
+        if threadPool is not None:
+            self.threadPool = threadPool
+        if reactor is not None:
+            self.reactor = reactor
+
+
+    def _callFile(self, handle, f, *args):
+        """
+        Call a method of the open file with the given handle, in the thread
+        pool if there is one, once the calls made before it for the same file
+        have completed.
+
+        @return: A L{Deferred} which fires with the result of C{f}.
+        """
+        if self.threadPool is None or self._switchesUser():
+            return defer.maybeDeferred(f, *args)
+        reactor = self.reactor
+        if reactor is None:
+            from twisted.internet import reactor
+        lock = self._fileLocks.get(handle)
+        if lock is None:
+            lock = self._fileLocks[handle] = defer.DeferredLock()
+        return lock.run(threads.deferToThreadPool,
+                        reactor, self.threadPool, f, *args)
+
+
+    def _switchesUser(self):
+        """
+        Determine whether the files being served are accessed by switching
+        the effective user of the process, with the C{_runAsUser} method of
+        the avatar.
+
+        @rtype: L{bool}
+        """
+        avatar = getattr(self.client, "avatar", None)
+        return getattr(avatar, "_runAsUser", None) is not None
 
 
     def packet_INIT(self, data):
@@ -177,7 +240,7 @@ class FileTransferServer(FileTransferBase):
         assert data == b'', 'still have data in CLOSE: {!r}'.format(data)
         if handle in self.openFiles:
             fileObj = self.openFiles[handle]
-            d = defer.maybeDeferred(fileObj.close)
+            d = self._callFile(handle, fileObj.close)
             d.addCallback(self._cbClose, handle, requestId)
             d.addErrback(self._ebStatus, requestId, b"close failed")
         elif handle in self.openDirs:
@@ -194,6 +257,7 @@ class FileTransferServer(FileTransferBase):
             del self.openDirs[handle]
         else:
             del self.openFiles[handle]
+            self._fileLocks.pop(handle, None)
         self._sendStatus(requestId, FX_OK, b'file closed')
 
 
@@ -207,7 +271,7 @@ class FileTransferServer(FileTransferBase):
             self._ebRead(failure.Failure(KeyError()), requestId)
         else:
             fileObj = self.openFiles[handle]
-            d = defer.maybeDeferred(fileObj.readChunk, offset, length)
+            d = self._callFile(handle, fileObj.readChunk, offset, length)
             d.addCallback(self._cbRead, requestId)
             d.addErrback(self._ebStatus, requestId, b"read failed")
 
@@ -230,7 +294,7 @@ class FileTransferServer(FileTransferBase):
             self._ebWrite(failure.Failure(KeyError()), requestId)
         else:
             fileObj = self.openFiles[handle]
-            d = defer.maybeDeferred(fileObj.writeChunk, offset, writeData)
+            d = self._callFile(handle, fileObj.writeChunk, offset, writeData)
             d.addCallback(self._cbStatus, requestId, b"write succeeded")
             d.addErrback(self._ebStatus, requestId, b"write failed")
 
@@ -496,10 +560,14 @@ class FileTransferServer(FileTransferBase):
     def connectionLost(self, reason):
         """
         Clean all opened files and directories.
+
+        Files are closed once the calls already made for them are complete.
         """
-        for fileObj in self.openFiles.values():
-            fileObj.close()
+        for handle, fileObj in list(self.openFiles.items()):
+            d = self._callFile(handle, fileObj.close)
+            d.addErrback(log.err, "Error closing SFTP file")
         self.openFiles = {}
+        self._fileLocks = {}
         for (dirObj, dirIter) in self.openDirs.values():
             dirObj.close()
         self.openDirs = {}
@@ -866,6 +934,463 @@ class FileTransferClient(FileTransferBase):
         """
 
 
+    def get(self, filename, consumer, requests=16, chunkSize=2 ** 15,
+            maximumChunkSize=2 ** 17):
+        """
+        Download a file, keeping several read requests outstanding at once so
+        that the transfer is not limited to one chunk per round trip.
+
+        The chunks read are doubled in size, up to C{maximumChunkSize}, each
+        time the server returns as much as was asked for.  If the server
+        returns less, the rest is asked for again and later chunks are no
+        larger than what it returned.
+
+        @type filename: L{bytes}
+        @param filename: The name of the file to download.
+
+        @param consumer: An L{IConsumer}, which is registered with a
+            streaming producer for the duration of the download, or a
+            file-like object with a C{write} method.  It is given the
+            contents of the file in order, whatever order the server answers
+            in.
+
+        @type requests: L{int}
+        @param requests: The number of read requests to keep outstanding.
+
+        @type chunkSize: L{int}
+        @param chunkSize: The size of the first chunks to read.
+
+        @type maximumChunkSize: L{int}
+        @param maximumChunkSize: The largest chunk to read.
+
+        @return: A L{Deferred} which fires with a L{TransferStatistics} once
+            the whole file has been given to C{consumer} and closed.
+        """
+        d = self.openFile(filename, FXF_READ, {})
+        d.addCallback(self._transfer, _Download, consumer, requests,
+                      chunkSize, maximumChunkSize)
+        return d
+
+
+    def put(self, filename, source, requests=16, chunkSize=2 ** 15,
+            maximumChunkSize=2 ** 17):
+        """
+        Upload a file, keeping several write requests outstanding at once so
+        that the transfer is not limited to one chunk per round trip.
+
+        The chunks written are doubled in size, up to C{maximumChunkSize}, each
+        time the server acknowledges one.
+
+        @type filename: L{bytes}
+        @param filename: The name of the file to create or truncate.
+
+        @param source: A file-like object with a C{read} method, read until it
+            returns C{b''}.
+
+        @type requests: L{int}
+        @param requests: The number of write requests to keep outstanding.
+
+        @type chunkSize: L{int}
+        @param chunkSize: The size of the first chunks to write.
+
+        @type maximumChunkSize: L{int}
+        @param maximumChunkSize: The largest chunk to write.
+
+        @return: A L{Deferred} which fires with a L{TransferStatistics} once
+            all of C{source} has been written and the file closed.
+        """
+        d = self.openFile(filename, FXF_WRITE | FXF_CREAT | FXF_TRUNC, {})
+        d.addCallback(self._transfer, _Upload, source, requests,
+                      chunkSize, maximumChunkSize)
+        return d
+
+
+    def _transfer(self, remoteFile, transferClass, *args):
+        """
+        Run a transfer to or from an open file, then close the file.
+
+        @param remoteFile: The L{ClientFile} to transfer to or from.
+
+        @param transferClass: L{_Download} or L{_Upload}, which is called with
+            C{remoteFile} and C{args}.
+
+        @return: A L{Deferred} which fires with the result of the transfer
+            once the file has been closed, or with the first failure of the
+            transfer or the close.
+        """
+        def close(result):
+            d = remoteFile.close()
+            if isinstance(result, failure.Failure):
+                d.addBoth(lambda ignored: result)
+            else:
+                d.addCallback(lambda ignored: result)
+            return d
+        return transferClass(remoteFile, *args).start().addBoth(close)
+
+
+
+class TransferStatistics(object):
+    """
+    How a transfer made by L{FileTransferClient.get} or
+    L{FileTransferClient.put} went.
+
+    @ivar size: The number of bytes transferred.
+    @type size: L{int}
+
+    @ivar elapsed: The number of seconds the transfer took.
+    @type elapsed: L{float}
+
+    @ivar requests: The number of read or write requests made.
+    @type requests: L{int}
+    """
+    def __init__(self, size, elapsed, requests):
+        self.size = size
+        self.elapsed = elapsed
+        self.requests = requests
+
+
+    @property
+    def rate(self):
+        """
+        The number of bytes transferred per second, or L{None} if the
+        transfer took no measurable time.
+        """
+        if not self.elapsed:
+            return None
+        return self.size / self.elapsed
+
+
+    def __repr__(self):
+        return '<TransferStatistics size=%d elapsed=%.3f requests=%d>' % (
+            self.size, self.elapsed, self.requests)
+
+
+
+class _Transfer(object):
+    """
+    The parts of L{_Download} and L{_Upload} which keep track of outstanding
+    requests and of when the transfer is over.
+
+    @ivar _file: The L{ClientFile} transferred to or from.
+
+    @ivar _requests: The number of requests to keep outstanding.
+
+    @ivar _chunkSize: The size of the next chunk to request.
+
+    @ivar _maximumChunkSize: The largest chunk to request.
+
+    @ivar _inFlight: The number of requests not answered yet.
+
+    @ivar _requestCount: The number of requests made so far.
+
+    @ivar _size: The number of bytes transferred so far.
+
+    @ivar _failure: The L{failure.Failure} the transfer stopped with, or
+        L{None}.
+
+    @ivar _requesting: Whether L{_request} is running, so that answers
+        which arrive while it makes a request do not start it again.
+
+    @ivar _finished: The L{Deferred} returned by L{start}.
+    """
+    _now = staticmethod(time.time)
+
+    def __init__(self, remoteFile, requests, chunkSize, maximumChunkSize):
+        self._file = remoteFile
+        self._requests = max(1, requests)
+        self._maximumChunkSize = max(1, maximumChunkSize)
+        self._chunkSize = max(1, min(chunkSize, self._maximumChunkSize))
+        self._inFlight = 0
+        self._requestCount = 0
+        self._size = 0
+        self._failure = None
+        self._requesting = False
+        self._finished = None
+
+
+    def start(self):
+        """
+        Start the transfer.
+
+        @return: A L{Deferred} which fires with a L{TransferStatistics} when
+            the transfer is over.
+        """
+        self._finished = defer.Deferred()
+        self._started = self._now()
+        self._request()
+        return self._finished
+
+
+    def _request(self):
+        """
+        Make requests until there are C{_requests} outstanding, or nothing is
+        left to ask for, then finish the transfer if it is over.
+        """
+        if self._requesting:
+            return
+        self._requesting = True
+        try:
+            while (self._failure is None and
+                   self._inFlight < self._requests):
+                d = self._nextRequest()
+                if d is None:
+                    break
+                self._inFlight += 1
+                self._requestCount += 1
+                d.addBoth(self._answered)
+        finally:
+            self._requesting = False
+        if self._inFlight == 0 and self._isDone():
+            self._finish()
+
+
+    def _answered(self, result):
+        """
+        Make more requests once one is answered, or stop the transfer if it
+        failed.
+        """
+        self._inFlight -= 1
+        if isinstance(result, failure.Failure) and self._failure is None:
+            self._failure = result
+        self._request()
+
+
+    def _nextRequest(self):
+        """
+        Make the next request.
+
+        @return: A L{Deferred} which fires when the request has been answered
+            and the answer dealt with, or L{None} if there is nothing to ask
+            for now.
+        """
+        raise NotImplementedError()
+
+
+    def _isDone(self):
+        """
+        @return: Whether the transfer is over once no requests are
+            outstanding.
+        """
+        return self._failure is not None
+
+
+    def _finish(self):
+        """
+        Fire the L{Deferred} returned by L{start}.
+        """
+        finished, self._finished = self._finished, None
+        if finished is None:
+            return
+        if self._failure is not None:
+            finished.errback(self._failure)
+        else:
+            finished.callback(TransferStatistics(
+                self._size, self._now() - self._started, self._requestCount))
+
+
+
+@implementer(IPushProducer)
+class _Download(_Transfer):
+    """
+    Read a remote file into a consumer with several read requests
+    outstanding.
+
+    @ivar _consumer: What the contents of the file are written to.
+
+    @ivar _nextOffset: The offset of the first byte not asked for yet.
+
+    @ivar _received: A L{dict} mapping offsets to the data read from them
+        which cannot be written to C{_consumer} yet, because data before it
+        has not been, or because the download is paused.
+
+    @ivar _gaps: A L{list} of C{(offset, length)} for the parts of the file
+        which short reads left out, to ask for again.
+
+    @ivar _eof: The size of the file, once a read has found its end, or
+        L{None}.
+
+    @ivar _paused: Whether the consumer has paused the download.
+
+    @ivar _registered: Whether the download is registered as the producer
+        of C{_consumer}.
+    """
+    def __init__(self, remoteFile, consumer, requests, chunkSize,
+                 maximumChunkSize):
+        _Transfer.__init__(self, remoteFile, requests, chunkSize,
+                           maximumChunkSize)
+        self._consumer = consumer
+        self._nextOffset = 0
+        self._received = {}
+        self._gaps = []
+        self._eof = None
+        self._paused = False
+        self._registered = False
+
+
+    def start(self):
+        if IConsumer.providedBy(self._consumer):
+            self._consumer.registerProducer(self, True)
+            self._registered = True
+        return _Transfer.start(self)
+
+
+    def _nextRequest(self):
+        if self._paused:
+            return None
+        if self._gaps:
+            offset, length = self._gaps.pop(0)
+        elif self._eof is None:
+            offset, length = self._nextOffset, self._chunkSize
+            self._nextOffset += length
+        else:
+            return None
+        d = self._file.readChunk(offset, length)
+        d.addCallbacks(self._cbRead, self._ebRead,
+                       (offset, length), None, (offset,), None)
+        return d
+
+
+    def _cbRead(self, data, offset, length):
+        """
+        Keep the data read, and adjust the size of the next chunks to it.
+        """
+        if not data:
+            self._foundEnd(offset)
+        elif self._failure is None and (self._eof is None or
+                                        offset < self._eof):
+            self._received[offset] = data
+            if len(data) < length:
+                self._gaps.append((offset + len(data), length - len(data)))
+                self._maximumChunkSize = min(
+                    self._maximumChunkSize, len(data))
+                self._chunkSize = min(self._chunkSize, len(data))
+            else:
+                self._chunkSize = min(
+                    self._chunkSize * 2, self._maximumChunkSize)
+            self._deliver()
+
+
+    def _ebRead(self, reason, offset):
+        """
+        Note the end of the file when a read is past it, or pass the failure
+        on.
+        """
+        reason.trap(EOFError)
+        self._foundEnd(offset)
+
+
+    def _foundEnd(self, offset):
+        """
+        Note that the file ends at or before C{offset}, forgetting about
+        anything read or to read past it.
+        """
+        if self._eof is None or offset < self._eof:
+            self._eof = offset
+            self._gaps = [gap for gap in self._gaps if gap[0] < offset]
+            for start in list(self._received):
+                if start >= offset:
+                    del self._received[start]
+
+
+    def _deliver(self):
+        """
+        Write what has been read to the consumer, in order, for as long as it
+        is not paused.
+        """
+        while not self._paused and self._size in self._received:
+            data = self._received.pop(self._size)
+            self._size += len(data)
+            self._consumer.write(data)
+
+
+    def _isDone(self):
+        return (self._failure is not None or
+                (self._eof is not None and not self._gaps and
+                 not self._received))
+
+
+    def _finish(self):
+        self._received.clear()
+        if self._registered:
+            self._registered = False
+            self._consumer.unregisterProducer()
+        _Transfer._finish(self)
+
+
+    def pauseProducing(self):
+        """
+        Stop writing to the consumer and making requests.
+        """
+        self._paused = True
+
+
+    def resumeProducing(self):
+        """
+        Write what has been read to the consumer, and make requests again.
+        """
+        self._paused = False
+        self._deliver()
+        self._request()
+
+
+    def stopProducing(self):
+        """
+        Give up on the download.
+        """
+        if self._failure is None:
+            self._failure = failure.Failure(
+                Exception("Consumer asked us to stop producing"))
+        self._paused = False
+        self._request()
+
+
+
+class _Upload(_Transfer):
+    """
+    Write a local file to a remote one with several write requests
+    outstanding.
+
+    @ivar _source: What the data written is read from.
+
+    @ivar _offset: The offset the next chunk is written at.
+
+    @ivar _exhausted: Whether all of C{_source} has been read.
+    """
+    def __init__(self, remoteFile, source, requests, chunkSize,
+                 maximumChunkSize):
+        _Transfer.__init__(self, remoteFile, requests, chunkSize,
+                           maximumChunkSize)
+        self._source = source
+        self._offset = 0
+        self._exhausted = False
+
+
+    def _nextRequest(self):
+        if self._exhausted:
+            return None
+        data = self._source.read(self._chunkSize)
+        if not data:
+            self._exhausted = True
+            return None
+        offset = self._offset
+        self._offset += len(data)
+        d = self._file.writeChunk(offset, data)
+        d.addCallback(self._cbWrite, len(data))
+        return d
+
+
+    def _cbWrite(self, ignored, length):
+        """
+        Count the data written, and write larger chunks from now on.
+        """
+        self._size += length
+        self._chunkSize = min(self._chunkSize * 2, self._maximumChunkSize)
+
+
+    def _isDone(self):
+        return self._failure is not None or self._exhausted
+
+
 
 @implementer(ISFTPFile)
 class ClientFile:
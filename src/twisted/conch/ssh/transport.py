@@ -25,7 +25,7 @@ from cryptography.hazmat.primitives.ciphers import algorithms, modes, Cipher
 from cryptography.hazmat.primitives.asymmetric import ec
 
 from twisted import __version__ as twisted_version
-from twisted.internet import protocol, defer
+from twisted.internet import protocol, defer, threads
 from twisted.python import log, randbytes
 from twisted.python.compat import iterbytes, _bytesChr as chr, networkString
 
@@ -87,6 +87,217 @@ def _generateX(random, bits):
 
 
 
+def _dhKeyPair(g, p, bits):
+    """
+    Generate an ephemeral Diffie-Hellman key pair.
+
+    @param g: The group generator.
+    @type g: L{int}
+
+    @param p: The group prime.
+    @type p: L{int}
+
+    @param bits: The size of the private key, in bits.
+    @type bits: L{int}
+
+    @return: A 2-L{tuple} of the private key and the public key, as an
+        C{mpint}.
+    @rtype: L{tuple}
+    """
+    y = _getRandomNumber(randbytes.secureRandom, bits)
+    return y, _MPpow(g, y, p)
+
+
+
+def _ecdhKeyPair(curve):
+    """
+    Generate an ephemeral elliptic curve Diffie-Hellman key pair.
+
+    @param curve: The curve.
+    @type curve: L{ec.EllipticCurve}
+
+    @return: The private key.
+    @rtype: L{ec.EllipticCurvePrivateKey}
+    """
+    return ec.generate_private_key(curve, default_backend())
+
+
+
+def _dhReply(h, hostKey, privateHostKey, e, g, p, bits, keyPair):
+    """
+    Do the server's share of a Diffie-Hellman key exchange, either with a
+    fixed group or with group exchange.
+
+    This only uses its arguments, so it can be called in a thread.
+
+    @param h: A hash object which has been updated with everything the
+        exchange hash covers which comes before C{e}.
+
+    @param hostKey: The server's public host key blob.
+    @type hostKey: L{bytes}
+
+    @param privateHostKey: The server's private host key.
+    @type privateHostKey: L{keys.Key}
+
+    @param e: The client's public key.
+    @type e: L{int}
+
+    @param g: The group generator.
+    @param p: The group prime.
+
+    @param bits: The size of the private key to generate, in bits, if
+        C{keyPair} is L{None}.
+
+    @param keyPair: A key pair returned by L{_dhKeyPair}, or L{None} to
+        generate one.
+
+    @return: A 3-L{tuple} of the shared secret, the exchange hash and the
+        payload of the reply.
+    """
+    if keyPair is None:
+        keyPair = _dhKeyPair(g, p, bits)
+    y, f = keyPair
+    sharedSecret = _MPpow(e, y, p)
+    h.update(MP(e))
+    h.update(f)
+    h.update(sharedSecret)
+    exchangeHash = h.digest()
+    return (sharedSecret, exchangeHash,
+            NS(hostKey) + f + NS(privateHostKey.sign(exchangeHash)))
+
+
+
+def _ecdhReply(h, hostKey, privateHostKey, clientPublicKey, curve, ecPriv):
+    """
+    Do the server's share of an elliptic curve Diffie-Hellman key exchange.
+
+    This only uses its arguments, so it can be called in a thread.
+
+    @param h: A hash object which has been updated with everything the
+        exchange hash covers which comes before the client's public key.
+
+    @param hostKey: The server's public host key blob.
+    @type hostKey: L{bytes}
+
+    @param privateHostKey: The server's private host key.
+    @type privateHostKey: L{keys.Key}
+
+    @param clientPublicKey: The client's encoded public key.
+    @type clientPublicKey: L{bytes}
+
+    @param curve: The curve.
+    @type curve: L{ec.EllipticCurve}
+
+    @param ecPriv: A private key returned by L{_ecdhKeyPair}, or L{None} to
+        generate one.
+
+    @return: A 3-L{tuple} of the shared secret, the exchange hash and the
+        payload of the reply.
+    """
+    if ecPriv is None:
+        ecPriv = _ecdhKeyPair(curve)
+    encPub = ecPriv.public_key().public_numbers().encode_point()
+
+    # Take the provided public key and transform it into
+    # a format for the cryptography module
+    theirECPub = ec.EllipticCurvePublicNumbers.from_encoded_point(
+        curve, clientPublicKey).public_key(default_backend())
+
+    # We need to convert to hex,
+    # so we can convert to an int
+    # so we can make it a multiple precision int.
+    sharedSecret = MP(int(binascii.hexlify(
+        ecPriv.exchange(ec.ECDH(), theirECPub)), 16))
+
+    h.update(NS(clientPublicKey))
+    h.update(NS(encPub))
+    h.update(sharedSecret)
+    exchangeHash = h.digest()
+    return (sharedSecret, exchangeHash,
+            NS(hostKey) + NS(encPub) + NS(privateHostKey.sign(exchangeHash)))
+
+
+
+class EphemeralKeyPool(object):
+    """
+    Ephemeral key pairs for key exchanges, generated before they are needed
+    so that a burst of new connections does not have to wait for them.
+
+    Every key pair is used for one key exchange only.  Whenever one is taken
+    for a group, another is generated to replace it, in C{threadPool} if
+    there is one, or in the reactor thread, but not while handling the key
+    exchange which took it.
+
+    @ivar size: The number of key pairs to keep ready for each group.
+    @type size: L{int}
+
+    @ivar threadPool: The thread pool to generate key pairs in, or L{None}.
+    @type threadPool: L{twisted.python.threadpool.ThreadPool}
+
+    @ivar reactor: The reactor to use, or L{None} for the global reactor.
+
+    @ivar _ready: A L{dict} mapping groups to L{list}s of key pairs.
+
+    @ivar _pending: A L{dict} mapping groups to the number of key pairs being
+        generated for them.
+
+    @since: Twisted NEXT
+    """
+    def __init__(self, size, threadPool=None, reactor=None):
+        self.size = size
+        self.threadPool = threadPool
+        self.reactor = reactor
+        self._ready = {}
+        self._pending = {}
+
+
+    def take(self, group, generate):
+        """
+        Take a key pair for a group, and start generating more for it.
+
+        @param group: A hashable value identifying the group, and the size of
+            the private key.
+
+        @param generate: A callable, taking no arguments, which generates a
+            key pair for C{group}.
+
+        @return: A key pair returned by C{generate}, or L{None} if none is
+            ready yet.
+        """
+        ready = self._ready.setdefault(group, [])
+        keyPair = ready.pop() if ready else None
+        while len(ready) + self._pending.get(group, 0) < self.size:
+            self._generate(group, generate)
+        return keyPair
+
+
+    def _generate(self, group, generate):
+        """
+        Generate a key pair for a group in the background, and keep it.
+        """
+        reactor = self.reactor
+        if reactor is None:
+            from twisted.internet import reactor
+        self._pending[group] = self._pending.get(group, 0) + 1
+        if self.threadPool is not None:
+            d = threads.deferToThreadPool(reactor, self.threadPool, generate)
+        else:
+            d = defer.Deferred()
+            reactor.callLater(0, lambda: d.callback(None))
+            d.addCallback(lambda ignored: generate())
+
+        def generated(keyPair):
+            self._pending[group] -= 1
+            self._ready.setdefault(group, []).append(keyPair)
+
+        def failed(reason):
+            self._pending[group] -= 1
+            log.err(reason, "Generating an ephemeral key pair failed")
+
+        d.addCallbacks(generated, failed)
+
+
+
 class _MACParams(tuple):
     """
     L{_MACParams} represents the parameters necessary to compute SSH MAC
@@ -288,8 +499,10 @@ class SSHCiphers:
         """
         if not self.outMAC[0]:
             return b''
-        data = struct.pack('>L', seqid) + data
-        return hmac.HMAC(self.outMAC.key, data, self.outMAC[0]).digest()
+        mac = hmac.HMAC(self.outMAC.key, struct.pack('>L', seqid),
+                        self.outMAC[0])
+        mac.update(data)
+        return mac.digest()
 
 
     def verify(self, seqid, data, mac):
@@ -310,9 +523,10 @@ class SSHCiphers:
         """
         if not self.inMAC[0]:
             return mac == b''
-        data = struct.pack('>L', seqid) + data
-        outer = hmac.HMAC(self.inMAC.key, data, self.inMAC[0]).digest()
-        return mac == outer
+        outer = hmac.HMAC(self.inMAC.key, struct.pack('>L', seqid),
+                          self.inMAC[0])
+        outer.update(data)
+        return mac == outer.digest()
 
 
 
@@ -387,6 +601,7 @@ class SSHTransportBase(protocol.Protocol):
         version string from the other side.
 
     @ivar buf: Data we've received but hasn't been parsed into a packet.
+    @type buf: L{bytearray}
 
     @ivar outgoingPacketSequence: the sequence number of the next packet we
         will send.
@@ -647,13 +862,38 @@ class SSHTransportBase(protocol.Protocol):
         @rtype: L{str} or L{None}
         @return: The decoded packet, if any.
         """
+        if not isinstance(self.buf, bytearray):
+            self.buf = bytearray(self.buf)
+        packet, offset = self._getPacketAt(0)
+        del self.buf[:offset]
+        return packet
+
+
+    def _getPacketAt(self, offset):
+        """
+        Try to decrypt, authenticate, and decompress the packet which starts
+        at C{offset} in the buffer, without removing anything from the buffer.
+
+        The buffer is only sliced as far as the cipher and the MAC need it to
+        be, so many packets can be taken out of one large buffer one after
+        the other, and the consumed data removed from it once at the end.
+
+        @type offset: L{int}
+        @param offset: The index in C{self.buf} at which the packet starts.
+
+        @rtype: L{tuple} of (L{bytes} or L{None}, L{int})
+        @return: The decoded packet, if any, and the offset just after it in
+            the buffer, or C{offset} if no packet was decoded.
+        """
+        buf = self.buf
         bs = self.currentEncryptions.decBlockSize
         ms = self.currentEncryptions.verifyDigestSize
-        if len(self.buf) < bs:
+        if len(buf) - offset < bs:
             # Not enough data for a block
-            return
+            return None, offset
         if not hasattr(self, 'first'):
-            first = self.currentEncryptions.decrypt(self.buf[:bs])
+            first = self.currentEncryptions.decrypt(
+                bytes(buf[offset:offset + bs]))
         else:
             first = self.first
             del self.first
@@ -662,30 +902,31 @@ class SSHTransportBase(protocol.Protocol):
             self.sendDisconnect(
                 DISCONNECT_PROTOCOL_ERROR,
                 networkString('bad packet length {}'.format(packetLen)))
-            return
-        if len(self.buf) < packetLen + 4 + ms:
+            return None, offset
+        end = offset + 4 + packetLen
+        if len(buf) < end + ms:
             # Not enough data for a packet
             self.first = first
-            return
+            return None, offset
         if (packetLen + 4) % bs != 0:
             self.sendDisconnect(
                 DISCONNECT_PROTOCOL_ERROR,
                 networkString(
                     'bad packet mod (%i%%%i == %i)' % (
                         packetLen + 4, bs, (packetLen + 4) % bs)))
-            return
-        encData, self.buf = self.buf[:4 + packetLen], self.buf[4 + packetLen:]
-        packet = first + self.currentEncryptions.decrypt(encData[bs:])
+            return None, offset
+        packet = first + self.currentEncryptions.decrypt(
+            bytes(buf[offset + bs:end]))
         if len(packet) != 4 + packetLen:
             self.sendDisconnect(DISCONNECT_PROTOCOL_ERROR,
                                 b'bad decryption')
-            return
+            return None, offset
         if ms:
-            macData, self.buf = self.buf[:ms], self.buf[ms:]
+            macData = bytes(buf[end:end + ms])
             if not self.currentEncryptions.verify(self.incomingPacketSequence,
                                                   packet, macData):
                 self.sendDisconnect(DISCONNECT_MAC_ERROR, b'bad MAC')
-                return
+                return None, end + ms
         payload = packet[5:-paddingLen]
         if self.incomingCompression:
             try:
@@ -695,9 +936,9 @@ class SSHTransportBase(protocol.Protocol):
                 log.err()
                 self.sendDisconnect(DISCONNECT_COMPRESSION_ERROR,
                                     b'compression error')
-                return
+                return None, end + ms
         self.incomingPacketSequence += 1
-        return payload
+        return payload, end + ms
 
 
     def _unsupportedVersionReceived(self, remoteVersion):
@@ -722,16 +963,19 @@ class SSHTransportBase(protocol.Protocol):
         @type data: L{bytes}
         @param data: The data that was received.
         """
-        self.buf = self.buf + data
+        buf = self.buf
+        if not isinstance(buf, bytearray):
+            self.buf = buf = bytearray(buf)
+        buf += data
         if not self.gotVersion:
-            if self.buf.find(b'\n', self.buf.find(b'SSH-')) == -1:
+            if buf.find(b'\n', buf.find(b'SSH-')) == -1:
                 return
 
             # RFC 4253 section 4.2 ask for strict `\r\n` line ending.
             # Here we are a bit more relaxed and accept implementations ending
             # only in '\n'.
             # https://tools.ietf.org/html/rfc4253#section-4.2
-            lines = self.buf.split(b'\n')
+            lines = bytes(buf).split(b'\n')
             for p in lines:
                 if p.startswith(b'SSH-'):
                     self.gotVersion = True
@@ -743,12 +987,19 @@ class SSHTransportBase(protocol.Protocol):
                         self._unsupportedVersionReceived(remoteVersion)
                         return
                     i = lines.index(p)
-                    self.buf = b'\n'.join(lines[i + 1:])
-        packet = self.getPacket()
-        while packet:
-            messageNum = ord(packet[0:1])
-            self.dispatchMessage(messageNum, packet[1:])
-            packet = self.getPacket()
+                    self.buf = buf = bytearray(b'\n'.join(lines[i + 1:]))
+        # Dispatch every complete packet in the buffer before removing them
+        # from it all at once, rather than copying what is left of the buffer
+        # after each one.
+        offset = 0
+        try:
+            packet, offset = self._getPacketAt(offset)
+            while packet:
+                messageNum = ord(packet[0:1])
+                self.dispatchMessage(messageNum, packet[1:])
+                packet, offset = self._getPacketAt(offset)
+        finally:
+            del buf[:offset]
 
 
     def dispatchMessage(self, messageNum, payload):
@@ -1228,9 +1479,29 @@ class SSHServerTransport(SSHTransportBase):
     @ivar g: the Diffie-Hellman group generator.
 
     @ivar p: the Diffie-Hellman group prime.
+
+    @ivar threadPool: The thread pool in which the Diffie-Hellman and
+        elliptic curve computations and the host key signature of each key
+        exchange are done, so that a burst of new connections does not stop
+        the reactor from serving the existing ones, or L{None} to do them in
+        the reactor thread.  Set from L{SSHFactory.threadPool
+        <twisted.conch.ssh.factory.SSHFactory.threadPool>}.
+    @type threadPool: L{twisted.python.threadpool.ThreadPool}
+
+    @ivar reactor: The reactor used with C{threadPool}, or L{None} for the
+        global reactor.
+
+    @ivar ephemeralKeys: The L{EphemeralKeyPool} to take the server's
+        ephemeral key pairs from, or L{None} to generate one for each key
+        exchange.  It is only used for the fixed Diffie-Hellman groups and
+        elliptic curves; the primes of group exchanges are chosen for each
+        connection, so key pairs for them are always generated when needed.
     """
     isClient = False
     ignoreNextPacket = 0
+    threadPool = None
+    reactor = None
+    ephemeralKeys = None
 
 
     def ssh_KEXINIT(self, packet):
@@ -1252,6 +1523,79 @@ class SSHServerTransport(SSHTransportBase):
                 self.ignoreNextPacket = True # Guess was wrong
 
 
+    def _exchangeHash(self):
+        """
+        Start the exchange hash of the current key exchange.
+
+        @return: A hash object for the key exchange algorithm, updated with
+            the version strings, the KEXINIT payloads and the host key.
+        """
+        h = _kex.getHashProcessor(self.kexAlg)()
+        h.update(NS(self.otherVersionString))
+        h.update(NS(self.ourVersionString))
+        h.update(NS(self.otherKexInitPayload))
+        h.update(NS(self.ourKexInitPayload))
+        h.update(NS(self.factory.publicKeys[self.keyAlg].blob()))
+        return h
+
+
+    def _takeKeyPair(self, group, generate, *args):
+        """
+        Take a precomputed ephemeral key pair from C{ephemeralKeys}.
+
+        @return: The key pair, or L{None} if there is no pool or no key pair
+            is ready.
+        """
+        if self.ephemeralKeys is None:
+            return None
+        return self.ephemeralKeys.take(group, lambda: generate(*args))
+
+
+    def _replyToKex(self, messageType, compute, *args):
+        """
+        Compute the reply to the client's share of the key exchange, in
+        C{threadPool} if there is one, then send it and set up the new keys.
+
+        @param messageType: The type of the reply.
+        @type messageType: L{int}
+
+        @param compute: L{_dhReply} or L{_ecdhReply}, which is called with
+            C{args}.
+        """
+        if self.threadPool is None:
+            self._sendKexReply(compute(*args), messageType)
+            return
+        reactor = self.reactor
+        if reactor is None:
+            from twisted.internet import reactor
+        d = threads.deferToThreadPool(reactor, self.threadPool, compute, *args)
+        d.addCallback(self._sendKexReply, messageType)
+        d.addErrback(self._ebKexReply)
+
+
+    def _sendKexReply(self, result, messageType):
+        """
+        Send the reply to the client's share of the key exchange and set up
+        the new keys.
+
+        @param result: The 3-L{tuple} returned by L{_dhReply} or
+            L{_ecdhReply}.
+        """
+        sharedSecret, exchangeHash, payload = result
+        self.sendPacket(messageType, payload)
+        self._keySetup(sharedSecret, exchangeHash)
+
+
+    def _ebKexReply(self, reason):
+        """
+        Disconnect if computing the reply to the key exchange in a thread
+        failed.
+        """
+        log.err(reason, "Key exchange failed")
+        self.sendDisconnect(DISCONNECT_KEY_EXCHANGE_FAILED,
+                            b"key exchange failed")
+
+
     def _ssh_KEX_ECDH_INIT(self, packet):
         """
         Called from L{ssh_KEX_DH_GEX_REQUEST_OLD} to handle
@@ -1266,10 +1610,13 @@ class SSHServerTransport(SSHTransportBase):
         is required.
 
         First we load the host's public/private keys.
-        Then we generate the ECDH public/private keypair for the given curve.
+        Then we generate the ECDH public/private keypair for the given curve,
+        or take one from C{ephemeralKeys}.
         With that we generate the shared secret key.
         Then we compute the hash to sign and send back to the client
         Along with the server's public key and the ECDH public key.
+        All of this but the first step is done in C{threadPool}, if there is
+        one.
 
         @type packet: L{bytes}
         @param packet: The message data.
@@ -1279,53 +1626,17 @@ class SSHServerTransport(SSHTransportBase):
         # Get the raw client public key.
         pktPub, packet = getNS(packet)
 
-        # Get the host's public and private keys
-        pubHostKey = self.factory.publicKeys[self.keyAlg]
-        privHostKey = self.factory.privateKeys[self.keyAlg]
-
         # Get the curve instance
         try:
             curve = keys._curveTable[b'ecdsa' + self.kexAlg[4:]]
         except KeyError:
             raise UnsupportedAlgorithm('unused-key')
 
-        # Generate the private key
-        ecPriv = ec.generate_private_key(curve, default_backend())
-
-        # Get the public key
-        ecPub = ecPriv.public_key()
-        encPub = ecPub.public_numbers().encode_point()
-
-        # Take the provided public key and transform it into
-        # a format for the cryptography module
-        theirECPub = ec.EllipticCurvePublicNumbers.from_encoded_point(
-                        curve, pktPub).public_key(default_backend())
-
-        # We need to convert to hex,
-        # so we can convert to an int
-        # so we can make it a multiple precision int.
-        sharedSecret = MP(
-                       int(
-                        binascii.hexlify(
-                          ecPriv.exchange(ec.ECDH(), theirECPub)), 16))
-
-        # Finish update and digest
-        h = _kex.getHashProcessor(self.kexAlg)()
-        h.update(NS(self.otherVersionString))
-        h.update(NS(self.ourVersionString))
-        h.update(NS(self.otherKexInitPayload))
-        h.update(NS(self.ourKexInitPayload))
-        h.update(NS(pubHostKey.blob()))
-        h.update(NS(pktPub))
-        h.update(NS(encPub))
-        h.update(sharedSecret)
-        exchangeHash = h.digest()
-
-        self.sendPacket(
-            MSG_KEXDH_REPLY,
-            NS(pubHostKey.blob()) + NS(encPub) +
-            NS(privHostKey.sign(exchangeHash)))
-        self._keySetup(sharedSecret, exchangeHash)
+        self._replyToKex(
+            MSG_KEXDH_REPLY, _ecdhReply, self._exchangeHash(),
+            self.factory.publicKeys[self.keyAlg].blob(),
+            self.factory.privateKeys[self.keyAlg], pktPub, curve,
+            self._takeKeyPair(self.kexAlg, _ecdhKeyPair, curve))
 
 
     def _ssh_KEXDH_INIT(self, packet):
@@ -1341,32 +1652,21 @@ class SSHServerTransport(SSHTransportBase):
 
                 integer e (the client's Diffie-Hellman public key)
 
-        We send the KEXDH_REPLY with our host key and signature.
+        We send the KEXDH_REPLY with our host key and signature, computed in
+        C{threadPool} if there is one.
 
         @type packet: L{bytes}
         @param packet: The message data.
         """
         clientDHpublicKey, foo = getMP(packet)
-        y = _getRandomNumber(randbytes.secureRandom, 512)
         self.g, self.p = _kex.getDHGeneratorAndPrime(self.kexAlg)
-        serverDHpublicKey = _MPpow(self.g, y, self.p)
-        sharedSecret = _MPpow(clientDHpublicKey, y, self.p)
-        h = sha1()
-        h.update(NS(self.otherVersionString))
-        h.update(NS(self.ourVersionString))
-        h.update(NS(self.otherKexInitPayload))
-        h.update(NS(self.ourKexInitPayload))
-        h.update(NS(self.factory.publicKeys[self.keyAlg].blob()))
-        h.update(MP(clientDHpublicKey))
-        h.update(serverDHpublicKey)
-        h.update(sharedSecret)
-        exchangeHash = h.digest()
-        self.sendPacket(
-            MSG_KEXDH_REPLY,
-            NS(self.factory.publicKeys[self.keyAlg].blob()) +
-            serverDHpublicKey +
-            NS(self.factory.privateKeys[self.keyAlg].sign(exchangeHash)))
-        self._keySetup(sharedSecret, exchangeHash)
+        self._replyToKex(
+            MSG_KEXDH_REPLY, _dhReply, self._exchangeHash(),
+            self.factory.publicKeys[self.keyAlg].blob(),
+            self.factory.privateKeys[self.keyAlg], clientDHpublicKey,
+            self.g, self.p, 512,
+            self._takeKeyPair((self.g, self.p, 512), _dhKeyPair,
+                              self.g, self.p, 512))
 
 
     def ssh_KEX_DH_GEX_REQUEST_OLD(self, packet):
@@ -1438,7 +1738,7 @@ class SSHServerTransport(SSHTransportBase):
             integer e (client DH public key)
 
         We send the MSG_KEX_DH_GEX_REPLY message with our host key and
-        signature.
+        signature, computed in C{threadPool} if there is one.
 
         @type packet: L{bytes}
         @param packet: The message data.
@@ -1452,29 +1752,17 @@ class SSHServerTransport(SSHTransportBase):
         #  or do as openssh does and scan f for a single '1' bit instead
 
         pSize = self.p.bit_length()
-        y = _getRandomNumber(randbytes.secureRandom, pSize)
-
-        serverDHpublicKey = _MPpow(self.g, y, self.p)
-        sharedSecret = _MPpow(clientDHpublicKey, y, self.p)
-        h = _kex.getHashProcessor(self.kexAlg)()
-        h.update(NS(self.otherVersionString))
-        h.update(NS(self.ourVersionString))
-        h.update(NS(self.otherKexInitPayload))
-        h.update(NS(self.ourKexInitPayload))
-        h.update(NS(self.factory.publicKeys[self.keyAlg].blob()))
+        h = self._exchangeHash()
         h.update(self.dhGexRequest)
         h.update(MP(self.p))
         h.update(MP(self.g))
-        h.update(MP(clientDHpublicKey))
-        h.update(serverDHpublicKey)
-        h.update(sharedSecret)
-        exchangeHash = h.digest()
-        self.sendPacket(
-            MSG_KEX_DH_GEX_REPLY,
-            NS(self.factory.publicKeys[self.keyAlg].blob()) +
-            serverDHpublicKey +
-            NS(self.factory.privateKeys[self.keyAlg].sign(exchangeHash)))
-        self._keySetup(sharedSecret, exchangeHash)
+        # The prime is picked at random for this connection, so there is no
+        # point keeping key pairs ready for it.
+        self._replyToKex(
+            MSG_KEX_DH_GEX_REPLY, _dhReply, h,
+            self.factory.publicKeys[self.keyAlg].blob(),
+            self.factory.privateKeys[self.keyAlg], clientDHpublicKey,
+            self.g, self.p, pSize, None)
 
 
     def ssh_NEWKEYS(self, packet):
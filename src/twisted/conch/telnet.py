@@ -10,13 +10,14 @@ Telnet protocol implementation.
 
 from __future__ import absolute_import, division
 
+import re
 import struct
 
 from zope.interface import implementer
 
 from twisted.internet import protocol, interfaces as iinternet, defer
 from twisted.python import log
-from twisted.python.compat import _bytesChr as chr, iterbytes
+from twisted.python.compat import _bytesChr as chr
 
 MODE = chr(1)
 EDIT = 1
@@ -155,6 +156,11 @@ LINEMODE_EOF = chr(236)
 LINEMODE_SUSP = chr(237)
 LINEMODE_ABORT = chr(238)
 
+# The bytes which Telnet.dataReceived has to look at one by one in the data
+# state: IAC, and carriage returns which are not followed by the line feed or
+# NUL which make them a newline or a carriage return.
+_specialData = re.compile(b'\r(?![\n\0])|\xff')
+
 class ITelnetProtocol(iinternet.IProtocol):
     def unhandledCommand(command, argument):
         """
@@ -556,8 +562,27 @@ class Telnet(protocol.Protocol):
 
     def dataReceived(self, data):
         appDataBuffer = []
+        position = 0
 
-        for b in iterbytes(data):
+        while position < len(data):
+            if self.state == 'data':
+                # Take a run of application data, with complete newlines,
+                # all at once rather than byte by byte.
+                special = _specialData.search(data, position)
+                if special is None:
+                    end = len(data)
+                else:
+                    end = special.start()
+                if end > position:
+                    run = data[position:end]
+                    if b'\r' in run:
+                        run = run.replace(b'\r\n', b'\n').replace(
+                            b'\r\0', b'\r')
+                    appDataBuffer.append(run)
+                    position = end
+                    continue
+            b = data[position:position + 1]
+            position += 1
             if self.state == 'data':
                 if b == IAC:
                     self.state = 'escaped'
@@ -992,6 +1017,13 @@ class TelnetTransport(Telnet, ProtocolTransportMixin):
         ProtocolTransportMixin.write(self, data.replace(b'\xff', b'\xff\xff'))
 
 
+    def writeSequence(self, seq):
+        """
+        Escape and write the given sequence of bytes all at once.
+        """
+        self.write(b''.join(seq))
+
+
 
 class TelnetBootstrapProtocol(TelnetProtocol, ProtocolTransportMixin):
     protocol = None
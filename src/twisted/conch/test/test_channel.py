@@ -16,6 +16,7 @@ try:
     from twisted.conch.ssh.service import SSHService
     from twisted.internet import interfaces
     from twisted.internet.address import IPv4Address
+    from twisted.internet._producer_helpers import _PullToPush
     from twisted.test.proto_helpers import StringTransport
     skipTest = None
 except ImportError:
@@ -36,12 +37,15 @@ class MockConnection(SSHService):
         (extended data type, data) sent by that channel.
     @ivar closes: a L{dict} mapping channel id #s to True if that channel sent
         a close message.
+    @ivar windowAdjustments: a L{list} of the numbers of bytes added to
+        channels' local windows.
     """
 
     def __init__(self):
         self.data = {}
         self.extData = {}
         self.closes = {}
+        self.windowAdjustments = []
 
 
     def logPrefix(self):
@@ -72,6 +76,38 @@ class MockConnection(SSHService):
         self.closes[channel] = True
 
 
+    def adjustWindow(self, channel, bytesToAdd):
+        """
+        Record the window adjustment, and add the bytes to the channel's local
+        window.
+        """
+        self.windowAdjustments.append(bytesToAdd)
+        channel.localWindowLeft += bytesToAdd
+
+
+
+class MockProducer(object):
+    """
+    A streaming producer which records whether it is paused.
+
+    @ivar paused: the number of times C{pauseProducing} was called, less the
+        number of times C{resumeProducing} was.
+    """
+    paused = 0
+    stopped = False
+
+    def pauseProducing(self):
+        self.paused += 1
+
+
+    def resumeProducing(self):
+        self.paused -= 1
+
+
+    def stopProducing(self):
+        self.stopped = True
+
+
 
 def connectSSHTransport(service, hostAddress=None, peerAddress=None):
     """
@@ -120,6 +156,15 @@ class ChannelTests(unittest.TestCase):
         self.assertTrue(verifyObject(interfaces.ITransport, self.channel))
 
 
+    def test_producerConsumerInterfaces(self):
+        """
+        L{SSHChannel} instances provide L{interfaces.IConsumer} and
+        L{interfaces.IPushProducer}.
+        """
+        self.assertTrue(verifyObject(interfaces.IConsumer, self.channel))
+        self.assertTrue(verifyObject(interfaces.IPushProducer, self.channel))
+
+
     def test_init(self):
         """
         Test that SSHChannel initializes correctly.  localWindowSize defaults
@@ -139,6 +184,7 @@ class ChannelTests(unittest.TestCase):
         self.assertEqual(c.conn, self.conn)
         self.assertIsNone(c.data)
         self.assertIsNone(c.avatar)
+        self.assertEqual(c.localWindowMaximum, 131072)
 
         c2 = channel.SSHChannel(1, 2, 3, 4, 5, 6, 7)
         self.assertEqual(c2.localWindowSize, 1)
@@ -149,6 +195,11 @@ class ChannelTests(unittest.TestCase):
         self.assertEqual(c2.conn, 5)
         self.assertEqual(c2.data, 6)
         self.assertEqual(c2.avatar, 7)
+        self.assertEqual(c2.localWindowMaximum, 1)
+
+        c3 = channel.SSHChannel(localWindow=2, localWindowMaximum=8)
+        self.assertEqual(c3.localWindowSize, 2)
+        self.assertEqual(c3.localWindowMaximum, 8)
 
 
     def test_str(self):
@@ -353,3 +404,212 @@ class ChannelTests(unittest.TestCase):
         connectSSHTransport(service=self.channel.conn, hostAddress=host)
 
         self.assertEqual(SSHTransportAddress(host), self.channel.getHost())
+
+
+    def receive(self, data, dataType=None):
+        """
+        Deliver C{data} to the channel as the connection would, taking it out
+        of the local window first.
+        """
+        self.channel.localWindowLeft -= len(data)
+        self.channel._dataArrived(dataType, data)
+
+
+    def recordReceived(self):
+        """
+        Record the data and extended data delivered to the channel.
+
+        @return: A L{list} to which 2-tuples of the extended data type code,
+            or L{None} for regular data, and the data are appended.
+        """
+        received = []
+        self.channel.dataReceived = lambda data: received.append((None, data))
+        self.channel.extReceived = lambda dataType, data: received.append(
+            (dataType, data))
+        return received
+
+
+    def test_dataArrived(self):
+        """
+        Data which arrives is delivered to C{dataReceived} or C{extReceived},
+        and once less than half of the local window is left it is replenished.
+        """
+        received = self.recordReceived()
+        self.receive(b'a' * 65536)
+        self.assertEqual(self.conn.windowAdjustments, [])
+        self.receive(b'b', 1)
+        self.assertEqual(self.conn.windowAdjustments, [65537])
+        self.assertEqual(self.channel.localWindowLeft, 131072)
+        self.assertEqual(received, [(None, b'a' * 65536), (1, b'b')])
+
+
+    def test_pauseProducing(self):
+        """
+        Data which arrives while the channel is paused is delivered, in order,
+        when it is resumed, and the local window is only replenished then,
+        with a single adjustment.
+        """
+        received = self.recordReceived()
+        self.channel.pauseProducing()
+        self.receive(b'a' * 65536)
+        self.receive(b'b' * 65536, 1)
+        self.assertEqual(received, [])
+        self.assertEqual(self.conn.windowAdjustments, [])
+        self.assertEqual(self.channel.localWindowLeft, 0)
+
+        self.channel.resumeProducing()
+        self.assertEqual(received, [(None, b'a' * 65536), (1, b'b' * 65536)])
+        self.assertEqual(self.conn.windowAdjustments, [131072])
+
+
+    def test_pauseProducingWhileResuming(self):
+        """
+        If the channel is paused again by the data delivered when it is
+        resumed, the rest of the data is kept until it is resumed again.
+        """
+        received = []
+        def dataReceived(data):
+            received.append(data)
+            if data != b'c':
+                self.channel.pauseProducing()
+        self.channel.dataReceived = dataReceived
+        self.channel.pauseProducing()
+        self.receive(b'a' * 65536)
+        self.receive(b'b')
+        self.channel.resumeProducing()
+        self.assertEqual(received, [b'a' * 65536])
+        self.assertEqual(self.conn.windowAdjustments, [])
+        self.receive(b'c')
+        self.channel.resumeProducing()
+        self.assertEqual(received, [b'a' * 65536, b'b'])
+        self.channel.resumeProducing()
+        self.assertEqual(received, [b'a' * 65536, b'b', b'c'])
+        self.assertEqual(self.conn.windowAdjustments, [65538])
+
+
+    def test_windowGrowth(self):
+        """
+        While more than a window's worth of data arrives per
+        C{_windowTuningInterval} seconds, the local window is doubled each
+        time it is replenished, up to C{localWindowMaximum}.
+        """
+        now = [0.0]
+        self.channel = channel.SSHChannel(
+            conn=self.conn, localWindow=100, localWindowMaximum=300)
+        self.channel._now = lambda: now[0]
+        self.recordReceived()
+        self.receive(b'a' * 60)
+        self.assertEqual(self.channel.localWindowSize, 100)
+        self.assertEqual(self.conn.windowAdjustments, [60])
+
+        now[0] = 0.1
+        self.receive(b'a' * 60)
+        self.assertEqual(self.channel.localWindowSize, 200)
+        self.assertEqual(self.conn.windowAdjustments, [60, 160])
+        self.assertEqual(self.channel.localWindowLeft, 200)
+
+        now[0] = 0.2
+        self.receive(b'a' * 120)
+        self.assertEqual(self.channel.localWindowSize, 300)
+        self.assertEqual(self.channel.localWindowLeft, 300)
+
+
+    def test_windowNotGrownWhenSlow(self):
+        """
+        The local window is not grown while less than a window's worth of data
+        arrives per C{_windowTuningInterval} seconds.
+        """
+        now = [0.0]
+        self.channel = channel.SSHChannel(
+            conn=self.conn, localWindow=100, localWindowMaximum=300)
+        self.channel._now = lambda: now[0]
+        self.recordReceived()
+        self.receive(b'a' * 60)
+        now[0] = 10.0
+        self.receive(b'a' * 60)
+        self.assertEqual(self.channel.localWindowSize, 100)
+        self.assertEqual(self.conn.windowAdjustments, [60, 60])
+
+
+    def test_windowNotGrownByDefault(self):
+        """
+        Without a C{localWindowMaximum}, the local window never grows.
+        """
+        self.channel._now = lambda: 0.0
+        self.recordReceived()
+        for i in range(3):
+            self.receive(b'a' * 65537)
+        self.assertEqual(self.channel.localWindowSize, 131072)
+        self.assertEqual(self.conn.windowAdjustments, [65537] * 3)
+
+
+    def test_registerProducer(self):
+        """
+        A streaming producer registered with the channel is paused when the
+        remote window is used up, and resumed once the data buffered by the
+        channel has been sent.
+        """
+        producer = MockProducer()
+        self.channel.addWindowBytes(10)
+        self.channel.registerProducer(producer, True)
+        self.assertIs(self.channel.producer, producer)
+        self.channel.write(b'a' * 15)
+        self.assertEqual(producer.paused, 1)
+        self.channel.write(b'b' * 5)
+        self.assertEqual(producer.paused, 1)
+        self.channel.addWindowBytes(5)
+        self.assertEqual(producer.paused, 1)
+        self.channel.addWindowBytes(5)
+        self.assertEqual(producer.paused, 0)
+        self.assertEqual(b''.join(self.conn.data[self.channel]),
+                         b'a' * 15 + b'b' * 5)
+
+
+    def test_registerProducerWithoutWindow(self):
+        """
+        A producer registered while the remote window is used up is paused
+        straight away.
+        """
+        producer = MockProducer()
+        self.channel.write(b'a')
+        self.channel.registerProducer(producer, True)
+        self.assertEqual(producer.paused, 1)
+        self.channel.addWindowBytes(1)
+        self.assertEqual(producer.paused, 0)
+
+
+    def test_registerProducerTwice(self):
+        """
+        Registering a producer while another is registered raises
+        L{RuntimeError}.
+        """
+        self.channel.registerProducer(MockProducer(), True)
+        self.assertRaises(
+            RuntimeError, self.channel.registerProducer, MockProducer(), True)
+
+
+    def test_unregisterProducer(self):
+        """
+        Once unregistered, a producer is no longer paused or resumed.
+        """
+        producer = MockProducer()
+        self.channel.registerProducer(producer, True)
+        self.channel.unregisterProducer()
+        self.assertIsNone(self.channel.producer)
+        self.channel.write(b'a')
+        self.channel.addWindowBytes(1)
+        self.assertEqual(producer.paused, 0)
+
+
+    def test_registerPullProducer(self):
+        """
+        A non-streaming producer is wrapped in a streaming one, which is
+        stopped when the producer is unregistered.
+        """
+        producer = MockProducer()
+        self.channel.registerProducer(producer, False)
+        streaming = self.channel.producer
+        self.assertIsInstance(streaming, _PullToPush)
+        self.assertIs(streaming._producer, producer)
+        self.channel.unregisterProducer()
+        self.assertTrue(streaming._finished)
@@ -777,6 +777,60 @@ class UNIXAuthorizedKeysFilesTests(TestCase):
                          list(keydb.getAuthorizedKeys(b'alice')))
 
 
+    def test_keysParsedOnce(self):
+        """
+        L{checkers.UNIXAuthorizedKeysFiles.getAuthorizedKeys} parses the keys
+        in a file only once for as long as it is not modified.
+        """
+        parsed = []
+        def parseKey(line):
+            parsed.append(line)
+            return line
+        keydb = checkers.UNIXAuthorizedKeysFiles(self.userdb,
+                                                 parseKey=parseKey)
+        self.assertEqual(self.expectedKeys,
+                         list(keydb.getAuthorizedKeys(b'alice')))
+        self.assertEqual(self.expectedKeys,
+                         list(keydb.getAuthorizedKeys(b'alice')))
+        self.assertEqual(self.expectedKeys, parsed)
+
+
+    def test_modifiedFileParsedAgain(self):
+        """
+        L{checkers.UNIXAuthorizedKeysFiles.getAuthorizedKeys} parses a file
+        again once it is modified, and stops returning its keys once it is
+        removed.
+        """
+        keydb = checkers.UNIXAuthorizedKeysFiles(self.userdb,
+                                                 parseKey=lambda x: x)
+        self.assertEqual(self.expectedKeys,
+                         list(keydb.getAuthorizedKeys(b'alice')))
+        self.sshDir.child('authorized_keys').setContent(b'key 1\nkey 3\n')
+        self.assertEqual([b'key 1', b'key 3'],
+                         list(keydb.getAuthorizedKeys(b'alice')))
+        self.sshDir.child('authorized_keys').remove()
+        self.assertEqual([], list(keydb.getAuthorizedKeys(b'alice')))
+
+
+    def test_rewrittenFileParsedAgain(self):
+        """
+        L{checkers.UNIXAuthorizedKeysFiles.getAuthorizedKeys} parses a file
+        again once it is rewritten in place, even with the same size and
+        modification time.
+        """
+        keydb = checkers.UNIXAuthorizedKeysFiles(self.userdb,
+                                                 parseKey=lambda x: x)
+        self.assertEqual(self.expectedKeys,
+                         list(keydb.getAuthorizedKeys(b'alice')))
+        path = self.sshDir.child('authorized_keys').path
+        st = os.stat(path)
+        with open(path, 'r+b') as f:
+            f.write(b'key 3')
+        os.utime(path, (st.st_atime, st.st_mtime))
+        self.assertEqual([b'key 3', b'key 2'],
+                         list(keydb.getAuthorizedKeys(b'alice')))
+
+
 
 _KeyDB = namedtuple('KeyDB', ['getAuthorizedKeys'])
 
@@ -441,6 +441,28 @@ class ConnectionTests(unittest.TestCase):
         self.assertEqual(self.transport.packets,
                 [(connection.MSG_CHANNEL_CLOSE, b'\x00\x00\x00\xff')])
 
+    def test_CHANNEL_DATAWhilePaused(self):
+        """
+        Channel data messages for a paused channel are delivered when the
+        channel is resumed, and the window is only adjusted then, with a single
+        message.
+        """
+        channel = TestChannel(localWindow=6, localMaxPacket=5)
+        self._openChannel(channel)
+        channel.pauseProducing()
+        self.conn.ssh_CHANNEL_DATA(b'\x00\x00\x00\x00' + common.NS(b'dat'))
+        self.conn.ssh_CHANNEL_EXTENDED_DATA(b'\x00\x00\x00\x00\x00\x00\x00'
+                                            b'\x01' + common.NS(b'a'))
+        self.assertEqual(channel.inBuffer, [])
+        self.assertEqual(channel.extBuffer, [])
+        self.assertEqual(self.transport.packets, [])
+        channel.resumeProducing()
+        self.assertEqual(channel.inBuffer, [b'dat'])
+        self.assertEqual(channel.extBuffer, [(1, b'a')])
+        self.assertEqual(self.transport.packets,
+                [(connection.MSG_CHANNEL_WINDOW_ADJUST, b'\x00\x00\x00\xff'
+                    b'\x00\x00\x00\x04')])
+
     def test_CHANNEL_EXTENDED_DATA(self):
         """
         Test that channel extended data messages are passed up to the channel,
@@ -493,6 +515,30 @@ class ConnectionTests(unittest.TestCase):
         self.assertTrue(channel.gotOneClose)
         self.assertTrue(channel.gotClosed)
 
+    def test_CHANNEL_EOFAndCLOSEWhilePaused(self):
+        """
+        The EOF and close messages for a paused channel are passed up to it
+        when it is resumed, after the data which arrived before them.
+        """
+        channel = TestChannel()
+        self._openChannel(channel)
+        self.conn.sendClose(channel)
+        channel.pauseProducing()
+        self.conn.ssh_CHANNEL_DATA(b'\x00\x00\x00\x00' + common.NS(b'dat'))
+        self.conn.ssh_CHANNEL_EOF(b'\x00\x00\x00\x00')
+        self.conn.ssh_CHANNEL_CLOSE(b'\x00\x00\x00\x00')
+        self.assertFalse(channel.gotEOF)
+        self.assertFalse(channel.gotOneClose)
+        self.assertFalse(channel.gotClosed)
+        received = []
+        channel.dataReceived = lambda data: received.append(
+            (data, channel.gotEOF))
+        channel.resumeProducing()
+        self.assertEqual(received, [(b'dat', False)])
+        self.assertTrue(channel.gotEOF)
+        self.assertTrue(channel.gotOneClose)
+        self.assertTrue(channel.gotClosed)
+
     def test_CHANNEL_REQUEST_success(self):
         """
         Test that channel requests that succeed send MSG_CHANNEL_SUCCESS.
@@ -8,6 +8,7 @@ Tests for L{twisted.conch.ssh.filetransfer}.
 
 from __future__ import division, absolute_import
 
+import io
 import os
 import re
 import struct
@@ -30,6 +31,9 @@ from twisted.protocols import loopback
 from twisted.python import components
 from twisted.python.compat import long
 from twisted.python.filepath import FilePath
+from twisted.test.proto_helpers import StringTransport
+from twisted.test.proto_helpers import (
+    _ImmediateReactor, _QueueingThreadPool)
 
 
 class TestAvatar(avatar.ConchUser):
@@ -547,6 +551,156 @@ class OurServerOurClientTests(SFTPTestBase):
                               b'testfile1']))
 
 
+    def test_get(self):
+        """
+        L{filetransfer.FileTransferClient.get} downloads a whole file with
+        several reads outstanding, and closes it.
+        """
+        received = io.BytesIO()
+        d = self.client.get(b'testfile1', received, requests=4,
+                            chunkSize=1024, maximumChunkSize=8192)
+        self._emptyBuffers()
+        statistics = self.successResultOf(d)
+        content = self.testDir.child('testfile1').getContent()
+        self.assertEqual(received.getvalue(), content)
+        self.assertEqual(statistics.size, len(content))
+        self.assertEqual(self.server.openFiles, {})
+
+
+    def test_put(self):
+        """
+        L{filetransfer.FileTransferClient.put} uploads a whole file with
+        several writes outstanding, and closes it.
+        """
+        content = os.urandom(100000)
+        d = self.client.put(b'testUpload', io.BytesIO(content), requests=4,
+                            chunkSize=1024, maximumChunkSize=8192)
+        self._emptyBuffers()
+        statistics = self.successResultOf(d)
+        self.assertEqual(
+            self.testDir.child('testUpload').getContent(), content)
+        self.assertEqual(statistics.size, len(content))
+        self.assertEqual(self.server.openFiles, {})
+
+
+    def test_getMissingFile(self):
+        """
+        L{filetransfer.FileTransferClient.get} fails with the
+        L{filetransfer.SFTPError} opening the file failed with.
+        """
+        d = self.client.get(b'noSuchFile', io.BytesIO())
+        self._emptyBuffers()
+        self.failureResultOf(d, filetransfer.SFTPError)
+
+
+    def test_serverThreadPool(self):
+        """
+        When L{filetransfer.FileTransferServer.threadPool} is set, the server
+        reads, writes and closes files in it, one call at a time for each
+        file.
+        """
+        pool = _QueueingThreadPool()
+        self.server.threadPool = pool
+        self.server.reactor = _ImmediateReactor()
+        self.server.client = _OpenedFileServer(self.testDir)
+
+        received = io.BytesIO()
+        d = self.client.get(b'testfile1', received, requests=4,
+                            chunkSize=1024, maximumChunkSize=8192)
+        self._emptyBuffers()
+        self.assertNoResult(d)
+        self.assertEqual(len(pool.calls), 1)
+        self.assertEqual(len(self.server._fileLocks), 1)
+
+        while pool.calls:
+            pool.runOne()
+            self._emptyBuffers()
+        self.successResultOf(d)
+        self.assertEqual(received.getvalue(),
+                         self.testDir.child('testfile1').getContent())
+        self.assertEqual(self.server._fileLocks, {})
+
+
+    def test_serverThreadPoolSwitchingUser(self):
+        """
+        The files of an avatar which switches the effective user of the
+        process to access them are not used in the thread pool.
+        """
+        pool = _QueueingThreadPool()
+        self.server.threadPool = pool
+        self.server.reactor = _ImmediateReactor()
+
+        received = io.BytesIO()
+        d = self.client.get(b'testfile1', received)
+        self._emptyBuffers()
+        self.successResultOf(d)
+        self.assertEqual(pool.calls, [])
+        self.assertEqual(received.getvalue(),
+                         self.testDir.child('testfile1').getContent())
+
+
+    def test_connectionLostThreadPool(self):
+        """
+        When the connection is lost, files are closed in the thread pool once
+        the calls already made for them are complete.
+        """
+        pool = _QueueingThreadPool()
+        self.server.threadPool = pool
+        self.server.reactor = _ImmediateReactor()
+        self.server.client = server = _OpenedFileServer(self.testDir)
+
+        d = self.client.openFile(b'testfile1', filetransfer.FXF_READ, {})
+        self._emptyBuffers()
+        self.successResultOf(d).readChunk(0, 10)
+        self._emptyBuffers()
+        [opened] = server.opened
+
+        self.server.connectionLost(None)
+        self.assertEqual(self.server._fileLocks, {})
+        self.assertEqual(len(pool.calls), 1)
+        pool.runOne()
+        self.assertFalse(opened.closed)
+        pool.runOne()
+        self.assertTrue(opened.closed)
+
+
+
+class _OpenedFileServer(object):
+    """
+    An SFTP server whose files are opened by the process itself, without
+    switching its effective user, so that they can be used in a thread pool.
+
+    @ivar opened: The files opened, in order.
+    """
+    def __init__(self, homeDir):
+        self.homeDir = homeDir
+        self.opened = []
+
+
+    def openFile(self, filename, flags, attrs):
+        f = self.homeDir.child(filename.decode("ascii")).open("rb")
+        self.opened.append(f)
+        return _OpenedFile(f)
+
+
+
+class _OpenedFile(object):
+    """
+    An SFTP file reading from an open file.
+    """
+    def __init__(self, f):
+        self.f = f
+
+
+    def readChunk(self, offset, length):
+        self.f.seek(offset)
+        return self.f.read(length)
+
+
+    def close(self):
+        self.f.close()
+
+
 
 class FakeConn:
     def sendClose(self, channel):
@@ -854,3 +1008,270 @@ class RawPacketDataTests(unittest.TestCase):
         """
         self.assertEqual(result[0], b'msg')
         self.assertEqual(result[1], b'')
+
+
+
+class FakeRemoteFile(object):
+    """
+    A stand-in for L{filetransfer.ClientFile} whose requests are answered
+    only when the test says so.
+
+    @ivar data: The content of the file.
+
+    @ivar maximumRead: The most a read returns, like a server which limits
+        the size of its answers, or L{None}.
+
+    @ivar requests: A L{list} of C{(kind, offset, length)} for every
+        request made.
+
+    @ivar pending: A L{list} of the L{defer.Deferred}s of the requests not
+        answered yet, with the offset and data or length of each.
+    """
+    def __init__(self, data=b'', maximumRead=None):
+        self.data = data
+        self.maximumRead = maximumRead
+        self.requests = []
+        self.pending = []
+        self.closed = False
+
+
+    def readChunk(self, offset, length):
+        self.requests.append(('read', offset, length))
+        d = defer.Deferred()
+        self.pending.append((d, offset, length))
+        return d
+
+
+    def writeChunk(self, offset, chunk):
+        self.requests.append(('write', offset, len(chunk)))
+        d = defer.Deferred()
+        self.pending.append((d, offset, chunk))
+        return d
+
+
+    def close(self):
+        self.closed = True
+        return defer.succeed(None)
+
+
+    def answerOne(self, index=0):
+        """
+        Answer one outstanding request, the way a server would.
+        """
+        d, offset, lengthOrChunk = self.pending.pop(index)
+        if isinstance(lengthOrChunk, bytes):
+            self.data = (self.data[:offset].ljust(offset, b'\0') +
+                         lengthOrChunk +
+                         self.data[offset + len(lengthOrChunk):])
+            d.callback(None)
+        elif offset >= len(self.data):
+            d.errback(EOFError())
+        else:
+            length = lengthOrChunk
+            if self.maximumRead is not None:
+                length = min(length, self.maximumRead)
+            d.callback(self.data[offset:offset + length])
+
+
+    def answerAll(self, newestFirst=False):
+        """
+        Answer requests, including those made in response to the answers,
+        until none are outstanding.
+        """
+        while self.pending:
+            self.answerOne(-1 if newestFirst else 0)
+
+
+
+class TransferTests(unittest.TestCase):
+    """
+    Tests for L{filetransfer.FileTransferClient.get} and
+    L{filetransfer.FileTransferClient.put}.
+    """
+    if not cryptography:
+        skip = "Cannot run without cryptography"
+
+    def setUp(self):
+        self.client = filetransfer.FileTransferClient()
+        self.opened = []
+        self.remoteFile = FakeRemoteFile(os.urandom(10000))
+        def openFile(filename, flags, attrs):
+            self.opened.append((filename, flags))
+            return defer.succeed(self.remoteFile)
+        self.client.openFile = openFile
+
+
+    def test_getOutOfOrder(self):
+        """
+        The content of the file is written in order even when the reads are
+        answered out of order, then the file is closed.
+        """
+        received = io.BytesIO()
+        d = self.client.get(b'file', received, requests=8, chunkSize=100,
+                            maximumChunkSize=1000)
+        self.assertEqual(len(self.remoteFile.pending), 8)
+        self.remoteFile.answerAll(newestFirst=True)
+        statistics = self.successResultOf(d)
+        self.assertEqual(received.getvalue(), self.remoteFile.data)
+        self.assertEqual(statistics.size, 10000)
+        self.assertEqual(statistics.requests, len(self.remoteFile.requests))
+        self.assertEqual(self.opened, [(b'file', filetransfer.FXF_READ)])
+        self.assertTrue(self.remoteFile.closed)
+
+
+    def test_getRequestsOutstanding(self):
+        """
+        No more than C{requests} reads are outstanding at once.
+        """
+        d = self.client.get(b'file', io.BytesIO(), requests=3,
+                            chunkSize=100, maximumChunkSize=100)
+        while self.remoteFile.pending:
+            self.assertTrue(len(self.remoteFile.pending) <= 3)
+            self.remoteFile.answerOne()
+        self.successResultOf(d)
+
+
+    def test_getChunkSizeGrows(self):
+        """
+        The chunks read double in size, up to C{maximumChunkSize}, while the
+        server returns as much as is asked for.
+        """
+        d = self.client.get(b'file', io.BytesIO(), requests=1,
+                            chunkSize=100, maximumChunkSize=1000)
+        self.remoteFile.answerAll()
+        self.successResultOf(d)
+        self.assertEqual(
+            [length for kind, offset, length in self.remoteFile.requests[:6]],
+            [100, 200, 400, 800, 1000, 1000])
+
+
+    def test_getShortReads(self):
+        """
+        When the server returns less than was asked for, the rest is asked
+        for again and later chunks are no larger than what it returned.
+        """
+        self.remoteFile.maximumRead = 300
+        received = io.BytesIO()
+        d = self.client.get(b'file', received, requests=4, chunkSize=1000,
+                            maximumChunkSize=4000)
+        self.remoteFile.answerAll()
+        self.successResultOf(d)
+        self.assertEqual(received.getvalue(), self.remoteFile.data)
+        self.assertIn(('read', 300, 700), self.remoteFile.requests)
+        self.assertEqual(
+            max(length for kind, offset, length
+                in self.remoteFile.requests[4:]), 700)
+        self.assertEqual(self.remoteFile.requests[-1][2], 300)
+
+
+    def test_getEmptyFile(self):
+        """
+        Downloading an empty file writes nothing.
+        """
+        self.remoteFile.data = b''
+        received = io.BytesIO()
+        d = self.client.get(b'file', received)
+        self.remoteFile.answerAll()
+        self.assertEqual(self.successResultOf(d).size, 0)
+        self.assertEqual(received.getvalue(), b'')
+
+
+    def test_getReadFails(self):
+        """
+        If a read fails, the download fails with the same failure once all
+        outstanding reads are answered, and the file is still closed.
+        """
+        d = self.client.get(b'file', io.BytesIO(), requests=2)
+        self.remoteFile.pending.pop(0)[0].errback(
+            filetransfer.SFTPError(filetransfer.FX_FAILURE, 'oops'))
+        self.assertNoResult(d)
+        self.remoteFile.answerAll()
+        self.failureResultOf(d, filetransfer.SFTPError)
+        self.assertEqual(len(self.remoteFile.requests), 2)
+        self.assertTrue(self.remoteFile.closed)
+
+
+    def test_getConsumer(self):
+        """
+        An L{IConsumer} is registered with a streaming producer which stops
+        reads and writes while it is paused.
+        """
+        consumer = StringTransport()
+        d = self.client.get(b'file', consumer, requests=2, chunkSize=1000,
+                            maximumChunkSize=1000)
+        self.assertTrue(consumer.streaming)
+        consumer.producer.pauseProducing()
+        self.remoteFile.answerAll()
+        self.assertEqual(consumer.value(), b'')
+        self.assertEqual(len(self.remoteFile.requests), 2)
+
+        consumer.producer.resumeProducing()
+        self.assertEqual(consumer.value(), self.remoteFile.data[:2000])
+        self.remoteFile.answerAll()
+        self.successResultOf(d)
+        self.assertEqual(consumer.value(), self.remoteFile.data)
+        self.assertIsNone(consumer.producer)
+
+
+    def test_getStopProducing(self):
+        """
+        The download fails if its consumer asks it to stop.
+        """
+        consumer = StringTransport()
+        d = self.client.get(b'file', consumer)
+        consumer.producer.stopProducing()
+        self.remoteFile.answerAll()
+        self.failureResultOf(d)
+        self.assertTrue(self.remoteFile.closed)
+
+
+    def test_put(self):
+        """
+        L{filetransfer.FileTransferClient.put} writes all of the source to
+        the file in chunks which grow while the writes succeed, with no more
+        than C{requests} outstanding, and closes it.
+        """
+        content = os.urandom(20000)
+        d = self.client.put(b'file', io.BytesIO(content), requests=2,
+                            chunkSize=1000, maximumChunkSize=4000)
+        self.remoteFile.data = b''
+        while self.remoteFile.pending:
+            self.assertTrue(len(self.remoteFile.pending) <= 2)
+            self.remoteFile.answerOne()
+        statistics = self.successResultOf(d)
+        self.assertEqual(self.remoteFile.data, content)
+        self.assertEqual(statistics.size, 20000)
+        self.assertEqual(
+            [length for kind, offset, length in self.remoteFile.requests[:5]],
+            [1000, 1000, 2000, 4000, 4000])
+        self.assertEqual(
+            self.opened,
+            [(b'file', filetransfer.FXF_WRITE | filetransfer.FXF_CREAT |
+              filetransfer.FXF_TRUNC)])
+        self.assertTrue(self.remoteFile.closed)
+
+
+    def test_putWriteFails(self):
+        """
+        If a write fails, the upload fails with the same failure and the file
+        is still closed.
+        """
+        d = self.client.put(b'file', io.BytesIO(b'x' * 10000), requests=2)
+        self.remoteFile.pending.pop(0)[0].errback(
+            filetransfer.SFTPError(filetransfer.FX_FAILURE, 'oops'))
+        self.remoteFile.answerAll()
+        self.failureResultOf(d, filetransfer.SFTPError)
+        self.assertTrue(self.remoteFile.closed)
+
+
+    def test_statistics(self):
+        """
+        L{filetransfer.TransferStatistics.rate} is the number of bytes
+        transferred per second, or L{None} when no time was measured.
+        """
+        statistics = filetransfer.TransferStatistics(1000, 0.5, 3)
+        self.assertEqual(statistics.rate, 2000)
+        self.assertEqual(
+            repr(statistics),
+            '<TransferStatistics size=1000 elapsed=0.500 requests=3>')
+        self.assertIsNone(filetransfer.TransferStatistics(0, 0, 1).rate)
@@ -4,11 +4,14 @@
 
 from twisted.conch.insults import helper
 from twisted.conch.insults.insults import G0, G1, G2, G3
+from twisted.conch.insults.insults import CS_DRAWING, ClientProtocol
 from twisted.conch.insults.insults import modes, privateModes
 from twisted.conch.insults.insults import (
     NORMAL, BOLD, UNDERLINE, BLINK, REVERSE_VIDEO)
 
-from twisted.python.compat import _PY3
+from twisted.internet.task import Clock
+from twisted.python.compat import _PY3, intToBytes
+from twisted.test.proto_helpers import StringTransport
 from twisted.trial import unittest
 
 WIDTH = 80
@@ -602,6 +605,313 @@ class ExpectTests(unittest.TestCase):
 
 
 
+class WriteRecorder(object):
+    """
+    A terminal which records what is written to it.
+    """
+    def __init__(self):
+        self.writes = []
+
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+
+class CursorPositionParser(ClientProtocol.ControlSequenceParser):
+    """
+    Parse cursor position control sequences, which
+    L{ClientProtocol.ControlSequenceParser} takes to be cursor home ones.
+    """
+    def H(self, proto, handler, buf):
+        if buf:
+            line, column = buf.split(b';')
+            handler.cursorPosition(int(column) - 1, int(line) - 1)
+        else:
+            handler.cursorHome()
+
+
+
+class CursorPositionClientProtocol(ClientProtocol):
+    controlSequenceParser = CursorPositionParser()
+
+
+
+class ScreenBufferTests(unittest.TestCase):
+    """
+    Tests for L{helper.ScreenBuffer}.
+    """
+    def setUp(self):
+        self.terminal = WriteRecorder()
+        self.clock = Clock()
+        self.screen = helper.ScreenBuffer(
+            self.terminal, WIDTH, HEIGHT, scheduler=self.clock)
+        self.emulator = helper.TerminalBuffer()
+        self.client = CursorPositionClientProtocol(lambda: self.emulator)
+        self.client.makeConnection(StringTransport())
+
+
+    def refresh(self):
+        """
+        Refresh the screen, and have the terminal emulator interpret what was
+        written.
+
+        @return: What was written.
+        """
+        del self.terminal.writes[:]
+        self.screen.refresh()
+        data = b''.join(self.terminal.writes)
+        self.client.dataReceived(data)
+        return data
+
+
+    def test_refresh(self):
+        """
+        L{helper.ScreenBuffer.refresh} makes the terminal show what was drawn,
+        leaving the cursor where it was drawn, in a single write.
+        """
+        self.screen.cursorPosition(2, 1)
+        self.screen.write(b'hello')
+        self.screen.cursorPosition(4, 3)
+        self.screen.write(b'world\nagain')
+        self.refresh()
+        self.assertEqual(len(self.terminal.writes), 1)
+        self.assertEqual(
+            self.emulator.__bytes__(),
+            b'\n  hello\n\n    world\nagain' + b'\n' * (HEIGHT - 5))
+        self.assertEqual(self.emulator.reportCursorPosition(), (5, 4))
+
+
+    def test_refreshUnchanged(self):
+        """
+        Nothing is written when nothing changed since the previous refresh,
+        even when the same characters were drawn again.
+        """
+        self.screen.write(b'hello')
+        self.refresh()
+        self.screen.cursorHome()
+        self.screen.write(b'hello')
+        self.assertEqual(self.refresh(), b'')
+        self.assertEqual(self.terminal.writes, [])
+
+
+    def test_refreshChanges(self):
+        """
+        Only the characters which changed are written, with the cursor moved
+        to them.
+        """
+        self.screen.write(b'hello world')
+        self.refresh()
+        self.screen.cursorHome()
+        self.screen.write(b'hello there')
+        self.assertEqual(self.refresh(), b'\x1b[5Dthere')
+        self.assertEqual(
+            self.emulator.__bytes__(), b'hello there' + b'\n' * (HEIGHT - 1))
+
+
+    def test_refreshSmallGap(self):
+        """
+        A few unchanged characters between changed ones are written again
+        rather than skipped over.
+        """
+        self.screen.write(b'abcdefgh')
+        self.refresh()
+        self.screen.cursorHome()
+        self.screen.write(b'Abcdefgh')
+        self.screen.cursorPosition(4, 0)
+        self.screen.write(b'E')
+        self.assertEqual(self.refresh(), b'\rAbcdE')
+
+
+    def test_refreshErasesBlankEnd(self):
+        """
+        When the end of a line became blank, it is erased rather than
+        overwritten with spaces.
+        """
+        self.screen.write(b'hello world')
+        self.refresh()
+        self.screen.eraseLine()
+        self.screen.cursorHome()
+        self.screen.write(b'hi')
+        self.assertEqual(self.refresh(), b'\x1b[10Di\x1b[K')
+        self.assertEqual(
+            self.emulator.__bytes__(), b'hi' + b'\n' * (HEIGHT - 1))
+
+
+    def test_graphicRendition(self):
+        """
+        The graphic rendition of each character is selected as it is written,
+        resetting it only when an attribute is turned off.
+        """
+        self.screen.write(b'a')
+        self.screen.selectGraphicRendition(str(BOLD))
+        self.screen.write(b'b')
+        self.screen.selectGraphicRendition(str(REVERSE_VIDEO), '34')
+        self.screen.write(b'c')
+        self.screen.selectGraphicRendition(str(NORMAL), str(UNDERLINE))
+        self.screen.write(b'd')
+        self.screen.selectGraphicRendition(str(NORMAL))
+        self.screen.write(b'e')
+        data = self.refresh()
+        self.assertIn(b'a\x1b[1mb\x1b[7;34mc\x1b[0;4md\x1b[0me', data)
+
+        for x, (ch, bold, underline, reverseVideo, foreground) in enumerate([
+                (b'a', False, False, False, helper.WHITE),
+                (b'b', True, False, False, helper.WHITE),
+                (b'c', True, False, True, helper.BLUE),
+                (b'd', False, True, False, helper.WHITE),
+                (b'e', False, False, False, helper.WHITE)]):
+            character, attributes = self.emulator.getCharacter(x, 0)
+            self.assertEqual(character, ch)
+            self.assertEqual(attributes.bold, bold)
+            self.assertEqual(attributes.underline, underline)
+            self.assertEqual(attributes.reverseVideo, reverseVideo)
+            self.assertEqual(attributes.foreground, foreground)
+
+
+    def test_writeNonASCII(self):
+        """
+        Each character written takes one cell and moves the cursor by one
+        column, however many bytes its UTF-8 encoding is, whether it is
+        written as text or as UTF-8.
+        """
+        self.refresh()
+        self.screen.write(u'caf\xe9 \u2603')
+        self.assertEqual(self.screen.x, 6)
+        self.screen.cursorPosition(WIDTH - 2, 1)
+        self.screen.write(u'\xe9\xe9\xe9'.encode('utf-8') + b'!')
+        self.assertEqual((self.screen.x, self.screen.y), (2, 2))
+        self.assertEqual(
+            self.refresh(),
+            b'caf\xc3\xa9 \xe2\x98\x83\x1b[2;' + intToBytes(WIDTH - 1) +
+            b'H\xc3\xa9\xc3\xa9\x1b[3;1H\xc3\xa9!')
+
+
+    def test_writeEscapeSequences(self):
+        """
+        The escape sequences which widgets write are interpreted, rather than
+        written as characters.
+        """
+        self.screen.write(b'\x1b[3;5Ha\x1b[1mb\x1b[0m\x1b(0q\x1b(B'
+                          b'\x1b[2D\x1b[1mc\x1b[0m\x1b[Kd\x1b[Aup\x1b[2Bdown')
+        self.refresh()
+        self.assertEqual(
+            self.emulator.__bytes__(),
+            b'\n       up\n    acd\n         down' + b'\n' * (HEIGHT - 4))
+        self.assertTrue(self.emulator.getCharacter(5, 2)[1].bold)
+        self.assertFalse(self.emulator.getCharacter(6, 2)[1].bold)
+
+
+    def test_restoreCursor(self):
+        """
+        L{helper.ScreenBuffer.restoreCursor} restores the graphic rendition
+        and character sets as well as the position of the cursor.
+        """
+        self.screen.cursorPosition(3, 2)
+        self.screen.saveCursor()
+        self.screen.selectGraphicRendition(str(REVERSE_VIDEO))
+        self.screen.selectCharacterSet(CS_DRAWING, G0)
+        self.screen.write(b'q')
+        self.screen.restoreCursor()
+        self.screen.cursorForward()
+        self.screen.write(b'q')
+        self.assertEqual(self.refresh(),
+                         b'\x1b[0m\x1b(B\x1b[2J'
+                         b'\x1b[3;4H\x1b(0\x1b[7mq\x1b(B\x1b[0mq')
+
+
+    def test_scroll(self):
+        """
+        Writing a line feed on the last line scrolls the screen up.
+        """
+        self.screen.write(b'\n'.join(
+            [str(i).encode('ascii') for i in range(HEIGHT + 1)]))
+        self.refresh()
+        self.assertEqual(
+            self.emulator.__bytes__(),
+            b'\n'.join([str(i).encode('ascii')
+                        for i in range(1, HEIGHT + 1)]))
+
+
+    def test_wrap(self):
+        """
+        Writing past the last column continues on the next line.
+        """
+        self.screen.cursorPosition(WIDTH - 2, 0)
+        self.screen.write(b'abcd')
+        self.refresh()
+        self.assertEqual(
+            self.emulator.__bytes__(),
+            b' ' * (WIDTH - 2) + b'ab\ncd' + b'\n' * (HEIGHT - 2))
+
+
+    def test_invalidate(self):
+        """
+        After L{helper.ScreenBuffer.invalidate}, the next refresh clears the
+        terminal and writes everything again.
+        """
+        self.screen.write(b'hello')
+        self.refresh()
+        self.screen.invalidate()
+        self.assertEqual(self.refresh(), b'\x1b[0m\x1b(B\x1b[2J\x1b[1;1Hhello')
+
+
+    def test_resize(self):
+        """
+        L{helper.ScreenBuffer.resize} clears the screen, and has the next
+        refresh clear the terminal.
+        """
+        self.screen.write(b'hello')
+        self.refresh()
+        self.screen.resize(40, 10)
+        self.screen.cursorHome()
+        self.screen.write(b'x' * 41)
+        self.assertEqual(
+            self.refresh(),
+            b'\x1b[0m\x1b(B\x1b[2J\x1b[1;1H' + b'x' * 40 + b'\x1b[2;1Hx')
+
+
+    def test_schedule(self):
+        """
+        L{helper.ScreenBuffer.schedule} calls the painters it was given and
+        refreshes the screen once, no sooner than C{minimumInterval} seconds
+        after the previous refresh.
+        """
+        self.screen.minimumInterval = 0.5
+        painted = []
+        def painter():
+            painted.append(None)
+            self.screen.write(b'x')
+        self.screen.schedule(painter)
+        self.screen.schedule(painter)
+        self.assertEqual(painted, [])
+        self.clock.advance(0)
+        self.assertEqual(len(painted), 2)
+        self.assertEqual(self.terminal.writes,
+                         [b'\x1b[0m\x1b(B\x1b[2J\x1b[1;1Hxx'])
+
+        self.clock.advance(0.2)
+        self.screen.schedule(painter)
+        self.clock.advance(0.2)
+        self.assertEqual(len(painted), 2)
+        self.clock.advance(0.1)
+        self.assertEqual(len(painted), 3)
+        self.assertEqual(self.terminal.writes[1:], [b'x'])
+
+
+    def test_cancel(self):
+        """
+        L{helper.ScreenBuffer.cancel} cancels the pending scheduled refresh.
+        """
+        painted = []
+        self.screen.schedule(lambda: painted.append(None))
+        self.screen.cancel()
+        self.clock.advance(1)
+        self.assertEqual(painted, [])
+        self.assertEqual(self.terminal.writes, [])
+
+
+
 class CharacterAttributeTests(unittest.TestCase):
     """
     Tests for L{twisted.conch.insults.helper.CharacterAttribute}.
@@ -730,6 +730,59 @@ class KnownHostsDatabaseTests(TestCase):
             True, hostsFile.hasHostKey(b"brandnew.example.com", key))
 
 
+    def test_entriesParsedOnce(self):
+        """
+        L{KnownHostsFile.iterentries} parses the file only once for as long as
+        it is not modified.
+        """
+        hostsFile = self.loadSampleHostsFile()
+        entries = list(hostsFile.iterentries())
+        self.assertEqual(len(entries), 6)
+        for entry, again in zip(entries, hostsFile.iterentries()):
+            self.assertIs(entry, again)
+
+
+    def test_hostMatchedOnce(self):
+        """
+        L{KnownHostsFile.hasHostKey} hashes a hostname for each hashed entry
+        only the first time it is looked up.
+        """
+        hashed = []
+        matchesHost = HashedEntry.matchesHost
+        def countingMatchesHost(entry, hostname):
+            hashed.append(hostname)
+            return matchesHost(entry, hostname)
+        self.patch(HashedEntry, "matchesHost", countingMatchesHost)
+
+        hostsFile = self.loadSampleHostsFile()
+        key = Key.fromString(sampleKey)
+        self.assertTrue(hostsFile.hasHostKey(b"www.twistedmatrix.com", key))
+        self.assertEqual(hashed, [b"www.twistedmatrix.com"])
+        self.assertTrue(hostsFile.hasHostKey(b"www.twistedmatrix.com", key))
+        self.assertFalse(hostsFile.hasHostKey(b"other.example.com", key))
+        self.assertFalse(hostsFile.hasHostKey(b"other.example.com", key))
+        self.assertEqual(
+            hashed, [b"www.twistedmatrix.com", b"other.example.com"])
+
+
+    def test_keyChangedInFile(self):
+        """
+        L{KnownHostsFile.hasHostKey} notices when the host key for a hostname
+        it has already looked up is changed in the file.
+        """
+        hostsFile = self.loadSampleHostsFile()
+        key = Key.fromString(sampleKey)
+        self.assertTrue(hostsFile.hasHostKey(b"www.twistedmatrix.com", key))
+        otherKey = Key.fromString(thirdSampleKey)
+        entry = PlainEntry([b"www.twistedmatrix.com"], otherKey.sshType(),
+                           otherKey, b"")
+        hostsFile.savePath.setContent(entry.toString() + b"\n")
+        self.assertTrue(
+            hostsFile.hasHostKey(b"www.twistedmatrix.com", otherKey))
+        self.assertRaises(HostKeyChanged, hostsFile.hasHostKey,
+                          b"www.twistedmatrix.com", key)
+
+
     def test_savedEntryHasKeyMismatch(self):
         """
         L{KnownHostsFile.hasHostKey} raises L{HostKeyChanged} if the host key is
@@ -910,6 +910,21 @@ class SSHFactoryTests(unittest.TestCase):
             b'diffie-hellman-group-exchange-sha256', p2.supportedKeyExchanges)
 
 
+    def test_buildProtocolThreadPool(self):
+        """
+        buildProtocol() gives the transport the factory's thread pool,
+        reactor and ephemeral key pool.
+        """
+        factory = self.makeSSHFactory()
+        factory.threadPool = object()
+        factory.reactor = object()
+        factory.ephemeralKeys = transport.EphemeralKeyPool(1)
+        protocol = factory.buildProtocol(None)
+        self.assertIs(protocol.threadPool, factory.threadPool)
+        self.assertIs(protocol.reactor, factory.reactor)
+        self.assertIs(protocol.ephemeralKeys, factory.ephemeralKeys)
+
+
 
 class MPTests(unittest.TestCase):
     """
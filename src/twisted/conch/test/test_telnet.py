@@ -153,6 +153,16 @@ class TelnetTransportTests(unittest.TestCase):
         self.assertEqual(h.data, b''.join(L).replace(b'\xff\xff', b'\xff'))
 
 
+    def test_writeSequence(self):
+        """
+        L{telnet.TelnetTransport.writeSequence} escapes I{IAC} and newlines in
+        the bytes it writes, as L{telnet.TelnetTransport.write} does.
+        """
+        self.t.clear()
+        self.p.writeSequence([b'one\n', b'two\xff', b'three'])
+        self.assertEqual(self.t.value(), b'one\r\ntwo\xff\xffthree')
+
+
     def _simpleCommandTest(self, cmdName):
         # Send a single simple telnet command and make sure
         # it gets noticed and the appropriate method gets
@@ -744,6 +754,20 @@ class TelnetTests(unittest.TestCase):
         self._deliver(b'def' + telnet.IAC, ('bytes', b'def'))
 
 
+    def test_manyApplicationDataBytes(self):
+        """
+        Application-data bytes are delivered together, along with the ones
+        following escaped I{IAC}s and newlines, until a command is received.
+        """
+        self._deliver(b'x' * 10000, ('bytes', b'x' * 10000))
+        self._deliver(
+            b'abc\r\ndef' + telnet.IAC + telnet.IAC + b'ghi\r\0jkl' +
+            telnet.IAC + telnet.NOP + b'mno',
+            ('bytes', b'abc\ndef' + telnet.IAC + b'ghi\rjkl'),
+            ('command', telnet.NOP, None),
+            ('bytes', b'mno'))
+
+
     def test_escapedControl(self):
         """
         IAC in the escaped state gets delivered and so does another
@@ -50,11 +50,14 @@ from twisted import __version__ as twisted_version
 from twisted.trial import unittest
 from twisted.internet import defer
 from twisted.protocols import loopback
+from twisted.internet.task import Clock
 from twisted.python import randbytes
 from twisted.python.randbytes import insecureRandom
-from twisted.python.compat import iterbytes, _bytesChr as chr
+from twisted.python.compat import iterbytes, intToBytes, _bytesChr as chr
 from twisted.conch.ssh import address, service, _kex
 from twisted.test import proto_helpers
+from twisted.test.proto_helpers import (
+    _ImmediateReactor, _ImmediateThreadPool, _QueueingThreadPool)
 
 from twisted.conch.error import ConchError
 
@@ -647,6 +650,72 @@ class BaseSSHTransportTests(BaseSSHTransportBaseCase, TransportTestCase):
         self.assertEqual(proto.getPacket(), b'ABCDEFG')
 
 
+    def _encryptedPackets(self, count):
+        """
+        Connect a L{MockTransportBase} which uses L{MockCipher} and has
+        received a version string, and have it send C{count} packets.
+
+        @return: A 3-tuple of the transport, the bytes it sent, and a list to
+            which each message it dispatches is appended.
+        """
+        proto = MockTransportBase()
+        proto.sendKexInit = lambda: None
+        proto.makeConnection(self.transport)
+        proto.dataReceived(b'SSH-2.0-BogoClient-1.2i\r\n')
+        proto.currentEncryptions = MockCipher()
+        messages = []
+        proto.dispatchMessage = lambda *message: messages.append(message)
+        self.transport.clear()
+        for i in range(count):
+            proto.sendPacket(ord('A'), intToBytes(i))
+        return proto, self.transport.value(), messages
+
+
+    def test_dataReceivedManyPackets(self):
+        """
+        All of the complete packets delivered by one call to
+        L{SSHTransportBase.dataReceived} are dispatched, in order, and only
+        the data which follows them is left in the buffer.
+        """
+        proto, value, messages = self._encryptedPackets(100)
+        proto.dataReceived(value + b'extra')
+        self.assertEqual(
+            messages, [(ord('A'), intToBytes(i)) for i in range(100)])
+        self.assertEqual(proto.buf, b'extra')
+
+
+    def test_dataReceivedPartialPackets(self):
+        """
+        Packets split across many calls to L{SSHTransportBase.dataReceived}
+        are reassembled and dispatched once they are complete.
+        """
+        proto, value, messages = self._encryptedPackets(3)
+        for byte in iterbytes(value):
+            proto.dataReceived(byte)
+        self.assertEqual(
+            messages, [(ord('A'), intToBytes(i)) for i in range(3)])
+        self.assertEqual(proto.buf, b'')
+
+
+    def test_dataReceivedDispatchError(self):
+        """
+        If dispatching a packet raises an exception, the packets which were
+        already dispatched are removed from the buffer and the rest are
+        dispatched when more data is received.
+        """
+        proto, value, messages = self._encryptedPackets(3)
+        def dispatchMessage(messageNum, payload):
+            messages.append(payload)
+            if payload == b'1':
+                raise RuntimeError("dispatch failed")
+        proto.dispatchMessage = dispatchMessage
+        self.assertRaises(RuntimeError, proto.dataReceived, value)
+        self.assertEqual(messages, [b'0', b'1'])
+        proto.dataReceived(b'')
+        self.assertEqual(messages, [b'0', b'1', b'2'])
+        self.assertEqual(proto.buf, b'')
+
+
     def test_ciphersAreValid(self):
         """
         Test that all the supportedCiphers are valid.
@@ -1460,13 +1529,19 @@ class ServerSSHTransportTests(ServerSSHTransportBaseCase, TransportTestCase):
         self.assertEqual(self.packets, [])
 
 
-    def assertKexDHInitResponse(self, kexAlgorithm):
+    def assertKexDHInitResponse(self, kexAlgorithm, threadPool=None, y=None):
         """
         Test that the KEXDH_INIT packet causes the server to send a
         KEXDH_REPLY with the server's public key and a signature.
 
         @param kexAlgorithm: The key exchange algorithm to use.
         @type kexAlgorithm: L{str}
+
+        @param threadPool: A L{_QueueingThreadPool} the server is expected to
+            compute the reply in, or L{None}.
+
+        @param y: The server's private key, if it is not the one generated
+            from the fake random bytes.
         """
         self.proto.supportedKeyExchanges = [kexAlgorithm]
         self.proto.supportedPublicKeys = [b'ssh-rsa']
@@ -1476,7 +1551,11 @@ class ServerSSHTransportTests(ServerSSHTransportBaseCase, TransportTestCase):
         e = pow(g, 5000, p)
 
         self.proto.ssh_KEX_DH_GEX_REQUEST_OLD(common.MP(e))
-        y = common.getMP(b'\x00\x00\x00\x40' + b'\x99' * 64)[0]
+        if threadPool is not None:
+            self.assertEqual(self.packets, [])
+            threadPool.runAll()
+        if y is None:
+            y = common.getMP(b'\x00\x00\x00\x40' + b'\x99' * 64)[0]
         f = common._MPpow(self.proto.g, y, self.proto.p)
         sharedSecret = common._MPpow(e, y, self.proto.p)
 
@@ -1544,6 +1623,52 @@ class ServerSSHTransportTests(ServerSSHTransportBaseCase, TransportTestCase):
         self.assertKexDHInitResponse(b'diffie-hellman-group14-sha1')
 
 
+    def test_KEXDH_INITInThreadPool(self):
+        """
+        If the server has a C{threadPool}, the reply to KEXDH_INIT is
+        computed in it, and sent once it has been.
+        """
+        self.proto.threadPool = _QueueingThreadPool()
+        self.proto.reactor = _ImmediateReactor()
+        self.assertKexDHInitResponse(b'diffie-hellman-group14-sha1',
+                                     self.proto.threadPool)
+
+
+    def test_KEXDH_INITEphemeralKeys(self):
+        """
+        If the server has C{ephemeralKeys}, the reply to KEXDH_INIT uses a
+        precomputed key pair from it.
+        """
+        g, p = _kex.getDHGeneratorAndPrime(b'diffie-hellman-group14-sha1')
+        threadPool = _QueueingThreadPool()
+        self.proto.ephemeralKeys = transport.EphemeralKeyPool(
+            1, threadPool, _ImmediateReactor())
+        self.proto.ephemeralKeys.take(
+            (g, p, 512), lambda: (7, common._MPpow(g, 7, p)))
+        threadPool.runAll()
+        self.assertKexDHInitResponse(b'diffie-hellman-group14-sha1', y=7)
+
+
+    def test_KEXDH_INITFailsInThreadPool(self):
+        """
+        If computing the reply to KEXDH_INIT in the thread pool fails, the
+        error is logged and the server disconnects.
+        """
+        self.proto.threadPool = _QueueingThreadPool()
+        self.proto.reactor = _ImmediateReactor()
+        self.proto.supportedKeyExchanges = [b'diffie-hellman-group14-sha1']
+        self.proto.supportedPublicKeys = [b'ssh-rsa']
+        self.proto.dataReceived(self.transport.value())
+        def sign(data):
+            raise RuntimeError("signing failed")
+        self.patch(self.proto.factory.privateKeys[b'ssh-rsa'], 'sign', sign)
+
+        self.proto.ssh_KEX_DH_GEX_REQUEST_OLD(common.MP(5))
+        self.proto.threadPool.runAll()
+        self.checkDisconnected(transport.DISCONNECT_KEY_EXCHANGE_FAILED)
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
     def test_keySetup(self):
         """
         Test that _keySetup sets up the next encryption keys.
@@ -1721,6 +1846,20 @@ class ServerSSHTransportDHGroupExchangeBaseCase(ServerSSHTransportBaseCase):
              (transport.MSG_NEWKEYS, b'')])
 
 
+    def test_KEX_DH_GEX_INITEphemeralKeys(self):
+        """
+        The server does not take key pairs from C{ephemeralKeys} for group
+        exchanges, whose primes differ from one connection to the next.
+        """
+        taken = []
+        class RecordingPool(object):
+            def take(self, group, generate):
+                taken.append(group)
+        self.proto.ephemeralKeys = RecordingPool()
+        self.test_KEX_DH_GEX_INIT_after_REQUEST()
+        self.assertEqual(taken, [])
+
+
     def test_KEX_DH_GEX_INIT_after_REQUEST(self):
         """
         Test that the KEX_DH_GEX_INIT message after the client sends
@@ -2556,6 +2695,28 @@ class TransportLoopbackTests(unittest.TestCase):
         return defer.DeferredList(deferreds, fireOnOneErrback=True)
 
 
+    def test_keyexchangesInThreadPool(self):
+        """
+        Like test_keyexchanges, with the server doing its share of each key
+        exchange in a thread pool, with precomputed ephemeral keys.
+        """
+        threadPool = _ImmediateThreadPool()
+        reactor = _ImmediateReactor()
+        ephemeralKeys = transport.EphemeralKeyPool(2, threadPool, reactor)
+        deferreds = []
+        for kexAlgorithm in transport.SSHTransportBase.supportedKeyExchanges:
+            for i in range(2):
+                def setKeyExchange(proto):
+                    proto.supportedKeyExchanges = [kexAlgorithm]
+                    if not proto.isClient:
+                        proto.threadPool = threadPool
+                        proto.reactor = reactor
+                        proto.ephemeralKeys = ephemeralKeys
+                    return proto
+                deferreds.append(self._runClientServer(setKeyExchange))
+        return defer.DeferredList(deferreds, fireOnOneErrback=True)
+
+
     def test_compressions(self):
         """
         Like test_ciphers, but for the various compressions.
@@ -2570,6 +2731,75 @@ class TransportLoopbackTests(unittest.TestCase):
 
 
 
+class EphemeralKeyPoolTests(unittest.TestCase):
+    """
+    Tests for L{transport.EphemeralKeyPool}.
+    """
+    if dependencySkip:
+        skip = dependencySkip
+
+    def setUp(self):
+        self.generated = []
+
+
+    def generate(self):
+        self.generated.append(len(self.generated))
+        return self.generated[-1]
+
+
+    def test_takeGeneratesInReactor(self):
+        """
+        L{transport.EphemeralKeyPool.take} returns L{None} when no key pair
+        is ready, and without a thread pool generates C{size} of them in the
+        reactor thread later, each of which is taken only once.
+        """
+        clock = Clock()
+        pool = transport.EphemeralKeyPool(2, reactor=clock)
+        self.assertIsNone(pool.take(b'group', self.generate))
+        self.assertEqual(self.generated, [])
+        clock.advance(0)
+        self.assertEqual(self.generated, [0, 1])
+
+        self.assertEqual(pool.take(b'group', self.generate), 1)
+        self.assertEqual(pool.take(b'group', self.generate), 0)
+        self.assertIsNone(pool.take(b'other', self.generate))
+        clock.advance(0)
+        self.assertEqual(self.generated, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(
+            sorted([pool.take(b'group', self.generate),
+                    pool.take(b'group', self.generate)]), [2, 3])
+
+
+    def test_takeGeneratesInThreadPool(self):
+        """
+        With a thread pool, L{transport.EphemeralKeyPool} generates key pairs
+        in it.
+        """
+        threadPool = _QueueingThreadPool()
+        pool = transport.EphemeralKeyPool(1, threadPool, _ImmediateReactor())
+        self.assertIsNone(pool.take(b'group', self.generate))
+        self.assertIsNone(pool.take(b'group', self.generate))
+        self.assertEqual(len(threadPool.calls), 1)
+        threadPool.runAll()
+        self.assertEqual(pool.take(b'group', self.generate), 0)
+
+
+    def test_generateFails(self):
+        """
+        If generating a key pair fails, the error is logged, and another is
+        generated when one is next taken.
+        """
+        threadPool = _QueueingThreadPool()
+        pool = transport.EphemeralKeyPool(1, threadPool, _ImmediateReactor())
+        pool.take(b'group', lambda: 1 // 0)
+        threadPool.runAll()
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        self.assertIsNone(pool.take(b'group', self.generate))
+        threadPool.runAll()
+        self.assertEqual(pool.take(b'group', self.generate), 0)
+
+
+
 class RandomNumberTests(unittest.TestCase):
     """
     Tests for the random number generator L{_getRandomNumber} and private
@@ -3,9 +3,16 @@
 Tests for the insults windowing module, L{twisted.conch.insults.window}.
 """
 
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
 from twisted.trial.unittest import TestCase
 
-from twisted.conch.insults.window import TopWindow, ScrolledArea, TextOutput
+from twisted.conch.insults.helper import ScreenBuffer, TerminalBuffer
+from twisted.conch.insults.insults import ServerProtocol
+from twisted.conch.insults.window import (
+    TopWindow, ScrolledArea, TextOutput, TextOutputArea, TextInput, Button,
+    Border, HBox, VBox, Selection)
+from twisted.conch.test.test_helper import CursorPositionClientProtocol
 
 
 class TopWindowTests(TestCase):
@@ -65,3 +72,84 @@ class ScrolledAreaTests(TestCase):
         scrolled = ScrolledArea(widget)
         self.assertIs(widget.parent, scrolled._viewport)
         self.assertIs(scrolled._viewport.parent, scrolled)
+
+
+
+class ScreenBufferTests(TestCase):
+    """
+    Tests for drawing widgets on a L{ScreenBuffer}.
+    """
+    def buildWindow(self, painter, scheduler):
+        window = TopWindow(painter, scheduler)
+        hbox = HBox()
+        textInput = TextInput(10, lambda text: None)
+        hbox.addChild(textInput)
+        hbox.addChild(Border(Button(b'Press', lambda: None)))
+        hbox.addChild(Border(Selection([b'one', b'two', b'three'],
+                                       lambda item: None, 3)))
+        output = TextOutputArea()
+        output.setText(b'hello\nworld')
+        vbox = VBox()
+        vbox.addChild(hbox)
+        vbox.addChild(Border(output))
+        window.addChild(vbox)
+        return window, textInput
+
+
+    def emulate(self, data):
+        emulator = TerminalBuffer()
+        client = CursorPositionClientProtocol(lambda: emulator)
+        client.makeConnection(StringTransport())
+        client.dataReceived(data)
+        return emulator
+
+
+    def characters(self, emulator):
+        """
+        Get the characters shown by a terminal emulator, without their
+        attributes, since L{TerminalBuffer} does not restore them along with
+        the cursor.
+        """
+        return [b''.join([ch if ch is not emulator.void else b' '
+                          for (ch, attributes) in line])
+                for line in emulator.lines]
+
+
+    def test_sameAsDrawnDirectly(self):
+        """
+        Widgets drawn on a L{ScreenBuffer} scheduled by a L{TopWindow} show
+        the same characters as when drawn directly on the terminal, and later
+        frames only write what changed.
+        """
+        transport = StringTransport()
+        terminal = ServerProtocol()
+        terminal.makeConnection(transport)
+        direct, directInput = self.buildWindow(lambda: None, lambda f: None)
+        direct.draw(80, 24, terminal)
+
+        bufferTransport = StringTransport()
+        bufferTerminal = ServerProtocol()
+        bufferTerminal.makeConnection(bufferTransport)
+        clock = Clock()
+        screen = ScreenBuffer(bufferTerminal, 80, 24, scheduler=clock)
+        buffered, bufferedInput = self.buildWindow(
+            lambda: buffered.draw(80, 24, screen), screen.schedule)
+        clock.advance(0)
+
+        self.assertEqual(
+            self.characters(self.emulate(bufferTransport.value())),
+            self.characters(self.emulate(transport.value())))
+
+        for widget in directInput, bufferedInput:
+            widget.keystrokeReceived(b'x', None)
+        direct.draw(80, 24, terminal)
+        clock.advance(0)
+        self.assertEqual(
+            self.characters(self.emulate(bufferTransport.value())),
+            self.characters(self.emulate(transport.value())))
+
+        before = len(bufferTransport.value())
+        bufferedInput.keystrokeReceived(b'y', None)
+        clock.advance(0)
+        self.assertEqual(bufferTransport.value()[before:],
+                         b'\x1b[11Dy\x1b[7m \x1b[9C')
@@ -6,10 +6,14 @@
 from __future__ import division, absolute_import
 
 import itertools
+import struct
+import time
 import warnings
 
+from collections import OrderedDict
 from constantly import Names, NamedConstant
 from hashlib import md5
+from weakref import WeakKeyDictionary
 
 from OpenSSL import SSL, crypto
 from OpenSSL._util import lib as pyOpenSSLlib
@@ -1109,6 +1113,231 @@ def _tolerateErrors(wrapped):
 
 
 
+class TLSHandshakeStatistics(object):
+    """
+    Counters of the TLS handshakes completed by some connections, for
+    verifying how often their sessions are resumed.
+
+    @ivar fullHandshakes: The number of handshakes which negotiated a new
+        session, authenticated by a certificate.
+    @type fullHandshakes: L{int}
+
+    @ivar resumedHandshakes: The number of handshakes which resumed a session
+        negotiated by an earlier connection.
+    @type resumedHandshakes: L{int}
+    """
+    def __init__(self):
+        self.fullHandshakes = 0
+        self.resumedHandshakes = 0
+
+
+    @property
+    def resumptionRate(self):
+        """
+        The fraction of handshakes which resumed a session, or L{None} if no
+        handshake has completed yet.
+        """
+        handshakes = self.fullHandshakes + self.resumedHandshakes
+        if not handshakes:
+            return None
+        return self.resumedHandshakes / handshakes
+
+
+    def __repr__(self):
+        return (
+            '<TLSHandshakeStatistics fullHandshakes={} '
+            'resumedHandshakes={}>'.format(
+                self.fullHandshakes, self.resumedHandshakes))
+
+
+
+# The info callbacks OpenSSLCertificateOptions installed on the contexts it
+# made, which ClientTLSOptions calls from the info callback it replaces them
+# with, since a context has only one.
+_contextInfoCallbacks = WeakKeyDictionary()
+
+
+
+class _HandshakeTracker(object):
+    """
+    Tell full TLS handshakes from resumed ones as an C{info_callback} reports
+    their progress, and count them.
+
+    pyOpenSSL does not expose C{SSL_session_reused}, so a handshake is
+    considered full if a certificate was sent or received during it, which
+    only happens when a session is not resumed.
+
+    @ivar statistics: The counters updated as handshakes complete.
+    @type statistics: L{TLSHandshakeStatistics}
+
+    @ivar _handshakes: Whether each connection with a handshake in progress
+        has exchanged a certificate so far.
+    @type _handshakes: L{WeakKeyDictionary} mapping L{OpenSSL.SSL.Connection}
+        to L{bool}
+    """
+    def __init__(self, statistics):
+        self.statistics = statistics
+        self._handshakes = WeakKeyDictionary()
+
+
+    def infoCallback(self, connection, where, ret=None):
+        """
+        Follow the progress of C{connection}'s handshake.  This has the
+        signature of an C{info_callback}, so it can be given to
+        L{OpenSSL.SSL.Context.set_info_callback} directly.
+
+        @param connection: The connection which is handshaking.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param where: Flags indicating progress through a TLS handshake.
+        @type where: L{int}
+
+        @param ret: ignored
+        """
+        if where & SSL.SSL_CB_HANDSHAKE_START:
+            self._handshakes[connection] = False
+        elif where & SSL.SSL_CB_LOOP:
+            if (self._handshakes.get(connection) is False and
+                    b"certificate" in connection.get_state_string()):
+                self._handshakes[connection] = True
+        elif where & SSL.SSL_CB_HANDSHAKE_DONE:
+            full = self._handshakes.pop(connection, None)
+            if full:
+                self.statistics.fullHandshakes += 1
+            elif full is not None:
+                self.statistics.resumedHandshakes += 1
+
+
+
+class ClientTLSSessionCache(object):
+    """
+    The TLS sessions most recently negotiated by clients, keyed by the
+    hostname they connected to, so that later connections to the same host
+    can resume them with an abbreviated handshake.
+
+    Pass one to L{optionsForClientTLS} as C{sessionCache} for each connection
+    which should store and resume sessions.  A session is only stored once the
+    server's certificate has been verified, but it is resumed without
+    verifying a certificate again, so only share a cache between connections
+    using the same C{trustRoot} and C{clientCertificate}.
+
+    @ivar maxSessions: The largest number of hosts whose sessions are kept.
+        The sessions used least recently are discarded first.
+    @type maxSessions: L{int}
+
+    @ivar statistics: Counters of the handshakes completed by connections
+        using this cache.
+    @type statistics: L{TLSHandshakeStatistics}
+
+    @ivar _sessions: The stored sessions, least recently used first.
+    @type _sessions: L{OrderedDict} mapping IDNA-encoded L{bytes} hostnames to
+        L{OpenSSL.SSL.Session}
+
+    @ivar _verified: The connections using this cache which have completed a
+        handshake and verified the server's certificate.
+    @type _verified: L{WeakKeyDictionary} mapping L{OpenSSL.SSL.Connection}
+        to L{bool}
+
+    @ivar _sessionID: The session ID context given to the contexts of the
+        connections using this cache.  OpenSSL refuses to resume a session
+        negotiated under a different one, and L{OpenSSLCertificateOptions}
+        gives each context its own.
+    @type _sessionID: L{bytes}
+    """
+    def __init__(self, maxSessions=1000):
+        """
+        @param maxSessions: See L{ClientTLSSessionCache.maxSessions}.
+        @type maxSessions: L{int}
+        """
+        self.maxSessions = maxSessions
+        name = "%s-%d" % (reflect.qual(self.__class__), _sessionCounter())
+        self._sessionID = md5(networkString(name)).hexdigest().encode("ascii")
+        self.statistics = TLSHandshakeStatistics()
+        self._tracker = _HandshakeTracker(self.statistics)
+        self._sessions = OrderedDict()
+        self._verified = WeakKeyDictionary()
+
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+    def clear(self):
+        """
+        Discard all stored sessions, so that the next connection to each host
+        performs a full handshake.
+        """
+        self._sessions.clear()
+
+
+    def _resume(self, connection, hostname):
+        """
+        Offer the session stored for C{hostname}, if there is one, in
+        C{connection}'s handshake.
+
+        @param connection: A client connection which has not handshaken yet.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param hostname: The IDNA-encoded host C{connection} is to.
+        @type hostname: L{bytes}
+        """
+        session = self._sessions.pop(hostname, None)
+        if session is not None:
+            self._sessions[hostname] = session
+            connection.set_session(session)
+
+
+    def _store(self, connection, hostname):
+        """
+        Store C{connection}'s session for C{hostname}, discarding the least
+        recently used session if there are more than C{maxSessions}.
+
+        @param connection: A client connection which has verified the server's
+            certificate.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param hostname: The IDNA-encoded host C{connection} is to.
+        @type hostname: L{bytes}
+        """
+        session = connection.get_session()
+        if session is None:
+            return
+        self._sessions.pop(hostname, None)
+        self._sessions[hostname] = session
+        while len(self._sessions) > self.maxSessions:
+            self._sessions.popitem(last=False)
+
+
+    def _infoCallback(self, connection, where, hostname, verified):
+        """
+        Count C{connection}'s handshake and store its session once it is
+        verified.
+
+        @param connection: The client connection which is handshaking.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param where: Flags indicating progress through a TLS handshake.
+        @type where: L{int}
+
+        @param hostname: The IDNA-encoded host C{connection} is to.
+        @type hostname: L{bytes}
+
+        @param verified: Whether the handshake has just completed with the
+            server's certificate verified.
+        @type verified: L{bool}
+        """
+        self._tracker.infoCallback(connection, where)
+        if verified:
+            self._verified[connection] = True
+            # TLS 1.3 servers only send a resumable session once the handshake
+            # is done; it is stored when it arrives, below.
+            if connection.get_protocol_version_name() != u"TLSv1.3":
+                self._store(connection, hostname)
+        elif where & SSL.SSL_CB_EXIT and connection in self._verified:
+            self._store(connection, hostname)
+
+
+
 @implementer(IOpenSSLClientConnectionCreator)
 class ClientTLSOptions(object):
     """
@@ -1136,9 +1365,13 @@ class ClientTLSOptions(object):
         than working with Python's built-in (but sometimes broken) IDNA
         encoding.  ASCII values, however, will always work.
     @type _hostnameASCII: L{unicode}
+
+    @ivar _sessionCache: The cache new connections resume sessions from and
+        store them in, or L{None} to not resume sessions.
+    @type _sessionCache: L{ClientTLSSessionCache} or L{None}
     """
 
-    def __init__(self, hostname, ctx):
+    def __init__(self, hostname, ctx, sessionCache=None):
         """
         Initialize L{ClientTLSOptions}.
 
@@ -1147,14 +1380,25 @@ class ClientTLSOptions(object):
 
         @param ctx: an L{OpenSSL.SSL.Context} to use for new connections.
         @type ctx: L{OpenSSL.SSL.Context}.
+
+        @param sessionCache: See L{ClientTLSOptions._sessionCache}.
+        @type sessionCache: L{ClientTLSSessionCache} or L{None}
         """
         self._ctx = ctx
         self._hostname = hostname
         self._hostnameBytes = _idnaBytes(hostname)
         self._hostnameASCII = self._hostnameBytes.decode("ascii")
-        ctx.set_info_callback(
-            _tolerateErrors(self._identityVerifyingInfoCallback)
-        )
+        self._sessionCache = sessionCache
+        if sessionCache is not None:
+            ctx.set_session_id(sessionCache._sessionID)
+        infoCallback = _tolerateErrors(self._identityVerifyingInfoCallback)
+        contextInfoCallback = _contextInfoCallbacks.get(ctx)
+        if contextInfoCallback is not None:
+            verifyingInfoCallback = infoCallback
+            def infoCallback(connection, where, ret):
+                contextInfoCallback(connection, where, ret)
+                verifyingInfoCallback(connection, where, ret)
+        ctx.set_info_callback(infoCallback)
 
 
     def clientConnectionForTLS(self, tlsProtocol):
@@ -1176,6 +1420,8 @@ class ClientTLSOptions(object):
         context = self._ctx
         connection = SSL.Connection(context, None)
         connection.set_app_data(tlsProtocol)
+        if self._sessionCache is not None:
+            self._sessionCache._resume(connection, self._hostnameBytes)
         return connection
 
 
@@ -1195,6 +1441,7 @@ class ClientTLSOptions(object):
         @param ret: ignored
         @type ret: ignored
         """
+        verified = False
         if where & SSL.SSL_CB_HANDSHAKE_START:
             connection.set_tlsext_host_name(self._hostnameBytes)
         elif where & SSL.SSL_CB_HANDSHAKE_DONE:
@@ -1204,6 +1451,11 @@ class ClientTLSOptions(object):
                 f = Failure()
                 transport = connection.get_app_data()
                 transport.failVerification(f)
+            else:
+                verified = True
+        if self._sessionCache is not None:
+            self._sessionCache._infoCallback(
+                connection, where, self._hostnameBytes, verified)
 
 
 
@@ -1255,6 +1507,13 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         interface.
     @type extraCertificateOptions: L{dict}
 
+    @param sessionCache: keyword-only argument; a cache to resume a session
+        with C{hostname} from, if it holds one, and to store the session
+        negotiated by each connection in once the server's certificate is
+        verified.  If unspecified, every connection performs a full
+        handshake.
+    @type sessionCache: L{ClientTLSSessionCache}
+
     @param kw: (Backwards compatibility hack to allow keyword-only arguments on
         Python 2. Please ignore; arbitrary keyword arguments will be errors.)
     @type kw: L{dict}
@@ -1263,6 +1522,7 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
     @rtype: L{IOpenSSLClientConnectionCreator}
     """
     extraCertificateOptions = kw.pop('extraCertificateOptions', None) or {}
+    sessionCache = kw.pop('sessionCache', None)
     if trustRoot is None:
         trustRoot = platformTrust()
     if kw:
@@ -1287,7 +1547,85 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         acceptableProtocols=acceptableProtocols,
         **extraCertificateOptions
     )
-    return ClientTLSOptions(hostname, certificateOptions.getContext())
+    return ClientTLSOptions(hostname, certificateOptions.getContext(),
+                            sessionCache)
+
+
+
+def _clientHelloTicketKeyName(clientHello):
+    """
+    Find the name of the key which encrypted the session ticket a client
+    offers in its C{ClientHello}.
+
+    OpenSSL begins each session ticket with the 16 byte name of the key it was
+    encrypted with, whether it is sent in a TLS 1.2 C{session_ticket}
+    extension or as a TLS 1.3 C{pre_shared_key} identity.
+
+    @param clientHello: The first bytes a client sent.
+    @type clientHello: L{bytes}
+
+    @return: The key name, or L{None} if C{clientHello} does not begin with a
+        complete C{ClientHello} record offering a ticket.
+    @rtype: L{bytes} or L{None}
+    """
+    try:
+        recordType, recordLength = struct.unpack_from("!B2xH", clientHello)
+        hello = clientHello[5:5 + recordLength]
+        if (recordType != 22 or len(hello) != recordLength or
+                hello[:1] != b"\x01"):
+            return None
+        # Skip the message type and length, the version and the random.
+        offset = 38
+        for lengthFormat in ["!B", "!H", "!B"]:
+            # The session ID, cipher suites and compression methods.
+            length, = struct.unpack_from(lengthFormat, hello, offset)
+            offset += struct.calcsize(lengthFormat) + length
+        extensionsLength, = struct.unpack_from("!H", hello, offset)
+        offset += 2
+        end = offset + extensionsLength
+        while offset < end:
+            extensionType, extensionLength = struct.unpack_from(
+                "!HH", hello, offset)
+            offset += 4
+            extension = hello[offset:offset + extensionLength]
+            offset += extensionLength
+            if extensionType == 35:
+                ticket = extension
+            elif extensionType == 41:
+                identityLength, = struct.unpack_from("!H", extension, 2)
+                ticket = extension[4:4 + identityLength]
+            else:
+                continue
+            if len(ticket) >= 16:
+                return ticket[:16]
+    except struct.error:
+        pass
+    return None
+
+
+
+def _resumesSession(context, clientHello):
+    """
+    Find out whether a server connection using C{context} resumes the session
+    offered in C{clientHello}, by processing it in a connection which is then
+    discarded.
+
+    @param context: The context a server connection would use.
+    @type context: L{OpenSSL.SSL.Context}
+
+    @param clientHello: The first bytes a client sent.
+    @type clientHello: L{bytes}
+
+    @rtype: L{bool}
+    """
+    connection = SSL.Connection(context, None)
+    connection.set_accept_state()
+    connection.bio_write(clientHello)
+    try:
+        connection.do_handshake()
+    except SSL.Error:
+        pass
+    return bool(pyOpenSSLlib.SSL_session_reused(connection._ssl))
 
 
 
@@ -1310,11 +1648,47 @@ class OpenSSLCertificateOptions(object):
         server support, vs an optimally secure one that excludes a large number
         of users. As of late 2016, TLSv1.0 is that safe default.
     @type _defaultMinimumTLSVersion: L{TLSVersion} constant
+
+    @ivar _contextExpires: When, in seconds since the epoch, the current
+        context is replaced by L{getContext} if C{sessionTicketKeyLifetime} is
+        set.
+    @type _contextExpires: L{float}
+
+    @ivar _previousContext: The context L{getContext} replaced last, which
+        server connections still resume the sessions of for
+        C{sessionTicketKeyLifetime} seconds, or L{None}.
+    @type _previousContext: L{OpenSSL.SSL.Context}
+
+    @ivar _previousContextExpires: When, in seconds since the epoch,
+        C{_previousContext} stops being used.
+    @type _previousContextExpires: L{float}
+
+    @ivar _previousTicketKeyName: The name of C{_previousContext}'s session
+        ticket key once a connection resumed a session with it, or L{None}.
+    @type _previousTicketKeyName: L{bytes}
+
+    @ivar _otherTicketKeyNames: The names of session ticket keys found not to
+        be C{_previousContext}'s.
+    @type _otherTicketKeyNames: L{set} of L{bytes}
+
+    @ivar _maxTicketKeyProbes: How many session ticket key names offered to a
+        server are tried with C{_previousContext} before giving up on finding
+        its key, so that clients offering bogus tickets cannot make every
+        handshake cost twice as much.
+    @type _maxTicketKeyProbes: L{int}
     """
 
     # Factory for creating contexts.  Configurable for testability.
     _contextFactory = SSL.Context
     _context = None
+    _contextExpires = None
+    _previousContext = None
+    _previousContextExpires = None
+    _previousTicketKeyName = None
+    _maxTicketKeyProbes = 16
+
+    # Source of the current time.  Configurable for testability.
+    _now = staticmethod(time.time)
 
     _OP_NO_TLSv1_3 = _tlsDisableFlags[TLSVersion.TLSv1_3]
 
@@ -1350,6 +1724,9 @@ class OpenSSLCertificateOptions(object):
                  raiseMinimumTo=None,
                  insecurelyLowerMinimumTo=None,
                  lowerMaximumSecurityTo=None,
+                 sessionTimeout=None,
+                 sessionTicketKeyLifetime=None,
+                 handshakeStatistics=None,
                  ):
         """
         Create an OpenSSL context SSL connection context factory.
@@ -1479,6 +1856,28 @@ class OpenSSLCertificateOptions(object):
             unless you are absolutely sure this is what you want.
         @type lowerMaximumSecurityTo: L{TLSVersion} constant
 
+        @param sessionTimeout: The number of seconds for which a session may
+            be resumed after it was negotiated, or L{None} to use OpenSSL's
+            default of 300 seconds.
+        @type sessionTimeout: L{int}
+
+        @param sessionTicketKeyLifetime: The number of seconds after which
+            L{getContext} creates a new context if C{enableSessionTickets} is
+            set, or L{None} to keep using the first one.  Each context
+            encrypts session tickets with its own randomly generated keys and
+            caches sessions by itself, so this rotates the keys and starts a
+            fresh session cache.  Server connections offered a session ticket
+            encrypted by the context created before still resume it with that
+            context for another C{sessionTicketKeyLifetime} seconds; older
+            sessions cannot be resumed.
+        @type sessionTicketKeyLifetime: L{int} or L{float}
+
+        @param handshakeStatistics: Counters to add the handshakes completed
+            by connections using contexts created by this object to, or
+            L{None} to not count them.  Pass the same counters to several
+            objects to get their totals.
+        @type handshakeStatistics: L{TLSHandshakeStatistics}
+
         @raise ValueError: when C{privateKey} or C{certificate} are set without
             setting the respective other.
         @raise ValueError: when C{verify} is L{True} but C{caCerts} doesn't
@@ -1627,14 +2026,18 @@ class OpenSSLCertificateOptions(object):
             )
 
         self._acceptableProtocols = acceptableProtocols
+        self.sessionTimeout = sessionTimeout
+        self.sessionTicketKeyLifetime = sessionTicketKeyLifetime
+        self.handshakeStatistics = handshakeStatistics
 
 
     def __getstate__(self):
         d = self.__dict__.copy()
-        try:
-            del d['_context']
-        except KeyError:
-            pass
+        for name in ['_context', '_previousContext']:
+            try:
+                del d[name]
+            except KeyError:
+                pass
         return d
 
 
@@ -1645,12 +2048,67 @@ class OpenSSLCertificateOptions(object):
     def getContext(self):
         """
         Return an L{OpenSSL.SSL.Context} object.
+
+        If C{sessionTicketKeyLifetime} was given and C{enableSessionTickets}
+        is set, a new context replaces the one returned before once it is that
+        many seconds old.  The replaced context is kept for
+        L{_contextForClientHello} for as long again.
         """
-        if self._context is None:
-            self._context = self._makeContext()
+        lifetime = self.sessionTicketKeyLifetime
+        if lifetime is None or not self.enableSessionTickets:
+            if self._context is None:
+                self._context = self._makeContext()
+        else:
+            now = self._now()
+            if self._context is None or now >= self._contextExpires:
+                if self._context is not None:
+                    self._previousContext = self._context
+                    self._previousContextExpires = (
+                        self._contextExpires + lifetime)
+                    self._previousTicketKeyName = None
+                    self._otherTicketKeyNames = set()
+                self._context = self._makeContext()
+                self._contextExpires = now + lifetime
         return self._context
 
 
+    def _contextForClientHello(self, clientHello):
+        """
+        Choose the context for a server connection which received
+        C{clientHello}: the context L{getContext} replaced last if the
+        session ticket offered was encrypted with its key and that context is
+        not too old yet.
+
+        Which key that is only becomes known once a session was resumed with
+        it, so until then each new key name offered is tried by processing
+        C{clientHello} with the previous context, up to
+        C{_maxTicketKeyProbes} of them.
+
+        @param clientHello: The first bytes a client sent.
+        @type clientHello: L{bytes}
+
+        @return: The previous context, or L{None} to keep using the one
+            L{getContext} returned.
+        @rtype: L{OpenSSL.SSL.Context} or L{None}
+        """
+        previous = self._previousContext
+        if previous is None or self._now() >= self._previousContextExpires:
+            return None
+        keyName = _clientHelloTicketKeyName(clientHello)
+        if keyName is None or keyName in self._otherTicketKeyNames:
+            return None
+        if self._previousTicketKeyName is None:
+            if len(self._otherTicketKeyNames) >= self._maxTicketKeyProbes:
+                return None
+            if not _resumesSession(previous, clientHello):
+                self._otherTicketKeyNames.add(keyName)
+                return None
+            self._previousTicketKeyName = keyName
+        elif keyName != self._previousTicketKeyName:
+            return None
+        return previous
+
+
     def _makeContext(self):
         ctx = self._contextFactory(self.method)
         ctx.set_options(self._options)
@@ -1688,6 +2146,15 @@ class OpenSSLCertificateOptions(object):
 
             ctx.set_session_id(sessionName.encode('ascii'))
 
+        if self.sessionTimeout is not None:
+            ctx.set_timeout(self.sessionTimeout)
+
+        if self.handshakeStatistics is not None:
+            infoCallback = _HandshakeTracker(
+                self.handshakeStatistics).infoCallback
+            ctx.set_info_callback(infoCallback)
+            _contextInfoCallbacks[ctx] = infoCallback
+
         if self.dhParameters:
             ctx.load_tmp_dh(self.dhParameters._dhFile.path)
         ctx.set_cipher_list(self._cipherString.encode('ascii'))
@@ -238,6 +238,7 @@ from twisted.internet._sslverify import (
     protocolNegotiationMechanisms,
     trustRootFromCertificates,
     TLSVersion,
+    ClientTLSSessionCache, TLSHandshakeStatistics,
 )
 
 __all__ = [
@@ -252,4 +253,5 @@ __all__ = [
     'VerificationError', 'optionsForClientTLS',
     'ProtocolNegotiationSupport', 'protocolNegotiationMechanisms',
     'trustRootFromCertificates',
+    'ClientTLSSessionCache', 'TLSHandshakeStatistics',
 ]
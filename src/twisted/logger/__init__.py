@@ -64,6 +64,7 @@ __all__ = [
 
     # From ._file
     "FileLogObserver", "textFileLogObserver",
+    "ThreadedFileLogObserver", "QueueOverflowPolicy",
 
     # From ._filter
     "PredicateResult", "ILogFilterPredicate",
@@ -83,7 +84,7 @@ __all__ = [
 
     # From ._json
     "eventAsJSON", "eventFromJSON",
-    "jsonFileLogObserver", "eventsFromJSONLogFile",
+    "jsonFileLogObserver", "eventsFromJSONLogFile", "IndexedJSONLogFile",
 ]
 
 from ._levels import InvalidLogLevelError, LogLevel
@@ -100,7 +101,10 @@ from ._observer import ILogObserver, LogPublisher
 
 from ._buffer import LimitedHistoryLogObserver
 
-from ._file import FileLogObserver, textFileLogObserver
+from ._file import (
+    FileLogObserver, textFileLogObserver,
+    ThreadedFileLogObserver, QueueOverflowPolicy,
+)
 
 from ._filter import (
     PredicateResult, ILogFilterPredicate, FilteringLogObserver,
@@ -119,5 +123,5 @@ from ._global import (
 
 from ._json import (
     eventAsJSON, eventFromJSON,
-    jsonFileLogObserver, eventsFromJSONLogFile
+    jsonFileLogObserver, eventsFromJSONLogFile, IndexedJSONLogFile,
 )
@@ -6,8 +6,17 @@
 File log observer.
 """
 
+import threading
+
+try:
+    from Queue import Queue, Full, Empty
+except ImportError:
+    from queue import Queue, Full, Empty
+
 from zope.interface import implementer
 
+from constantly import NamedConstant, Names
+
 from twisted.python.compat import ioType, unicode
 from ._observer import ILogObserver
 from ._format import formatTime
@@ -61,6 +70,222 @@ class FileLogObserver(object):
 
 
 
+class QueueOverflowPolicy(Names):
+    """
+    What a L{ThreadedFileLogObserver} does with an event when its queue of
+    records waiting to be written is full.
+
+    @cvar block: Wait for the writer thread to make room in the queue.  No
+        events are lost, but a slow file slows down whichever thread logs.
+
+    @cvar drop: Discard the event and count it in
+        L{ThreadedFileLogObserver.dropped}.  Logging never waits for the file.
+    """
+    block = NamedConstant()
+    drop = NamedConstant()
+
+
+
+class ThreadedFileLogObserver(FileLogObserver):
+    """
+    Log observer that writes to a file-like object from a dedicated thread, so
+    that a slow file does not hold up the threads logging to it, such as the
+    reactor thread.
+
+    Events are formatted by the thread which logs them, then queued for the
+    writer thread.  Each time the writer thread wakes up, it writes all of the
+    records queued since, up to C{batchSize} of them, and flushes the file
+    once.
+
+    For example, to write classic log text or JSON::
+
+        observer = ThreadedFileLogObserver(
+            outFile, formatEventAsClassicLogText, reactor=reactor)
+        observer = ThreadedFileLogObserver(
+            outFile, lambda event: u"\x1e" + eventAsJSON(event) + u"\n")
+
+    Once stopped, with L{stop}, events are written directly to the file, as by
+    L{FileLogObserver}.
+
+    @ivar dropped: The number of events discarded because the queue was full,
+        or the file could not be written to.
+    @type dropped: L{int}
+
+    @ivar _queue: Records waiting to be written, followed by L{None} once
+        L{stop} has been called.
+    @type _queue: L{Queue}
+
+    @ivar _thread: The writer thread, or L{None} until the first event.
+    @type _thread: L{threading.Thread}
+
+    @ivar _stopped: C{True} once L{stop} has stopped the writer thread, so
+        that events can be written directly to the file.
+
+    @ivar _lock: Held while starting the writer thread, queueing a record or
+        stopping, so that no record is queued after L{stop} queues L{None},
+        and none is written directly to the file before the writer thread
+        has written the queued ones.
+    @type _lock: L{threading.Lock}
+
+    @ivar _droppedLock: Held while updating C{dropped}.  The writer thread
+        takes it rather than C{_lock}, which may be held by a thread waiting
+        for room in the queue.
+    @type _droppedLock: L{threading.Lock}
+    """
+    _thread = None
+    _stopped = False
+
+    def __init__(self, outFile, formatEvent, maxQueueSize=10000,
+                 overflow=QueueOverflowPolicy.block, batchSize=1000,
+                 reactor=None):
+        """
+        @param outFile: A file-like object.  Ideally one should be passed which
+            accepts L{unicode} data.  Otherwise, UTF-8 L{bytes} will be used.
+            Once given to this observer, it must not be written to by anything
+            else until the observer has been stopped.
+        @type outFile: L{io.IOBase}
+
+        @param formatEvent: A callable that formats an event.
+        @type formatEvent: L{callable} that takes an C{event} argument and
+            returns a formatted event as L{unicode}.
+
+        @param maxQueueSize: The largest number of records to queue for the
+            writer thread.
+        @type maxQueueSize: L{int}
+
+        @param overflow: What to do with an event when the queue is full.
+        @type overflow: L{QueueOverflowPolicy}
+
+        @param batchSize: The largest number of records to write to the file
+            at once.
+        @type batchSize: L{int}
+
+        @param reactor: If not L{None}, a reactor whose shutdown stops this
+            observer, so that every event logged before then is written.
+        @type reactor: L{IReactorCore} provider
+        """
+        FileLogObserver.__init__(self, outFile, formatEvent)
+        self._queue = Queue(maxQueueSize)
+        self._overflow = overflow
+        self._batchSize = batchSize
+        self._lock = threading.Lock()
+        self._droppedLock = threading.Lock()
+        self.dropped = 0
+        if reactor is not None:
+            reactor.addSystemEventTrigger("after", "shutdown", self.stop)
+
+
+    def _startThread(self, target):
+        """
+        Start the writer thread.
+
+        @param target: The function to run on the thread.
+        """
+        self._thread = threading.Thread(
+            target=target, name="twisted.logger file writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def __call__(self, event):
+        """
+        Format an event and queue it to be written to the file.
+
+        @param event: An event.
+        @type event: L{dict}
+        """
+        if self._stopped:
+            FileLogObserver.__call__(self, event)
+            return
+
+        text = self.formatEvent(event)
+        if not text:
+            return
+        if self._encoding is not None:
+            text = text.encode(self._encoding)
+
+        with self._lock:
+            if self._stopped:
+                self._outFile.write(text)
+                self._outFile.flush()
+                return
+            if self._thread is None:
+                self._startThread(self._writeRecords)
+
+            if self._overflow is QueueOverflowPolicy.drop:
+                try:
+                    self._queue.put_nowait(text)
+                except Full:
+                    self._drop(1)
+            else:
+                self._queue.put(text)
+
+
+    def _drop(self, count):
+        """
+        Count records as dropped.
+
+        @param count: The number of records dropped.
+        @type count: L{int}
+        """
+        with self._droppedLock:
+            self.dropped += count
+
+
+    def _writeRecords(self):
+        """
+        Write queued records to the file in batches, until L{stop} is called.
+        """
+        queue = self._queue
+        while True:
+            record = queue.get()
+            if record is None:
+                break
+            batch = [record]
+            while len(batch) < self._batchSize:
+                try:
+                    record = queue.get_nowait()
+                except Empty:
+                    break
+                if record is None:
+                    self._writeBatch(batch)
+                    return
+                batch.append(record)
+            self._writeBatch(batch)
+
+
+    def _writeBatch(self, batch):
+        """
+        Write a batch of records to the file and flush it.
+
+        Records which cannot be written are counted in C{dropped}; there is
+        nowhere to log the error to.
+
+        @param batch: The records to write.
+        @type batch: L{list} of L{unicode} or L{bytes}
+        """
+        try:
+            self._outFile.write(batch[0][:0].join(batch))
+            self._outFile.flush()
+        except Exception:
+            self._drop(len(batch))
+
+
+    def stop(self):
+        """
+        Wait for every queued record to be written, and stop the writer
+        thread.  Events observed from now on are written directly to the file.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+            self._stopped = True
+
+
+
 def textFileLogObserver(outFile, timeFormat=timeFormatRFC3339):
     """
     Create a L{FileLogObserver} that emits text to a specified (writable)
@@ -13,7 +13,7 @@ from zope.interface import Interface, implementer
 from constantly import NamedConstant, Names
 
 from ._levels import InvalidLogLevelError, LogLevel
-from ._observer import ILogObserver
+from ._observer import ILogObserver, _changeLevels, _minimumLevelFor
 
 
 
@@ -93,6 +93,17 @@ def shouldLogEvent(predicates, event):
 
 
 
+def _ignoreEvent(event):
+    """
+    Do nothing with an event; the default negative observer of
+    L{FilteringLogObserver}.
+
+    @param event: An event.
+    @type event: L{dict}
+    """
+
+
+
 @implementer(ILogObserver)
 class FilteringLogObserver(object):
     """
@@ -102,7 +113,7 @@ class FilteringLogObserver(object):
 
     def __init__(
         self, observer, predicates,
-        negativeObserver=lambda event: None
+        negativeObserver=_ignoreEvent
     ):
         """
         @param observer: An observer to which this observer will forward
@@ -118,7 +129,8 @@ class FilteringLogObserver(object):
         @type negativeObserver: L{ILogObserver}
         """
         self._observer = observer
-        self._shouldLogEvent = partial(shouldLogEvent, list(predicates))
+        self._predicates = list(predicates)
+        self._shouldLogEvent = partial(shouldLogEvent, self._predicates)
         self._negativeObserver = negativeObserver
 
 
@@ -134,6 +146,37 @@ class FilteringLogObserver(object):
             self._negativeObserver(event)
 
 
+    def _minimumLevelFor(self, namespace):
+        """
+        Determine the lowest level of event from a namespace which this
+        observer might forward.
+
+        Only the leading predicates which filter on level are considered,
+        since any other predicate may accept an event outright.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The lowest level of event which is not certain to be dropped,
+            or L{None} if events of any level might be forwarded to an
+            observer which might not drop them.
+        @rtype: L{LogLevel} or L{None}
+        """
+        if self._negativeObserver is not _ignoreEvent:
+            return None
+        minimumLevel = _minimumLevelFor(self._observer, namespace)
+        for predicate in self._predicates:
+            minimumLevelFor = getattr(predicate, "_minimumLevelFor", None)
+            if minimumLevelFor is None:
+                break
+            level = minimumLevelFor(namespace)
+            if (minimumLevel is None or
+                    LogLevel._priorityForLevel(level) >
+                    LogLevel._priorityForLevel(minimumLevel)):
+                minimumLevel = level
+        return minimumLevel
+
+
 
 @implementer(ILogFilterPredicate)
 class LogLevelFilterPredicate(object):
@@ -205,6 +248,7 @@ class LogLevelFilterPredicate(object):
             self._logLevelsByNamespace[namespace] = level
         else:
             self._logLevelsByNamespace[None] = level
+        _changeLevels()
 
 
     def clearLogLevels(self):
@@ -213,6 +257,21 @@ class LogLevelFilterPredicate(object):
         """
         self._logLevelsByNamespace.clear()
         self._logLevelsByNamespace[None] = self.defaultLogLevel
+        _changeLevels()
+
+
+    def _minimumLevelFor(self, namespace):
+        """
+        Determine the lowest level of event from a namespace which this
+        predicate does not reject.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The log level for C{namespace}.
+        @rtype: L{LogLevel}
+        """
+        return self.logLevelForNamespace(namespace)
 
 
     def __call__(self, event):
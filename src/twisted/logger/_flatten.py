@@ -64,27 +64,33 @@ class KeyFlattener(object):
 
 
 
-def flattenEvent(event):
+def _fieldsForFormat(format):
     """
-    Flatten the given event by pre-associating format fields with specific
-    objects and callable results in a L{dict} put into the C{"log_flattened"}
-    key in the event.
+    Describe how L{flattenEvent} flattens each field of a format string.
 
-    @param event: A logging event.
-    @type event: L{dict}
-    """
-    if event.get("log_format", None) is None:
-        return
+    The description depends only on the format string, so it is computed
+    once per format and cached.
 
-    if "log_flattened" in event:
-        fields = event["log_flattened"]
-    else:
-        fields = {}
+    @param format: A PEP-3101 format string.
+    @type format: L{unicode}
+
+    @return: A L{tuple} for each field of C{format}, of the key of its
+        flattened value, the key of its structured value, the name used to
+        look it up in the event or L{None} if it can only be looked up with
+        L{Formatter.get_field}, the field name to use for that, whether it is
+        to be called, and the function converting its value to text.
+    @rtype: L{list} of L{tuple}
+    """
+    try:
+        return _formatFields[format]
+    except (KeyError, TypeError):
+        pass
 
     keyFlattener = KeyFlattener()
+    fields = []
 
     for (literalText, fieldName, formatSpec, conversion) in (
-        aFormatter.parse(event["log_format"])
+        aFormatter.parse(format)
     ):
         if fieldName is None:
             continue
@@ -95,24 +101,64 @@ def flattenEvent(event):
         flattenedKey = keyFlattener.flatKey(fieldName, formatSpec, conversion)
         structuredKey = keyFlattener.flatKey(fieldName, formatSpec, "")
 
-        if flattenedKey in fields:
-            # We've already seen and handled this key
-            continue
-
         if fieldName.endswith(u"()"):
             fieldName = fieldName[:-2]
             callit = True
         else:
             callit = False
 
-        field = aFormatter.get_field(fieldName, (), event)
-        fieldValue = field[0]
+        if ("." in fieldName or "[" in fieldName or
+                not fieldName or fieldName.isdigit()):
+            key = None
+        else:
+            key = fieldName
 
         if conversion == "r":
             conversionFunction = repr
         else:  # Above: if conversion is not "r", it's "s"
             conversionFunction = unicode
 
+        fields.append((flattenedKey, structuredKey, key, fieldName, callit,
+                       conversionFunction))
+
+    if len(_formatFields) >= _maxCachedFormats:
+        _formatFields.clear()
+    _formatFields[format] = fields
+    return fields
+
+_formatFields = {}
+_maxCachedFormats = 1000
+
+
+
+def flattenEvent(event):
+    """
+    Flatten the given event by pre-associating format fields with specific
+    objects and callable results in a L{dict} put into the C{"log_flattened"}
+    key in the event.
+
+    @param event: A logging event.
+    @type event: L{dict}
+    """
+    if event.get("log_format", None) is None:
+        return
+
+    if "log_flattened" in event:
+        fields = event["log_flattened"]
+    else:
+        fields = {}
+
+    for (flattenedKey, structuredKey, key, fieldName, callit,
+         conversionFunction) in _fieldsForFormat(event["log_format"]):
+        if flattenedKey in fields:
+            # We've already seen and handled this key
+            continue
+
+        if key is not None:
+            fieldValue = event[key]
+        else:
+            fieldValue = aFormatter.get_field(fieldName, (), event)[0]
+
         if callit:
             fieldValue = fieldValue()
 
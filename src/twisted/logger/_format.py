@@ -8,7 +8,7 @@ Tools for formatting logging events.
 
 from datetime import datetime as DateTime
 
-from twisted.python.compat import unicode
+from twisted.python.compat import _PY3, unicode
 from twisted.python.failure import Failure
 from twisted.python.reflect import safe_repr
 from twisted.python._tzhelper import FixedOffsetTimeZone
@@ -284,6 +284,10 @@ def formatWithCall(formatString, mapping):
     @return: The string with formatted values interpolated.
     @rtype: L{unicode}
     """
+    if _PY3:
+        # str.format_map looks fields up in the mapping directly, including
+        # those ending in "()", at a fraction of the cost of string.Formatter.
+        return formatString.format_map(CallMapping(mapping))
     return unicode(
         aFormatter.vformat(formatString, (), CallMapping(mapping))
     )
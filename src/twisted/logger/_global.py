@@ -72,6 +72,21 @@ class LogBeginner(object):
         L{sys} module) which will be replaced when redirecting standard I/O.
     @type _stdio: L{object}
 
+    @ivar levels: The lowest level of event from each namespace which is
+        published by the L{LogPublisher} associated with this L{LogBeginner}.
+        By default, events of every level are.  Events below the level for
+        their namespace are not only dropped by that publisher, but are not
+        even constructed by a L{Logger} which emits to it, so that raising the
+        level for a namespace makes the L{Logger.debug} calls in it nearly
+        free.  For example, to drop debug events from all namespaces except
+        C{"myapp.db"}::
+
+            globalLogBeginner.levels.setLogLevelForNamespace(
+                None, LogLevel.info)
+            globalLogBeginner.levels.setLogLevelForNamespace(
+                "myapp.db", LogLevel.debug)
+    @type levels: L{LogLevelFilterPredicate}
+
     @cvar _DEFAULT_BUFFER_SIZE: The default size for the initial log events
         buffer.
     @type _DEFAULT_BUFFER_SIZE: L{int}
@@ -95,6 +110,8 @@ class LogBeginner(object):
             initialBufferSize = self._DEFAULT_BUFFER_SIZE
         self._initialBuffer = LimitedHistoryLogObserver(size=initialBufferSize)
         self._publisher = publisher
+        self.levels = LogLevelFilterPredicate(defaultLogLevel=LogLevel.debug)
+        publisher._levels = self.levels
         self._log = Logger(observer=publisher)
         self._stdio = stdio
         self._warningsModule = warningsModule
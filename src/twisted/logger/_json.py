@@ -6,10 +6,12 @@
 Tools for saving and loading log events in a structured format.
 """
 
+import os
 import types
 
 from constantly import NamedConstant
-from json import dumps, loads
+from hashlib import sha256
+from json import JSONEncoder, loads
 from uuid import UUID
 
 from ._flatten import flattenEvent
@@ -124,6 +126,10 @@ uuidToLoader = dict([
     (uuid, loader) for (predicate, uuid, saver, loader) in classInfo
 ])
 
+_uuidText = dict([
+    (uuid, str(uuid)) for (predicate, uuid, saver, loader) in classInfo
+])
+
 
 
 def objectLoadHook(aDict):
@@ -162,12 +168,43 @@ def objectSaveHook(pythonObject):
     for (predicate, uuid, saver, loader) in classInfo:
         if predicate(pythonObject):
             result = saver(pythonObject)
-            result["__class_uuid__"] = str(uuid)
+            result["__class_uuid__"] = _uuidText[uuid]
             return result
     return {"unpersistable": True}
 
 
 
+# The serialized forms of objects which appear in nearly every event, so that
+# they need not be computed again for each one.
+_levelsAsJSON = dict([
+    (level, objectSaveHook(level)) for level in LogLevel.iterconstants()
+])
+_unpersistable = objectSaveHook(object())
+
+
+
+def _saveHook(unencodable):
+    """
+    Serialize an object not otherwise serializable as JSON.
+
+    @param unencodable: An unencodable object.
+
+    @return: C{unencodable}, serialized
+    """
+    if isinstance(unencodable, bytes):
+        return unencodable.decode("charmap")
+    return objectSaveHook(unencodable)
+
+
+
+if bytes is str:
+    _encoder = JSONEncoder(
+        default=objectSaveHook, encoding="charmap", skipkeys=True)
+else:
+    _encoder = JSONEncoder(default=_saveHook, skipkeys=True)
+
+
+
 def eventAsJSON(event):
     """
     Encode an event as JSON, flattening it if necessary to preserve as much
@@ -184,24 +221,16 @@ def eventAsJSON(event):
         file.
     @rtype: L{unicode}
     """
-    if bytes is str:
-        kw = dict(default=objectSaveHook, encoding="charmap", skipkeys=True)
-    else:
-        def default(unencodable):
-            """
-            Serialize an object not otherwise serializable by L{dumps}.
-
-            @param unencodable: An unencodable object.
-            @return: C{unencodable}, serialized
-            """
-            if isinstance(unencodable, bytes):
-                return unencodable.decode("charmap")
-            return objectSaveHook(unencodable)
+    flattenEvent(event)
 
-        kw = dict(default=default, skipkeys=True)
+    event = event.copy()
+    level = event.get("log_level", None)
+    if isinstance(level, NamedConstant):
+        event["log_level"] = _levelsAsJSON.get(level, level)
+    if isinstance(event.get("log_logger", None), Logger):
+        event["log_logger"] = _unpersistable
 
-    flattenEvent(event)
-    result = dumps(event, **kw)
+    result = _encoder.encode(event)
     if not isinstance(result, unicode):
         return unicode(result, "utf-8", "replace")
     return result
@@ -254,6 +283,37 @@ def jsonFileLogObserver(outFile, recordSeparator=u"\x1e"):
 
 
 
+def _eventFromRecord(record):
+    """
+    Decode a log event from a record of a file written by
+    L{jsonFileLogObserver}, logging an error if it cannot be decoded.
+
+    @param record: The JSON text of the record, without any record separator.
+    @type record: L{bytes} or L{bytearray}
+
+    @return: The event, or L{None} if C{record} cannot be decoded.
+    @rtype: L{dict}
+    """
+    try:
+        text = bytes(record).decode("utf-8")
+    except UnicodeDecodeError:
+        log.error(
+            u"Unable to decode UTF-8 for JSON record: {record!r}",
+            record=bytes(record)
+        )
+        return None
+
+    try:
+        return eventFromJSON(text)
+    except ValueError:
+        log.error(
+            u"Unable to read JSON record: {record!r}",
+            record=bytes(record)
+        )
+        return None
+
+
+
 def eventsFromJSONLogFile(inFile, recordSeparator=None, bufferSize=4096):
     """
     Load events from a file previously saved with L{jsonFileLogObserver}.
@@ -281,24 +341,7 @@ def eventsFromJSONLogFile(inFile, recordSeparator=None, bufferSize=4096):
         else:
             return s.encode("utf-8")
 
-    def eventFromBytearray(record):
-        try:
-            text = bytes(record).decode("utf-8")
-        except UnicodeDecodeError:
-            log.error(
-                u"Unable to decode UTF-8 for JSON record: {record!r}",
-                record=bytes(record)
-            )
-            return None
-
-        try:
-            return eventFromJSON(text)
-        except ValueError:
-            log.error(
-                u"Unable to read JSON record: {record!r}",
-                record=bytes(record)
-            )
-            return None
+    eventFromBytearray = _eventFromRecord
 
     if recordSeparator is None:
         first = asBytes(inFile.read(1))
@@ -353,3 +396,295 @@ def eventsFromJSONLogFile(inFile, recordSeparator=None, bufferSize=4096):
                     yield event
 
         buffer = records[-1]
+
+
+
+_levelNames = set([level.name for level in LogLevel.iterconstants()])
+
+
+
+class IndexedJSONLogFile(object):
+    """
+    A file written by L{jsonFileLogObserver}, with an index of the time, level
+    and namespace of each of its records kept in a separate file, so that the
+    events matching a query can be read without decoding every record in the
+    file.
+
+    The index is a text file with a line identifying the log file by its
+    device, inode and a hash of its first record, followed by a line for each
+    record of the log file.  It is brought up to date before every query by
+    indexing any records appended since the last.  If the log file has been
+    truncated or replaced, for example by rotating it, the index is rebuilt.
+
+    Records are lines of JSON text, each optionally preceded by a record
+    separator (C{u"\\x1e"}), as written by L{jsonFileLogObserver} with either
+    its default record separator or an empty one.  Truncated or unreadable
+    records are ignored.
+
+    @ivar path: The path of the log file.
+    @type path: L{str}
+
+    @ivar indexPath: The path of the index file.
+    @type indexPath: L{str}
+    """
+
+    _header = b"twisted.logger JSON log index 2\n"
+
+    def __init__(self, path, indexPath=None, bufferSize=2 ** 16):
+        """
+        @param path: The path of the log file.
+        @type path: L{str}
+
+        @param indexPath: The path of the index file, which is created if it
+            does not exist.  If L{None}, C{path} followed by C{".index"}.
+        @type indexPath: L{str}
+
+        @param bufferSize: The size of the read buffer used while indexing.
+        @type bufferSize: L{int}
+        """
+        if indexPath is None:
+            indexPath = path + ".index"
+        self.path = path
+        self.indexPath = indexPath
+        self._bufferSize = bufferSize
+
+
+    def _readIndex(self):
+        """
+        Read the index.
+
+        @return: The identity of the log file indexed, as returned by
+            L{_identify}, and the index entries, each a L{list} of the offset
+            and length of a record, and its time, level name and namespace as
+            they are encoded in the index; or L{None} if there is no usable
+            index.
+        @rtype: L{tuple} of L{bytes} and L{list} of L{list} of L{bytes}
+        """
+        try:
+            with open(self.indexPath, "rb") as indexFile:
+                if indexFile.readline() != self._header:
+                    return None
+                identity = indexFile.readline()
+                lines = indexFile.readlines()
+        except (IOError, OSError):
+            return None
+        if (not identity.endswith(b"\n") or
+                lines and not lines[-1].endswith(b"\n")):
+            # Interrupted while writing the index.
+            return None
+        return identity, [line.split(b" ", 4) for line in lines]
+
+
+    def _identify(self, logFile, entries):
+        """
+        Identify a log file by its device, inode and first record, so that a
+        different file at the same path can be told apart from the one
+        indexed.
+
+        @param logFile: The log file, open for reading.
+
+        @param entries: The entries of the index of the log file.
+
+        @return: The identity of the log file, as written to the index.
+        @rtype: L{bytes}
+        """
+        status = os.fstat(logFile.fileno())
+        if entries:
+            logFile.seek(0)
+            digest = sha256(logFile.read(int(entries[0][1]))).hexdigest()
+        else:
+            digest = "-"
+        return "{0} {1} {2}\n".format(
+            status.st_dev, status.st_ino, digest).encode("ascii")
+
+
+    def _stillIndexed(self, logFile, identity, entries):
+        """
+        Determine whether the records described by an index are still those at
+        the start of the log file.
+
+        @param logFile: The log file, open for reading.
+
+        @param identity: The identity of the log file indexed.
+
+        @param entries: The entries of the index.
+
+        @return: C{True} if the log file has the identity recorded in the
+            index, is at least as long as the records indexed and the last of
+            them is still a complete line.
+        @rtype: L{bool}
+        """
+        if self._identify(logFile, entries) != identity:
+            return False
+        if not entries:
+            return True
+        offset, length = int(entries[-1][0]), int(entries[-1][1])
+        start = max(offset - 1, 0)
+        logFile.seek(start)
+        record = logFile.read(offset + length - start)
+        return (len(record) == offset + length - start and
+                record.endswith(b"\n") and
+                (offset == 0 or record.startswith(b"\n")))
+
+
+    def updateIndex(self):
+        """
+        Index any records appended to the log file since the index was last
+        updated, or rebuild the index if the log file has been truncated or
+        replaced.
+
+        @return: The entries of the index, as returned by L{_readIndex}.
+        """
+        index = self._readIndex()
+        with open(self.path, "rb") as logFile:
+            if index is not None and self._stillIndexed(logFile, *index):
+                identity, entries = index
+            else:
+                identity, entries = None, []
+
+            if entries:
+                offset = int(entries[-1][0]) + int(entries[-1][1])
+            else:
+                offset = 0
+            logFile.seek(offset)
+
+            newEntries = []
+            buffer = b""
+            while True:
+                data = logFile.read(self._bufferSize)
+                if not data:
+                    break
+                lines = (buffer + data).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    newEntries.append(self._indexRecord(offset, line))
+                    offset += len(line) + 1
+
+            if identity is None or newEntries and not entries:
+                # The identity covers the first record, so the index is
+                # written afresh until there is one.
+                entries = newEntries
+                with open(self.indexPath, "wb") as indexFile:
+                    indexFile.write(self._header +
+                                    self._identify(logFile, entries))
+                    indexFile.write(b"".join(
+                        [b" ".join(entry) for entry in entries]))
+            elif newEntries:
+                with open(self.indexPath, "ab") as indexFile:
+                    indexFile.write(b"".join(
+                        [b" ".join(entry) for entry in newEntries]))
+                entries.extend(newEntries)
+        return entries
+
+
+    def _indexRecord(self, offset, line):
+        """
+        Create the index entry for a record.
+
+        @param offset: The offset of the record in the log file.
+        @type offset: L{int}
+
+        @param line: The record, without its terminating newline.
+        @type line: L{bytes}
+
+        @return: The index entry for the record, as read by L{_readIndex}
+            except that its namespace ends with a newline.
+        @rtype: L{list} of L{bytes}
+        """
+        time = level = namespace = None
+        try:
+            event = loads(line.rsplit(b"\x1e", 1)[-1].decode("utf-8"))
+            time = event.get("log_time", None)
+            level = event.get("log_level", None)
+            namespace = event.get("log_namespace", None)
+        except (ValueError, AttributeError):
+            pass
+
+        entry = [str(offset), str(len(line) + 1)]
+        if isinstance(time, (int, float)) and not isinstance(time, bool):
+            entry.append(repr(float(time)))
+        else:
+            entry.append("-")
+        if isinstance(level, dict) and level.get("name") in _levelNames:
+            entry.append(str(level["name"]))
+        else:
+            entry.append("-")
+        if isinstance(namespace, unicode):
+            entry.append(_encoder.encode(namespace))
+        else:
+            entry.append("-")
+        return [field.encode("ascii") for field in entry[:-1]] + [
+            entry[-1].encode("ascii") + b"\n"]
+
+
+    def events(self, since=None, until=None, namespace=None,
+               minimumLevel=None):
+        """
+        Read the events matching a query from the log file, updating the
+        index first.
+
+        @param since: If not L{None}, only events logged at or after this
+            time.
+        @type since: L{float}
+
+        @param until: If not L{None}, only events logged before this time.
+        @type until: L{float}
+
+        @param namespace: If not L{None}, only events logged in this namespace
+            or namespaces within it; for example, C{"a.b"} matches C{"a.b"}
+            and C{"a.b.c"} but not C{"a.bc"}.
+        @type namespace: L{str} (native string)
+
+        @param minimumLevel: If not L{None}, only events logged at this level
+            or above.
+        @type minimumLevel: L{LogLevel}
+
+        @return: The matching events, in the order they were logged.
+        @rtype: iterable of L{dict}
+        """
+        if minimumLevel is not None:
+            minimumPriority = LogLevel._priorityForLevel(minimumLevel)
+            levelPriorities = dict([
+                (level.name.encode("ascii"),
+                 LogLevel._priorityForLevel(level))
+                for level in LogLevel.iterconstants()
+            ])
+        if namespace is not None:
+            namespaces = {}
+
+        with open(self.path, "rb") as logFile:
+            for offset, length, time, level, encodedNamespace in (
+                self.updateIndex()
+            ):
+                if since is not None or until is not None:
+                    if time == b"-":
+                        continue
+                    time = float(time)
+                    if since is not None and time < since:
+                        continue
+                    if until is not None and time >= until:
+                        continue
+
+                if minimumLevel is not None:
+                    priority = levelPriorities.get(level)
+                    if priority is None or priority < minimumPriority:
+                        continue
+
+                if namespace is not None:
+                    matches = namespaces.get(encodedNamespace)
+                    if matches is None:
+                        matches = False
+                        if encodedNamespace != b"-\n":
+                            name = loads(encodedNamespace.decode("ascii"))
+                            matches = (name == namespace or
+                                       name.startswith(namespace + "."))
+                        namespaces[encodedNamespace] = matches
+                    if not matches:
+                        continue
+
+                logFile.seek(int(offset))
+                record = logFile.read(int(length)).rsplit(b"\x1e", 1)[-1]
+                if record.strip():
+                    event = _eventFromRecord(record)
+                    if event is not None:
+                        yield event
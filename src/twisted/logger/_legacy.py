@@ -10,11 +10,16 @@ from zope.interface import implementer
 
 from ._levels import LogLevel
 from ._format import formatEvent
-from ._observer import ILogObserver
+from ._observer import ILogObserver, _minimumLevelFor
 from ._stdlib import fromStdlibLogLevelMapping, StringifiableFromEvent
 
 
 
+# The format publishToNewObserver gives legacy events, for their text.
+_LEGACY_TEXT_FORMAT = u"{log_text}"
+
+
+
 @implementer(ILogObserver)
 class LegacyLogObserverWrapper(object):
     """
@@ -60,8 +65,15 @@ class LegacyLogObserverWrapper(object):
         if "system" not in event:
             event["system"] = event.get("log_system", "-")
 
-        # Format new style -> old style
-        if "format" not in event and event.get("log_format", None) is not None:
+        # Format new style -> old style.  A legacy event whose format was
+        # given to it by publishToNewObserver needs none: the legacy observer
+        # will extract the same text from its message, without the event
+        # having to be copied and formatted again.
+        if (
+            "format" not in event and
+            event.get("log_format", None) is not None and
+            not _fromLegacyMessage(event)
+        ):
             # Create an object that implements __str__() in order to defer the
             # work of formatting until it's needed by a legacy log observer.
             event["format"] = "%(log_legacy)s"
@@ -94,6 +106,25 @@ class LegacyLogObserverWrapper(object):
 
 
 
+def _fromLegacyMessage(event):
+    """
+    Determine whether an event is a legacy event with a message, whose text
+    L{publishToNewObserver} gave it as its format.
+
+    @param event: an event
+    @type event: L{dict}
+
+    @return: C{True} if it is.
+    @rtype: L{bool}
+    """
+    message = event["message"]
+    return (
+        isinstance(message, tuple) and len(message) > 0 and
+        event["log_format"] == _LEGACY_TEXT_FORMAT and "log_text" in event
+    )
+
+
+
 def publishToNewObserver(observer, eventDict, textFromEventDict):
     """
     Publish an old-style (L{twisted.python.log}) event to a new-style
@@ -122,12 +153,6 @@ def publishToNewObserver(observer, eventDict, textFromEventDict):
     if "log_time" not in eventDict:
         eventDict["log_time"] = eventDict["time"]
 
-    if "log_format" not in eventDict:
-        text = textFromEventDict(eventDict)
-        if text is not None:
-            eventDict["log_text"] = text
-            eventDict["log_format"] = u"{log_text}"
-
     if "log_level" not in eventDict:
         if "logLevel" in eventDict:
             try:
@@ -148,7 +173,43 @@ def publishToNewObserver(observer, eventDict, textFromEventDict):
     if "log_namespace" not in eventDict:
         eventDict["log_namespace"] = u"log_legacy"
 
+    # Don't bother extracting the text of an event which would be dropped.
+    if _belowMinimumLevel(observer, eventDict):
+        return
+
+    if "log_format" not in eventDict:
+        text = textFromEventDict(eventDict)
+        if text is not None:
+            eventDict["log_text"] = text
+            eventDict["log_format"] = _LEGACY_TEXT_FORMAT
+
     if "log_system" not in eventDict and "system" in eventDict:
         eventDict["log_system"] = eventDict["system"]
 
     observer(eventDict)
+
+
+
+def _belowMinimumLevel(observer, event):
+    """
+    Determine whether an event is below the lowest level of event from its
+    namespace which an observer might not drop.
+
+    @param observer: A new-style observer.
+    @type observer: L{ILogObserver}
+
+    @param event: A new-style event.
+    @type event: L{dict}
+
+    @return: C{True} if the observer would drop the event.
+    @rtype: L{bool}
+    """
+    try:
+        priority = LogLevel._levelPriorities.get(event.get("log_level"))
+        if priority is None:
+            return False
+        minimumLevel = _minimumLevelFor(observer, event["log_namespace"])
+    except TypeError:
+        return False
+    return (minimumLevel is not None and
+            priority < LogLevel._levelPriorities[minimumLevel])
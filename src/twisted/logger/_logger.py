@@ -14,6 +14,23 @@ from ._levels import InvalidLogLevelError, LogLevel
 
 
 
+# Incremented whenever something changes which might change the result of an
+# observer's _minimumLevelFor method, invalidating any cached results.
+_levelsChanged = 0
+
+_priorities = LogLevel._levelPriorities
+
+
+
+def _changeLevels():
+    """
+    Note that the levels of events which some observers drop may have changed.
+    """
+    global _levelsChanged
+    _levelsChanged += 1
+
+
+
 class Logger(object):
     """
     A L{Logger} emits log messages to an observer.  You should instantiate it
@@ -28,8 +45,15 @@ class Logger(object):
 
     @type: L{ILogObserver}
     @ivar observer: The observer that this logger will send events to.
+
+    @ivar _levels: The observer, namespace and value of C{_levelsChanged} for
+        which the minimum priority of events this logger emits was last
+        determined, and that priority; or L{None} if it has not been.
+    @type _levels: L{tuple} of (L{tuple}, L{int}), or L{None}
     """
 
+    _levels = None
+
     @staticmethod
     def _namespaceFromCallingContext():
         """
@@ -108,6 +132,33 @@ class Logger(object):
         return "<%s %r>" % (self.__class__.__name__, self.namespace)
 
 
+    def _minimumPriority(self):
+        """
+        Determine the priority of the lowest level of event which this
+        logger's observer might not drop, so that events below it need not be
+        constructed.
+
+        The result is remembered until the observer, the namespace, or the
+        levels of events which any observer drops change.
+
+        @return: A priority, as in C{LogLevel._levelPriorities}.
+        @rtype: L{int}
+        """
+        levelsFor = (self.observer, self.namespace, _levelsChanged)
+        levels = self._levels
+        if levels is not None and levels[0] == levelsFor:
+            return levels[1]
+
+        priority = 0
+        minimumLevelFor = getattr(self.observer, "_minimumLevelFor", None)
+        if minimumLevelFor is not None:
+            minimumLevel = minimumLevelFor(self.namespace)
+            if minimumLevel is not None:
+                priority = LogLevel._levelPriorities[minimumLevel]
+        self._levels = (levelsFor, priority)
+        return priority
+
+
     def emit(self, level, format=None, **kwargs):
         """
         Emit a log event to all log observers at the given level.
@@ -123,7 +174,9 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        if level not in LogLevel.iterconstants():
+        try:
+            priority = LogLevel._levelPriorities[level]
+        except (KeyError, TypeError):
             self.failure(
                 "Got invalid log level {invalidLevel!r} in {logger}.emit().",
                 Failure(InvalidLogLevelError(level)),
@@ -132,6 +185,10 @@ class Logger(object):
             )
             return
 
+        # Don't bother building an event which every observer would drop.
+        if priority < self._minimumPriority():
+            return
+
         event = kwargs
         event.update(
             log_logger=self, log_level=level, log_namespace=self.namespace,
@@ -185,6 +242,11 @@ class Logger(object):
             later execution.
         """
         if failure is None:
+            # Capturing the exception is expensive, so don't if the event
+            # would be dropped.
+            priority = LogLevel._levelPriorities.get(level)
+            if priority is not None and priority < self._minimumPriority():
+                return
             failure = Failure()
 
         self.emit(level, format, log_failure=failure, **kwargs)
@@ -203,7 +265,8 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        self.emit(LogLevel.debug, format, **kwargs)
+        if _priorities[LogLevel.debug] >= self._minimumPriority():
+            self.emit(LogLevel.debug, format, **kwargs)
 
 
     def info(self, format=None, **kwargs):
@@ -219,7 +282,8 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        self.emit(LogLevel.info, format, **kwargs)
+        if _priorities[LogLevel.info] >= self._minimumPriority():
+            self.emit(LogLevel.info, format, **kwargs)
 
 
     def warn(self, format=None, **kwargs):
@@ -235,7 +299,8 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        self.emit(LogLevel.warn, format, **kwargs)
+        if _priorities[LogLevel.warn] >= self._minimumPriority():
+            self.emit(LogLevel.warn, format, **kwargs)
 
 
     def error(self, format=None, **kwargs):
@@ -251,7 +316,8 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        self.emit(LogLevel.error, format, **kwargs)
+        if _priorities[LogLevel.error] >= self._minimumPriority():
+            self.emit(LogLevel.error, format, **kwargs)
 
 
     def critical(self, format=None, **kwargs):
@@ -267,7 +333,8 @@ class Logger(object):
             non-deterministic behavior from observers that schedule work for
             later execution.
         """
-        self.emit(LogLevel.critical, format, **kwargs)
+        if _priorities[LogLevel.critical] >= self._minimumPriority():
+            self.emit(LogLevel.critical, format, **kwargs)
 
 
 
@@ -9,7 +9,9 @@ Basic log observers.
 from zope.interface import Interface, implementer
 
 from twisted.python.failure import Failure
-from ._logger import Logger
+from . import _logger
+from ._levels import LogLevel
+from ._logger import Logger, _changeLevels
 
 
 
@@ -19,6 +21,34 @@ OBSERVER_DISABLED = (
 
 
 
+def _minimumLevelFor(observer, namespace):
+    """
+    Determine the lowest level of event from a namespace which an observer
+    might do something with.
+
+    An observer supports this by having a C{_minimumLevelFor} method taking
+    a namespace and returning a L{LogLevel}, or L{None} if it might do
+    something with events of any level.  Events below that level can then be
+    dropped before they are even constructed.  Whenever the result might
+    change, L{_changeLevels} must be called.
+
+    @param observer: An observer.
+    @type observer: L{ILogObserver}
+
+    @param namespace: A logging namespace.
+    @type namespace: L{str} (native string)
+
+    @return: The lowest level of event C{observer} might not drop, or L{None}
+        if it might not drop events of any level.
+    @rtype: L{LogLevel} or L{None}
+    """
+    minimumLevelFor = getattr(observer, "_minimumLevelFor", None)
+    if minimumLevelFor is None:
+        return None
+    return minimumLevelFor(namespace)
+
+
+
 class ILogObserver(Interface):
     """
     An observer which can handle log events.
@@ -74,10 +104,20 @@ class LogPublisher(object):
 
     Keeps track of a set of L{ILogObserver} objects and forwards
     events to each.
+
+    @ivar _levels: If not L{None}, an object with a C{logLevelForNamespace}
+        method, like a L{LogLevelFilterPredicate}, giving the lowest level of
+        event from each namespace which this publisher forwards.  Events below
+        that level are dropped, and those without a level are forwarded.
+        L{_changeLevels} must be called whenever it changes.
+    @type _levels: L{LogLevelFilterPredicate} or L{None}
     """
 
+    _levels = None
+
     def __init__(self, *observers):
         self._observers = list(observers)
+        self._minimumLevels = {}
         self.log = Logger(observer=self)
 
 
@@ -91,6 +131,7 @@ class LogPublisher(object):
             raise TypeError("Observer is not callable: {0!r}".format(observer))
         if observer not in self._observers:
             self._observers.append(observer)
+            _changeLevels()
 
 
     def removeObserver(self, observer):
@@ -103,12 +144,102 @@ class LogPublisher(object):
             self._observers.remove(observer)
         except ValueError:
             pass
+        else:
+            _changeLevels()
+
+
+    def _minimumLevelFor(self, namespace):
+        """
+        Determine the lowest level of event from a namespace which any of the
+        observers of this publisher might do something with.
+
+        The result is cached until L{_changeLevels} is next called.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The lowest level of event not dropped by this publisher or
+            by every observer, or L{None} if events of any level might be
+            forwarded to some observer which might not drop them.
+        @rtype: L{LogLevel} or L{None}
+        """
+        return self._levelsFor(namespace)[1]
+
+
+    def _levelsFor(self, namespace):
+        """
+        Determine the lowest level of event from a namespace which this
+        publisher forwards, and the lowest which might not be dropped by this
+        publisher or by every observer.
+
+        The result is cached until L{_changeLevels} is next called.
+
+        @param namespace: A logging namespace.
+        @type namespace: L{str} (native string)
+
+        @return: The lowest level this publisher forwards, and the lowest
+            level which might not be dropped; either is L{None} if there is no
+            lowest level.
+        @rtype: L{tuple} of two L{LogLevel}s or L{None}s
+        """
+        changed = _logger._levelsChanged
+        cached = self._minimumLevels.get(namespace)
+        if cached is not None and cached[0] == changed:
+            return cached[1]
+
+        priorities = LogLevel._levelPriorities
+        minimumLevel = None
+        if self._observers:
+            for observer in self._observers:
+                level = _minimumLevelFor(observer, namespace)
+                if level is None:
+                    minimumLevel = None
+                    break
+                if (minimumLevel is None or
+                        priorities[level] < priorities[minimumLevel]):
+                    minimumLevel = level
+
+        forwardedLevel = None
+        if self._levels is not None:
+            forwardedLevel = self._levels.logLevelForNamespace(namespace)
+            if (minimumLevel is None or
+                    priorities[forwardedLevel] > priorities[minimumLevel]):
+                minimumLevel = forwardedLevel
+
+        levels = (forwardedLevel, minimumLevel)
+        self._minimumLevels[namespace] = (changed, levels)
+        return levels
+
+
+    def _drops(self, event):
+        """
+        Determine whether this publisher drops an event because of its level.
+
+        @param event: An event.
+        @type event: L{dict}
+
+        @return: C{True} if C{event} is below the lowest level of event from
+            its namespace which this publisher forwards.
+        @rtype: L{bool}
+        """
+        try:
+            priority = LogLevel._levelPriorities.get(event.get("log_level"))
+            if priority is None:
+                return False
+            forwardedLevel = self._levelsFor(event.get("log_namespace"))[0]
+        except TypeError:
+            return False
+        return (forwardedLevel is not None and
+                priority < LogLevel._levelPriorities[forwardedLevel])
 
 
     def __call__(self, event):
         """
         Forward events to contained observers.
         """
+        if self._levels is not None and self._drops(event):
+            return
+
         if "log_trace" in event:
             def trace(observer):
                 """
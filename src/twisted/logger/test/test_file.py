@@ -5,7 +5,9 @@
 Test cases for L{twisted.logger._file}.
 """
 
-from io import StringIO
+import threading
+import time
+from io import BytesIO, StringIO
 
 from zope.interface.verify import verifyObject, BrokenMethodImplementation
 
@@ -13,9 +15,11 @@ from twisted.trial.unittest import TestCase
 
 from twisted.python.failure import Failure
 from twisted.python.compat import unicode
+from twisted.test.proto_helpers import MemoryReactor
 from .._observer import ILogObserver
 from .._file import FileLogObserver
 from .._file import textFileLogObserver
+from .._file import ThreadedFileLogObserver, QueueOverflowPolicy
 
 
 
@@ -164,6 +168,279 @@ class TextFileLogObserverTests(TestCase):
 
 
 
+class ThreadedFileLogObserverTests(TestCase):
+    """
+    Tests for L{ThreadedFileLogObserver}.
+    """
+
+    def observer(self, outFile, **kwargs):
+        """
+        Create a L{ThreadedFileLogObserver} whose writer thread does not run
+        until the observer is stopped.
+
+        @param outFile: The file to write to.
+
+        @param kwargs: Additional arguments for L{ThreadedFileLogObserver}.
+
+        @return: The observer.
+        @rtype: L{ThreadedFileLogObserver}
+        """
+        observer = ThreadedFileLogObserver(
+            outFile, lambda e: u"{0}\n".format(e["x"]), **kwargs)
+        def startThread(target):
+            observer._thread = JoinRunsThread(target)
+        observer._startThread = startThread
+        return observer
+
+
+    def test_interface(self):
+        """
+        L{ThreadedFileLogObserver} is an L{ILogObserver}.
+        """
+        observer = ThreadedFileLogObserver(StringIO(), lambda e: unicode(e))
+        try:
+            verifyObject(ILogObserver, observer)
+        except BrokenMethodImplementation as e:
+            self.fail(e)
+
+
+    def test_writesInBatch(self):
+        """
+        Records queued while the writer thread is busy are written, and the
+        file flushed, together.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile)
+        for x in range(3):
+            observer(dict(x=x))
+        self.assertEqual(outFile.writes, [])
+        observer.stop()
+        self.assertEqual(outFile.writes, [u"0\n1\n2\n"])
+        self.assertEqual(outFile.flushes, 1)
+
+
+    def test_batchSize(self):
+        """
+        No more than C{batchSize} records are written at once.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile, batchSize=2)
+        for x in range(3):
+            observer(dict(x=x))
+        observer.stop()
+        self.assertEqual(outFile.writes, [u"0\n1\n", u"2\n"])
+        self.assertEqual(outFile.flushes, 2)
+
+
+    def test_noText(self):
+        """
+        Events formatted as nothing are not queued.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile)
+        observer(dict(x=u""))
+        observer.formatEvent = lambda e: None
+        observer(dict(x=1))
+        observer.stop()
+        self.assertEqual(outFile.writes, [u"\n"])
+
+
+    def test_encoding(self):
+        """
+        Records for a file which does not accept L{unicode} are encoded as
+        UTF-8.
+        """
+        outFile = BytesIO()
+        observer = self.observer(outFile)
+        observer(dict(x=u"\u2603"))
+        observer(dict(x=u"x"))
+        observer.stop()
+        self.assertEqual(outFile.getvalue(), b"\xe2\x98\x83\nx\n")
+
+
+    def test_dropWhenFull(self):
+        """
+        With L{QueueOverflowPolicy.drop}, events logged while the queue is full
+        are discarded and counted.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(
+            outFile, maxQueueSize=2, overflow=QueueOverflowPolicy.drop)
+        for x in range(5):
+            observer(dict(x=x))
+        self.assertEqual(observer.dropped, 3)
+        # Stopping waits for the writer to make room for the end of the queue.
+        observer._thread = threading.Thread(target=observer._writeRecords)
+        observer._thread.start()
+        observer.stop()
+        self.assertEqual(outFile.writes, [u"0\n1\n"])
+
+
+    def test_stopWhileQueueing(self):
+        """
+        L{stop} waits for a thread queueing a record to finish doing so, so
+        that the record is written rather than queued after the writer thread
+        has been told to stop.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile, maxQueueSize=1)
+        observer(dict(x=0))
+        logging = threading.Thread(target=observer, args=(dict(x=1),))
+        logging.start()
+        while not observer._lock.locked():
+            time.sleep(0.001)
+        observer._thread = threading.Thread(target=observer._writeRecords)
+        observer._thread.start()
+        observer.stop()
+        logging.join()
+        self.assertEqual(u"".join(outFile.writes), u"0\n1\n")
+
+
+    def test_logWhileStopping(self):
+        """
+        An event logged while L{stop} waits for the writer thread is written
+        after the records which were queued before it.
+        """
+        outFile = RecordingFile()
+        writing = threading.Event()
+        release = threading.Event()
+        write = outFile.write
+
+        def blockingWrite(data):
+            if not writing.is_set():
+                writing.set()
+                release.wait()
+            write(data)
+        outFile.write = blockingWrite
+
+        observer = ThreadedFileLogObserver(
+            outFile, lambda e: u"{0}\n".format(e["x"]))
+        observer(dict(x=0))
+        writing.wait()
+        stopping = threading.Thread(target=observer.stop)
+        stopping.start()
+        while observer._queue.empty():
+            time.sleep(0.001)
+        logging = threading.Thread(target=observer, args=(dict(x=1),))
+        logging.start()
+        logging.join(0.1)
+        release.set()
+        stopping.join()
+        logging.join()
+        self.assertEqual(outFile.writes, [u"0\n", u"1\n"])
+
+
+    def test_writeFailure(self):
+        """
+        Records which cannot be written are counted as dropped, and do not
+        stop later ones being written.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile, batchSize=1)
+        observer(dict(x=u"bad"))
+        observer(dict(x=u"good"))
+        outFile.fail = u"bad\n"
+        observer.stop()
+        self.assertEqual(outFile.writes, [u"good\n"])
+        self.assertEqual(observer.dropped, 1)
+
+
+    def test_afterStop(self):
+        """
+        Once stopped, events are written directly to the file.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile)
+        observer(dict(x=1))
+        observer.stop()
+        observer.stop()
+        observer(dict(x=2))
+        self.assertEqual(outFile.writes, [u"1\n", u"2\n"])
+        self.assertEqual(outFile.flushes, 2)
+
+
+    def test_stopUnused(self):
+        """
+        An observer stopped before observing any events never starts a writer
+        thread.
+        """
+        outFile = RecordingFile()
+        observer = self.observer(outFile)
+        observer.stop()
+        self.assertIsNone(observer._thread)
+        observer(dict(x=1))
+        self.assertEqual(outFile.writes, [u"1\n"])
+
+
+    def test_reactorShutdown(self):
+        """
+        If given a reactor, the observer is stopped after it shuts down.
+        """
+        reactor = MemoryReactor()
+        observer = self.observer(RecordingFile(), reactor=reactor)
+        self.assertEqual(reactor.triggers["after"]["shutdown"],
+                         [(observer.stop, (), {})])
+
+
+    def test_writerThread(self):
+        """
+        By default, records are written by a separate thread, in the order in
+        which they were logged, and all of them have been written when L{stop}
+        returns.
+        """
+        outFile = StringIO()
+        observer = ThreadedFileLogObserver(
+            outFile, lambda e: u"{0}\n".format(e["x"]), maxQueueSize=5)
+        for x in range(100):
+            observer(dict(x=x))
+        observer.stop()
+        self.assertFalse(observer._thread.is_alive())
+        self.assertEqual(outFile.getvalue(),
+                         u"".join(u"{0}\n".format(x) for x in range(100)))
+
+
+
+class JoinRunsThread(object):
+    """
+    Stand-in for a writer thread which runs it when joined.
+
+    @ivar target: The function to run on the thread.
+    """
+    def __init__(self, target):
+        self.target = target
+
+
+    def join(self):
+        self.target()
+
+
+
+class RecordingFile(object):
+    """
+    File that records what is written to it and counts flushes.
+
+    @ivar writes: The data written.
+    @ivar flushes: The number of flushes.
+    @ivar fail: Data which raises an exception when written.
+    """
+    fail = None
+
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+
+    def write(self, data):
+        if data == self.fail:
+            raise IOError("Disk on fire")
+        self.writes.append(data)
+
+
+    def flush(self):
+        self.flushes += 1
+
+
+
 class DummyFile(object):
     """
     File that counts writes and flushes.
@@ -271,6 +271,72 @@ class FilteringLogObserverTests(unittest.TestCase):
         publisher(event)
 
 
+    def test_minimumLevel(self):
+        """
+        L{FilteringLogObserver._minimumLevelFor} returns the highest of the
+        levels of its leading L{LogLevelFilterPredicate}s for the namespace.
+        """
+        info = LogLevelFilterPredicate(defaultLogLevel=LogLevel.info)
+        error = LogLevelFilterPredicate(defaultLogLevel=LogLevel.debug)
+        error.setLogLevelForNamespace("ns", LogLevel.error)
+        observer = FilteringLogObserver(lambda e: None, [info, error])
+        self.assertIs(observer._minimumLevelFor("ns"), LogLevel.error)
+        self.assertIs(observer._minimumLevelFor("other"), LogLevel.info)
+
+
+    def test_minimumLevelOtherPredicate(self):
+        """
+        L{FilteringLogObserver._minimumLevelFor} ignores the predicates after
+        the first which does not filter on level, since it might accept any
+        event outright.
+        """
+        observer = FilteringLogObserver(
+            lambda e: None,
+            [lambda e: PredicateResult.yes,
+             LogLevelFilterPredicate(defaultLogLevel=LogLevel.error)])
+        self.assertIsNone(observer._minimumLevelFor("ns"))
+
+
+    def test_minimumLevelWrappedObserver(self):
+        """
+        L{FilteringLogObserver._minimumLevelFor} takes into account the levels
+        of events its wrapped observer will drop.
+        """
+        inner = FilteringLogObserver(
+            lambda e: None,
+            [LogLevelFilterPredicate(defaultLogLevel=LogLevel.error)])
+        observer = FilteringLogObserver(
+            inner, [LogLevelFilterPredicate(defaultLogLevel=LogLevel.info)])
+        self.assertIs(observer._minimumLevelFor("ns"), LogLevel.error)
+
+
+    def test_minimumLevelNegativeObserver(self):
+        """
+        L{FilteringLogObserver._minimumLevelFor} returns L{None} if the
+        observer has a negative observer, which may want any event.
+        """
+        observer = FilteringLogObserver(
+            lambda e: None,
+            [LogLevelFilterPredicate(defaultLogLevel=LogLevel.error)],
+            negativeObserver=lambda e: None)
+        self.assertIsNone(observer._minimumLevelFor("ns"))
+
+
+    def test_minimumLevelChanged(self):
+        """
+        Changing the levels of a L{LogLevelFilterPredicate} invalidates the
+        levels cached by a L{LogPublisher} observed by it.
+        """
+        predicate = LogLevelFilterPredicate()
+        publisher = LogPublisher(
+            FilteringLogObserver(lambda e: None, [predicate]))
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.info)
+        predicate.setLogLevelForNamespace("ns", LogLevel.warn)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.warn)
+        predicate.clearLogLevels()
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.info)
+
+
 
 class LogLevelFilterPredicateTests(unittest.TestCase):
     """
@@ -18,9 +18,10 @@ except ImportError:
 
 from twisted.trial import unittest
 
+from .. import _flatten
 from .._format import formatEvent
 from .._flatten import (
-    flattenEvent, extractField, KeyFlattener, aFormatter
+    flattenEvent, extractField, KeyFlattener, aFormatter, flatFormat
 )
 
 
@@ -321,3 +322,20 @@ class FlatFormattingTests(unittest.TestCase):
                 'log_format': None,
             }
         )
+
+
+    def test_formatFieldsCached(self):
+        """
+        L{flattenEvent} parses each format string once, and forgets the
+        parsed format strings once too many have been parsed.
+        """
+        self.patch(_flatten, "_formatFields", {})
+        self.patch(_flatten, "_maxCachedFormats", 2)
+        for format in [u"{a}", u"{a}", u"{b.real}"]:
+            event = dict(log_format=format, a=1, b=complex(1, 2))
+            flattenEvent(event)
+            self.assertEqual(formatEvent(event), flatFormat(event))
+        self.assertEqual(sorted(_flatten._formatFields), [u"{a}", u"{b.real}"])
+
+        flattenEvent(dict(log_format=u"{x[0]}", x=[1]))
+        self.assertEqual(list(_flatten._formatFields), [u"{x[0]}"])
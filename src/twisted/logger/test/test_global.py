@@ -133,6 +133,30 @@ class LogBeginnerTests(unittest.TestCase):
         self.assertEqual([event], events2)
 
 
+    def test_levels(self):
+        """
+        By default, the publisher associated with a L{LogBeginner} publishes
+        events of every level, but drops events below the levels set on
+        L{LogBeginner.levels}, which loggers do not construct at all.
+        """
+        events = []
+        self.beginner.beginLoggingTo([events.append])
+        log = Logger(namespace="a.b", observer=self.publisher)
+        log.debug("debug")
+        self.assertEqual(len(events), 1)
+
+        self.beginner.levels.setLogLevelForNamespace(None, LogLevel.info)
+        self.beginner.levels.setLogLevelForNamespace("a", LogLevel.warn)
+        self.assertIs(self.publisher._minimumLevelFor("a.b"), LogLevel.warn)
+        log.info("info")
+        self.publisher(dict(log_level=LogLevel.info, log_namespace="a.c"))
+        self.publisher(dict(log_level=LogLevel.debug, log_namespace="c"))
+        self.assertEqual(len(events), 1)
+        self.publisher(dict(log_level=LogLevel.info, log_namespace="c"))
+        log.warn("warn")
+        self.assertEqual(len(events), 3)
+
+
     def test_beginLoggingToBufferedEvents(self):
         """
         Test that events are buffered until C{beginLoggingTo()} is
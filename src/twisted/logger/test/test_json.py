@@ -5,7 +5,10 @@
 Tests for L{twisted.logger._json}.
 """
 
+import io
+import os
 from io import StringIO, BytesIO
+from json import loads
 
 from zope.interface.verify import verifyObject, BrokenMethodImplementation
 
@@ -20,9 +23,10 @@ from .._format import formatEvent
 from .._levels import LogLevel
 from .._flatten import extractField
 from .._global import globalLogPublisher
+from .. import _json
 from .._json import (
     eventAsJSON, eventFromJSON, jsonFileLogObserver, eventsFromJSONLogFile,
-    log as jsonLog
+    IndexedJSONLogFile, log as jsonLog
 )
 from .._logger import Logger
 
@@ -86,6 +90,32 @@ class SaveLoadTests(TestCase):
         )
 
 
+    def test_saveFormatted(self):
+        """
+        Formatting an event with L{formatEvent} adds nothing to what is
+        saved.
+        """
+        event = dict(log_format=u"{x}", x=1)
+        formatEvent(event)
+        self.assertEqual(eventFromJSON(self.savedEventJSON(event)),
+                         dict(log_format=u"{x}", x=1,
+                              log_flattened={u"x!s:": u"1", u"x!:": 1}))
+
+
+    def test_saveLevelAndLogger(self):
+        """
+        Saving and loading an event with a log level and a logger preserves
+        the level, replaces the logger with an unpersistable marker, and
+        decodes bytes.
+        """
+        event = dict(log_format=u"{x}", x=1, log_level=LogLevel.warn,
+                     log_logger=Logger(), y=b"\xe1")
+        self.assertEqual(eventFromJSON(self.savedEventJSON(event)), dict(
+            log_format=u"{x}", x=1, log_level=LogLevel.warn,
+            log_logger={u"unpersistable": True}, y=u"\xe1",
+            log_flattened={u"x!s:": u"1", u"x!:": 1}))
+
+
     def test_saveUnPersistable(self):
         """
         Saving and loading an object which cannot be represented in JSON will
@@ -562,3 +592,234 @@ class LogFileReaderTests(TestCase):
 
             self.assertEqual(tuple(events), (event,))
             self.assertEqual(len(self.errorEvents), 0)
+
+
+
+class IndexedJSONLogFileTests(TestCase):
+    """
+    Tests for L{IndexedJSONLogFile}.
+    """
+
+    def setUp(self):
+        self.path = self.mktemp()
+        self.errorEvents = []
+
+        def observer(event):
+            if (
+                event["log_namespace"] == jsonLog.namespace and
+                "record" in event
+            ):
+                self.errorEvents.append(event)
+
+        globalLogPublisher.addObserver(observer)
+        self.addCleanup(globalLogPublisher.removeObserver, observer)
+
+
+    def write(self, *events, **kwargs):
+        """
+        Append events to the log file with a L{jsonFileLogObserver}.
+
+        @param events: The events to write.
+
+        @param kwargs: Keyword arguments to pass to L{jsonFileLogObserver}.
+        """
+        with io.open(self.path, "a", encoding="utf-8") as logFile:
+            observer = jsonFileLogObserver(logFile, **kwargs)
+            for event in events:
+                observer(event)
+
+
+    def event(self, time, level=LogLevel.info, namespace=u"a.b"):
+        """
+        Create an event.
+        """
+        return dict(log_time=time, log_level=level, log_namespace=namespace,
+                    log_format=u"{n}", n=time)
+
+
+    def times(self, events):
+        """
+        Extract the times of some events.
+        """
+        return [event["log_time"] for event in events]
+
+
+    def test_events(self):
+        """
+        L{IndexedJSONLogFile.events} reads every event in the log file.
+        """
+        self.write(self.event(1), self.event(2))
+        self.write(self.event(3), recordSeparator=u"")
+        self.assertEqual(
+            self.times(IndexedJSONLogFile(self.path).events()), [1, 2, 3])
+        self.assertEqual(self.errorEvents, [])
+
+
+    def test_indexFile(self):
+        """
+        The index is kept in a file named after the log file, unless another
+        is specified.
+        """
+        self.write(self.event(1))
+        list(IndexedJSONLogFile(self.path).events())
+        self.assertTrue(os.path.exists(self.path + ".index"))
+        indexPath = self.mktemp()
+        list(IndexedJSONLogFile(self.path, indexPath).events())
+        self.assertTrue(os.path.exists(indexPath))
+
+
+    def test_timeRange(self):
+        """
+        L{IndexedJSONLogFile.events} reads the events logged at or after
+        C{since} and before C{until}.
+        """
+        self.write(*[self.event(t) for t in range(10)])
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events(since=3, until=6)),
+                         [3, 4, 5])
+        self.assertEqual(self.times(indexed.events(since=8)), [8, 9])
+        self.assertEqual(self.times(indexed.events(until=1.5)), [0, 1])
+
+
+    def test_minimumLevel(self):
+        """
+        L{IndexedJSONLogFile.events} reads the events logged at or above
+        C{minimumLevel}.
+        """
+        self.write(self.event(1, LogLevel.debug), self.event(2, LogLevel.warn),
+                   self.event(3, LogLevel.error), dict(log_time=4))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(
+            self.times(indexed.events(minimumLevel=LogLevel.warn)), [2, 3])
+
+
+    def test_namespace(self):
+        """
+        L{IndexedJSONLogFile.events} reads the events logged in C{namespace}
+        or a namespace within it.
+        """
+        self.write(self.event(1, namespace=u"a"), self.event(2),
+                   self.event(3, namespace=u"a.b.c"),
+                   self.event(4, namespace=u"a.bc"),
+                   self.event(5, namespace=u"a b \u2603"), dict(log_time=6))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events(namespace="a.b")), [2, 3])
+        self.assertEqual(
+            self.times(indexed.events(namespace=u"a b \u2603")), [5])
+
+
+    def test_onlyMatchingDecoded(self):
+        """
+        L{IndexedJSONLogFile.events} decodes only the events which match, once
+        the log file has been indexed.
+        """
+        self.write(*[self.event(t) for t in range(10)])
+        indexed = IndexedJSONLogFile(self.path)
+        indexed.updateIndex()
+        decoded = []
+        def eventFromJSON(text):
+            decoded.append(text)
+            return loads(text)
+        self.patch(_json, "eventFromJSON", eventFromJSON)
+        self.patch(_json, "loads", None)
+        self.assertEqual(self.times(indexed.events(since=7)), [7, 8, 9])
+        self.assertEqual(len(decoded), 3)
+
+
+    def test_appended(self):
+        """
+        Events appended to the log file after it was indexed are indexed
+        before the next query, without indexing the earlier ones again.
+        """
+        self.write(self.event(1))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events()), [1])
+        with open(indexed.indexPath, "rb") as indexFile:
+            before = indexFile.read()
+        self.write(self.event(2))
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+        with open(indexed.indexPath, "rb") as indexFile:
+            self.assertTrue(indexFile.read().startswith(before))
+
+
+    def test_incompleteRecord(self):
+        """
+        A record which has not been completely written is not indexed until
+        it has been.
+        """
+        self.write(self.event(1))
+        with open(self.path, "ab") as logFile:
+            logFile.write(b'\x1e{"log_time": 2')
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events()), [1])
+        with open(self.path, "ab") as logFile:
+            logFile.write(b'}\n')
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+
+
+    def test_truncated(self):
+        """
+        If the log file is truncated, for example by rotating it, the index is
+        rebuilt.
+        """
+        self.write(self.event(1), self.event(2))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+        os.remove(self.path)
+        self.write(self.event(3))
+        self.assertEqual(self.times(indexed.events()), [3])
+
+
+    def test_replaced(self):
+        """
+        If the log file is replaced by a different one at least as long, for
+        example by rotating it, the index is rebuilt.
+        """
+        self.write(self.event(1), self.event(2))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+        os.rename(self.path, self.path + ".1")
+        self.write(self.event(3), self.event(4))
+        self.assertEqual(self.times(indexed.events(since=3)), [3, 4])
+
+
+    def test_rewritten(self):
+        """
+        If the log file is rewritten in place with different records, the
+        index is rebuilt.
+        """
+        self.write(self.event(1), self.event(2))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+        with open(self.path, "wb"):
+            pass
+        self.write(self.event(3), self.event(4))
+        self.assertEqual(self.times(indexed.events(since=3)), [3, 4])
+
+
+    def test_interruptedIndex(self):
+        """
+        If the index was not completely written, it is rebuilt.
+        """
+        self.write(self.event(1), self.event(2))
+        indexed = IndexedJSONLogFile(self.path)
+        indexed.updateIndex()
+        with open(indexed.indexPath, "rb+") as indexFile:
+            indexFile.truncate(os.path.getsize(indexed.indexPath) - 2)
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+
+
+    def test_unreadableRecords(self):
+        """
+        Unreadable records are indexed without a time, level or namespace, and
+        logged as errors and skipped when read, while blank ones are ignored.
+        """
+        self.write(self.event(1))
+        with open(self.path, "ab") as logFile:
+            logFile.write(b'\x1e{"log_time": \n\n\x1e\xff\n')
+        self.write(self.event(2))
+        indexed = IndexedJSONLogFile(self.path)
+        self.assertEqual(self.times(indexed.events(since=0)), [1, 2])
+        self.assertEqual(self.errorEvents, [])
+        self.assertEqual(self.times(indexed.events()), [1, 2])
+        self.assertEqual(len(self.errorEvents), 2)
@@ -274,6 +274,35 @@ class LegacyLogObserverWrapperTests(unittest.TestCase):
         ))
 
 
+    def test_legacyMessage(self):
+        """
+        A legacy event with a message, published to new-style observers by
+        L{publishToNewObserver}, is forwarded to the legacy observer without
+        an old-style format, since its text is extracted from its message.
+        """
+        events = []
+        publishToNewObserver(
+            LegacyLogObserverWrapper(events.append),
+            dict(message=("Hello,", "world!"), time=time(), isError=0),
+            legacyLog.textFromEventDict,
+        )
+        self.assertNotIn("format", events[0])
+        self.assertNotIn("log_legacy", events[0])
+        self.assertEqual(legacyLog.textFromEventDict(events[0]),
+                         "Hello, world!")
+
+
+    def test_formatLogText(self):
+        """
+        A new-style event with the same format as L{publishToNewObserver}
+        gives legacy events, but no message, is forwarded to the legacy
+        observer with an old-style format.
+        """
+        event = self.observe(dict(log_format=u"{log_text}", log_text=u"Hi",
+                                  log_time=time(), log_level=LogLevel.info))
+        self.assertEqual(legacyLog.textFromEventDict(event), u"Hi")
+
+
     def test_failure(self):
         """
         Captured failures in the new style set the old-style C{"failure"},
@@ -470,3 +499,25 @@ class PublishToNewObserverTests(unittest.TestCase):
         self.assertEqual(
             self.events[0]["log_system"], self.events[0]["system"]
         )
+
+
+    def test_belowMinimumLevel(self):
+        """
+        An event below the lowest level the observer might observe is not
+        published, and its text is not extracted.
+        """
+        class Observer(object):
+            def __call__(oself, event):
+                self.events.append(event)
+            def _minimumLevelFor(oself, namespace):
+                return LogLevel.warn
+
+        def textFromEventDict(event):
+            self.fail("Text extracted.")
+
+        publishToNewObserver(
+            Observer(), self.legacyEvent("Hello"), textFromEventDict)
+        self.assertEqual(self.events, [])
+        publishToNewObserver(
+            Observer(), self.legacyEvent(isError=1), lambda event: None)
+        self.assertEqual(len(self.events), 1)
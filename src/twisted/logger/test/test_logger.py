@@ -10,7 +10,10 @@ from twisted.trial import unittest
 from .._levels import InvalidLogLevelError
 from .._levels import LogLevel
 from .._format import formatEvent
+from .. import _logger
 from .._logger import Logger
+from .._observer import LogPublisher
+from .._filter import FilteringLogObserver, LogLevelFilterPredicate
 from .._global import globalLogPublisher
 
 
@@ -266,3 +269,77 @@ class LoggerTests(unittest.TestCase):
 
         log = TestLogger(observer=publisher)
         log.info("Hello.", log_trace=[])
+
+
+    def test_belowMinimumLevel(self):
+        """
+        Events below the lowest level any observer of a L{Logger} might
+        observe are dropped before they are constructed.
+        """
+        events = []
+        predicate = LogLevelFilterPredicate(defaultLogLevel=LogLevel.warn)
+        publisher = LogPublisher(
+            FilteringLogObserver(events.append, [predicate]))
+        log = Logger(namespace="ns", observer=publisher)
+
+        log.info("Dropped.")
+        self.assertEqual(events, [])
+        log.warn("Kept.")
+        self.assertEqual(len(events), 1)
+
+        predicate.setLogLevelForNamespace("ns", LogLevel.debug)
+        log.info("Kept.")
+        self.assertEqual(len(events), 2)
+
+
+    def test_minimumLevelCached(self):
+        """
+        A L{Logger} asks its observer for the lowest level of event it might
+        observe only when the observer, the namespace or the levels observers
+        drop may have changed.
+        """
+        calls = []
+        class Observer(object):
+            def __init__(self, level):
+                self.level = level
+            def __call__(self, event):
+                pass
+            def _minimumLevelFor(self, namespace):
+                calls.append(namespace)
+                return self.level
+
+        log = Logger(namespace="ns", observer=Observer(LogLevel.warn))
+        log.info("Dropped.")
+        log.debug("Dropped.")
+        self.assertEqual(calls, ["ns"])
+
+        _logger._changeLevels()
+        log.info("Dropped.")
+        self.assertEqual(calls, ["ns", "ns"])
+
+        log.namespace = "other"
+        log.info("Dropped.")
+        self.assertEqual(calls, ["ns", "ns", "other"])
+
+        events = []
+        log.observer = events.append
+        log.info("Kept.")
+        self.assertEqual(len(events), 1)
+
+
+    def test_failureBelowMinimumLevel(self):
+        """
+        L{Logger.failure} does not capture the exception being handled if the
+        event would be dropped.
+        """
+        events = []
+        predicate = LogLevelFilterPredicate(defaultLogLevel=LogLevel.critical)
+        log = Logger(observer=LogPublisher(
+            FilteringLogObserver(events.append, [predicate])))
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            self.patch(_logger, "Failure", None)
+            log.failure("Dropped.", level=LogLevel.error)
+        self.assertEqual(events, [])
+
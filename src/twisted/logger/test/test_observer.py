@@ -9,9 +9,11 @@ from zope.interface.verify import verifyObject, BrokenMethodImplementation
 
 from twisted.trial import unittest
 
+from .._levels import LogLevel
 from .._logger import Logger
 from .._observer import ILogObserver
 from .._observer import LogPublisher
+from .._filter import LogLevelFilterPredicate
 
 
 
@@ -188,3 +190,101 @@ class LogPublisherTests(unittest.TestCase):
 
         self.assertEqual(traces[1], ((publisher, o1),))
         self.assertEqual(traces[2], ((publisher, o1), (publisher, o2)))
+
+
+    def test_minimumLevelUnknown(self):
+        """
+        L{LogPublisher._minimumLevelFor} returns L{None} if the publisher has
+        no observers, or any of its observers might observe events of any
+        level.
+        """
+        publisher = LogPublisher()
+        self.assertIsNone(publisher._minimumLevelFor("ns"))
+        publisher.addObserver(LevelObserver(LogLevel.warn))
+        publisher.addObserver(lambda e: None)
+        self.assertIsNone(publisher._minimumLevelFor("ns"))
+
+
+    def test_minimumLevel(self):
+        """
+        L{LogPublisher._minimumLevelFor} returns the lowest of the levels its
+        observers might observe events from the given namespace at.
+        """
+        publisher = LogPublisher(
+            LevelObserver(LogLevel.error), LevelObserver(LogLevel.warn))
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.warn)
+
+
+    def test_minimumLevelObserversChanged(self):
+        """
+        Adding and removing observers invalidates the levels cached by
+        L{LogPublisher._minimumLevelFor}.
+        """
+        warn = LevelObserver(LogLevel.warn)
+        publisher = LogPublisher(LevelObserver(LogLevel.error))
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.error)
+        publisher.addObserver(warn)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.warn)
+        publisher.removeObserver(warn)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.error)
+
+
+    def test_forwardedLevels(self):
+        """
+        A L{LogPublisher} with levels drops events below the level for their
+        namespace, and forwards those without a level, or with one it does not
+        recognize.
+        """
+        events = []
+        publisher = LogPublisher(events.append)
+        publisher._levels = LogLevelFilterPredicate(
+            defaultLogLevel=LogLevel.warn)
+        publisher._levels.setLogLevelForNamespace("a", LogLevel.debug)
+        kept = [
+            dict(log_level=LogLevel.warn, log_namespace="ns"),
+            dict(log_level=LogLevel.debug, log_namespace="a.b"),
+            dict(log_namespace="ns"),
+            dict(log_level="garbage", log_namespace="ns"),
+            dict(log_level=[], log_namespace="ns"),
+            dict(log_level=LogLevel.info, log_namespace=[]),
+        ]
+        for event in kept:
+            publisher(event)
+        publisher(dict(log_level=LogLevel.info, log_namespace="ns"))
+        publisher(dict(log_level=LogLevel.info))
+        self.assertEqual(events, kept)
+
+
+    def test_minimumLevelForwardedLevels(self):
+        """
+        L{LogPublisher._minimumLevelFor} returns no lower a level than the
+        publisher forwards from the given namespace.
+        """
+        publisher = LogPublisher(LevelObserver(LogLevel.info))
+        publisher._levels = LogLevelFilterPredicate(
+            defaultLogLevel=LogLevel.debug)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.info)
+        publisher._levels.setLogLevelForNamespace("ns", LogLevel.error)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.error)
+        publisher.addObserver(lambda e: None)
+        self.assertIs(publisher._minimumLevelFor("ns"), LogLevel.error)
+        self.assertIs(publisher._minimumLevelFor("other"), LogLevel.debug)
+
+
+
+class LevelObserver(object):
+    """
+    Observer which drops events below a fixed level.
+
+    @ivar level: The lowest level of event this observer might observe.
+    """
+    def __init__(self, level):
+        self.level = level
+
+
+    def __call__(self, event):
+        pass
+
+
+    def _minimumLevelFor(self, namespace):
+        return self.level
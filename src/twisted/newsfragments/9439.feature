@@ -0,0 +1 @@
+twisted.logger.formatEvent now formats events faster on Python 3, and twisted.logger.Logger no longer constructs events which every observer, such as a FilteringLogObserver with a LogLevelFilterPredicate, would drop for their level.
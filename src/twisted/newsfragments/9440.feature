@@ -0,0 +1 @@
+twisted.logger.ThreadedFileLogObserver writes log events to a file in batches from a dedicated thread, with a bounded queue whose overflow either blocks or drops and counts events, as chosen with twisted.logger.QueueOverflowPolicy.
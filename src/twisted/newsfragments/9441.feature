@@ -0,0 +1 @@
+twisted.logger.jsonFileLogObserver now encodes events faster, and the new twisted.logger.IndexedJSONLogFile keeps an index of a JSON log file so that events can be found by time, level and namespace without decoding the whole file.
@@ -0,0 +1 @@
+twisted.logger.globalLogBeginner.levels sets the lowest level of event published from each namespace; twisted.logger.Logger does not construct events below it, and twisted.python.log.msg does less work to publish to legacy observers.
@@ -0,0 +1 @@
+twisted.internet.ssl.optionsForClientTLS now accepts a sessionCache, a twisted.internet.ssl.ClientTLSSessionCache which stores sessions by hostname so later connections resume them; CertificateOptions accepts sessionTimeout, sessionTicketKeyLifetime to rotate session ticket keys while still resuming sessions ticketed with the previous key for one more lifetime, and handshakeStatistics to count full and resumed handshakes; twisted.web.client.BrowserLikePolicyForHTTPS resumes sessions when given a sessionCache.
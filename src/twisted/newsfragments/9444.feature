@@ -0,0 +1 @@
+twisted.protocols.tls.TLSMemoryBIOProtocol now encrypts the writes an application makes while handling received data, or while a non-streaming producer produces, together into full TLS records, writes all the resulting ciphertext to the transport at once, and delivers the data decrypted from several records with one dataReceived call.
@@ -0,0 +1 @@
+twisted.protocols.amp.BinaryBoxProtocol now parses all the complete boxes in the data it receives in one pass, and twisted.protocols.amp.Command compiles its argument and response schemas once instead of converting every argument through fromBox and toBox on every call.
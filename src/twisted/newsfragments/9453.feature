@@ -0,0 +1 @@
+twisted.protocols.amp now has a Stream argument type, which sends byte strings of any length from an IPushProducer to an IConsumer with per-stream flow control, and BoxDispatcher.maxOutstanding, which limits how many requests may await a response at once and queues the rest.
@@ -0,0 +1 @@
+Perspective Broker calls carrying large lists and dictionaries are now several times faster: twisted.spread.jelly dispatches on the type of each object through a per-class table and copies strings and numbers in containers as they are, and twisted.spread.banana encodes lists of primitives and decodes whole receive buffers in single passes.
@@ -148,7 +148,13 @@ be generated and any ordering must be accepted.  This applies to the
 command-related keys I{_command} and I{_ask} as well as any other keys.
 
 Values are limited to the maximum encodable size in a 16-bit length, 65535
-bytes.
+bytes.  Longer byte strings can be sent with the L{Stream} argument type, whose
+value in a box only identifies a stream of bytes carried by boxes of its own.
+Those boxes have a I{_stream} key instead of a I{_command}, I{_answer} or
+I{_error} key.  The first of them announces, with a I{_stream_window} key, how
+many bytes the sender will have in flight at most, and the peer grants the
+sender credit for more, with boxes with a I{_stream_credit} key, as the
+receiving application consumes them.
 
 Keys are limited to the maximum encodable size in a 8-bit length, 255 bytes.
 Note that we still use 2-byte lengths to encode keys.  This small redundancy
@@ -199,8 +205,9 @@ __metaclass__ = type
 
 import types, warnings
 
+from collections import deque
 from io import BytesIO
-from struct import pack
+from struct import pack, Struct
 import decimal, datetime
 from functools import partial
 from itertools import count
@@ -215,11 +222,13 @@ from twisted.python._tzhelper import (
 
 from twisted.python import log, filepath
 
-from twisted.internet.interfaces import IFileDescriptorReceiver
+from twisted.internet.interfaces import (
+    IConsumer, IFileDescriptorReceiver, IPushProducer)
 from twisted.internet.main import CONNECTION_LOST
 from twisted.internet.error import PeerVerifyError, ConnectionLost
 from twisted.internet.error import ConnectionClosed
-from twisted.internet.defer import Deferred, maybeDeferred, fail
+from twisted.internet.defer import (
+    CancelledError, Deferred, maybeDeferred, fail)
 from twisted.protocols.basic import Int16StringReceiver, StatefulStringProtocol
 from twisted.python.compat import (
     iteritems, unicode, nativeString, intToBytes, _PY3, long,
@@ -283,6 +292,7 @@ __all__ = [
     'RemoteAmpError',
     'SimpleStringLocator',
     'StartTLS',
+    'Stream',
     'String',
     'TooLong',
     'UNHANDLED_ERROR_CODE',
@@ -306,9 +316,20 @@ ERROR_DESCRIPTION = b'_error_description'
 UNKNOWN_ERROR_CODE = b'UNKNOWN'
 UNHANDLED_ERROR_CODE = b'UNHANDLED'
 
+_STREAM = b'_stream'
+_STREAM_DATA = b'_stream_data'
+_STREAM_END = b'_stream_end'
+_STREAM_ERROR = b'_stream_error'
+_STREAM_CREDIT = b'_stream_credit'
+_STREAM_BYTES = b'_stream_bytes'
+_STREAM_STOP = b'_stream_stop'
+_STREAM_WINDOW = b'_stream_window'
+
 MAX_KEY_LENGTH = 0xff
 MAX_VALUE_LENGTH = 0xffff
 
+_int16 = Struct("!H")
+
 
 
 class IArgumentType(Interface):
@@ -689,6 +710,7 @@ class AmpBox(dict):
         i = sorted(iteritems(self))
         L = []
         w = L.append
+        packLength = _int16.pack
         for k, v in i:
             if type(k) == unicode:
                 raise TypeError("Unicode key not allowed: %r" % k)
@@ -699,10 +721,11 @@ class AmpBox(dict):
                 raise TooLong(True, True, k, None)
             if len(v) > MAX_VALUE_LENGTH:
                 raise TooLong(False, True, v, k)
-            for kv in k, v:
-                w(pack("!H", len(kv)))
-                w(kv)
-        w(pack("!H", 0))
+            w(packLength(len(k)))
+            w(k)
+            w(packLength(len(v)))
+            w(v)
+        w(b'\x00\x00')
         return b''.join(L)
 
 
@@ -808,15 +831,56 @@ class BoxDispatcher:
     @ivar boxSender: an object which can send boxes, via the L{_sendBoxCommand}
     method, such as an L{AMP} instance.
     @type boxSender: L{IBoxSender}
+
+    @ivar maxOutstanding: The most requests which may be waiting for a
+        response at once, or L{None} for no limit.  Further requests are
+        queued, and sent in order as responses come back.
+    @type maxOutstanding: L{int} or L{None}
+
+    @ivar streamWindow: How many bytes of each L{Stream} sent from this side
+        may be in flight at once.  The peer is told, in the first box of the
+        stream, and buffers no more than this while the stream's consumer is
+        paused or not there yet.  It also limits the windows the peer
+        announces for the streams it sends, so that this side buffers no more
+        than this either.
+    @type streamWindow: L{int}
+
+    @ivar _queuedRequests: the requests waiting for room under
+        C{maxOutstanding}, as 5-tuples of the command name, the box, whether
+        an answer is required, the L{Deferred} which was returned for it (or
+        L{None}) and the L{_OutgoingStream}s to start once it is sent.
+
+    @ivar _outgoingStreams: a dictionary mapping stream IDs to the
+        L{_OutgoingStream}s this side is sending.
+
+    @ivar _unsentStreams: the L{_OutgoingStream}s of the box being converted,
+        which are started once that box has been sent, so that the peer gets
+        the box which refers to a stream before any of the stream's boxes.
+
+    @ivar _incomingStreams: a dictionary mapping stream IDs to the
+        L{_IncomingStream}s the peer is sending.
+
+    @ivar _claimedStreams: the L{_IncomingStream}s claimed by the arguments
+        of the command being dispatched or the answer being received, or
+        L{None} if there is neither.
     """
 
     _failAllReason = None
     _outstandingRequests = None
+    _queuedRequests = None
     _counter = long(0)
+    _streamCounter = long(0)
+    _claimedStreams = None
     boxSender = None
+    maxOutstanding = None
+    streamWindow = 2 ** 18
 
     def __init__(self, locator):
         self._outstandingRequests = {}
+        self._queuedRequests = deque()
+        self._outgoingStreams = {}
+        self._unsentStreams = []
+        self._incomingStreams = {}
         self.locator = locator
 
 
@@ -833,9 +897,15 @@ class BoxDispatcher:
     def stopReceivingBoxes(self, reason):
         """
         No further boxes will be received here.  Terminate all currently
-        outstanding command deferreds with the given reason.
+        outstanding command deferreds, and all streams, with the given reason.
         """
         self.failAllOutgoing(reason)
+        outgoing, self._outgoingStreams = self._outgoingStreams, {}
+        for stream in outgoing.values():
+            stream._connectionLost()
+        incoming, self._incomingStreams = self._incomingStreams, {}
+        for stream in incoming.values():
+            stream._end(reason)
 
 
     def failAllOutgoing(self, reason):
@@ -849,6 +919,10 @@ class BoxDispatcher:
         self._outstandingRequests = None # we can never send another request
         for key, value in OR:
             value.errback(reason)
+        queued, self._queuedRequests = self._queuedRequests, deque()
+        for command, box, requiresAnswer, result, streams in queued:
+            if result is not None:
+                result.errback(reason)
 
 
     def _nextTag(self):
@@ -866,13 +940,18 @@ class BoxDispatcher:
             return (b'%x' % (self._counter,))
 
 
-    def _sendBoxCommand(self, command, box, requiresAnswer=True):
+    def _sendBoxCommand(self, command, box, requiresAnswer=True,
+                        immediate=False):
         """
         Send a command across the wire with the given C{amp.Box}.
 
         Mutate the given box to give it any additional keys (_command, _ask)
         required for the command and request/response machinery, then send it.
 
+        If L{maxOutstanding} requests are already waiting for a response, or
+        other requests are queued, the command is queued instead, and sent
+        when there is room for it.
+
         If requiresAnswer is True, returns a C{Deferred} which fires when a
         response is received. The C{Deferred} is fired with an C{amp.Box} on
         success, or with an C{amp.RemoteAmpError} if an error is received.
@@ -888,13 +967,37 @@ class BoxDispatcher:
         Deferred which will fire when the other side responds to this command.
         If False, return None and do not ask the other side for acknowledgement.
 
+        @param immediate: a boolean.  Defaults to False.  If True, send the
+        command right away, even if it does not fit in L{maxOutstanding}.
+        Commands which change the connection, like L{StartTLS}, must not wait.
+
         @return: a Deferred which fires the AmpBox that holds the response to
         this command, or None, as specified by requiresAnswer.
 
         @raise ProtocolSwitched: if the protocol has been switched.
         """
+        streams, self._unsentStreams = self._unsentStreams, []
         if self._failAllReason is not None:
             return fail(self._failAllReason)
+        if not immediate and (
+                self._queuedRequests or
+                (requiresAnswer and self.maxOutstanding is not None and
+                 len(self._outstandingRequests) >= self.maxOutstanding)):
+            if requiresAnswer:
+                result = Deferred()
+            else:
+                result = None
+            self._queuedRequests.append(
+                (command, box, requiresAnswer, result, streams))
+            return result
+        return self._sendBoxCommandNow(command, box, requiresAnswer, streams)
+
+
+    def _sendBoxCommandNow(self, command, box, requiresAnswer, streams=()):
+        """
+        Send a command across the wire, as L{_sendBoxCommand} does, without
+        regard to L{maxOutstanding}, and then start the streams it refers to.
+        """
         box[COMMAND] = command
         tag = self._nextTag()
         if requiresAnswer:
@@ -904,9 +1007,36 @@ class BoxDispatcher:
             result = self._outstandingRequests[tag] = Deferred()
         else:
             result = None
+        for stream in streams:
+            stream._start()
         return result
 
 
+    def _sendQueuedRequests(self):
+        """
+        Send queued requests, in order, for as long as there is room for them
+        under L{maxOutstanding}.
+        """
+        queued = self._queuedRequests
+        while queued:
+            command, box, requiresAnswer, result, streams = queued[0]
+            if (requiresAnswer and self.maxOutstanding is not None and
+                    len(self._outstandingRequests) >= self.maxOutstanding):
+                break
+            queued.popleft()
+            try:
+                sent = self._sendBoxCommandNow(
+                    command, box, requiresAnswer, streams)
+            except:
+                if result is None:
+                    log.err(None, "Sending a queued AMP request failed")
+                else:
+                    result.errback()
+            else:
+                if result is not None:
+                    sent.chainDeferred(result)
+
+
     def callRemoteString(self, command, requiresAnswer=True, **kw):
         """
         This is a low-level API, designed only for optimizing simple messages
@@ -968,7 +1098,12 @@ class BoxDispatcher:
             co = commandType(*a, **kw)
         except:
             return fail()
-        return co._doCommand(self)
+        try:
+            return co._doCommand(self)
+        finally:
+            # If the arguments could not be converted, the streams started for
+            # some of them will never be sent.
+            self._unsentStreams = []
 
 
     def unhandledError(self, failure):
@@ -987,8 +1122,15 @@ class BoxDispatcher:
         @param box: an AmpBox with a value for its L{ANSWER} key.
         """
         question = self._outstandingRequests.pop(box[ANSWER])
+        self._sendQueuedRequests()
         question.addErrback(self.unhandledError)
-        question.callback(box)
+        claimed = []
+        question.addBoth(self._abandonStreams, claimed)
+        claimed, self._claimedStreams = self._claimedStreams, claimed
+        try:
+            question.callback(box)
+        finally:
+            self._claimedStreams = claimed
 
 
     def _errorReceived(self, box):
@@ -1000,6 +1142,7 @@ class BoxDispatcher:
         and L{ERROR_DESCRIPTION} keys.
         """
         question = self._outstandingRequests.pop(box[ERROR])
+        self._sendQueuedRequests()
         question.addErrback(self.unhandledError)
         errorCode = box[ERROR_CODE]
         description = box[ERROR_DESCRIPTION]
@@ -1040,13 +1183,68 @@ class BoxDispatcher:
             errorBox[ERROR_DESCRIPTION] = desc
             errorBox[ERROR_CODE] = code
             return errorBox
-        deferred = self.dispatchCommand(box)
+        claimed, self._claimedStreams = self._claimedStreams, []
+        try:
+            deferred = self.dispatchCommand(box)
+        finally:
+            claimed, self._claimedStreams = self._claimedStreams, claimed
+        deferred.addBoth(self._abandonStreams, claimed)
         if ASK in box:
             deferred.addCallbacks(formatAnswer, formatError)
-            deferred.addCallback(self._safeEmit)
+            deferred.addCallback(self._sendAnswer)
+        else:
+            deferred.addBoth(self._discardUnsentStreams)
         deferred.addErrback(self.unhandledError)
 
 
+    def _abandonStreams(self, result, streams):
+        """
+        A responder, or the callbacks for an answer, are finished; stop the
+        streams the arguments referred to which have not been delivered, so
+        that their senders do not wait for credit forever.
+
+        @param result: the result of the responder or callbacks, which is
+            passed on.
+
+        @param streams: the L{_IncomingStream}s claimed by the arguments.
+        @type streams: L{list}
+
+        @return: C{result}
+        """
+        for stream in streams:
+            if stream._consumer is None:
+                stream.stopProducing()
+        return result
+
+
+    def _sendAnswer(self, answerBox):
+        """
+        Send the answer or error box for a command, and start the streams the
+        answer refers to once it has been sent.
+
+        @param answerBox: an L{AmpBox} with a value for its L{ANSWER} or
+            L{ERROR} key.
+        """
+        streams, self._unsentStreams = self._unsentStreams, []
+        self._safeEmit(answerBox)
+        if ANSWER in answerBox:
+            for stream in streams:
+                stream._start()
+
+
+    def _discardUnsentStreams(self, result):
+        """
+        Forget the streams of a response which will not be sent, because the
+        command did not ask for one.
+
+        @param result: the response, which is passed on.
+
+        @return: C{result}
+        """
+        self._unsentStreams = []
+        return result
+
+
     def ampBoxReceived(self, box):
         """
         An AmpBox was received, representing a command, or an answer to a
@@ -1065,10 +1263,130 @@ class BoxDispatcher:
             self._errorReceived(box)
         elif COMMAND in box:
             self._commandReceived(box)
+        elif _STREAM in box:
+            self._streamBoxReceived(box)
+        elif _STREAM_CREDIT in box:
+            stream = self._outgoingStreams.get(box[_STREAM_CREDIT])
+            if stream is not None:
+                stream._creditReceived(int(box[_STREAM_BYTES]))
+        elif _STREAM_STOP in box:
+            stream = self._outgoingStreams.pop(box[_STREAM_STOP], None)
+            if stream is not None:
+                stream._stopRequested()
         else:
             raise NoEmptyBoxes(box)
 
 
+    def _streamBoxReceived(self, box):
+        """
+        A box carrying part of a L{Stream} from the peer was received.
+
+        @param box: an L{AmpBox} with a value for its C{_stream} key, and for
+            one of its C{_stream_data}, C{_stream_end} and C{_stream_error}
+            keys.
+        """
+        stream = self._incomingStreams.get(box[_STREAM])
+        if stream is None:
+            # The box referring to a stream is always sent before the stream,
+            # so nothing which has been received refers to this one, and
+            # nothing ever will.  The first box of the stream, which announces
+            # its window, is answered by asking the peer to stop it.
+            if _STREAM_DATA in box and _STREAM_WINDOW in box:
+                self._safeEmit(AmpBox({_STREAM_STOP: box[_STREAM]}))
+            return
+        if _STREAM_WINDOW in box:
+            stream._window = min(int(box[_STREAM_WINDOW]), self.streamWindow)
+        if _STREAM_DATA in box:
+            stream._dataReceived(box[_STREAM_DATA])
+        elif _STREAM_END in box:
+            stream._end(None)
+        else:
+            description = box.get(_STREAM_ERROR, b'')
+            stream._end(Failure(UnknownRemoteError(
+                description.decode("utf-8", "replace"))))
+
+
+    def _getIncomingStream(self, streamID):
+        """
+        Find the stream the peer is sending with the given ID, or start
+        keeping track of a new one.
+
+        @param streamID: the ID the peer gave the stream.
+        @type streamID: L{bytes}
+
+        @rtype: L{_IncomingStream}
+        """
+        stream = self._incomingStreams.get(streamID)
+        if stream is None:
+            stream = self._incomingStreams[streamID] = _IncomingStream(
+                self, streamID)
+        return stream
+
+
+    def _claimStream(self, streamID):
+        """
+        Get the stream the peer is sending with the given ID, for the value of
+        a L{Stream} argument.
+
+        @param streamID: the ID the peer gave the stream.
+        @type streamID: L{bytes}
+
+        @rtype: L{_IncomingStream}
+        """
+        stream = self._getIncomingStream(streamID)
+        stream._claimed = True
+        if self._claimedStreams is not None:
+            self._claimedStreams.append(stream)
+        if stream._finished:
+            self._forgetIncomingStream(stream)
+        return stream
+
+
+    def _forgetIncomingStream(self, stream):
+        """
+        Stop keeping track of a stream the peer sent, once it has both ended
+        and been claimed by a L{Stream} argument.
+
+        @param stream: the stream.
+        @type stream: L{_IncomingStream}
+        """
+        if self._incomingStreams.get(stream._streamID) is stream:
+            del self._incomingStreams[stream._streamID]
+
+
+    def _startStream(self, producer):
+        """
+        Prepare to send the bytes a producer produces to the peer, for the
+        value of a L{Stream} argument.  The producer is started once the box
+        with the argument has been sent.
+
+        @param producer: an L{IPushProducer} provider with a
+            C{startProducing} method, as described by L{Stream}.
+
+        @return: the ID of the new stream.
+        @rtype: L{bytes}
+        """
+        self._streamCounter += 1
+        if _PY3:
+            streamID = (u'%x' % (self._streamCounter,)).encode("ascii")
+        else:
+            streamID = b'%x' % (self._streamCounter,)
+        self._unsentStreams.append(_OutgoingStream(
+            self, streamID, producer, self.streamWindow))
+        return streamID
+
+
+    def _forgetOutgoingStream(self, stream):
+        """
+        Stop keeping track of a stream this side has finished sending.
+
+        @param stream: the stream.
+        @type stream: L{_OutgoingStream}
+        """
+        if self._outgoingStreams.get(stream._streamID) is stream:
+            del self._outgoingStreams[stream._streamID]
+
+
     def _safeEmit(self, aBox):
         """
         Emit a box, ignoring L{ProtocolSwitched} and L{ConnectionLost} errors
@@ -1635,20 +1953,21 @@ class AmpList(Argument):
             "AmpList should be defined with a list of (name, argument) "
             "tuples where `name' is a byte string, got: %r" % (subargs, ))
         self.subargs = subargs
+        self._codec = _ArgumentCodec(subargs)
         Argument.__init__(self, optional)
 
 
     def fromStringProto(self, inString, proto):
         boxes = parseString(inString)
-        values = [_stringsToObjects(box, self.subargs, proto)
-                  for box in boxes]
+        fromBox = self._codec.fromBox
+        values = [fromBox(box, proto) for box in boxes]
         return values
 
 
     def toStringProto(self, inObject, proto):
-        return b''.join([_objectsToStrings(
-                    objects, self.subargs, Box(), proto
-                    ).serialize() for objects in inObject])
+        toBox = self._codec.toBox
+        return b''.join([toBox(objects, Box(), proto).serialize()
+                         for objects in inObject])
 
 
 
@@ -1718,6 +2037,452 @@ class Descriptor(Integer):
 
 
 
+
+class Stream(Argument):
+    """
+    Send a stream of bytes of any length, with flow control.
+
+    The bytes do not travel in the box which carries the argument, so they are
+    not subject to L{MAX_VALUE_LENGTH}.  The box carries an identifier for the
+    stream, and the bytes follow in boxes of their own, which the peer
+    consumes as they arrive; other commands and responses may be exchanged in
+    the meantime.
+
+    The object passed for a L{Stream} argument, or returned for one by a
+    responder, must be an L{IPushProducer} provider with a
+    C{startProducing(consumer)} method which writes the bytes to the
+    L{IConsumer} it is given and returns a L{Deferred} which fires when it has
+    written them all, such as
+    L{FileBodyProducer<twisted.web.client.FileBodyProducer>}.  It is paused
+    whenever L{BoxDispatcher.streamWindow} bytes are in flight, and resumed
+    when the peer has consumed some of them.
+
+    The object received for a L{Stream} argument is an L{IPushProducer}
+    provider with a C{deliverTo(consumer)} method.  That registers it as a
+    streaming producer with the given L{IConsumer}, writes the bytes of the
+    stream to it and returns a L{Deferred} which fires with L{None} after
+    unregistering when the stream ends, or fails if the sender failed or the
+    connection was lost.  Until C{deliverTo} is called, or while the consumer
+    has paused it, the sender sends no more than its
+    L{BoxDispatcher.streamWindow} bytes, and a stream which sends more, or
+    more than the receiver's own L{BoxDispatcher.streamWindow}, is failed with
+    L{MalformedAmpBox}.  A responder must call C{deliverTo} before its result
+    is ready; the streams it has not delivered by then, like those of a
+    command which could not be dispatched, are stopped.  Likewise, the
+    streams of a response must be delivered by the callbacks added to the
+    L{Deferred} returned by L{BoxDispatcher.callRemote}, and those which
+    have not been when the callbacks are finished are stopped.
+
+    Both sides of the connection must use a L{BoxDispatcher}, such as L{AMP},
+    which is also the protocol the argument is converted for.  The peer only
+    gets stream boxes for commands whose schema it shares, so declaring a
+    L{Stream} argument is what tells both sides to expect them.
+    """
+
+    def fromStringProto(self, inString, proto):
+        """
+        Get the stream identified by C{inString}.
+
+        @param inString: the identifier the peer gave the stream.
+        @type inString: L{bytes}
+
+        @param proto: the L{BoxDispatcher} receiving the stream.
+
+        @return: an L{IPushProducer} provider with a C{deliverTo} method.
+        """
+        return proto._claimStream(inString)
+
+
+    def toStringProto(self, inObject, proto):
+        """
+        Start sending what C{inObject} produces as a new stream.
+
+        @param inObject: the producer of the bytes.
+
+        @param proto: the L{BoxDispatcher} sending the stream.
+
+        @return: the identifier of the stream.
+        @rtype: L{bytes}
+        """
+        return proto._startStream(inObject)
+
+
+
+@implementer(IPushProducer)
+class _IncomingStream(object):
+    """
+    The receiving end of a L{Stream}.
+
+    @ivar _streamID: the identifier the peer gave the stream.
+    @type _streamID: L{bytes}
+
+    @ivar _window: how many bytes the peer may send before it is granted
+        more credit, as it announced in the first box of the stream.
+    @type _window: L{int}
+
+    @ivar _buffer: the chunks of bytes received and not yet delivered.
+    @type _buffer: L{collections.deque} of L{bytes}
+
+    @ivar _uncredited: how many bytes have been delivered since the peer was
+        last granted credit for them.
+    @type _uncredited: L{int}
+
+    @ivar _outstanding: how many bytes have been received since the peer was
+        last granted credit, which may not exceed C{_window}.
+    @type _outstanding: L{int}
+
+    @ivar _claimed: whether a L{Stream} argument has referred to this stream.
+
+    @ivar _finished: whether the end of the stream, or an error, was received.
+
+    @ivar _reason: L{None} if the stream ended normally, or the L{Failure} it
+        ended with.
+    """
+    _consumer = None
+    _done = None
+    _paused = False
+    _stopped = False
+    _claimed = False
+    _finished = False
+    _reason = None
+    _window = BoxDispatcher.streamWindow
+
+    def __init__(self, dispatcher, streamID):
+        self._dispatcher = dispatcher
+        self._streamID = streamID
+        self._buffer = deque()
+        self._uncredited = 0
+        self._outstanding = 0
+
+
+    def deliverTo(self, consumer):
+        """
+        Write the bytes of the stream to a consumer.
+
+        @param consumer: the consumer, with which this is registered as a
+            streaming producer.
+        @type consumer: L{IConsumer} provider
+
+        @return: a L{Deferred} which fires with L{None} when the stream has
+            been delivered, or fails if it could not be.
+
+        @raise RuntimeError: if the stream is already being delivered.
+        """
+        if self._consumer is not None:
+            raise RuntimeError("Stream is already being delivered.")
+        self._consumer = consumer
+        done = self._done = Deferred()
+        consumer.registerProducer(self, True)
+        self._deliver()
+        return done
+
+
+    def pauseProducing(self):
+        """
+        Stop delivering bytes, and granting the peer credit to send more.
+        """
+        self._paused = True
+
+
+    def resumeProducing(self):
+        """
+        Deliver what has been received, and grant the peer credit for it.
+        """
+        self._paused = False
+        self._deliver()
+
+
+    def stopProducing(self):
+        """
+        Discard the rest of the stream, and ask the peer to stop sending it.
+        The L{Deferred} returned by L{deliverTo} fails with
+        L{CancelledError}.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._buffer.clear()
+        if not self._finished:
+            # Whatever the peer has already sent is dropped, until its
+            # acknowledgement that it has stopped ends the stream.
+            self._dispatcher._safeEmit(AmpBox({_STREAM_STOP: self._streamID}))
+        done, self._done = self._done, None
+        if done is not None:
+            done.errback(CancelledError())
+
+
+    def _dataReceived(self, data):
+        """
+        A chunk of the stream was received.  If the peer sent more than its
+        window allows, the rest of the stream is discarded and the peer is
+        asked to stop sending it.
+
+        @param data: the chunk.
+        @type data: L{bytes}
+        """
+        if self._stopped or self._finished:
+            return
+        self._outstanding += len(data)
+        if self._outstanding > self._window:
+            self._buffer.clear()
+            self._dispatcher._safeEmit(AmpBox({_STREAM_STOP: self._streamID}))
+            self._end(Failure(MalformedAmpBox(
+                "Stream %r exceeded its window of %d bytes" % (
+                    self._streamID, self._window))))
+            return
+        self._buffer.append(data)
+        self._deliver()
+
+
+    def _end(self, reason):
+        """
+        The stream ended.
+
+        @param reason: L{None} if the whole stream was received, or a
+            L{Failure} if it was not.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self._reason = reason
+        if self._claimed:
+            self._dispatcher._forgetIncomingStream(self)
+        self._deliver()
+
+
+    def _deliver(self):
+        """
+        Write what has been received to the consumer, unless there is no
+        consumer yet or it is paused, and then grant the peer more credit, or
+        finish if the stream has ended.
+        """
+        consumer = self._consumer
+        if consumer is None or self._stopped:
+            return
+        buffer = self._buffer
+        while buffer and not self._paused:
+            data = buffer.popleft()
+            self._uncredited += len(data)
+            consumer.write(data)
+        if self._stopped or buffer:
+            return
+        if self._finished:
+            # Once everything received has been delivered, a failure is not
+            # held back while the consumer is paused.
+            if self._paused and self._reason is None:
+                return
+            self._stopped = True
+            consumer.unregisterProducer()
+            done, self._done = self._done, None
+            if self._reason is None:
+                done.callback(None)
+            else:
+                done.errback(self._reason)
+        elif not self._paused and self._uncredited >= self._window // 2:
+            self._dispatcher._safeEmit(AmpBox({
+                _STREAM_CREDIT: self._streamID,
+                _STREAM_BYTES: intToBytes(self._uncredited)}))
+            self._outstanding -= self._uncredited
+            self._uncredited = 0
+
+
+
+@implementer(IConsumer)
+class _OutgoingStream(object):
+    """
+    The sending end of a L{Stream}.
+
+    @ivar _streamID: the identifier of the stream.
+    @type _streamID: L{bytes}
+
+    @ivar _producer: the producer of the bytes of the stream.
+
+    @ivar _window: how many bytes may be in flight before the producer is
+        paused.
+    @type _window: L{int}
+
+    @ivar _inFlight: how many bytes have been sent without the peer granting
+        credit for them.
+    @type _inFlight: L{int}
+
+    @ivar _pending: the bytes written by the producer which did not fit in
+        the window, to be sent as the peer grants credit.
+    @type _pending: L{collections.deque} of L{bytes}
+
+    @ivar _produced: whether the producer has written everything, so that the
+        stream ends once C{_pending} has been sent.
+
+    @ivar _done: whether the stream has ended, been stopped by the peer or
+        been cut short by the connection being lost.
+
+    @ivar _announced: whether the window has been sent to the peer.
+    """
+    _paused = False
+    _produced = False
+    _done = False
+    _announced = False
+
+    def __init__(self, dispatcher, streamID, producer, window):
+        self._dispatcher = dispatcher
+        self._streamID = streamID
+        self._producer = producer
+        self._window = window
+        self._inFlight = 0
+        self._pending = deque()
+
+
+    def _start(self):
+        """
+        Start the producer, once the box which refers to the stream has been
+        sent.
+        """
+        self._dispatcher._outgoingStreams[self._streamID] = self
+        d = maybeDeferred(self._producer.startProducing, self)
+        d.addCallbacks(self._finished, self._failed)
+
+
+    def _send(self, box):
+        """
+        Send a box of this stream to the peer, announcing the window in the
+        first one.
+
+        @param box: an L{AmpBox} with a value for one of its C{_stream_data},
+            C{_stream_end} and C{_stream_error} keys.
+        """
+        box[_STREAM] = self._streamID
+        if not self._announced:
+            self._announced = True
+            box[_STREAM_WINDOW] = intToBytes(self._window)
+        self._dispatcher._safeEmit(box)
+
+
+    def registerProducer(self, producer, streaming):
+        """
+        Pause and resume C{producer}, instead of the producer the stream was
+        started with, as the peer grants credit.
+
+        @param producer: an L{IPushProducer} provider.
+
+        @param streaming: must be L{True}.
+        """
+        self._producer = producer
+
+
+    def unregisterProducer(self):
+        """
+        Nothing to do; the stream ends when the L{Deferred} returned by
+        C{startProducing} fires.
+        """
+
+
+    def write(self, data):
+        """
+        Send as many of some bytes to the peer as the window allows, and pause
+        the producer if the peer has not granted enough credit for more.
+
+        @param data: the bytes.
+        @type data: L{bytes}
+        """
+        if self._done or not data:
+            return
+        self._pending.append(data)
+        self._sendPending()
+        if not self._paused and self._pending:
+            self._paused = True
+            self._producer.pauseProducing()
+
+
+    def _sendPending(self):
+        """
+        Send the pending bytes which fit in the window, in boxes of up to
+        L{MAX_VALUE_LENGTH} bytes, and end the stream if the producer has
+        written everything and it has all been sent.
+        """
+        pending = self._pending
+        while pending and self._inFlight < self._window:
+            data = pending.popleft()
+            room = self._window - self._inFlight
+            if len(data) > room:
+                pending.appendleft(data[room:])
+                data = data[:room]
+            for offset in range(0, len(data), MAX_VALUE_LENGTH):
+                self._send(AmpBox({
+                    _STREAM_DATA: data[offset:offset + MAX_VALUE_LENGTH]}))
+            self._inFlight += len(data)
+        if self._produced and not pending and not self._done:
+            self._done = True
+            self._dispatcher._forgetOutgoingStream(self)
+            self._send(AmpBox({_STREAM_END: b''}))
+
+
+    def _creditReceived(self, count):
+        """
+        The peer has consumed some bytes; send what is pending, and resume
+        the producer if it was paused and all of that fit in the window.
+
+        @param count: how many bytes the peer consumed.
+        @type count: L{int}
+        """
+        self._inFlight -= count
+        if self._done:
+            return
+        self._sendPending()
+        if (self._paused and not self._done and not self._pending and
+                self._inFlight < self._window):
+            self._paused = False
+            self._producer.resumeProducing()
+
+
+    def _finished(self, ignored):
+        """
+        The producer has written everything; tell the peer the stream ended,
+        once the rest of it has been sent.
+        """
+        self._produced = True
+        self._sendPending()
+
+
+    def _failed(self, reason):
+        """
+        The producer failed; tell the peer, unless the stream was already
+        stopped, in which case the failure is the producer being stopped.
+        """
+        if not self._done:
+            self._done = True
+            self._pending.clear()
+            self._dispatcher._forgetOutgoingStream(self)
+            log.err(reason, "Producing an AMP stream failed")
+            description = reason.getErrorMessage()
+            if isinstance(description, unicode):
+                description = description.encode("utf-8", "replace")
+            self._send(AmpBox({_STREAM_ERROR: description}))
+
+
+    def _stopRequested(self):
+        """
+        The peer does not want the rest of the stream; stop the producer, and
+        end the stream so the peer knows nothing more is coming.
+        """
+        if not self._done:
+            self._done = True
+            self._pending.clear()
+            if not self._produced:
+                self._producer.stopProducing()
+            self._send(AmpBox({_STREAM_END: b''}))
+
+
+    def _connectionLost(self):
+        """
+        The connection was lost; stop the producer.
+        """
+        if not self._done:
+            self._done = True
+            self._pending.clear()
+            if not self._produced:
+                self._producer.stopProducing()
+
+
+
 class Command:
     """
     Subclass me to specify an AMP Command.
@@ -1769,6 +2534,7 @@ class Command:
         def __new__(cls, name, bases, attrs):
             reverseErrors = attrs['reverseErrors'] = {}
             er = attrs['allErrors'] = {}
+            attrs['_codecs'] = {}
             if 'commandName' not in attrs:
                 if _PY3:
                     attrs['commandName'] = name.encode("ascii")
@@ -1832,6 +2598,10 @@ class Command:
 
     requiresAnswer = True
 
+    # Set on commands which change the connection, so that they are not
+    # queued behind other requests by BoxDispatcher.maxOutstanding.
+    _immediate = False
+
 
     def __init__(self, **kw):
         """
@@ -1853,15 +2623,31 @@ class Command:
         @raise InvalidSignature: if you forgot any required arguments.
         """
         self.structured = kw
-        forgotten = []
-        for name, arg in self.arguments:
-            pythonName = _wireNameToPythonIdentifier(name)
-            if pythonName not in self.structured and not arg.optional:
-                forgotten.append(pythonName)
+        forgotten = [pythonName
+                     for pythonName in self._getCodec('arguments').required
+                     if pythonName not in kw]
         if forgotten:
             raise InvalidSignature("forgot %s for %s" % (
                 ', '.join(forgotten), self.commandName))
-        forgotten = []
+
+
+    def _getCodec(cls, attribute):
+        """
+        Get the L{_ArgumentCodec} for one of this L{Command}'s argument lists,
+        compiling it the first time it is needed, or if the list has been
+        replaced since.
+
+        @param attribute: C{'arguments'} or C{'response'}.
+        @type attribute: native L{str}
+
+        @rtype: L{_ArgumentCodec}
+        """
+        arglist = getattr(cls, attribute)
+        codec = cls._codecs.get(attribute)
+        if codec is None or codec.arglist is not arglist:
+            codec = cls._codecs[attribute] = _ArgumentCodec(arglist)
+        return codec
+    _getCodec = classmethod(_getCodec)
 
 
     def makeResponse(cls, objects, proto):
@@ -1881,7 +2667,7 @@ class Command:
             responseType = cls.responseType()
         except:
             return fail()
-        return _objectsToStrings(objects, cls.response, responseType, proto)
+        return cls._getCodec('response').toBox(objects, responseType, proto)
     makeResponse = classmethod(makeResponse)
 
 
@@ -1898,16 +2684,13 @@ class Command:
 
         @return: An instance of this L{Command}'s C{commandType}.
         """
-        allowedNames = set()
-        for (argName, ignored) in cls.arguments:
-            allowedNames.add(_wireNameToPythonIdentifier(argName))
-
+        codec = cls._getCodec('arguments')
+        allowedNames = codec.pythonNames
         for intendedArg in objects:
             if intendedArg not in allowedNames:
                 raise InvalidSignature(
                     "%s is not a valid argument" % (intendedArg,))
-        return _objectsToStrings(objects, cls.arguments, cls.commandType(),
-                                 proto)
+        return codec.toBox(objects, cls.commandType(), proto)
     makeArguments = classmethod(makeArguments)
 
 
@@ -1923,7 +2706,7 @@ class Command:
         @return: A mapping of response-argument names to the parsed
         forms.
         """
-        return _stringsToObjects(box, cls.response, protocol)
+        return cls._getCodec('response').fromBox(box, protocol)
     parseResponse = classmethod(parseResponse)
 
 
@@ -1938,7 +2721,7 @@ class Command:
 
         @return: A mapping of argument names to the parsed forms.
         """
-        return _stringsToObjects(box, cls.arguments, protocol)
+        return cls._getCodec('arguments').fromBox(box, protocol)
     parseArguments = classmethod(parseArguments)
 
 
@@ -1997,9 +2780,13 @@ class Command:
                                                UnknownRemoteError)
             return Failure(errorType(rje.description))
 
-        d = proto._sendBoxCommand(self.commandName,
-                                  self.makeArguments(self.structured, proto),
-                                  self.requiresAnswer)
+        box = self.makeArguments(self.structured, proto)
+        if self._immediate:
+            d = proto._sendBoxCommand(self.commandName, box,
+                                      self.requiresAnswer, immediate=True)
+        else:
+            d = proto._sendBoxCommand(self.commandName, box,
+                                      self.requiresAnswer)
 
         if self.requiresAnswer:
             d.addCallback(self.parseResponse, proto)
@@ -2143,6 +2930,8 @@ class StartTLS(Command):
 
     responseType = _TLSBox
 
+    _immediate = True
+
     def __init__(self, **kw):
         """
         Create a StartTLS command.  (This is private.  Use AMP.callRemote.)
@@ -2187,6 +2976,8 @@ class ProtocolSwitchCommand(Command):
     remain secured.
     """
 
+    _immediate = True
+
     def __init__(self, _protoToSwitchToFactory, **kw):
         """
         Create a ProtocolSwitchCommand.
@@ -2408,7 +3199,91 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
         if self.innerProtocol is not None:
             self.innerProtocol.dataReceived(data)
             return
-        return Int16StringReceiver.dataReceived(self, data)
+        if self.state == 'value':
+            # Someone has been driving the string-at-a-time state machine
+            # directly; let it finish what it started.
+            return Int16StringReceiver.dataReceived(self, data)
+        self._boxesReceived(data)
+
+
+    def _boxesReceived(self, data):
+        """
+        Parse every complete box in the received data in one pass and deliver
+        each to L{boxReceiver}.
+
+        This does the same job as feeding the data through
+        L{Int16StringReceiver.dataReceived} to L{proto_init}, L{proto_key} and
+        L{proto_value}, without a method call for every key and value.  The
+        unprocessed data always begins with the length prefix of a key; the
+        key/value pairs of a box which has not been completely received yet
+        are kept in C{_currentBox}.
+
+        @param data: The bytes just received.
+        @type data: L{bytes}
+        """
+        if self._unprocessed:
+            alldata = self._unprocessed + data
+        else:
+            alldata = data
+        end = len(alldata)
+        offset = 0
+        box = self._currentBox
+        unpackLength = _int16.unpack_from
+        maxKeyLength = self._MAX_KEY_LENGTH
+        maxValueLength = self._MAX_VALUE_LENGTH
+
+        while offset + 2 <= end and not self.paused:
+            keyLength, = unpackLength(alldata, offset)
+            if not keyLength:
+                if box is None:
+                    box = AmpBox()
+                offset += 2
+                self._currentBox = None
+                self.state = 'init'
+                # Let _switchTo find everything after this box via recvd.
+                self._unprocessed = alldata
+                self._compatibilityOffset = offset
+                self.boxReceiver.ampBoxReceived(box)
+                box = None
+                if 'recvd' in self.__dict__:
+                    alldata = self.__dict__.pop('recvd')
+                    self._unprocessed = alldata
+                    self._compatibilityOffset = offset = 0
+                    end = len(alldata)
+                    if alldata:
+                        continue
+                    return
+                continue
+            if keyLength > maxKeyLength:
+                self._currentBox = box
+                self._unprocessed = alldata
+                self._compatibilityOffset = offset
+                self.lengthLimitExceeded(keyLength)
+                return
+            valueOffset = offset + 2 + keyLength
+            if valueOffset + 2 > end:
+                break
+            valueLength, = unpackLength(alldata, valueOffset)
+            if valueLength > maxValueLength:
+                self._currentBox = box
+                self._unprocessed = alldata
+                self._compatibilityOffset = valueOffset
+                self.lengthLimitExceeded(valueLength)
+                return
+            valueEnd = valueOffset + 2 + valueLength
+            if valueEnd > end:
+                break
+            if box is None:
+                box = AmpBox()
+            box[alldata[offset + 2:valueOffset]] = (
+                alldata[valueOffset + 2:valueEnd])
+            offset = valueEnd
+
+        self._currentBox = box
+        if box is not None:
+            self.state = 'key'
+        self._unprocessed = alldata[offset:]
+        self._compatibilityOffset = 0
 
 
     def connectionLost(self, reason):
@@ -2772,6 +3647,166 @@ def _objectsToStrings(objects, arglist, strings, proto):
 
 
 
+def _overrides(argument, name):
+    """
+    Determine whether the class of an L{Argument} overrides one of
+    L{Argument}'s methods.
+
+    @param argument: an L{Argument} instance.
+
+    @param name: the name of the method.
+    @type name: native L{str}
+
+    @return: L{True} if C{argument}'s class has its own implementation of
+        the method, L{False} if it inherits L{Argument}'s.
+    """
+    method = getattr(argument.__class__, name)
+    base = getattr(Argument, name)
+    return getattr(method, '__func__', method) is not getattr(
+        base, '__func__', base)
+
+
+
+class _ArgumentCodec(object):
+    """
+    An argument list, such as L{Command.arguments}, L{Command.response} or
+    the schema of an L{AmpList}, compiled once for converting between
+    dictionaries of Python objects and boxes.
+
+    This does what L{_stringsToObjects} and L{_objectsToStrings} do, but an
+    L{Argument} which customizes only C{fromString} and C{toString}, or
+    C{fromStringProto} and C{toStringProto}, has those methods called directly
+    instead of going through C{fromBox}, C{retrieve} and C{toBox}, and the
+    wire names are translated into Python identifiers only once.  Any other
+    L{IArgumentType} provider is still asked to C{fromBox} and C{toBox}
+    itself.
+
+    @ivar arglist: the argument list this codec was compiled from, a list of
+        2-tuples of C{bytes} names and L{IArgumentType} providers.
+
+    @ivar pythonNames: the Python identifiers of all the arguments.
+    @type pythonNames: L{set} of native L{str}
+
+    @ivar required: the Python identifiers of the arguments which are not
+        optional, in order.
+    @type required: L{list} of native L{str}
+
+    @ivar _fields: for each argument, a 7-tuple of its wire name, its Python
+        identifier, the L{IArgumentType} provider, whether it is optional, and
+        the methods to decode and encode it with, or L{None} for both if it
+        must be converted with C{fromBox} and C{toBox}, and whether those
+        methods take the protocol.
+
+    @ivar _general: L{True} if any argument must be converted with
+        C{fromBox} and C{toBox}.
+    """
+
+    def __init__(self, arglist):
+        self.arglist = arglist
+        self.pythonNames = set()
+        self.required = []
+        self._fields = []
+        self._general = False
+        for name, argument in arglist:
+            pythonName = _wireNameToPythonIdentifier(name)
+            self.pythonNames.add(pythonName)
+            optional = getattr(argument, 'optional', False)
+            if not optional:
+                self.required.append(pythonName)
+            if (isinstance(argument, Argument) and
+                not _overrides(argument, 'fromBox') and
+                not _overrides(argument, 'toBox') and
+                not _overrides(argument, 'retrieve')):
+                withProto = (_overrides(argument, 'fromStringProto') or
+                             _overrides(argument, 'toStringProto'))
+                if withProto:
+                    decode = argument.fromStringProto
+                    encode = argument.toStringProto
+                else:
+                    decode = argument.fromString
+                    encode = argument.toString
+            else:
+                decode = encode = None
+                withProto = True
+                self._general = True
+            self._fields.append(
+                (name, pythonName, argument, optional, decode, encode,
+                 withProto))
+
+
+    def fromBox(self, strings, proto):
+        """
+        Convert a box to a dictionary of Python objects.
+
+        @param strings: an L{AmpBox} (or dict of strings), which is not
+            changed.
+
+        @param proto: an L{AMP} instance.
+
+        @return: a L{dict} mapping Python identifiers to the decoded objects.
+
+        @raise KeyError: if a required argument is missing.
+        """
+        objects = {}
+        if self._general:
+            strings = strings.copy()
+        for (name, pythonName, argument, optional, decode, encode,
+             withProto) in self._fields:
+            if decode is None:
+                argument.fromBox(name, strings, objects, proto)
+                continue
+            if optional:
+                value = strings.get(name)
+                if value is None:
+                    objects[pythonName] = None
+                    continue
+            else:
+                value = strings[name]
+            if withProto:
+                objects[pythonName] = decode(value, proto)
+            else:
+                objects[pythonName] = decode(value)
+        return objects
+
+
+    def toBox(self, objects, strings, proto):
+        """
+        Convert a dictionary of Python objects to a box.
+
+        @param objects: a L{dict} mapping Python identifiers to objects, which
+            is not changed.
+
+        @param strings: [OUT PARAMETER] an object providing the L{dict}
+            interface which will be populated with the encoded strings.
+
+        @param proto: an L{AMP} instance.
+
+        @return: C{strings}.
+
+        @raise KeyError: if a required argument is missing.
+        """
+        # Copying also rejects a responder's result which is not a dict, such
+        # as None, even when there is nothing to encode.
+        objects = objects.copy()
+        for (name, pythonName, argument, optional, decode, encode,
+             withProto) in self._fields:
+            if encode is None:
+                argument.toBox(name, strings, objects, proto)
+                continue
+            if optional:
+                value = objects.get(pythonName)
+                if value is None:
+                    continue
+            else:
+                value = objects[pythonName]
+            if withProto:
+                strings[name] = encode(value, proto)
+            else:
+                strings[name] = encode(value)
+        return strings
+
+
+
 class Decimal(Argument):
     """
     Encodes C{decimal.Decimal} instances.
@@ -15,7 +15,8 @@ from zope.interface import Interface, directlyProvides, implementer
 from twisted.python.compat import iterbytes
 try:
     from twisted.protocols.tls import TLSMemoryBIOProtocol, TLSMemoryBIOFactory
-    from twisted.protocols.tls import _PullToPush, _ProducerMembrane
+    from twisted.protocols.tls import (
+        _BatchingPullToPush, _PullToPush, _ProducerMembrane)
     from OpenSSL.crypto import X509Type
     from OpenSSL.SSL import (TLSv1_METHOD, TLSv1_1_METHOD, TLSv1_2_METHOD,
                              Error, Context, ConnectionType,
@@ -280,6 +281,34 @@ def handshakingClientAndServer(clientGreetingData=None,
 
 
 
+def connectedClientAndServer(serverProtocol):
+    """
+    Construct a client and server L{TLSMemoryBIOProtocol} connected by an IO
+    pump, and complete their handshake.
+
+    @param serverProtocol: The protocol wrapped by the server; the client
+        wraps an L{AccumulatingProtocol}.
+    @type serverProtocol: L{Protocol}
+
+    @return: 3-tuple of client, server, L{twisted.test.iosim.IOPump}
+    """
+    clientF = TLSMemoryBIOFactory(
+        ClientTLSContext(), isClient=True,
+        wrappedFactory=ClientFactory.forProtocol(
+            lambda: AccumulatingProtocol(999999)))
+    serverF = TLSMemoryBIOFactory(
+        ServerTLSContext(), isClient=False,
+        wrappedFactory=ServerFactory.forProtocol(lambda: serverProtocol))
+    client, server, pump = connectedServerAndClient(
+        lambda: serverF.buildProtocol(None),
+        lambda: clientF.buildProtocol(None),
+        greet=False,
+    )
+    pump.flush()
+    return client, server, pump
+
+
+
 class DeterministicTLSMemoryBIOTests(SynchronousTestCase):
     """
     Test for the implementation of L{ISSLTransport} which runs over another
@@ -319,6 +348,90 @@ class DeterministicTLSMemoryBIOTests(SynchronousTestCase):
         self.assertEqual(wrappedServerProtocol.received, [])
 
 
+    def test_writesInDataReceivedBatched(self):
+        """
+        The writes a protocol makes while it is receiving data are encrypted
+        together once it is done, rather than into a TLS record each.
+        """
+        class ByteByByteEcho(Protocol):
+            def dataReceived(self, data):
+                for byte in iterbytes(data):
+                    self.transport.write(byte)
+
+        client, server, pump = connectedClientAndServer(ByteByByteEcho())
+        sent = []
+        send = server._tlsConnection.send
+        def countingSend(data):
+            sent.append(bytes(data))
+            return send(data)
+        server._tlsConnection.send = countingSend
+
+        client.write(b"abcdefghij")
+        pump.flush()
+        self.assertEqual([b"abcdefghij"], sent)
+        self.assertEqual([b"abcdefghij"], client.wrappedProtocol.received)
+
+
+    def test_recordsDeliveredTogether(self):
+        """
+        Application data decrypted from several TLS records received at once
+        is delivered to the protocol with one call to its C{dataReceived}.
+        """
+        serverProtocol = AccumulatingProtocol(999999)
+        client, server, pump = connectedClientAndServer(serverProtocol)
+        for data in [b"abc", b"def", b"ghi"]:
+            client.write(data)
+        pump.flush()
+        self.assertEqual([b"abcdefghi"], serverProtocol.received)
+
+
+    def test_loseConnectionAfterBatchedWrites(self):
+        """
+        If a protocol writes and then calls C{loseConnection} while it is
+        receiving data, the batched writes are sent before the connection is
+        shut down.
+        """
+        class Goodbye(Protocol):
+            def dataReceived(self, data):
+                self.transport.write(b"good")
+                self.transport.write(b"bye")
+                self.transport.loseConnection()
+
+        client, server, pump = connectedClientAndServer(Goodbye())
+        clientProtocol = client.wrappedProtocol
+        client.write(b"hello")
+        pump.flush()
+        self.assertEqual([b"goodbye"], clientProtocol.received)
+        self.assertTrue(server.transport.disconnecting)
+
+
+    def test_producerWritesBatched(self):
+        """
+        L{_BatchingPullToPush} has its consumer batch the writes made by each
+        call to the non-streaming producer's C{resumeProducing}.
+        """
+        class BatchingConsumer(object):
+            batching = False
+            def _batchingWrites(self, f, *args):
+                self.batching = True
+                try:
+                    return f(*args)
+                finally:
+                    self.batching = False
+
+        consumer = BatchingConsumer()
+        produced = []
+        class Producer(object):
+            def resumeProducing(self):
+                produced.append(consumer.batching)
+
+        pull = _BatchingPullToPush(Producer(), consumer)._pull()
+        next(pull)
+        next(pull)
+        self.assertEqual([True, True], produced)
+        self.assertFalse(consumer.batching)
+
+
 
 class TLSMemoryBIOTests(TestCase):
     """
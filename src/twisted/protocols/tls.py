@@ -111,6 +111,27 @@ class _ProducerMembrane(object):
         self._producer.stopProducing()
 
 
+class _BatchingPullToPush(_PullToPush):
+    """
+    A L{_PullToPush} which has the writes its non-streaming producer makes
+    each time it produces batched by its L{TLSMemoryBIOProtocol} consumer.
+    """
+
+    def _pull(self):
+        """
+        Call C{resumeProducing} on the underlying producer forever, as
+        L{_PullToPush._pull} does, batching the writes of each call.
+        """
+        pull = _PullToPush._pull(self)
+        while True:
+            try:
+                self._consumer._batchingWrites(next, pull)
+            except StopIteration:
+                return
+            yield None
+
+
+
 @implementer(ISystemHandle, INegotiated)
 class TLSMemoryBIOProtocol(ProtocolWrapper):
     """
@@ -165,6 +186,20 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
     @ivar _aborted: C{abortConnection} has been called.  No further data will
         be received to the wrapped protocol's C{dataReceived}.
     @type _aborted: L{bool}
+
+    @ivar _writeBatch: Application-level (cleartext) data written while bytes
+        received from the underlying transport are being processed, or while
+        a producer is producing, which is encrypted once that is done.  Many
+        small writes then make a few full TLS records instead of a record
+        each.  L{None} when writes are not being batched.
+    @type _writeBatch: L{list} of L{bytes}, or L{None}
+
+    @ivar _writeBatchSize: The number of bytes in C{_writeBatch}.
+    @type _writeBatchSize: L{int}
+
+    @ivar _clientHelloPending: A server which has not received any bytes yet,
+        whose connection may still be replaced for the first ones.
+    @type _clientHelloPending: L{bool}
     """
 
     _reason = None
@@ -172,6 +207,17 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
     _lostTLSConnection = False
     _producer = None
     _aborted = False
+    _writeBatch = None
+    _writeBatchSize = 0
+    _clientHelloPending = False
+
+    # The largest number of bytes written to a batch before it is encrypted
+    # anyway, to bound how much is kept in memory.
+    _maxWriteBatchSize = 2 ** 16
+
+    # The largest number of decrypted bytes delivered to the wrapped protocol
+    # in one call to its dataReceived.
+    _maxReceiveSize = 2 ** 18
 
     def __init__(self, factory, wrappedProtocol, _connectWrapped=True):
         ProtocolWrapper.__init__(self, factory, wrappedProtocol)
@@ -197,6 +243,8 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         necessary L{OpenSSL.SSL.Connection} with a memory BIO.
         """
         self._tlsConnection = self.factory._createConnection(self)
+        self._clientHelloPending = (
+            self.factory._creatorInterface is IOpenSSLServerConnectionCreator)
         self._appSendBuffer = []
 
         # Add interfaces provided by the transport we are wrapping:
@@ -248,13 +296,24 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         Read any bytes out of the send BIO and write them to the underlying
         transport.
         """
-        try:
-            bytes = self._tlsConnection.bio_read(2 ** 15)
-        except WantReadError:
-            # There may be nothing in the send BIO right now.
-            pass
-        else:
-            self.transport.write(bytes)
+        # Read with a buffer which grows as long as reads fill it, so that a
+        # large amount of ciphertext is read with a few calls.
+        bufferSize = 2 ** 15
+        chunks = []
+        while True:
+            try:
+                bytes = self._tlsConnection.bio_read(bufferSize)
+            except WantReadError:
+                # There may be nothing in the send BIO right now.
+                break
+            chunks.append(bytes)
+            if len(bytes) < bufferSize:
+                break
+            bufferSize = min(bufferSize * 2, 2 ** 20)
+        if len(chunks) == 1:
+            self.transport.write(chunks[0])
+        elif chunks:
+            self.transport.write(b"".join(chunks))
 
 
     def _flushReceiveBIO(self):
@@ -268,7 +327,11 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # Keep trying this until an error indicates we should stop or we
         # close the connection.  Looping is necessary to make sure we
         # process all of the data which was put into the receive BIO, as
-        # there is no guarantee that a single recv call will do it all.
+        # there is no guarantee that a single recv call will do it all.  Each
+        # call decrypts at most one TLS record, so the records are collected
+        # and delivered to the application together.
+        received = []
+        receivedSize = 0
         while not self._lostTLSConnection:
             try:
                 bytes = self._tlsConnection.recv(2 ** 15)
@@ -277,6 +340,9 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
                 # any application data.
                 break
             except ZeroReturnError:
+                # Deliver what was received before the shutdown first.
+                self._deliver(received)
+                received = []
                 # TLS has shut down and no more TLS data will be received over
                 # this connection.
                 self._shutdownTLS()
@@ -289,10 +355,17 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
                 # shared ciphers, because a certificate failed to verify, etc).
                 # TLS can no longer proceed.
                 failure = Failure()
+                self._deliver(received)
+                received = []
                 self._tlsShutdownFinished(failure)
             else:
-                if not self._aborted:
-                    ProtocolWrapper.dataReceived(self, bytes)
+                received.append(bytes)
+                receivedSize += len(bytes)
+                if receivedSize >= self._maxReceiveSize:
+                    self._deliver(received)
+                    received = []
+                    receivedSize = 0
+        self._deliver(received)
 
         # The received bytes might have generated a response which needs to be
         # sent now.  For example, the handshake involves several round-trip
@@ -300,12 +373,81 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         self._flushSendBIO()
 
 
+    def _deliver(self, received):
+        """
+        Deliver decrypted application-level bytes to the wrapped protocol with
+        a single call, unless the connection was aborted.
+
+        @param received: The bytes to deliver, in order.
+        @type received: L{list} of L{bytes}
+        """
+        if received and not self._aborted:
+            if len(received) == 1:
+                ProtocolWrapper.dataReceived(self, received[0])
+            else:
+                ProtocolWrapper.dataReceived(self, b"".join(received))
+
+
+    def _batchingWrites(self, f, *args):
+        """
+        Call C{f}, batching the application-level writes it makes so that they
+        are encrypted together when it returns.
+
+        @param f: The function to call.
+
+        @param args: The positional arguments to pass to C{f}.
+
+        @return: The result of C{f}.
+        """
+        if self._writeBatch is not None:
+            # Already batching; the outermost call encrypts the batch.
+            return f(*args)
+        self._writeBatch = []
+        try:
+            return f(*args)
+        finally:
+            self._flushWriteBatch()
+            self._writeBatch = None
+
+
+    def _flushWriteBatch(self):
+        """
+        Encrypt and send any writes batched so far.
+        """
+        batch = self._writeBatch
+        if batch:
+            self._writeBatch = []
+            self._writeBatchSize = 0
+            if len(batch) == 1:
+                self._write(batch[0])
+            else:
+                self._write(b"".join(batch))
+
+
     def dataReceived(self, bytes):
         """
         Deliver any received bytes to the receive BIO and then read and deliver
         to the application any application-level data which becomes available
         as a result of this.
+
+        Application-level writes made in the meantime, such as a response to
+        the bytes delivered, are batched and encrypted together afterwards.
         """
+        self._batchingWrites(self._dataReceived, bytes)
+
+
+    def _dataReceived(self, bytes):
+        """
+        Implementation of L{dataReceived}, called while writes are batched.
+        """
+        if self._clientHelloPending:
+            # A server may pick a different connection for the client's first
+            # bytes, such as one which can resume the session they offer.
+            self._clientHelloPending = False
+            connection = self.factory._connectionForClientHello(self, bytes)
+            if connection is not None:
+                self._tlsConnection = connection
+
         # Let OpenSSL know some bytes were just received.
         self._tlsConnection.bio_write(bytes)
 
@@ -412,6 +554,9 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         """
         if self.disconnecting or not self.connected:
             return
+        # Writes made before loseConnection must be sent before the TLS
+        # shutdown, and may have to wait for the handshake like any others.
+        self._flushWriteBatch()
         # If connection setup has not finished, OpenSSL 1.0.2f+ will not shut
         # down the connection until we write some data to the connection which
         # allows the handshake to complete. However, since no data should be
@@ -430,6 +575,9 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         Tear down TLS state so that if the connection is aborted mid-handshake
         we don't deliver any further data from the application.
         """
+        if self._writeBatch:
+            self._writeBatch = []
+            self._writeBatchSize = 0
         self._aborted = True
         self.disconnecting = True
         self._shutdownTLS()
@@ -464,6 +612,12 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # is unregistered:
         if self.disconnecting and self._producer is None:
             return
+        if self._writeBatch is not None:
+            self._writeBatch.append(bytes)
+            self._writeBatchSize += len(bytes)
+            if self._writeBatchSize >= self._maxWriteBatchSize:
+                self._flushWriteBatch()
+            return
         self._write(bytes)
 
 
@@ -523,8 +677,14 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # How far into the input we've gotten so far
         alreadySent = 0
 
+        # Slicing a memoryview does not copy the bytes being sent.
+        if len(bytes) > bufferSize:
+            view = memoryview(bytes)
+        else:
+            view = bytes
+
         while alreadySent < len(bytes):
-            toSend = bytes[alreadySent:alreadySent + bufferSize]
+            toSend = view[alreadySent:alreadySent + bufferSize]
             try:
                 sent = self._tlsConnection.send(toSend)
             except WantReadError:
@@ -537,14 +697,15 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
                 # other SSL implementation doesn't, but losing helpful
                 # debugging information is a bad idea.
                 self._tlsShutdownFinished(Failure())
-                break
+                return
             else:
                 # We've successfully handed off the bytes to the OpenSSL
                 # Connection object.
                 alreadySent += sent
-                # See if OpenSSL wants to hand any bytes off to the underlying
-                # transport as a result.
-                self._flushSendBIO()
+
+        # Hand the records OpenSSL produced off to the underlying transport
+        # in one write.
+        self._flushSendBIO()
 
 
     def writeSequence(self, iovec):
@@ -596,7 +757,7 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # If we received a non-streaming producer, wrap it so it becomes a
         # streaming producer:
         if not streaming:
-            producer = streamingProducer = _PullToPush(producer, self)
+            producer = streamingProducer = _BatchingPullToPush(producer, self)
         producer = _ProducerMembrane(producer)
         # This will raise an exception if a producer is already registered:
         self.transport.registerProducer(producer, True)
@@ -619,6 +780,8 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         self._producer = None
         self._producerPaused = False
         self.transport.unregisterProducer()
+        # Writes made by the producer must be sent before any TLS shutdown.
+        self._flushWriteBatch()
         if self.disconnecting and not self._appSendBuffer:
             self._shutdownTLS()
 
@@ -666,6 +829,32 @@ class _ContextFactoryToConnectionFactory(object):
         return Connection(context, None)
 
 
+    def _serverConnectionForClientHello(self, protocol, clientHello):
+        """
+        Construct an OpenSSL server connection to replace the one
+        C{protocol} has before it receives C{clientHello}, if the wrapped
+        old-style context factory chooses a context for it with a
+        C{_contextForClientHello} method.
+
+        @param protocol: The protocol which received C{clientHello}.
+        @type protocol: L{TLSMemoryBIOProtocol}
+
+        @param clientHello: The first bytes the client sent.
+        @type clientHello: L{bytes}
+
+        @return: a connection, or L{None} to keep the current one
+        @rtype: L{OpenSSL.SSL.Connection} or L{None}
+        """
+        contextForClientHello = getattr(
+            self._oldStyleContextFactory, "_contextForClientHello", None)
+        if contextForClientHello is None:
+            return None
+        context = contextForClientHello(clientHello)
+        if context is None:
+            return None
+        return Connection(context, None)
+
+
     def serverConnectionForTLS(self, protocol):
         """
         Construct an OpenSSL server connection from the wrapped old-style
@@ -828,3 +1017,30 @@ class TLSMemoryBIOFactory(WrappingFactory):
             self._applyProtocolNegotiation(connection)
             connection.set_accept_state()
         return connection
+
+
+    def _connectionForClientHello(self, tlsProtocol, clientHello):
+        """
+        Create an OpenSSL server connection to replace the one C{tlsProtocol}
+        has before it receives C{clientHello}, if the connection creator
+        chooses one with a C{_serverConnectionForClientHello} method.
+
+        @param tlsProtocol: The protocol which received C{clientHello}.
+        @type tlsProtocol: L{TLSMemoryBIOProtocol}
+
+        @param clientHello: The first bytes the client sent.
+        @type clientHello: L{bytes}
+
+        @return: an OpenSSL connection object for C{tlsProtocol} to use
+            instead, or L{None} to keep the current one
+        @rtype: L{OpenSSL.SSL.Connection} or L{None}
+        """
+        serverConnectionForClientHello = getattr(
+            self._connectionCreator, "_serverConnectionForClientHello", None)
+        if serverConnectionForClientHello is None:
+            return None
+        connection = serverConnectionForClientHello(tlsProtocol, clientHello)
+        if connection is not None:
+            self._applyProtocolNegotiation(connection)
+            connection.set_accept_state()
+        return connection
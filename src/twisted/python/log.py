@@ -19,7 +19,7 @@ from zope.interface import Interface
 from twisted.python.compat import unicode, _PY3
 from twisted.python import context
 from twisted.python import reflect
-from twisted.python import util
+from twisted.python.util import untilConcludes
 from twisted.python import failure
 from twisted.python._oldstyle import _oldStyle
 from twisted.python.threadable import synchronize
@@ -559,8 +559,8 @@ class FileLogObserver(_GlobalStartStopMixIn):
         }
         msgStr = _safeFormat("[%(system)s] %(text)s\n", fmtDict)
 
-        util.untilConcludes(self.write, timeStr + " " + msgStr)
-        util.untilConcludes(self.flush)  # Hoorj!
+        untilConcludes(self.write, timeStr + " " + msgStr)
+        untilConcludes(self.flush)  # Hoorj!
 
 
 
@@ -20,20 +20,43 @@ from io import BytesIO
 from twisted.internet import protocol
 from twisted.persisted import styles
 from twisted.python import log
-from twisted.python.compat import iterbytes, long, _bytesChr as chr
+from twisted.python.compat import long, _bytesChr as chr
 from twisted.python.reflect import fullyQualifiedName
 
 class BananaError(Exception):
     pass
 
+# The encodings of the integers which fit in one or two base 128 digits,
+# filled in as they are needed.
+_shortEncodings = dict((i, chr(i)) for i in range(0x80))
+
+def _int2b128(integer):
+    """
+    Represent a non-negative integer as a base 128 string.
+
+    @param integer: The integer to encode.
+    @type integer: L{int} or L{long}
+
+    @return: The integer encoded in a byte string, least significant digit
+        first.
+    @rtype: L{bytes}
+    """
+    encoded = _shortEncodings.get(integer)
+    if encoded is None:
+        digits = bytearray()
+        value = integer
+        while value:
+            digits.append(value & 0x7f)
+            value >>= 7
+        encoded = bytes(digits)
+        if integer < 0x4000:
+            _shortEncodings[integer] = encoded
+    return encoded
+
+
 def int2b128(integer, stream):
-    if integer == 0:
-        stream(chr(0))
-        return
-    assert integer > 0, "can only encode positive integers"
-    while integer:
-        stream(chr(integer & 0x7f))
-        integer = integer >> 7
+    assert integer >= 0, "can only encode positive integers"
+    stream(_int2b128(integer))
 
 
 def b1282int(st):
@@ -49,8 +72,7 @@ def b1282int(st):
     """
     e = 1
     i = 0
-    for char in iterbytes(st):
-        n = ord(char)
+    for n in bytearray(st):
         i += (n * e)
         e <<= 7
     return i
@@ -70,6 +92,12 @@ VOCAB    = chr(0x87)
 
 HIGH_BIT_SET = chr(0x80)
 
+# The delimiters as the integers Banana.dataReceived compares them to.
+_LIST, _INT, _STRING, _NEG, _FLOAT, _LONGINT, _LONGNEG, _VOCAB = range(
+    0x80, 0x88)
+
+_double = struct.Struct("!d")
+
 def setPrefixLimit(limit):
     """
     Set the limit on the prefix length for all Banana connections
@@ -175,79 +203,103 @@ class Banana(protocol.Protocol, styles.Ephemeral):
     buffer = b''
 
     def dataReceived(self, chunk):
+        """
+        Decode every complete item in the buffered data and C{chunk}, keeping
+        whatever is left for the next call.
+
+        The data is parsed in place, from one offset to the next, and items
+        are appended straight to the list being decoded, if any, so that
+        large lists cost no more than their elements.
+        """
         buffer = self.buffer + chunk
+        # Index a copy of the data to get at its bytes as integers, with a
+        # type byte after the end so that looking for the end of a prefix
+        # never needs a bounds check.
+        data = bytearray(buffer)
+        end = len(buffer)
+        data.append(_LIST)
         listStack = self.listStack
+        if listStack:
+            count, items = listStack[-1]
+        else:
+            count, items = 0, None
         gotItem = self.gotItem
-        while buffer:
-            assert self.buffer != buffer, "This ain't right: %s %s" % (repr(self.buffer), repr(buffer))
-            self.buffer = buffer
-            pos = 0
-            for ch in iterbytes(buffer):
-                if ch >= HIGH_BIT_SET:
+        prefixLimit = self.prefixLimit
+        offset = 0
+        try:
+            while offset < end:
+                pos = offset
+                while data[pos] < 0x80:
+                    pos += 1
+                size = pos - offset
+                if size > prefixLimit:
+                    if pos == end:
+                        raise BananaError("Security precaution: more than %d bytes of prefix" % (prefixLimit,))
+                    raise BananaError("Security precaution: longer than %d bytes worth of prefix" % (prefixLimit,))
+                if pos == end:
                     break
-                pos = pos + 1
-            else:
-                if pos > self.prefixLimit:
-                    raise BananaError("Security precaution: more than %d bytes of prefix" % (self.prefixLimit,))
-                return
-            num = buffer[:pos]
-            typebyte = buffer[pos:pos+1]
-            rest = buffer[pos+1:]
-            if len(num) > self.prefixLimit:
-                raise BananaError("Security precaution: longer than %d bytes worth of prefix" % (self.prefixLimit,))
-            if typebyte == LIST:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: List too long.")
-                listStack.append((num, []))
-                buffer = rest
-            elif typebyte == STRING:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: String too long.")
-                if len(rest) >= num:
-                    buffer = rest[num:]
-                    gotItem(rest[:num])
-                else:
-                    return
-            elif typebyte == INT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGINT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGNEG:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(-num)
-            elif typebyte == NEG:
-                buffer = rest
-                num = -b1282int(num)
-                gotItem(num)
-            elif typebyte == VOCAB:
-                buffer = rest
-                num = b1282int(num)
-                item = self.incomingVocabulary[num]
-                if self.currentDialect == b'pb':
-                    # the sender issues VOCAB only for dialect pb
-                    gotItem(item)
+                if size == 1:
+                    num = data[offset]
+                elif size == 2:
+                    num = data[offset] | data[offset + 1] << 7
+                elif size == 0:
+                    num = 0
                 else:
-                    raise NotImplementedError(
-                        "Invalid item for pb protocol {0!r}".format(item))
-            elif typebyte == FLOAT:
-                if len(rest) >= 8:
-                    buffer = rest[8:]
-                    gotItem(struct.unpack("!d", rest[:8])[0])
+                    num = b1282int(buffer[offset:pos])
+                typebyte = data[pos]
+                pos += 1
+                if typebyte == _STRING:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: String too long.")
+                    if end - pos < num:
+                        break
+                    offset = pos + num
+                    item = buffer[pos:offset]
+                elif typebyte == _INT or typebyte == _LONGINT:
+                    offset = pos
+                    item = num
+                elif typebyte == _FLOAT:
+                    if end - pos < 8:
+                        break
+                    offset = pos + 8
+                    item = _double.unpack_from(buffer, pos)[0]
+                elif typebyte == _LIST:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: List too long.")
+                    offset = pos
+                    if num:
+                        count, items = num, []
+                        listStack.append((count, items))
+                        continue
+                    item = []
+                elif typebyte == _VOCAB:
+                    item = self.incomingVocabulary[num]
+                    if self.currentDialect != b'pb':
+                        # the sender issues VOCAB only for dialect pb
+                        raise NotImplementedError(
+                            "Invalid item for pb protocol {0!r}".format(item))
+                    offset = pos
+                elif typebyte == _NEG or typebyte == _LONGNEG:
+                    offset = pos
+                    item = -num
                 else:
-                    return
-            else:
-                raise NotImplementedError(("Invalid Type Byte %r" % (typebyte,)))
-            while listStack and (len(listStack[-1][1]) == listStack[-1][0]):
-                item = listStack.pop()[1]
-                gotItem(item)
-        self.buffer = b''
+                    raise NotImplementedError(("Invalid Type Byte %r" % (chr(typebyte),)))
+                if items is None:
+                    gotItem(item)
+                    continue
+                items.append(item)
+                # Deliver the lists this item completes.
+                while len(items) == count:
+                    del listStack[-1]
+                    item = items
+                    if not listStack:
+                        count, items = 0, None
+                        gotItem(item)
+                        break
+                    count, items = listStack[-1]
+                    items.append(item)
+        finally:
+            self.buffer = buffer[offset:]
 
 
     def expressionReceived(self, lst):
@@ -318,10 +370,9 @@ class Banana(protocol.Protocol, styles.Ephemeral):
 
         @return: L{None}
         """
-        encodeStream = BytesIO()
-        self._encode(obj, encodeStream.write)
-        value = encodeStream.getvalue()
-        self.transport.write(value)
+        encoded = []
+        self._encode(obj, encoded.append)
+        self.transport.write(b''.join(encoded))
 
 
     def _encode(self, obj, write):
@@ -329,40 +380,64 @@ class Banana(protocol.Protocol, styles.Ephemeral):
             if len(obj) > SIZE_LIMIT:
                 raise BananaError(
                     "list/tuple is too long to send (%d)" % (len(obj),))
-            int2b128(len(obj), write)
+            write(_int2b128(len(obj)))
             write(LIST)
+            # Encode the byte strings, small positive integers and floats
+            # which make up most lists here rather than one call at a time.
+            encode = self._encode
+            shortEncoding = _shortEncodings.get
+            symbols = self.currentDialect == b"pb" and self.outgoingSymbols
+            largestInt = self._largestInt
             for elem in obj:
-                self._encode(elem, write)
+                elemType = type(elem)
+                if elemType is bytes:
+                    if ((not symbols or elem not in symbols) and
+                            len(elem) <= SIZE_LIMIT):
+                        size = len(elem)
+                        write(shortEncoding(size) or _int2b128(size))
+                        write(STRING)
+                        write(elem)
+                        continue
+                elif elemType is int:
+                    if 0 <= elem <= largestInt:
+                        write(shortEncoding(elem) or _int2b128(elem))
+                        write(INT)
+                        continue
+                elif elemType is float:
+                    write(FLOAT)
+                    write(_double.pack(elem))
+                    continue
+                encode(elem, write)
         elif isinstance(obj, (int, long)):
             if obj < self._smallestLongInt or obj > self._largestLongInt:
                 raise BananaError(
                     "int/long is too large to send (%d)" % (obj,))
             if obj < self._smallestInt:
-                int2b128(-obj, write)
+                write(_int2b128(-obj))
                 write(LONGNEG)
             elif obj < 0:
-                int2b128(-obj, write)
+                write(_int2b128(-obj))
                 write(NEG)
             elif obj <= self._largestInt:
-                int2b128(obj, write)
+                write(_int2b128(obj))
                 write(INT)
             else:
-                int2b128(obj, write)
+                write(_int2b128(obj))
                 write(LONGINT)
         elif isinstance(obj, float):
             write(FLOAT)
-            write(struct.pack("!d", obj))
+            write(_double.pack(obj))
         elif isinstance(obj, bytes):
             # TODO: an API for extending banana...
             if self.currentDialect == b"pb" and obj in self.outgoingSymbols:
                 symbolID = self.outgoingSymbols[obj]
-                int2b128(symbolID, write)
+                write(_int2b128(symbolID))
                 write(VOCAB)
             else:
                 if len(obj) > SIZE_LIMIT:
                     raise BananaError(
                         "byte string is too long to send (%d)" % (len(obj),))
-                int2b128(len(obj), write)
+                write(_int2b128(len(obj)))
                 write(STRING)
                 write(obj)
         else:
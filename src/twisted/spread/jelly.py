@@ -396,6 +396,10 @@ class _Jellier:
         self._ref_id = 1
         self.persistentStore = persistentStore
         self.invoker = invoker
+        # The taster's answers for the types seen so far, and those of the
+        # immutable types it allowed.
+        self._allowedTypes = {}
+        self._plainTypes = set()
 
 
     def _cook(self, object):
@@ -470,6 +474,9 @@ class _Jellier:
 
     constantTypes = {bytes: 1, unicode: 1, int: 1, float: 1, long: 1}
 
+    # Types whose objects are jellied as themselves.
+    _immutableTypes = frozenset([bytes, int, long, float])
+
 
     def _checkMutable(self,obj):
         objId = id(obj)
@@ -480,122 +487,216 @@ class _Jellier:
             return self.cooked[objId]
 
 
+    def _isTypeAllowed(self, objType):
+        """
+        Ask the taster whether objects of the given type may be jellied,
+        remembering the answer for the rest of this call to L{jelly}.
+
+        @param objType: the type of an object about to be jellied.
+        @type objType: L{type}
+
+        @return: the taster's answer.
+        """
+        try:
+            return self._allowedTypes[objType]
+        except KeyError:
+            allowed = self.taster.isTypeAllowed(
+                qual(objType).encode('utf-8'))
+            self._allowedTypes[objType] = allowed
+            if allowed and objType in self._immutableTypes:
+                self._plainTypes.add(objType)
+            return allowed
+
+
     def jelly(self, obj):
-        if isinstance(obj, Jellyable):
+        objType = type(obj)
+        jellier = self._jellyByType.get(objType)
+        if jellier is None and isinstance(obj, Jellyable):
             preRef = self._checkMutable(obj)
             if preRef:
                 return preRef
             return obj.jellyFor(self)
-        objType = type(obj)
-        if self.taster.isTypeAllowed(qual(objType).encode('utf-8')):
-            # "Immutable" Types
-            if ((objType is bytes) or
-                (objType is int) or
-                (objType is long) or
-                (objType is float)):
-                return obj
-            elif objType is types.MethodType:
-                aSelf = obj.__self__ if _PY3 else obj.im_self
-                aFunc = obj.__func__ if _PY3 else obj.im_func
-                aClass = aSelf.__class__ if _PY3 else obj.im_class
-                return [b"method", aFunc.__name__, self.jelly(aSelf),
-                        self.jelly(aClass)]
-            elif objType is unicode:
-                return [b'unicode', obj.encode('UTF-8')]
-            elif objType is type(None):
-                return [b'None']
-            elif objType is types.FunctionType:
-                return [b'function', obj.__module__ + '.' +
-                        (obj.__qualname__ if _PY3 else obj.__name__)]
-            elif objType is types.ModuleType:
-                return [b'module', obj.__name__]
-            elif objType is bool:
-                return [b'boolean', obj and b'true' or b'false']
-            elif objType is datetime.datetime:
-                if obj.tzinfo:
-                    raise NotImplementedError(
-                        "Currently can't jelly datetime objects with tzinfo")
-                return [b'datetime', ' '.join([unicode(x) for x in (
-                    obj.year, obj.month, obj.day, obj.hour,
-                    obj.minute, obj.second, obj.microsecond)]
-                ).encode('utf-8')]
-            elif objType is datetime.time:
-                if obj.tzinfo:
-                    raise NotImplementedError(
-                        "Currently can't jelly datetime objects with tzinfo")
-                return [b'time', '%s %s %s %s' % (obj.hour, obj.minute,
-                                                 obj.second, obj.microsecond)]
-            elif objType is datetime.date:
-                return [b'date', '%s %s %s' % (obj.year, obj.month, obj.day)]
-            elif objType is datetime.timedelta:
-                return [b'timedelta', '%s %s %s' % (obj.days, obj.seconds,
-                                                   obj.microseconds)]
-            elif issubclass(objType, (type, _OldStyleClass)):
-                return [b'class', qual(obj).encode('utf-8')]
-            elif objType is decimal.Decimal:
-                return self.jelly_decimal(obj)
-            else:
-                preRef = self._checkMutable(obj)
-                if preRef:
-                    return preRef
-                # "Mutable" Types
-                sxp = self.prepare(obj)
-                if objType is list:
-                    sxp.extend(self._jellyIterable(list_atom, obj))
-                elif objType is tuple:
-                    sxp.extend(self._jellyIterable(tuple_atom, obj))
-                elif objType in DictTypes:
-                    sxp.append(dictionary_atom)
-                    for key, val in obj.items():
-                        sxp.append([self.jelly(key), self.jelly(val)])
-                elif objType in _SetTypes:
-                    sxp.extend(self._jellyIterable(set_atom, obj))
-                elif objType in _ImmutableSetTypes:
-                    sxp.extend(self._jellyIterable(frozenset_atom, obj))
-                else:
-                    className = qual(obj.__class__).encode('utf-8')
-                    persistent = None
-                    if self.persistentStore:
-                        persistent = self.persistentStore(obj, self)
-                    if persistent is not None:
-                        sxp.append(persistent_atom)
-                        sxp.append(persistent)
-                    elif self.taster.isClassAllowed(obj.__class__):
-                        sxp.append(className)
-                        if hasattr(obj, "__getstate__"):
-                            state = obj.__getstate__()
-                        else:
-                            state = obj.__dict__
-                        sxp.append(self.jelly(state))
-                    else:
-                        self.unpersistable(
-                            "instance of class %s deemed insecure" %
-                            qual(obj.__class__), sxp)
-                return self.preserve(obj, sxp)
-        else:
+        if not self._isTypeAllowed(objType):
             if objType is _OldStyleInstance:
                 raise InsecureJelly("Class not allowed for instance: %s %s" %
                                     (obj.__class__, obj))
             raise InsecureJelly("Type not allowed for object: %s %s" %
                                 (objType, obj))
+        if jellier is None:
+            return self._jellyInstance(obj, objType)
+        return jellier(self, obj)
+
+
+    def _jellyImmutable(self, obj):
+        return obj
+
+
+    def _jellyMethod(self, obj):
+        aSelf = obj.__self__ if _PY3 else obj.im_self
+        aFunc = obj.__func__ if _PY3 else obj.im_func
+        aClass = aSelf.__class__ if _PY3 else obj.im_class
+        return [b"method", aFunc.__name__, self.jelly(aSelf),
+                self.jelly(aClass)]
+
+
+    def _jellyUnicode(self, obj):
+        return [b'unicode', obj.encode('UTF-8')]
+
 
+    def _jellyNone(self, obj):
+        return [b'None']
 
-    def _jellyIterable(self, atom, obj):
+
+    def _jellyFunction(self, obj):
+        return [b'function', obj.__module__ + '.' +
+                (obj.__qualname__ if _PY3 else obj.__name__)]
+
+
+    def _jellyModule(self, obj):
+        return [b'module', obj.__name__]
+
+
+    def _jellyBoolean(self, obj):
+        return [b'boolean', obj and b'true' or b'false']
+
+
+    def _jellyDatetime(self, obj):
+        if obj.tzinfo:
+            raise NotImplementedError(
+                "Currently can't jelly datetime objects with tzinfo")
+        return [b'datetime', ' '.join([unicode(x) for x in (
+            obj.year, obj.month, obj.day, obj.hour,
+            obj.minute, obj.second, obj.microsecond)]
+        ).encode('utf-8')]
+
+
+    def _jellyTime(self, obj):
+        if obj.tzinfo:
+            raise NotImplementedError(
+                "Currently can't jelly datetime objects with tzinfo")
+        return [b'time', '%s %s %s %s' % (obj.hour, obj.minute,
+                                         obj.second, obj.microsecond)]
+
+
+    def _jellyDate(self, obj):
+        return [b'date', '%s %s %s' % (obj.year, obj.month, obj.day)]
+
+
+    def _jellyTimedelta(self, obj):
+        return [b'timedelta', '%s %s %s' % (obj.days, obj.seconds,
+                                           obj.microseconds)]
+
+
+    def _jellyItems(self, items):
         """
-        Jelly an iterable object.
+        Jelly the items of a container.
+
+        Items of the immutable types the taster has already allowed are
+        copied as they are rather than passed to L{jelly} one by one, which
+        makes large containers of strings and numbers much cheaper to jelly.
+
+        @param items: any iterable object.
+
+        @return: the jellied items.
+        @rtype: C{list}
+        """
+        plainTypes = self._plainTypes
+        jelly = self.jelly
+        jellied = []
+        append = jellied.append
+        for item in items:
+            if type(item) in plainTypes:
+                append(item)
+            else:
+                append(jelly(item))
+        return jellied
+
+
+    def _jellyContainer(self, atom, obj):
+        """
+        Jelly a list, tuple, set or frozenset.
 
         @param atom: the identifier atom of the object.
-        @type atom: C{str}
+        @type atom: C{bytes}
+
+        @param obj: the container.
+
+        @return: jelly for the container, or a reference to it if it has
+            been seen before.
+        @rtype: C{list}
+        """
+        preRef = self._checkMutable(obj)
+        if preRef:
+            return preRef
+        sxp = self.prepare(obj)
+        sxp.append(atom)
+        sxp.extend(self._jellyItems(obj))
+        return self.preserve(obj, sxp)
+
+
+    def _jellyList(self, obj):
+        return self._jellyContainer(list_atom, obj)
+
+
+    def _jellyTuple(self, obj):
+        return self._jellyContainer(tuple_atom, obj)
+
+
+    def _jellySet(self, obj):
+        return self._jellyContainer(set_atom, obj)
+
+
+    def _jellyFrozenset(self, obj):
+        return self._jellyContainer(frozenset_atom, obj)
 
-        @param obj: any iterable object.
-        @type obj: C{iterable}
 
-        @return: a generator of jellied data.
-        @rtype: C{generator}
+    def _jellyDictionary(self, obj):
+        preRef = self._checkMutable(obj)
+        if preRef:
+            return preRef
+        sxp = self.prepare(obj)
+        sxp.append(dictionary_atom)
+        plainTypes = self._plainTypes
+        jelly = self.jelly
+        for key, val in obj.items():
+            if type(key) not in plainTypes:
+                key = jelly(key)
+            if type(val) not in plainTypes:
+                val = jelly(val)
+            sxp.append([key, val])
+        return self.preserve(obj, sxp)
+
+
+    def _jellyInstance(self, obj, objType):
+        """
+        Jelly a class or an instance of a class which has no entry in
+        C{_jellyByType}.
         """
-        yield atom
-        for item in obj:
-            yield self.jelly(item)
+        if issubclass(objType, (type, _OldStyleClass)):
+            return [b'class', qual(obj).encode('utf-8')]
+        preRef = self._checkMutable(obj)
+        if preRef:
+            return preRef
+        sxp = self.prepare(obj)
+        className = qual(obj.__class__).encode('utf-8')
+        persistent = None
+        if self.persistentStore:
+            persistent = self.persistentStore(obj, self)
+        if persistent is not None:
+            sxp.append(persistent_atom)
+            sxp.append(persistent)
+        elif self.taster.isClassAllowed(obj.__class__):
+            sxp.append(className)
+            if hasattr(obj, "__getstate__"):
+                state = obj.__getstate__()
+            else:
+                state = obj.__dict__
+            sxp.append(self.jelly(state))
+        else:
+            self.unpersistable(
+                "instance of class %s deemed insecure" %
+                qual(obj.__class__), sxp)
+        return self.preserve(obj, sxp)
 
 
     def jelly_decimal(self, d):
@@ -615,6 +716,32 @@ class _Jellier:
         return [b'decimal', value, exponent]
 
 
+    # The exact types of objects jellied by something other than
+    # _jellyInstance, mapped to the functions which jelly them.
+    _jellyByType = {
+        bytes: _jellyImmutable,
+        int: _jellyImmutable,
+        long: _jellyImmutable,
+        float: _jellyImmutable,
+        types.MethodType: _jellyMethod,
+        unicode: _jellyUnicode,
+        type(None): _jellyNone,
+        types.FunctionType: _jellyFunction,
+        types.ModuleType: _jellyModule,
+        bool: _jellyBoolean,
+        datetime.datetime: _jellyDatetime,
+        datetime.time: _jellyTime,
+        datetime.date: _jellyDate,
+        datetime.timedelta: _jellyTimedelta,
+        decimal.Decimal: jelly_decimal,
+        list: _jellyList,
+        tuple: _jellyTuple,
+    }
+    _jellyByType.update(dict.fromkeys(DictTypes, _jellyDictionary))
+    _jellyByType.update(dict.fromkeys(_SetTypes, _jellySet))
+    _jellyByType.update(dict.fromkeys(_ImmutableSetTypes, _jellyFrozenset))
+
+
     def unpersistable(self, reason, sxp=None):
         """
         (internal) Returns an sexp: (unpersistable "reason").  Utility method
@@ -790,12 +917,30 @@ class _Unjellier:
         return o
 
 
+    def _unjellyItems(self, lst):
+        """
+        Unjelly the items of a container.
+
+        Only items which are themselves lists need unjellying; everything
+        else unjellies to itself and is copied as it is.
+
+        @param lst: the jellied items.
+        @type lst: C{list}
+
+        @return: the unjellied items, and whether they are all known yet.
+        @rtype: C{tuple} of C{list} and C{bool}
+        """
+        l = list(lst)
+        finished = True
+        for index, item in enumerate(lst):
+            if type(item) is list:
+                if isinstance(self.unjellyInto(l, index, item), NotKnown):
+                    finished = False
+        return l, finished
+
+
     def _unjelly_tuple(self, lst):
-        l = list(range(len(lst)))
-        finished = 1
-        for elem in l:
-            if isinstance(self.unjellyInto(l, elem, lst[elem]), NotKnown):
-                finished = 0
+        l, finished = self._unjellyItems(lst)
         if finished:
             return tuple(l)
         else:
@@ -803,10 +948,7 @@ class _Unjellier:
 
 
     def _unjelly_list(self, lst):
-        l = list(range(len(lst)))
-        for elem in l:
-            self.unjellyInto(l, elem, lst[elem])
-        return l
+        return self._unjellyItems(lst)[0]
 
 
     def _unjellySetOrFrozenset(self, lst, containerType):
@@ -818,12 +960,7 @@ class _Unjellier:
 
         @param containerType: the type of C{set} to use.
         """
-        l = list(range(len(lst)))
-        finished = True
-        for elem in l:
-            data = self.unjellyInto(l, elem, lst[elem])
-            if isinstance(data, NotKnown):
-                finished = False
+        l, finished = self._unjellyItems(lst)
         if not finished:
             return _Container(l, containerType)
         else:
@@ -847,9 +984,12 @@ class _Unjellier:
     def _unjelly_dictionary(self, lst):
         d = {}
         for k, v in lst:
-            kvd = _DictKeyAndValue(d)
-            self.unjellyInto(kvd, 0, k)
-            self.unjellyInto(kvd, 1, v)
+            if type(k) is list or type(v) is list:
+                kvd = _DictKeyAndValue(d)
+                self.unjellyInto(kvd, 0, k)
+                self.unjellyInto(kvd, 1, v)
+            else:
+                d[k] = v
         return d
 
 
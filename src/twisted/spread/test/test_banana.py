@@ -361,6 +361,39 @@ class BananaTests(BananaTestBase):
         self.assertEqual(self.result, -2147483648)
 
 
+    def test_listOfPrimitives(self):
+        """
+        Lists mixing byte strings, integers of every size, floats and nested
+        lists are encoded element by element and decoded to equal lists.
+        """
+        foo = [b"", b"x" * 200, 0, 127, 128, 2 ** 31 - 1, 2 ** 31, -1,
+               -2 ** 31, -2 ** 31 - 1, 0.5, -1e100, True, [], [[]],
+               (b"tuple", 1)] * 3
+        self.enc.sendEncoded(foo)
+        self.enc.dataReceived(self.io.getvalue())
+        self.assertEqual(
+            self.result,
+            [list(elem) if isinstance(elem, tuple) else elem for elem in foo])
+
+
+    def test_severalExpressions(self):
+        """
+        All the expressions in the data passed to
+        L{banana.Banana.dataReceived} are delivered, in order, and an
+        incomplete one at the end is completed by the next call.
+        """
+        results = []
+        self.enc.expressionReceived = results.append
+        for expression in [[1, b"two"], 3.0, b"four", [[5], []]]:
+            self.enc.sendEncoded(expression)
+        data = self.io.getvalue()
+        self.enc.dataReceived(data[:-3])
+        self.assertEqual(results, [[1, b"two"], 3.0, b"four"])
+        self.enc.dataReceived(data[-3:])
+        self.assertEqual(results, [[1, b"two"], 3.0, b"four", [[5], []]])
+        self.assertEqual(self.enc.buffer, b"")
+
+
     def test_sizedIntegerTypes(self):
         """
         Test that integers below the maximum C{INT} token size cutoff are
@@ -438,6 +471,22 @@ class DialectTests(BananaTestBase):
         self.assertEqual(self.legalPbItem, self.io.getvalue())
 
 
+    def test_sendPbList(self):
+        """
+        If the pb dialect is selected, byte strings in a list which are in
+        the vocabulary are sent as PB VOCAB items and received as the byte
+        strings.
+        """
+        selectDialect(self.enc, b'pb')
+        self.enc.sendEncoded([self.vocab, b'other'])
+        self.assertEqual(
+            b'\x02' + banana.LIST + self.legalPbItem +
+            b'\x05' + banana.STRING + b'other',
+            self.io.getvalue())
+        self.enc.dataReceived(self.io.getvalue())
+        self.assertEqual(self.result, [self.vocab, b'other'])
+
+
 
 class GlobalCoderTests(unittest.TestCase):
     """
@@ -425,6 +425,40 @@ class JellyTests(unittest.TestCase):
         self.assertIs(z[0][0][0], z)
 
 
+    def test_primitiveContainers(self):
+        """
+        Strings and numbers in lists, tuples and dictionaries are jellied as
+        themselves, and the containers unjelly to equal ones.
+        """
+        items = [b'a', 1, 2 ** 70, 1.5, b'a', 1]
+        dictionary = {b'a': 1, 2: 2.5, b'b': [b'c', u'd']}
+        sexp = jelly.jelly([items, tuple(items), dictionary])
+        self.assertEqual(sexp[1], [b'list'] + items)
+        self.assertEqual(sexp[2], [b'tuple'] + items)
+        self.assertIn([b'a', 1], sexp[3])
+        self.assertIn([2, 2.5], sexp[3])
+        self.assertEqual(
+            jelly.unjelly(sexp), [items, tuple(items), dictionary])
+
+
+    def test_typeSecurityInContainers(self):
+        """
+        The taster is consulted once per type of object found in a container,
+        and a type it refuses raises L{jelly.InsecureJelly} wherever it is
+        found.
+        """
+        asked = []
+        class Taster(jelly.DummySecurityOptions):
+            def isTypeAllowed(self, typeName):
+                asked.append(typeName)
+                return not typeName.endswith(b'.float')
+        taster = Taster()
+        jelly.jelly([1, 2, b'a', [3, b'b'], {4: b'c'}], taster)
+        self.assertEqual(sorted(set(asked)), sorted(asked))
+        self.assertRaises(
+            jelly.InsecureJelly, jelly.jelly, [1, 2, [3, {4: 5.0}]], taster)
+
+
     def test_typeSecurity(self):
         """
         Test for type-level security of serialization.
@@ -900,6 +900,66 @@ class NonStreamingProducer(object):
 
 
 
+class _QueueingThreadPool(object):
+    """
+    A fake thread pool which runs functions only when told to, in the calling
+    thread.
+
+    @ivar calls: The calls not yet run.
+    """
+    def __init__(self):
+        self.calls = []
+
+
+    def callInThreadWithCallback(self, onResult, f, *args, **kwargs):
+        self.calls.append((onResult, f, args, kwargs))
+
+
+    def runOne(self):
+        """
+        Run the oldest queued call.
+        """
+        onResult, f, args, kwargs = self.calls.pop(0)
+        try:
+            result = f(*args, **kwargs)
+        except:
+            onResult(False, failure.Failure())
+        else:
+            onResult(True, result)
+
+
+    def runAll(self):
+        """
+        Run queued calls, including those queued by the calls being run, until
+        none remain.
+        """
+        while self.calls:
+            self.runOne()
+
+
+
+class _ImmediateThreadPool(_QueueingThreadPool):
+    """
+    A fake thread pool which runs functions as soon as they are given to it,
+    in the calling thread.
+    """
+    def callInThreadWithCallback(self, onResult, f, *args, **kwargs):
+        _QueueingThreadPool.callInThreadWithCallback(
+            self, onResult, f, *args, **kwargs)
+        self.runAll()
+
+
+
+class _ImmediateReactor(object):
+    """
+    A fake reactor whose C{callFromThread} calls the function immediately,
+    for use with L{_QueueingThreadPool} and L{_ImmediateThreadPool}.
+    """
+    def callFromThread(self, f, *args, **kwargs):
+        f(*args, **kwargs)
+
+
+
 def waitUntilAllDisconnected(reactor, protocols):
     """
     Take a list of disconnecting protocols, callback a L{Deferred} when they're
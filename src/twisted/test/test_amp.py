@@ -20,7 +20,7 @@ from twisted.python.failure import Failure
 from twisted.protocols import amp
 from twisted.trial import unittest
 from twisted.internet import (
-    address, protocol, defer, error, reactor, interfaces)
+    address, protocol, defer, error, reactor, interfaces, task)
 from twisted.test import iosim
 from twisted.test.proto_helpers import StringTransport
 
@@ -984,6 +984,88 @@ class BinaryProtocolTests(unittest.TestCase):
         self.assertTrue(transport.disconnecting)
 
 
+    def test_receiveManyBoxesAtOnce(self):
+        """
+        All the complete boxes in the data received at once are delivered, in
+        order, and a box which is not complete yet is delivered once the rest
+        of it is received.
+        """
+        protocol = amp.BinaryBoxProtocol(self)
+        protocol.makeConnection(StringTransport())
+        boxes = [amp.AmpBox(a=b'1', b=b''), amp.AmpBox(c=b'2' * 300),
+                 amp.AmpBox(d=b'3')]
+        data = b''.join([box.serialize() for box in boxes])
+        protocol.dataReceived(data[:-3])
+        self.assertEqual(self.boxes, boxes[:2])
+        protocol.dataReceived(data[-3:])
+        self.assertEqual(self.boxes, boxes)
+
+
+    def test_receiveBoxesByteByByte(self):
+        """
+        Boxes received one byte at a time are delivered just the same.
+        """
+        protocol = amp.BinaryBoxProtocol(self)
+        protocol.makeConnection(StringTransport())
+        boxes = [amp.AmpBox(hello=b'world', x=b''), amp.AmpBox(y=b'z')]
+        data = b''.join([box.serialize() for box in boxes])
+        for i in range(len(data)):
+            protocol.dataReceived(data[i:i + 1])
+        self.assertEqual(self.boxes, boxes)
+
+
+    def test_receiveEmptyBox(self):
+        """
+        An empty box is delivered as an empty L{amp.AmpBox}.
+        """
+        protocol = amp.BinaryBoxProtocol(self)
+        protocol.makeConnection(StringTransport())
+        protocol.dataReceived(b'\x00\x00\x00\x01k\x00\x01v\x00\x00')
+        self.assertEqual(self.boxes, [amp.AmpBox(), amp.AmpBox(k=b'v')])
+        self.assertIsInstance(self.boxes[0], amp.AmpBox)
+
+
+    def test_pauseStopsBoxDelivery(self):
+        """
+        No more boxes are delivered while the protocol is paused, and the
+        rest are delivered when it is resumed.
+        """
+        transport = StringTransport()
+        protocol = amp.BinaryBoxProtocol(self)
+        protocol.makeConnection(transport)
+        boxes = [amp.AmpBox(a=b'1'), amp.AmpBox(b=b'2'), amp.AmpBox(c=b'3')]
+        def ampBoxReceived(box):
+            self.boxes.append(box)
+            protocol.pauseProducing()
+        self.ampBoxReceived = ampBoxReceived
+        protocol.dataReceived(b''.join([box.serialize() for box in boxes]))
+        self.assertEqual(self.boxes, boxes[:1])
+        del self.ampBoxReceived
+        protocol.resumeProducing()
+        self.assertEqual(self.boxes, boxes)
+
+
+    def test_switchProtocolsWithinReceivedData(self):
+        """
+        When a protocol switch happens while a box is delivered, the rest of
+        the data received with that box goes to the new protocol, not to the
+        box parser.
+        """
+        inner = protocol.Protocol()
+        boxProtocol = amp.BinaryBoxProtocol(self)
+        boxProtocol.makeConnection(StringTransport())
+        received = []
+        inner.dataReceived = received.append
+        def ampBoxReceived(box):
+            self.boxes.append(box)
+            boxProtocol._switchTo(inner)
+        self.ampBoxReceived = ampBoxReceived
+        boxProtocol.dataReceived(
+            amp.AmpBox(a=b'1').serialize() + b'\x00\x01not a box')
+        self.assertEqual(self.boxes, [amp.AmpBox(a=b'1')])
+        self.assertEqual(received, [b'\x00\x01not a box'])
+
+
     def test_excessiveKeyFailure(self):
         """
         If L{amp.BinaryBoxProtocol} disconnects because it received a key
@@ -2485,6 +2567,45 @@ class CommandTests(unittest.TestCase):
         self.assertTrue(verifyObject(amp.IArgumentType, amp.Argument()))
 
 
+    def test_customFromBoxAndToBox(self):
+        """
+        An argument which implements C{fromBox} and C{toBox} itself is used
+        through those methods, alongside arguments which do not.
+        """
+        class Prefixed(amp.String):
+            def fromBox(self, name, strings, objects, proto):
+                objects['thing'] = strings.pop(b'x-' + name)
+
+            def toBox(self, name, strings, objects, proto):
+                strings[b'x-' + name] = objects.pop('thing')
+
+        class PrefixedCommand(amp.Command):
+            arguments = [(b'plain', amp.Integer()),
+                         (b'thing', Prefixed())]
+
+        box = PrefixedCommand.makeArguments(
+            {'plain': 3, 'thing': b'value'}, None)
+        self.assertEqual(box, {b'plain': b'3', b'x-thing': b'value'})
+        self.assertEqual(PrefixedCommand.parseArguments(box, None),
+                         {'plain': 3, 'thing': b'value'})
+        self.assertEqual(box, {b'plain': b'3', b'x-thing': b'value'})
+
+
+    def test_replacedArguments(self):
+        """
+        If a L{amp.Command}'s argument list is replaced, the new one is used.
+        """
+        class Replaced(amp.Command):
+            arguments = [(b'a', amp.Integer())]
+
+        self.assertEqual(Replaced.parseArguments({b'a': b'1'}, None),
+                         {'a': 1})
+        Replaced.arguments = [(b'b', amp.Unicode(optional=True))]
+        self.assertEqual(Replaced.parseArguments({b'b': b'x'}, None),
+                         {'b': u'x'})
+        self.assertEqual(Replaced.makeArguments({}, None), {})
+
+
     def test_parseResponse(self):
         """
         There should be a class method of Command which accepts a
@@ -2718,6 +2839,496 @@ class CommandTests(unittest.TestCase):
 
 
 
+class OutstandingWindowTests(unittest.TestCase):
+    """
+    Tests for L{amp.BoxDispatcher.maxOutstanding}.
+    """
+
+    def setUp(self):
+        self.transport = StringTransport()
+        self.client = amp.AMP()
+        self.client.maxOutstanding = 2
+        self.client.makeConnection(self.transport)
+
+
+    def sentBoxes(self):
+        """
+        Parse and forget the boxes written to the transport so far.
+        """
+        boxes = amp.parseString(self.transport.value())
+        self.transport.clear()
+        return boxes
+
+
+    def test_queuedBeyondWindow(self):
+        """
+        Requests beyond C{maxOutstanding} are queued, and sent in order as
+        answers come back.
+        """
+        results = []
+        for i in range(3):
+            self.client.callRemoteString(
+                b'hello', hello=intToBytes(i)).addCallback(results.append)
+        self.assertEqual([box[b'hello'] for box in self.sentBoxes()],
+                         [b'0', b'1'])
+
+        self.client.ampBoxReceived(amp.AmpBox(_answer=b'1', hello=b'a'))
+        self.assertEqual([box[b'hello'] for box in self.sentBoxes()], [b'2'])
+        self.assertEqual(len(results), 1)
+
+        self.client.ampBoxReceived(amp.AmpBox(_answer=b'3', hello=b'c'))
+        self.client.ampBoxReceived(amp.AmpBox(_answer=b'2', hello=b'b'))
+        self.assertEqual([box[b'hello'] for box in results],
+                         [b'a', b'c', b'b'])
+
+
+    def test_errorFreesRoom(self):
+        """
+        An error answer makes room for a queued request too.
+        """
+        failures = []
+        self.client.callRemoteString(b'hello').addErrback(failures.append)
+        self.client.callRemoteString(b'hello')
+        self.client.callRemoteString(b'hello')
+        self.assertEqual(len(self.sentBoxes()), 2)
+        self.client.ampBoxReceived(amp.AmpBox(
+            _error=b'1', _error_code=b'X', _error_description=b'x'))
+        self.assertEqual(len(self.sentBoxes()), 1)
+        failures[0].trap(amp.RemoteAmpError)
+
+
+    def test_noAnswerQueuedInOrder(self):
+        """
+        A request which requires no answer is not limited by
+        C{maxOutstanding}, but is not sent ahead of queued requests either.
+        """
+        self.assertIsNone(self.client.callRemoteString(
+            b'hello', requiresAnswer=False, hello=b'0'))
+        self.client.callRemoteString(b'hello', hello=b'1')
+        self.client.callRemoteString(b'hello', hello=b'2')
+        self.client.callRemoteString(b'hello', hello=b'3')
+        self.assertIsNone(self.client.callRemoteString(
+            b'hello', requiresAnswer=False, hello=b'4'))
+        self.assertEqual([box[b'hello'] for box in self.sentBoxes()],
+                         [b'0', b'1', b'2'])
+        self.client.ampBoxReceived(amp.AmpBox(_answer=b'2'))
+        self.assertEqual([box[b'hello'] for box in self.sentBoxes()],
+                         [b'3', b'4'])
+
+
+    def test_immediate(self):
+        """
+        A command sent with C{immediate} is sent even if there is no room for
+        it.
+        """
+        self.client.callRemoteString(b'hello')
+        self.client.callRemoteString(b'hello')
+        self.client.callRemoteString(b'hello')
+        self.sentBoxes()
+        self.client._sendBoxCommand(b'now', amp.AmpBox(), immediate=True)
+        self.assertEqual([box[b'_command'] for box in self.sentBoxes()],
+                         [b'now'])
+
+
+    def test_connectionLostFailsQueued(self):
+        """
+        When the connection is lost, queued requests fail with the reason.
+        """
+        failures = []
+        for i in range(3):
+            self.client.callRemoteString(b'hello').addErrback(failures.append)
+        self.client.connectionLost(
+            Failure(error.ConnectionDone("simulated connection done")))
+        self.assertEqual(len(failures), 3)
+        for failure in failures:
+            failure.trap(error.ConnectionDone)
+
+
+
+@implementer(interfaces.IPushProducer)
+class ChunkProducer(object):
+    """
+    A producer for L{amp.Stream} arguments, which writes its data in chunks
+    for as long as it is not paused.
+
+    @ivar finished: the L{defer.Deferred} returned by C{startProducing}, until
+        it has fired.
+    """
+    paused = False
+    stopped = False
+    finished = None
+
+    def __init__(self, data, chunkSize=10000):
+        self.data = data
+        self.chunkSize = chunkSize
+
+
+    def startProducing(self, consumer):
+        self.consumer = consumer
+        self.finished = defer.Deferred()
+        finished = self.finished
+        self._produce()
+        return finished
+
+
+    def _produce(self):
+        while self.data and not self.paused and not self.stopped:
+            chunk = self.data[:self.chunkSize]
+            self.data = self.data[self.chunkSize:]
+            self.consumer.write(chunk)
+        if not self.data and self.finished is not None:
+            finished, self.finished = self.finished, None
+            finished.callback(None)
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+        self._produce()
+
+
+    def stopProducing(self):
+        self.stopped = True
+        finished, self.finished = self.finished, None
+        finished.errback(task.TaskStopped())
+
+
+
+@implementer(interfaces.IConsumer)
+class Collector(object):
+    """
+    A consumer which keeps what is written to it, and can pause its producer
+    when it is registered or stop it after the first write.
+    """
+    producer = None
+    pauseOnRegister = False
+    stopOnWrite = False
+    unregistered = False
+
+    def __init__(self):
+        self.chunks = []
+
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+        self.streaming = streaming
+        if self.pauseOnRegister:
+            producer.pauseProducing()
+
+
+    def unregisterProducer(self):
+        self.unregistered = True
+
+
+    def write(self, data):
+        self.chunks.append(data)
+        if self.stopOnWrite:
+            self.producer.stopProducing()
+
+
+
+class Upload(amp.Command):
+    arguments = [(b'data', amp.Stream())]
+    response = [(b'size', amp.Integer())]
+
+
+
+class Download(amp.Command):
+    arguments = [(b'size', amp.Integer())]
+    response = [(b'data', amp.Stream())]
+
+
+
+class Ignore(amp.Command):
+    arguments = [(b'data', amp.Stream())]
+
+
+
+class UnknownUpload(amp.Command):
+    commandName = b'unknown-upload'
+    arguments = [(b'data', amp.Stream())]
+
+
+
+class StreamingProtocol(amp.AMP):
+    """
+    A protocol which receives uploads into a L{Collector} and sends downloads
+    from a L{ChunkProducer}.
+    """
+    producer = None
+
+    def __init__(self):
+        amp.AMP.__init__(self)
+        self.collector = Collector()
+
+
+    def upload(self, data):
+        d = data.deliverTo(self.collector)
+        d.addCallback(
+            lambda ignored: {'size': len(b''.join(self.collector.chunks))})
+        return d
+    Upload.responder(upload)
+
+
+    def download(self, size):
+        self.producer = ChunkProducer(b'x' * size)
+        return {'data': self.producer}
+    Download.responder(download)
+
+
+    def ignore(self, data):
+        return {}
+    Ignore.responder(ignore)
+
+
+
+class StreamTests(unittest.TestCase):
+    """
+    Tests for L{amp.Stream}.
+    """
+
+    def setUp(self):
+        self.client, self.server, self.pump = connectedServerAndClient(
+            StreamingProtocol, StreamingProtocol)
+
+
+    def download(self, size, collector):
+        """
+        Download C{size} bytes into C{collector}.
+
+        @return: the L{defer.Deferred} returned by C{deliverTo}.
+        """
+        delivered = []
+        self.client.callRemote(Download, size=size).addCallback(
+            lambda response: delivered.append(
+                response['data'].deliverTo(collector)))
+        self.pump.flush()
+        return delivered[0]
+
+
+    def test_upload(self):
+        """
+        The bytes produced for a L{amp.Stream} argument of a command are
+        delivered to the responder, however long they are.
+        """
+        data = b''.join([intToBytes(i) for i in range(50000)])
+        self.assertTrue(len(data) > amp.MAX_VALUE_LENGTH * 3)
+        responses = []
+        self.client.callRemote(
+            Upload, data=ChunkProducer(data)).addCallback(responses.append)
+        self.pump.flush()
+        self.assertEqual(responses, [{'size': len(data)}])
+        self.assertEqual(b''.join(self.server.collector.chunks), data)
+        self.assertTrue(self.server.collector.streaming)
+        self.assertTrue(self.server.collector.unregistered)
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertEqual(self.server._incomingStreams, {})
+
+
+    def test_download(self):
+        """
+        The bytes produced for a L{amp.Stream} in a response are delivered to
+        the consumer given to C{deliverTo}.
+        """
+        collector = Collector()
+        results = []
+        self.download(300000, collector).addCallback(results.append)
+        self.pump.flush()
+        self.assertEqual(results, [None])
+        self.assertEqual(b''.join(collector.chunks), b'x' * 300000)
+        self.assertTrue(collector.unregistered)
+        self.assertEqual(self.client._incomingStreams, {})
+
+
+    def test_window(self):
+        """
+        No more than C{streamWindow} bytes are sent while the consumer is
+        paused, and the rest are sent when it is resumed.
+        """
+        self.server.streamWindow = 100000
+        collector = Collector()
+        collector.pauseOnRegister = True
+        results = []
+        self.download(1000000, collector).addCallback(results.append)
+        self.pump.flush()
+        self.assertTrue(self.server.producer.paused)
+        self.assertEqual(collector.chunks, [])
+        self.assertTrue(len(self.server.producer.data) >= 1000000 - 110000)
+
+        collector.producer.resumeProducing()
+        self.pump.flush()
+        self.assertEqual(results, [None])
+        self.assertEqual(b''.join(collector.chunks), b'x' * 1000000)
+
+
+    def test_stop(self):
+        """
+        When the consumer stops the stream, the sender's producer is stopped
+        and the L{defer.Deferred} returned by C{deliverTo} fails with
+        L{defer.CancelledError}.
+        """
+        collector = Collector()
+        collector.stopOnWrite = True
+        d = self.download(1000000, collector)
+        self.pump.flush()
+        self.assertTrue(self.server.producer.stopped)
+        self.assertEqual(len(collector.chunks), 1)
+        self.assertEqual(self.client._incomingStreams, {})
+        self.assertEqual(self.server._outgoingStreams, {})
+        self.assertEqual(self.flushLoggedErrors(), [])
+        return self.assertFailure(d, defer.CancelledError)
+
+
+    def test_producerFails(self):
+        """
+        If the producer fails, the failure is logged and the
+        L{defer.Deferred} returned by C{deliverTo} fails with
+        L{amp.UnknownRemoteError}.
+        """
+        self.server.streamWindow = 100000
+        collector = Collector()
+        collector.pauseOnRegister = True
+        d = self.download(1000000, collector)
+        self.pump.flush()
+        self.server.producer.finished.errback(ZeroDivisionError())
+        self.pump.flush()
+        collector.producer.resumeProducing()
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        return self.assertFailure(d, amp.UnknownRemoteError)
+
+
+    def test_connectionLost(self):
+        """
+        When the connection is lost, streams being received fail with the
+        reason, and the producers of streams being sent are stopped.
+        """
+        self.server.streamWindow = 100000
+        collector = Collector()
+        collector.pauseOnRegister = True
+        d = self.download(1000000, collector)
+        self.pump.flush()
+        reason = Failure(error.ConnectionDone("simulated connection done"))
+        self.client.connectionLost(reason)
+        self.server.connectionLost(reason)
+        self.assertTrue(self.server.producer.stopped)
+        collector.producer.resumeProducing()
+        self.assertTrue(collector.chunks)
+        return self.assertFailure(d, error.ConnectionDone)
+
+
+    def test_startedWhenSent(self):
+        """
+        The producer of a L{amp.Stream} argument is not started while the
+        command is queued by C{maxOutstanding}, but once it is sent.
+        """
+        self.client.maxOutstanding = 0
+        producer = ChunkProducer(b'x' * 1000)
+        responses = []
+        self.client.callRemote(
+            Upload, data=producer).addCallback(responses.append)
+        self.pump.flush()
+        self.assertIsNone(producer.finished)
+        self.assertFalse(hasattr(producer, 'consumer'))
+        self.assertEqual(self.client._outgoingStreams, {})
+
+        self.client.maxOutstanding = None
+        self.client._sendQueuedRequests()
+        self.pump.flush()
+        self.assertEqual(responses, [{'size': 1000}])
+
+
+    def test_unhandledCommand(self):
+        """
+        The streams of a command which the peer does not handle are stopped,
+        and neither side keeps track of them.
+        """
+        self.client.streamWindow = 1000
+        producer = ChunkProducer(b'x' * 100000, chunkSize=100)
+        d = self.assertFailure(
+            self.client.callRemote(UnknownUpload, data=producer),
+            amp.UnhandledCommand)
+        self.pump.flush()
+        self.assertTrue(producer.stopped)
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertEqual(self.server._incomingStreams, {})
+        return d
+
+
+    def test_notDelivered(self):
+        """
+        The streams a responder has not called C{deliverTo} for by the time
+        its result is ready are stopped.
+        """
+        self.client.streamWindow = 1000
+        producer = ChunkProducer(b'x' * 100000, chunkSize=100)
+        responses = []
+        self.client.callRemote(
+            Ignore, data=producer).addCallback(responses.append)
+        self.pump.flush()
+        self.assertEqual(responses, [{}])
+        self.assertTrue(producer.stopped)
+        self.assertEqual(self.client._outgoingStreams, {})
+        self.assertEqual(self.server._incomingStreams, {})
+
+
+    def test_responseNotDelivered(self):
+        """
+        The streams of a response which the callbacks for it have not called
+        C{deliverTo} for by the time they are finished are stopped.
+        """
+        self.server.streamWindow = 1000
+        responses = []
+        self.client.callRemote(Download, size=100000).addCallback(
+            responses.append)
+        self.pump.flush()
+        self.assertEqual(len(responses), 1)
+        self.assertTrue(self.server.producer.stopped)
+        self.assertEqual(self.server._outgoingStreams, {})
+        self.assertEqual(self.client._incomingStreams, {})
+
+
+    def test_windowLimited(self):
+        """
+        The window a peer announces for a stream it sends is limited to the
+        receiver's own C{streamWindow}, and a stream which sends more is
+        failed.
+        """
+        self.server.streamWindow = 100000
+        self.client.streamWindow = 1000
+        collector = Collector()
+        collector.pauseOnRegister = True
+        d = self.download(100000, collector)
+        self.pump.flush()
+        self.assertEqual(self.server._outgoingStreams, {})
+        self.assertEqual(self.client._incomingStreams, {})
+        return self.assertFailure(d, amp.MalformedAmpBox)
+
+
+    def test_windowExceeded(self):
+        """
+        If the peer sends more of a stream than its window allows, the
+        L{defer.Deferred} returned by C{deliverTo} fails with
+        L{amp.MalformedAmpBox} and the peer is asked to stop.
+        """
+        self.server.streamWindow = 1000
+        collector = Collector()
+        collector.pauseOnRegister = True
+        d = self.download(100000, collector)
+        self.pump.flush()
+        self.assertTrue(self.server.producer.paused)
+        [stream] = self.server._outgoingStreams.values()
+        stream._send(amp.AmpBox({amp._STREAM_DATA: b'x'}))
+        self.pump.flush()
+        self.assertTrue(self.server.producer.stopped)
+        self.assertEqual(self.client._incomingStreams, {})
+        self.assertEqual(self.server._outgoingStreams, {})
+        return self.assertFailure(d, amp.MalformedAmpBox)
+
+
+
 class ListOfTestsMixin:
     """
     Base class for testing L{ListOf}, a parameterized zero-or-more argument
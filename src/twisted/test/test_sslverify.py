@@ -463,8 +463,14 @@ class FakeContext(object):
     @ivar _defaultVerifyPathsSet: Set by L{set_default_verify_paths}
 
     @ivar _ecCurve: Set by L{set_tmp_ecdh}
+
+    @ivar _timeout: Set by L{set_timeout}.
+
+    @ivar _infoCallback: Set by L{set_info_callback}.
     """
     _options = 0
+    _timeout = None
+    _infoCallback = None
 
     def __init__(self, method):
         self._method = method
@@ -510,6 +516,14 @@ class FakeContext(object):
         self._sessionID = sessionID
 
 
+    def set_timeout(self, timeout):
+        self._timeout = timeout
+
+
+    def set_info_callback(self, callback):
+        self._infoCallback = callback
+
+
     def add_extra_chain_cert(self, cert):
         self._extraCertChain.append(cert)
 
@@ -845,6 +859,123 @@ class OpenSSLOptionsTests(OpenSSLOptionsTestsMixin, unittest.TestCase):
         self.assertIsInstance(ctx, SSL.Context)
 
 
+    def test_sessionTimeout(self):
+        """
+        If C{sessionTimeout} is set, it is the timeout of sessions cached by
+        the C{Context}s that get created.
+        """
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+            sessionTimeout=600,
+        )
+        opts._contextFactory = FakeContext
+        ctx = opts.getContext()
+        self.assertEqual(600, ctx._timeout)
+
+
+    def test_sessionTimeoutDefault(self):
+        """
+        If C{sessionTimeout} is not set, OpenSSL's default session timeout is
+        left alone.
+        """
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+        )
+        opts._contextFactory = FakeContext
+        ctx = opts.getContext()
+        self.assertIsNone(ctx._timeout)
+
+
+    def test_sessionTicketKeyLifetime(self):
+        """
+        If C{sessionTicketKeyLifetime} and C{enableSessionTickets} are set,
+        L{sslverify.OpenSSLCertificateOptions.getContext} keeps returning the
+        same C{Context} until it is that many seconds old, and then a new one,
+        with new session ticket keys.
+        """
+        now = [1000.0]
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+            enableSessionTickets=True,
+            sessionTicketKeyLifetime=60,
+        )
+        opts._contextFactory = FakeContext
+        opts._now = lambda: now[0]
+        ctx = opts.getContext()
+        now[0] += 59
+        self.assertIs(ctx, opts.getContext())
+        now[0] += 1
+        newCtx = opts.getContext()
+        self.assertIsNot(ctx, newCtx)
+        now[0] += 59
+        self.assertIs(newCtx, opts.getContext())
+
+
+    def test_noSessionTicketKeyLifetime(self):
+        """
+        If C{sessionTicketKeyLifetime} is not set,
+        L{sslverify.OpenSSLCertificateOptions.getContext} always returns the
+        same C{Context}.
+        """
+        now = [1000.0]
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+        )
+        opts._contextFactory = FakeContext
+        opts._now = lambda: now[0]
+        ctx = opts.getContext()
+        now[0] += 60 * 60 * 24 * 365
+        self.assertIs(ctx, opts.getContext())
+
+
+    def test_sessionTicketKeyLifetimeWithoutTickets(self):
+        """
+        If C{sessionTicketKeyLifetime} is set but C{enableSessionTickets} is
+        not, there are no session ticket keys to rotate, so
+        L{sslverify.OpenSSLCertificateOptions.getContext} always returns the
+        same C{Context}.
+        """
+        now = [1000.0]
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+            sessionTicketKeyLifetime=60,
+        )
+        opts._contextFactory = FakeContext
+        opts._now = lambda: now[0]
+        ctx = opts.getContext()
+        now[0] += 60
+        self.assertIs(ctx, opts.getContext())
+
+
+    def test_handshakeStatistics(self):
+        """
+        If C{handshakeStatistics} is set, the C{Context}s that get created
+        have an C{info_callback} counting handshakes into it; otherwise they
+        have none.
+        """
+        statistics = sslverify.TLSHandshakeStatistics()
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+            handshakeStatistics=statistics,
+        )
+        opts._contextFactory = FakeContext
+        self.assertIs(statistics, opts.handshakeStatistics)
+        self.assertIsNotNone(opts.getContext()._infoCallback)
+
+        opts = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.sKey,
+            certificate=self.sCert,
+        )
+        opts._contextFactory = FakeContext
+        self.assertIsNone(opts.getContext()._infoCallback)
+
+
     def test_acceptableCiphersAreAlwaysSet(self):
         """
         If the user doesn't supply custom acceptable ciphers, a shipped secure
@@ -2607,6 +2738,329 @@ class MultipleCertificateTrustRootTests(unittest.TestCase):
 
 
 
+class FakeSessionConnection(object):
+    """
+    A fake of an L{OpenSSL.SSL.Connection}, as far as
+    L{sslverify.ClientTLSSessionCache} uses one.
+
+    @ivar session: The session returned by L{get_session} and replaced by
+        L{set_session}.
+    """
+    def __init__(self, session=None):
+        self.session = session
+
+
+    def get_session(self):
+        return self.session
+
+
+    def set_session(self, session):
+        self.session = session
+
+
+
+class TLSHandshakeStatisticsTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{sslverify.TLSHandshakeStatistics}.
+    """
+
+    def test_resumptionRate(self):
+        """
+        L{sslverify.TLSHandshakeStatistics.resumptionRate} is the fraction of
+        handshakes which were resumed, or L{None} before any handshake.
+        """
+        statistics = sslverify.TLSHandshakeStatistics()
+        self.assertIsNone(statistics.resumptionRate)
+        statistics.fullHandshakes = 1
+        statistics.resumedHandshakes = 3
+        self.assertEqual(0.75, statistics.resumptionRate)
+
+
+    def test_repr(self):
+        """
+        The representation of a L{sslverify.TLSHandshakeStatistics} includes
+        its counters.
+        """
+        statistics = sslverify.TLSHandshakeStatistics()
+        statistics.fullHandshakes = 2
+        statistics.resumedHandshakes = 5
+        self.assertEqual(
+            "<TLSHandshakeStatistics fullHandshakes=2 resumedHandshakes=5>",
+            repr(statistics))
+
+
+
+class ClientTLSSessionCacheTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{sslverify.ClientTLSSessionCache}.
+    """
+
+    def test_resume(self):
+        """
+        A session stored for a host is offered to later connections to that
+        host, but not to connections to other hosts.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        cache._store(FakeSessionConnection(b"session"), b"example.com")
+        connection = FakeSessionConnection()
+        cache._resume(connection, b"example.com")
+        self.assertEqual(b"session", connection.session)
+        connection = FakeSessionConnection()
+        cache._resume(connection, b"example.org")
+        self.assertIsNone(connection.session)
+
+
+    def test_evictLeastRecentlyUsed(self):
+        """
+        Once sessions for more than C{maxSessions} hosts are stored, the one
+        least recently stored or resumed is discarded.
+        """
+        cache = sslverify.ClientTLSSessionCache(maxSessions=2)
+        cache._store(FakeSessionConnection(b"a"), b"a.example.com")
+        cache._store(FakeSessionConnection(b"b"), b"b.example.com")
+        cache._resume(FakeSessionConnection(), b"a.example.com")
+        cache._store(FakeSessionConnection(b"c"), b"c.example.com")
+        self.assertEqual(2, len(cache))
+
+        for hostname, session in [(b"a.example.com", b"a"),
+                                  (b"b.example.com", None),
+                                  (b"c.example.com", b"c")]:
+            connection = FakeSessionConnection()
+            cache._resume(connection, hostname)
+            self.assertEqual(session, connection.session)
+
+
+    def test_clear(self):
+        """
+        L{sslverify.ClientTLSSessionCache.clear} discards all stored sessions.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        cache._store(FakeSessionConnection(b"a"), b"a.example.com")
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        connection = FakeSessionConnection()
+        cache._resume(connection, b"a.example.com")
+        self.assertIsNone(connection.session)
+
+
+
+class SessionResumptionTests(unittest.SynchronousTestCase):
+    """
+    Tests for resuming TLS sessions with a L{sslverify.ClientTLSSessionCache}
+    and counting handshakes with L{sslverify.TLSHandshakeStatistics}.
+    """
+
+    if skipSSL:
+        skip = skipSSL
+
+    def setUp(self):
+        self.serverCertificate = sslverify.PrivateCertificate.loadPEM(
+            A_KEYPAIR)
+        self.trustRoot = sslverify.trustRootFromCertificates(
+            [self.serverCertificate])
+        self.serverStatistics = sslverify.TLSHandshakeStatistics()
+        self.patch(sslverify, "verifyHostname", self.verifyHostname)
+
+
+    def verifyHostname(self, connection, hostname):
+        """
+        Verify hostnames without depending on which implementation is
+        available, as if the server's certificate were for C{example.com}.
+
+        @param connection: The client connection which completed a handshake.
+        @type connection: L{OpenSSL.SSL.Connection}
+
+        @param hostname: The hostname the client expects.
+        @type hostname: L{unicode}
+
+        @raise sslverify.VerificationError: If C{hostname} is not
+            C{example.com}.
+        """
+        if hostname != u"example.com":
+            raise sslverify.VerificationError(hostname)
+
+
+    def serverOptions(self, **kw):
+        """
+        Create server options counting handshakes in C{serverStatistics}.
+
+        @param kw: Further arguments for
+            L{sslverify.OpenSSLCertificateOptions}.
+
+        @return: The server options.
+        @rtype: L{sslverify.OpenSSLCertificateOptions}
+        """
+        return sslverify.OpenSSLCertificateOptions(
+            privateKey=self.serverCertificate.privateKey.original,
+            certificate=self.serverCertificate.original,
+            handshakeStatistics=self.serverStatistics,
+            **kw
+        )
+
+
+    def connect(self, serverOptions, sessionCache, hostname=u"example.com"):
+        """
+        Connect a client resuming sessions from C{sessionCache} to a server,
+        and close the connection cleanly.
+
+        @param serverOptions: The server options.
+        @type serverOptions: L{sslverify.OpenSSLCertificateOptions}
+
+        @param sessionCache: The client's session cache.
+        @type sessionCache: L{sslverify.ClientTLSSessionCache}
+
+        @param hostname: The hostname the client verifies.
+        @type hostname: L{unicode}
+
+        @return: The client's wrapped protocol.
+        """
+        clientOptions = sslverify.optionsForClientTLS(
+            hostname, trustRoot=self.trustRoot, sessionCache=sessionCache)
+        sProto, cProto, sWrap, cWrap, pump = _loopbackTLSConnection(
+            serverOptions, clientOptions)
+        sWrap.transport.loseConnection()
+        pump.flush()
+        return cWrap
+
+
+    def test_resume(self):
+        """
+        A connection to a host a session was negotiated with before resumes
+        that session, as counted by the client's and server's handshake
+        statistics.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        serverOptions = self.serverOptions()
+        for i in range(3):
+            self.assertEqual(
+                b"greetings!", self.connect(serverOptions, cache).data)
+
+        for statistics in [cache.statistics, self.serverStatistics]:
+            self.assertEqual(1, statistics.fullHandshakes)
+            self.assertEqual(2, statistics.resumedHandshakes)
+        self.assertEqual(1, len(cache))
+
+
+    def test_noSessionCache(self):
+        """
+        Without a session cache, every connection performs a full handshake.
+        """
+        serverOptions = self.serverOptions()
+        for i in range(2):
+            self.assertEqual(
+                b"greetings!", self.connect(serverOptions, None).data)
+        self.assertEqual(2, self.serverStatistics.fullHandshakes)
+        self.assertEqual(0, self.serverStatistics.resumedHandshakes)
+
+
+    def test_clientHandshakeStatistics(self):
+        """
+        Client options created with C{handshakeStatistics} in their
+        C{extraCertificateOptions} count their handshakes as well as verify
+        the server's hostname.
+        """
+        statistics = sslverify.TLSHandshakeStatistics()
+        cache = sslverify.ClientTLSSessionCache()
+        serverOptions = self.serverOptions()
+        for hostname in [u"example.com", u"example.com", u"example.org"]:
+            clientOptions = sslverify.optionsForClientTLS(
+                hostname, trustRoot=self.trustRoot, sessionCache=cache,
+                extraCertificateOptions={
+                    "handshakeStatistics": statistics})
+            sProto, cProto, sWrap, cWrap, pump = _loopbackTLSConnection(
+                serverOptions, clientOptions)
+            sWrap.transport.loseConnection()
+            pump.flush()
+        self.assertEqual(b"", cWrap.data)
+        self.assertEqual(2, statistics.fullHandshakes)
+        self.assertEqual(1, statistics.resumedHandshakes)
+
+
+    def test_verificationFailed(self):
+        """
+        The session of a connection to a server whose certificate does not
+        match the hostname is not stored.
+        """
+        cache = sslverify.ClientTLSSessionCache()
+        client = self.connect(self.serverOptions(), cache, u"example.org")
+        self.assertEqual(b"", client.data)
+        self.assertEqual(0, len(cache))
+
+
+    def test_sessionTicketKeysRotated(self):
+        """
+        A session negotiated just before the server's
+        C{sessionTicketKeyLifetime} elapsed is still resumed for that long
+        again, while sessions negotiated with the new key are resumed too.
+        """
+        now = [1000.0]
+        oldCache = sslverify.ClientTLSSessionCache()
+        newCache = sslverify.ClientTLSSessionCache()
+        serverOptions = self.serverOptions(
+            enableSessionTickets=True, sessionTicketKeyLifetime=60)
+        serverOptions._now = lambda: now[0]
+        self.connect(serverOptions, oldCache)
+        now[0] += 59
+        self.connect(serverOptions, oldCache)
+        now[0] += 1
+        self.connect(serverOptions, newCache)
+        self.connect(serverOptions, newCache)
+        self.connect(serverOptions, oldCache)
+        now[0] += 59
+        self.connect(serverOptions, oldCache)
+        self.connect(serverOptions, newCache)
+        self.assertEqual(2, self.serverStatistics.fullHandshakes)
+        self.assertEqual(5, self.serverStatistics.resumedHandshakes)
+
+
+    def test_sessionTicketKeysExpired(self):
+        """
+        A session negotiated before the server's C{sessionTicketKeyLifetime}
+        elapsed cannot be resumed once it elapsed again.
+        """
+        now = [1000.0]
+        cache = sslverify.ClientTLSSessionCache()
+        serverOptions = self.serverOptions(
+            enableSessionTickets=True, sessionTicketKeyLifetime=60)
+        serverOptions._now = lambda: now[0]
+        self.connect(serverOptions, cache)
+        now[0] += 120
+        self.connect(serverOptions, cache)
+        self.assertEqual(2, self.serverStatistics.fullHandshakes)
+        self.assertEqual(0, self.serverStatistics.resumedHandshakes)
+
+
+    def test_ticketKeyProbesLimited(self):
+        """
+        Once C{_maxTicketKeyProbes} session ticket key names were found not to
+        be the previous context's, a server no longer tries to resume sessions
+        offered with other keys with it.
+        """
+        now = [1000.0]
+        cache = sslverify.ClientTLSSessionCache()
+        serverOptions = self.serverOptions(
+            enableSessionTickets=True, sessionTicketKeyLifetime=60)
+        serverOptions._now = lambda: now[0]
+        serverOptions._maxTicketKeyProbes = 0
+        self.connect(serverOptions, cache)
+        now[0] += 60
+        self.connect(serverOptions, cache)
+        self.assertEqual(2, self.serverStatistics.fullHandshakes)
+        self.assertEqual(0, self.serverStatistics.resumedHandshakes)
+
+
+    def test_clientHelloTicketKeyName(self):
+        """
+        L{sslverify._clientHelloTicketKeyName} finds no key name in bytes
+        which are not a complete C{ClientHello} offering a session ticket.
+        """
+        for clientHello in [b"", b"\x16\x03\x01\x00\x10\x01",
+                            b"GET / HTTP/1.1\r\n\r\n"]:
+            self.assertIsNone(
+                sslverify._clientHelloTicketKeyName(clientHello))
+
+
+
 class OpenSSLCipherTests(unittest.TestCase):
     """
     Tests for twisted.internet._sslverify.OpenSSLCipher.
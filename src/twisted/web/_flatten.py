@@ -21,12 +21,19 @@ except ImportError:
     def iscoroutine(*args, **kwargs):
         return False
 
+from zope.interface import implementer
+
 from twisted.python.compat import unicode, nativeString, iteritems
 from twisted.internet.defer import Deferred, ensureDeferred
+from twisted.internet.interfaces import IPushProducer
 from twisted.web._stan import Tag, slot, voidElements, Comment, CDATA, CharRef
 from twisted.web.error import UnfilledSlot, UnsupportedType, FlattenerError
 from twisted.web.iweb import IRenderable
 
+# The number of bytes which L{_flattenTree} accumulates before passing them to
+# its C{write} callable in a single call.
+BUFFER_SIZE = 2 ** 16
+
 
 
 def escapeForContent(data):
@@ -293,7 +300,7 @@ def _flattenElement(request, root, write, slotData, renderFactory,
 
 
 
-def _flattenTree(request, root, write):
+def _flattenTree(request, root, write, producer=None, bufferSize=None):
     """
     Make C{root} into an iterable of L{bytes} and L{Deferred} by doing a depth
     first traversal of the tree.
@@ -307,15 +314,50 @@ def _flattenTree(request, root, write):
         L{IRenderable}.
 
     @param write: A callable which will be invoked with each L{bytes} produced
-        by flattening C{root}.
+        by flattening C{root}.  Small fragments are joined together and passed
+        to C{write} once at least C{bufferSize} bytes have accumulated, before
+        waiting on a L{Deferred} and when flattening ends.
+
+    @param producer: A L{_FlattenerProducer} which may pause and resume
+        flattening, or L{None} if flattening should never be paused.
+
+    @param bufferSize: The number of bytes to accumulate before invoking
+        C{write}, or L{None} to use L{BUFFER_SIZE}.
 
     @return: An iterator which yields objects of type L{bytes} and L{Deferred}.
         A L{Deferred} is only yielded when one is encountered in the process of
-        flattening C{root}.  The returned iterator must not be iterated again
-        until the L{Deferred} is called back.
+        flattening C{root} or when C{producer} is paused.  The returned
+        iterator must not be iterated again until the L{Deferred} is called
+        back.
     """
-    stack = [_flattenElement(request, root, write, [], None, escapeForContent)]
+    if bufferSize is None:
+        bufferSize = BUFFER_SIZE
+    buf = []
+    bufSize = [0]
+
+    def flushBuffer():
+        if buf:
+            data = b''.join(buf)
+            del buf[:]
+            bufSize[0] = 0
+            write(data)
+
+    def bufferedWrite(data):
+        buf.append(data)
+        bufSize[0] += len(data)
+        if bufSize[0] >= bufferSize:
+            flushBuffer()
+
+    stack = [_flattenElement(request, root, bufferedWrite, [], None,
+                             escapeForContent)]
     while stack:
+        if producer is not None:
+            if producer._stopped:
+                return
+            if producer._paused is not None:
+                flushBuffer()
+                yield producer._paused
+                continue
         try:
             frame = stack[-1].gi_frame
             element = next(stack[-1])
@@ -327,6 +369,7 @@ def _flattenTree(request, root, write):
             for generator in stack:
                 roots.append(generator.gi_frame.f_locals['root'])
             roots.append(frame.f_locals['root'])
+            flushBuffer()
             raise FlattenerError(e, roots, extract_tb(exc_info()[2]))
         else:
             if isinstance(element, Deferred):
@@ -334,9 +377,54 @@ def _flattenTree(request, root, write):
                     original, toFlatten = originalAndToFlatten
                     stack.append(toFlatten)
                     return original
+                flushBuffer()
                 yield element.addCallback(cbx)
             else:
                 stack.append(element)
+    flushBuffer()
+
+
+
+@implementer(IPushProducer)
+class _FlattenerProducer(object):
+    """
+    A push producer which lets a consumer, such as a request whose transport
+    buffers are full, pause and resume an in-progress L{_flatten}.
+
+    @ivar _paused: A L{Deferred} which fires when flattening may continue, or
+        L{None} if flattening is not paused.
+
+    @ivar _stopped: C{True} once L{stopProducing} has been called, after which
+        no more data is written.
+    """
+    _paused = None
+    _stopped = False
+
+    def pauseProducing(self):
+        """
+        Stop flattening once the data produced so far has been written.
+        """
+        if self._paused is None:
+            self._paused = Deferred()
+
+
+    def resumeProducing(self):
+        """
+        Continue flattening after a call to L{pauseProducing}.
+        """
+        paused, self._paused = self._paused, None
+        if paused is not None:
+            paused.callback(None)
+
+
+    def stopProducing(self):
+        """
+        Abandon flattening.  The L{Deferred} returned by L{_flatten} fires
+        with L{None} without anything further being written.
+        """
+        self._stopped = True
+        self.resumeProducing()
+
 
 
 def _writeFlattenedData(state, write, result):
@@ -373,6 +461,24 @@ def _writeFlattenedData(state, write, result):
 
 
 
+def _flatten(request, root, write, producer=None):
+    """
+    Incrementally write out a string representation of C{root} using C{write},
+    allowing the process to be paused by C{producer}.
+
+    @param producer: A L{_FlattenerProducer} which may pause and resume
+        flattening, or L{None}.
+
+    @see: L{flatten} for the meaning of the other parameters and the return
+        value.
+    """
+    result = Deferred()
+    state = _flattenTree(request, root, write, producer)
+    _writeFlattenedData(state, write, result)
+    return result
+
+
+
 def flatten(request, root, write):
     """
     Incrementally write out a string representation of C{root} using C{write}.
@@ -381,6 +487,10 @@ def flatten(request, root, write):
     simpler objects which will themselves be decomposed and so on until strings
     or objects which can easily be converted to strings are encountered.
 
+    Adjacent pieces of output are gathered into chunks of up to L{BUFFER_SIZE}
+    bytes before being passed to C{write}, so that large documents do not
+    result in a great many small writes.
+
     @param request: A request object which will be passed to the C{render}
         method of any L{IRenderable} provider which is encountered.
 
@@ -396,10 +506,7 @@ def flatten(request, root, write):
         completely flattened into C{write} or which will be errbacked if an
         unexpected exception occurs.
     """
-    result = Deferred()
-    state = _flattenTree(request, root, write)
-    _writeFlattenedData(state, write, result)
-    return result
+    return _flatten(request, root, write)
 
 
 
@@ -30,6 +30,8 @@ import h2.connection
 import h2.errors
 import h2.events
 import h2.exceptions
+import h2.settings
+import h2.windows
 
 from twisted.internet.defer import Deferred
 from twisted.internet.error import ConnectionLost
@@ -50,6 +52,11 @@ __all__ = []
 _END_STREAM_SENTINEL = object()
 
 
+# The opaque data of the PINGs H2Connection sends to estimate the
+# bandwidth-delay product of a connection.
+_BDP_PING_DATA = b'twbdp\x00\x00\x00'
+
+
 # Python versions 2.7.3 and older don't have a memoryview object that plays
 # well with the struct module, which h2 needs. On those versions, just refuse
 # to import.
@@ -116,13 +123,40 @@ class H2Connection(Protocol, TimeoutMixin):
     @ivar _abortingCall: The L{twisted.internet.base.DelayedCall} that will be
         used to forcibly close the transport if it doesn't close cleanly.
     @type _abortingCall: L{twisted.internet.base.DelayedCall}
+
+    @ivar dataBatchSize: The number of bytes of response data, across all
+        streams, which the data-sending loop passes to the transport in one
+        write before yielding to the reactor.
+    @type dataBatchSize: L{int}
+
+    @ivar _windowSize: The size to which the inbound flow control windows of
+        the connection and of each stream are currently opened.
+    @type _windowSize: L{int}
+
+    @ivar _maxWindowSize: The largest size to which the inbound flow control
+        windows may be grown to match the bandwidth-delay product of the
+        connection, or L{None} if they are not adjusted automatically.
+    @type _maxWindowSize: L{int} or L{None}
+
+    @ivar _bdpPingOutstanding: Whether a PING used to estimate the
+        bandwidth-delay product of the connection is awaiting acknowledgement.
+    @type _bdpPingOutstanding: L{bool}
+
+    @ivar _bdpBytes: The number of flow controlled bytes received since the
+        outstanding bandwidth-delay product PING was sent.
+    @type _bdpBytes: L{int}
     """
     factory = None
     site = None
     abortTimeout = 15
+    dataBatchSize = 2 ** 16
 
     _log = Logger()
     _abortingCall = None
+    _windowSize = 65535
+    _maxWindowSize = None
+    _bdpPingOutstanding = False
+    _bdpBytes = 0
 
     def __init__(self, reactor=None):
         config = h2.config.H2Configuration(
@@ -155,9 +189,97 @@ class H2Connection(Protocol, TimeoutMixin):
         """
         self.setTimeout(self.timeOut)
         self.conn.initiate_connection()
+        self._configureFromFactory()
         self.transport.write(self.conn.data_to_send())
 
 
+    def _configureFromFactory(self):
+        """
+        Apply the HTTP/2 tuning parameters of C{self.factory} to the
+        connection: the initial stream and connection flow control windows,
+        the limit on concurrent streams and the largest frame we will accept.
+
+        @see: L{twisted.web.http.HTTPFactory}
+        """
+        factory = self.factory
+        settings = {}
+        initialWindowSize = getattr(factory, 'h2InitialWindowSize', None)
+        if initialWindowSize is not None:
+            settings[h2.settings.SettingCodes.INITIAL_WINDOW_SIZE] = (
+                initialWindowSize)
+            self._windowSize = initialWindowSize
+        maxConcurrentStreams = getattr(factory, 'h2MaxConcurrentStreams', None)
+        if maxConcurrentStreams is not None:
+            settings[h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS] = (
+                maxConcurrentStreams)
+        maxFrameSize = getattr(factory, 'h2MaxFrameSize', None)
+        if maxFrameSize is not None:
+            settings[h2.settings.SettingCodes.MAX_FRAME_SIZE] = maxFrameSize
+        if settings:
+            self.conn.update_settings(settings)
+
+        connectionWindowSize = getattr(
+            factory, 'h2ConnectionWindowSize', None)
+        if connectionWindowSize is not None:
+            self._openConnectionWindow(connectionWindowSize)
+
+        maxWindowSize = getattr(factory, 'h2MaxWindowSize', None)
+        if maxWindowSize is not None:
+            self._maxWindowSize = min(
+                maxWindowSize, h2.windows.LARGEST_FLOW_CONTROL_WINDOW)
+
+
+    def _openConnectionWindow(self, size):
+        """
+        Grow the inbound flow control window of the connection to C{size}, if
+        it is not already that large.
+
+        @param size: The new size of the window.
+        @type size: L{int}
+        """
+        increment = size - self.conn.inbound_flow_control_window
+        if increment > 0:
+            self.conn.increment_flow_control_window(increment)
+
+
+    def _sendBDPPing(self):
+        """
+        Send a PING which will be used to measure the number of bytes the peer
+        manages to send during one round trip, if automatic window tuning is
+        enabled, the windows are not yet as large as permitted and no such PING
+        is already outstanding.
+        """
+        if (self._maxWindowSize is None or self._bdpPingOutstanding or
+                self._windowSize >= self._maxWindowSize):
+            return
+        self._bdpPingOutstanding = True
+        self._bdpBytes = 0
+        self.conn.ping(_BDP_PING_DATA)
+
+
+    def _handlePingAcknowledged(self, event):
+        """
+        Grow the inbound flow control windows if the peer sent close to a full
+        window of data during the round trip of the bandwidth-delay product
+        PING, as that suggests that the windows are limiting throughput.
+
+        @param event: The Hyper-h2 event for the PING acknowledgement.
+        @type event: L{h2.events.PingAcknowledged}
+        """
+        if event.ping_data != _BDP_PING_DATA or not self._bdpPingOutstanding:
+            return
+        self._bdpPingOutstanding = False
+        if self._bdpBytes * 3 < self._windowSize * 2:
+            return
+        newWindowSize = min(self._bdpBytes * 2, self._maxWindowSize)
+        if newWindowSize <= self._windowSize:
+            return
+        self._windowSize = newWindowSize
+        self._openConnectionWindow(newWindowSize)
+        self.conn.update_settings({
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: newWindowSize})
+
+
     def dataReceived(self, data):
         """
         Called whenever a chunk of data is received from the transport.
@@ -190,6 +312,8 @@ class H2Connection(Protocol, TimeoutMixin):
                 self._handleWindowUpdate(event)
             elif isinstance(event, h2.events.PriorityUpdated):
                 self._handlePriorityUpdate(event)
+            elif isinstance(event, h2.events.PingAcknowledged):
+                self._handlePingAcknowledged(event)
             elif isinstance(event, h2.events.ConnectionTerminated):
                 self.transport.loseConnection()
                 self.connectionLost(ConnectionLost("Remote peer sent GOAWAY"))
@@ -369,6 +493,10 @@ class H2Connection(Protocol, TimeoutMixin):
         according to the priority signalled by the client, making sure that the
         connection is used with maximal efficiency.
 
+        Each call sends data frames for as many streams as are ready, up to
+        C{dataBatchSize} bytes in total, and passes all of them to the
+        transport in a single write before yielding to the reactor.
+
         This function will execute if data is available: if all data is
         exhausted, the function will place a deferred onto the L{H2Connection}
         object and wait until it is called to resume executing.
@@ -377,24 +505,53 @@ class H2Connection(Protocol, TimeoutMixin):
         if not self._stillProducing:
             return
 
-        stream = None
-
-        while stream is None:
-            try:
-                stream = next(self.priority)
-            except priority.DeadlockError:
-                # All streams are currently blocked or not progressing. Wait
-                # until a new one becomes available.
-                assert self._sendingDeferred is None
-                self._sendingDeferred = Deferred()
-                self._sendingDeferred.addCallback(self._sendPrioritisedData)
-                return
+        sent = 0
+        try:
+            while sent < self.dataBatchSize:
+                try:
+                    stream = next(self.priority)
+                except priority.DeadlockError:
+                    # All streams are currently blocked or not progressing.
+                    # Wait until a new one becomes available.
+                    assert self._sendingDeferred is None
+                    self._sendingDeferred = Deferred()
+                    self._sendingDeferred.addCallback(
+                        self._sendPrioritisedData)
+                    return
+
+                # Wait behind the transport.
+                if self._consumerBlocked is not None:
+                    self._consumerBlocked.addCallback(
+                        self._sendPrioritisedData)
+                    return
+
+                frameSize = self._sendFrameForStream(stream)
+                if frameSize is None:
+                    # The stream is blocked by flow control; rather than spin
+                    # here, give the reactor a chance to deliver a
+                    # WINDOW_UPDATE.
+                    break
+                sent += frameSize
+        finally:
+            dataToSend = self.conn.data_to_send()
+            if dataToSend:
+                self.transport.write(dataToSend)
 
-        # Wait behind the transport.
-        if self._consumerBlocked is not None:
-            self._consumerBlocked.addCallback(self._sendPrioritisedData)
-            return
+        self._reactor.callLater(0, self._sendPrioritisedData)
 
+
+    def _sendFrameForStream(self, stream):
+        """
+        Pass the next chunk of data queued for a stream to the HTTP/2 state
+        machine, without writing it to the transport.
+
+        @param stream: The ID of the stream, which must have data queued.
+        @type stream: L{int}
+
+        @return: The number of bytes of data sent, or L{None} if the flow
+            control window of the stream does not allow any to be sent.
+        @rtype: L{int} or L{None}
+        """
         remainingWindow = self.conn.local_flow_control_window(stream)
         frameData = self._outboundStreamQueues[stream].popleft()
         maxFrameSize = min(self.conn.max_outbound_frame_size, remainingWindow)
@@ -404,35 +561,39 @@ class H2Connection(Protocol, TimeoutMixin):
             # ProtocolError because we really shouldn't encounter this problem.
             # If we do, that's a nasty bug.
             self.conn.end_stream(stream)
+            # Everything sent so far must reach the transport before anything
+            # waiting on the stream is told that it is complete.
             self.transport.write(self.conn.data_to_send())
 
             # Clean up the stream
             self._requestDone(stream)
-        else:
-            # Respect the max frame size.
-            if len(frameData) > maxFrameSize:
-                excessData = frameData[maxFrameSize:]
-                frameData = frameData[:maxFrameSize]
-                self._outboundStreamQueues[stream].appendleft(excessData)
-
-            # There's deliberately no error handling here, because this just
-            # absolutely should not happen.
-            # If for whatever reason the max frame length is zero and so we
-            # have no frame data to send, don't send any.
-            if frameData:
-                self.conn.send_data(stream, frameData)
-                self.transport.write(self.conn.data_to_send())
-
-            # If there's no data left, this stream is now blocked.
-            if not self._outboundStreamQueues[stream]:
-                self.priority.block(stream)
-
-            # Also, if the stream's flow control window is exhausted, tell it
-            # to stop.
-            if self.remainingOutboundWindow(stream) <= 0:
-                self.streams[stream].flowControlBlocked()
+            return 0
 
-        self._reactor.callLater(0, self._sendPrioritisedData)
+        # Respect the max frame size.
+        if len(frameData) > maxFrameSize:
+            excessData = frameData[maxFrameSize:]
+            frameData = frameData[:maxFrameSize]
+            self._outboundStreamQueues[stream].appendleft(excessData)
+
+        # There's deliberately no error handling here, because this just
+        # absolutely should not happen.
+        # If for whatever reason the max frame length is zero and so we
+        # have no frame data to send, don't send any.
+        if frameData:
+            self.conn.send_data(stream, frameData)
+        elif maxFrameSize <= 0 and self._outboundStreamQueues[stream]:
+            return None
+
+        # If there's no data left, this stream is now blocked.
+        if not self._outboundStreamQueues[stream]:
+            self.priority.block(stream)
+
+        # Also, if the stream's flow control window is exhausted, tell it
+        # to stop.
+        if self.remainingOutboundWindow(stream) <= 0:
+            self.streams[stream].flowControlBlocked()
+
+        return len(frameData)
 
 
     # Internal functions.
@@ -476,6 +637,9 @@ class H2Connection(Protocol, TimeoutMixin):
             received data.
         @type event: L{h2.events.DataReceived}
         """
+        self._bdpBytes += event.flow_controlled_length
+        self._sendBDPPing()
+
         stream = self.streams[event.stream_id]
         stream.receiveDataChunk(event.data, event.flow_controlled_length)
 
@@ -0,0 +1,796 @@
+# -*- test-case-name: twisted.web.test.test_http2client -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+HTTP/2 client implementation.
+
+This is the client-side counterpart of L{twisted.web._http2}, used by
+L{twisted.web.client.HTTPConnectionPool} for connections on which the server
+selects HTTP/2 during the TLS handshake.  A single L{H2ClientConnection}
+carries any number of concurrent requests, each on its own stream.
+
+This API is currently considered private because it's in early draft form. When
+it has stabilised, it'll be made public.
+"""
+
+from __future__ import absolute_import, division
+
+from collections import deque
+
+from zope.interface import implementer
+
+import h2.config
+import h2.connection
+import h2.errors
+import h2.events
+import h2.exceptions
+import h2.settings
+
+from twisted.internet.defer import Deferred, CancelledError, fail, succeed
+from twisted.internet.error import ConnectionLost
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from twisted.internet.protocol import Protocol
+from twisted.logger import Logger
+from twisted.python.failure import Failure
+from twisted.web._newclient import (
+    BadHeaders, ConnectionAborted, RequestGenerationFailed, RequestNotSent,
+    Response, ResponseFailed, ResponseNeverReceived)
+from twisted.web.http import RESPONSES, NO_CONTENT, NOT_MODIFIED
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import UNKNOWN_LENGTH
+
+
+# This API is currently considered private.
+__all__ = []
+
+
+# Request headers which only have meaning for an HTTP/1.1 connection and must
+# not be sent over HTTP/2 (RFC 7540, section 8.1.2.2).  The Host header is
+# sent as the :authority pseudo-header instead.
+_CONNECTION_HEADERS = frozenset([
+    b'connection', b'host', b'keep-alive', b'proxy-connection',
+    b'transfer-encoding', b'upgrade'])
+
+
+
+def _requestHeaders(request):
+    """
+    Build the HTTP/2 header block for a request.
+
+    @param request: The request.
+    @type request: L{twisted.web._newclient.Request}
+
+    @return: The header block, pseudo-headers first.
+    @rtype: L{list} of 2-L{tuple}s of L{bytes}
+
+    @raise BadHeaders: If the request does not have exactly one I{Host}
+        header.
+    """
+    hosts = request.headers.getRawHeaders(b'host', ())
+    if len(hosts) != 1:
+        raise BadHeaders(u"Exactly one Host header required")
+    scheme = b'https'
+    if request._parsedURI is not None:
+        scheme = request._parsedURI.scheme
+    headers = [
+        (b':method', request.method),
+        (b':scheme', scheme),
+        (b':authority', hosts[0]),
+        (b':path', request.uri),
+    ]
+    for name, values in request.headers.getAllRawHeaders():
+        name = name.lower()
+        if name in _CONNECTION_HEADERS:
+            continue
+        for value in values:
+            if name == b'te' and value.lower() != b'trailers':
+                continue
+            headers.append((name, value))
+    bodyProducer = request.bodyProducer
+    if (bodyProducer is not None and
+            bodyProducer.length is not UNKNOWN_LENGTH and
+            not request.headers.hasHeader(b'content-length')):
+        headers.append(
+            (b'content-length', str(bodyProducer.length).encode('ascii')))
+    return headers
+
+
+
+@implementer(IPushProducer, IConsumer)
+class _H2ClientStream(object):
+    """
+    The state of one request made over an L{H2ClientConnection}.
+
+    An L{_H2ClientStream} is the transport of the L{Response} to its request:
+    pausing it stops the stream's receive window from being replenished, so
+    the server stops sending until the protocol reading the body catches up.
+    It is also the consumer to which the request's body producer writes.
+
+    @ivar streamID: The ID of the stream, or L{None} while the request is
+        queued waiting for the server to allow another stream.
+
+    @ivar request: The request.
+    @type request: L{twisted.web._newclient.Request}
+
+    @ivar response: The response, once its headers have been received.
+    @type response: L{Response}
+
+    @ivar _connection: The connection the stream belongs to.
+    @type _connection: L{H2ClientConnection}
+
+    @ivar _responseDeferred: The L{Deferred} returned from
+        L{H2ClientConnection.request}.
+
+    @ivar _headers: The request's HTTP/2 header block, until the stream is
+        opened.
+
+    @ivar _paused: Whether the response body protocol has paused the stream.
+
+    @ivar _unacknowledged: The number of flow-controlled bytes received while
+        paused, which are acknowledged to the server on resumption.
+
+    @ivar _outbound: Request body data waiting for flow control window.
+    @type _outbound: L{deque} of L{bytes}
+
+    @ivar _producerPaused: Whether the request body producer has been paused
+        because the server's receive window is full.
+
+    @ivar _producing: Whether the request body producer is producing.
+
+    @ivar _bodyFinished: Whether the request body producer has finished but
+        the stream has not yet been ended.
+    """
+    streamID = None
+    response = None
+    disconnecting = False
+
+    _headers = None
+
+    _paused = False
+    _unacknowledged = 0
+    _producerPaused = False
+    _bodyFinished = False
+    _producing = False
+
+    def __init__(self, connection, request, responseDeferred):
+        self._connection = connection
+        self.request = request
+        self._responseDeferred = responseDeferred
+        self._outbound = deque()
+
+
+    def _startBody(self):
+        """
+        Start the request body producer writing to this stream.
+        """
+        self._producing = True
+        self.request.bodyProducer.startProducing(self).addCallbacks(
+            self._bodyProducerFinished, self._bodyProducerFailed)
+
+
+    def _bodyProducerFinished(self, ignored):
+        """
+        End the stream once the buffered request body has been sent.
+        """
+        if not self._producing:
+            return
+        self._producing = False
+        self._bodyFinished = True
+        self._connection._sendBody(self)
+
+
+    def _bodyProducerFailed(self, reason):
+        """
+        Reset the stream and fail the request because its body could not be
+        produced.
+        """
+        if not self._producing:
+            # The producer was stopped, and reported it as a failure.
+            return
+        self._producing = False
+        self._connection._resetStream(self, h2.errors.ErrorCodes.CANCEL)
+        if not self._responseDeferred.called:
+            self._responseDeferred.errback(
+                Failure(RequestGenerationFailed([reason])))
+
+
+    def _stopBody(self):
+        """
+        Stop the request body producer, if it is still producing.
+        """
+        if self._producing:
+            self._producing = False
+            self._outbound.clear()
+            self.request.bodyProducer.stopProducing()
+
+
+    def _fail(self, reason):
+        """
+        Deliver the failure of this stream to the application: fail the
+        request, or, if a response has been received, its body.
+
+        @param reason: The reason for the failure.
+        @type reason: L{Failure}
+        """
+        self._stopBody()
+        if self.response is None:
+            if not self._responseDeferred.called:
+                self._responseDeferred.errback(
+                    Failure(ResponseNeverReceived([reason])))
+        else:
+            self.response._bodyDataFinished(
+                Failure(ResponseFailed([reason], self.response)))
+
+
+    # Implementation of IConsumer, for the request body.
+    def write(self, data):
+        """
+        Send request body data, pausing the body producer if the server's
+        window is exhausted.
+        """
+        if not self._producing:
+            # The stream has been closed.
+            return
+        if data:
+            self._outbound.append(data)
+            self._connection._sendBody(self)
+        if self._outbound and not self._producerPaused:
+            self._producerPaused = True
+            self.request.bodyProducer.pauseProducing()
+
+
+    def registerProducer(self, producer, streaming):
+        """
+        Body producers are driven through L{IBodyProducer.startProducing}, so
+        there is nothing to do here.
+        """
+
+
+    def unregisterProducer(self):
+        """
+        Body producers are driven through L{IBodyProducer.startProducing}, so
+        there is nothing to do here.
+        """
+
+
+    # Implementation of IPushProducer, for the response body.
+    def pauseProducing(self):
+        """
+        Stop replenishing the stream's receive window.
+        """
+        self._paused = True
+
+
+    def resumeProducing(self):
+        """
+        Acknowledge the data received while paused, reopening the stream's
+        receive window.
+        """
+        self._paused = False
+        unacknowledged, self._unacknowledged = self._unacknowledged, 0
+        if unacknowledged and self.streamID is not None:
+            self._connection._acknowledge(self.streamID, unacknowledged)
+
+
+    def stopProducing(self):
+        """
+        Cancel the stream; the body protocol will be disconnected with a
+        L{ResponseFailed} wrapping L{ConnectionAborted}.
+        """
+        self._connection._abortStream(self)
+
+
+    def loseConnection(self):
+        """
+        Cancel the stream, as L{stopProducing}.
+        """
+        self.stopProducing()
+
+
+    def abortConnection(self):
+        """
+        Cancel the stream, as L{stopProducing}.
+        """
+        self.stopProducing()
+
+
+
+class H2ClientConnection(Protocol):
+    """
+    A client HTTP/2 connection, over which any number of requests may be
+    issued concurrently.
+
+    Requests beyond the server's limit on concurrent streams are queued until
+    a stream becomes available.
+
+    @ivar conn: The HTTP/2 connection state machine.
+    @type conn: L{h2.connection.H2Connection}
+
+    @ivar connectionWindowSize: The receive window, in bytes, for the whole
+        connection.  This is larger than the window of a single stream so that
+        streams whose body protocols have paused them do not stall the others.
+    @type connectionWindowSize: L{int}
+
+    @ivar initialWindowSize: The receive window, in bytes, of each stream.
+    @type initialWindowSize: L{int}
+
+    @ivar _quiescentCallback: Called with this connection whenever it has no
+        more requests in progress and can still be used.
+
+    @ivar _streams: The requests in progress, by stream ID.
+    @type _streams: L{dict} of L{int} to L{_H2ClientStream}
+
+    @ivar _queued: Requests waiting for the server to allow another stream.
+    @type _queued: L{deque} of L{_H2ClientStream}
+
+    @ivar _closed: Whether the connection can no longer be used for new
+        requests, because it has been lost or the server has sent I{GOAWAY}.
+
+    @ivar _closeWhenIdle: Whether to close the connection once no requests
+        are in progress.
+
+    @ivar _aborting: Whether L{abort} has been called.
+
+    @ivar _lost: Whether the connection has been lost.
+
+    @ivar _abortDeferreds: L{Deferred}s which fire once the connection is lost
+        after a call to L{abort}.
+    """
+    connectionWindowSize = 2 ** 24
+    initialWindowSize = 2 ** 20
+
+    _closed = False
+    _closeWhenIdle = False
+    _aborting = False
+    _lost = False
+    _log = Logger()
+
+    def __init__(self, quiescentCallback=lambda c: None):
+        config = h2.config.H2Configuration(
+            client_side=True, header_encoding=None
+        )
+        self.conn = h2.connection.H2Connection(config=config)
+        self._quiescentCallback = quiescentCallback
+        self._streams = {}
+        self._queued = deque()
+        self._abortDeferreds = []
+
+
+    def connectionMade(self):
+        """
+        Send the connection preface and our settings.
+        """
+        self.conn.initiate_connection()
+        self.conn.update_settings({
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE:
+                self.initialWindowSize,
+        })
+        increment = (self.connectionWindowSize -
+                     self.conn.inbound_flow_control_window)
+        if increment > 0:
+            self.conn.increment_flow_control_window(increment)
+        self._flush()
+
+
+    def _flush(self):
+        """
+        Write any data the state machine has generated to the transport.
+        """
+        data = self.conn.data_to_send()
+        if data:
+            self.transport.write(data)
+
+
+    def _canRequest(self):
+        """
+        Determine whether new requests may be issued on this connection.
+
+        @rtype: L{bool}
+        """
+        return not self._closed and not self._closeWhenIdle
+
+
+    def request(self, request):
+        """
+        Issue C{request} on a new stream and return a L{Deferred} which will
+        fire with a L{Response} instance or an error.
+
+        @param request: The request to issue.
+        @type request: L{twisted.web._newclient.Request}
+
+        @rtype: L{Deferred}
+        @return: The L{Deferred} may errback with L{RequestGenerationFailed}
+            if the request or its body could not be generated, with
+            L{ResponseNeverReceived} if the stream or connection failed before
+            the response arrived, or with L{RequestNotSent} if this connection
+            can no longer be used.
+        """
+        if self._closed:
+            return fail(RequestNotSent())
+        try:
+            headers = _requestHeaders(request)
+        except:
+            return fail(RequestGenerationFailed([Failure()]))
+        if not request.persistent:
+            self._closeWhenIdle = True
+
+        d = Deferred(lambda d: self._cancelStream(stream))
+        stream = _H2ClientStream(self, request, d)
+        stream._headers = headers
+        if (self.conn.open_outbound_streams >=
+                self.conn.remote_settings.max_concurrent_streams):
+            self._queued.append(stream)
+        else:
+            self._startStream(stream)
+            self._flush()
+        return d
+
+
+    def _startStream(self, stream):
+        """
+        Open the stream for a request and start sending its body.
+
+        @param stream: The request's stream.
+        @type stream: L{_H2ClientStream}
+        """
+        stream.streamID = self.conn.get_next_available_stream_id()
+        self._streams[stream.streamID] = stream
+        bodyProducer = stream.request.bodyProducer
+        self.conn.send_headers(
+            stream.streamID, stream._headers,
+            end_stream=bodyProducer is None)
+        stream._headers = None
+        if bodyProducer is not None:
+            stream._startBody()
+
+
+    def _startQueued(self):
+        """
+        Open streams for queued requests, as far as the server allows.
+        """
+        maxStreams = self.conn.remote_settings.max_concurrent_streams
+        while (self._queued and not self._closed and
+               self.conn.open_outbound_streams < maxStreams):
+            self._startStream(self._queued.popleft())
+
+
+    def _sendBody(self, stream):
+        """
+        Send as much of a stream's buffered request body as flow control
+        allows, ending the stream if the body is complete.
+
+        @param stream: The stream.
+        @type stream: L{_H2ClientStream}
+        """
+        if stream.streamID not in self._streams:
+            return
+        outbound = stream._outbound
+        while outbound:
+            window = min(self.conn.local_flow_control_window(stream.streamID),
+                         self.conn.max_outbound_frame_size)
+            if window <= 0:
+                break
+            chunk = outbound.popleft()
+            if len(chunk) > window:
+                outbound.appendleft(chunk[window:])
+                chunk = chunk[:window]
+            self.conn.send_data(stream.streamID, chunk)
+        if not outbound:
+            if stream._producerPaused:
+                stream._producerPaused = False
+                stream.request.bodyProducer.resumeProducing()
+            if stream._bodyFinished:
+                stream._bodyFinished = False
+                self.conn.end_stream(stream.streamID)
+        self._flush()
+
+
+    def _acknowledge(self, streamID, size):
+        """
+        Acknowledge the receipt of flow-controlled data, allowing the server
+        to send more.
+        """
+        if not self._closed:
+            self.conn.acknowledge_received_data(size, streamID)
+            self._flush()
+
+
+    def _resetStream(self, stream, errorCode):
+        """
+        Reset a stream and forget about it.
+
+        @param stream: The stream.
+        @type stream: L{_H2ClientStream}
+
+        @param errorCode: The error code to send.
+        """
+        if self._streams.pop(stream.streamID, None) is None:
+            return
+        stream._stopBody()
+        if not self._closed:
+            try:
+                self.conn.reset_stream(stream.streamID, errorCode)
+            except h2.exceptions.StreamClosedError:
+                pass
+            self._flush()
+        self._streamClosed()
+
+
+    def _abortStream(self, stream):
+        """
+        Cancel a stream at the request of the protocol reading its response
+        body.
+        """
+        if stream.streamID in self._streams:
+            self._resetStream(stream, h2.errors.ErrorCodes.CANCEL)
+            stream._fail(Failure(ConnectionAborted()))
+
+
+    def _cancelStream(self, stream):
+        """
+        Cancel a request whose L{Deferred} was cancelled before its response
+        was received.
+        """
+        if stream in self._queued:
+            self._queued.remove(stream)
+        else:
+            self._resetStream(stream, h2.errors.ErrorCodes.CANCEL)
+        stream._stopBody()
+        stream._responseDeferred.errback(
+            Failure(ResponseNeverReceived([Failure(CancelledError())])))
+
+
+    def _streamClosed(self):
+        """
+        Called when a stream has been closed, to start queued requests and
+        to release or close the connection if it is idle.
+        """
+        self._startQueued()
+        if self._streams or self._queued:
+            return
+        if self._closed or self._closeWhenIdle:
+            self.transport.loseConnection()
+        else:
+            self._quiescentCallback(self)
+
+
+    def dataReceived(self, data):
+        """
+        Process data received from the server.
+        """
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            # h2 has queued a GOAWAY frame.
+            self._flush()
+            self._closed = True
+            self.transport.loseConnection()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.ResponseReceived):
+                self._responseReceived(event)
+            elif isinstance(event, h2.events.DataReceived):
+                self._dataReceived(event)
+            elif isinstance(event, h2.events.StreamEnded):
+                self._streamEnded(event)
+            elif isinstance(event, h2.events.StreamReset):
+                self._streamReset(event)
+            elif isinstance(event, h2.events.WindowUpdated):
+                self._windowUpdated(event)
+            elif isinstance(event, h2.events.RemoteSettingsChanged):
+                self._remoteSettingsChanged(event)
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self._connectionTerminated(event)
+        self._flush()
+
+
+    def _responseReceived(self, event):
+        """
+        Deliver the response to a request once its headers arrive.
+
+        @param event: The event.
+        @type event: L{h2.events.ResponseReceived}
+        """
+        stream = self._streams.get(event.stream_id)
+        if stream is None:
+            return
+        headers = Headers()
+        code = None
+        for name, value in event.headers:
+            if name == b':status':
+                code = int(value)
+            elif not name.startswith(b':'):
+                headers.addRawHeader(name, value)
+        response = Response._construct(
+            (b'HTTP', 2, 0), code, RESPONSES.get(code, b''), headers, stream,
+            stream.request)
+        if (stream.request.method == b'HEAD' or
+                code in (NO_CONTENT, NOT_MODIFIED)):
+            response.length = 0
+        else:
+            contentLength = headers.getRawHeaders(b'content-length')
+            if contentLength is not None:
+                try:
+                    response.length = int(contentLength[0])
+                except ValueError:
+                    pass
+        stream.response = response
+        # Withhold window updates until a protocol is given the body, as
+        # HTTPClientParser pauses its transport; Response.deliverBody
+        # resumes the stream.
+        stream.pauseProducing()
+        stream._responseDeferred.callback(response)
+
+
+    def _dataReceived(self, event):
+        """
+        Deliver response body data, acknowledging it unless the stream is
+        paused.
+
+        @param event: The event.
+        @type event: L{h2.events.DataReceived}
+        """
+        stream = self._streams.get(event.stream_id)
+        if stream is None or stream.response is None:
+            # Keep the connection window open for the other streams.
+            self.conn.acknowledge_received_data(
+                event.flow_controlled_length, event.stream_id)
+            return
+        stream.response._bodyDataReceived(event.data)
+        if stream._paused:
+            stream._unacknowledged += event.flow_controlled_length
+        elif event.stream_id in self._streams:
+            self.conn.acknowledge_received_data(
+                event.flow_controlled_length, event.stream_id)
+
+
+    def _streamEnded(self, event):
+        """
+        Finish the response body when the server ends the stream.
+
+        @param event: The event.
+        @type event: L{h2.events.StreamEnded}
+        """
+        stream = self._streams.get(event.stream_id)
+        if stream is None:
+            return
+        # The server responded before reading all of the request body if it
+        # is still being sent; it has no use for the rest.
+        bodyUnsent = stream._producing or stream._outbound
+        # No more data can arrive on the stream, so the connection window
+        # taken up by what was withheld is given back.
+        unacknowledged, stream._unacknowledged = stream._unacknowledged, 0
+        if unacknowledged:
+            self.conn.acknowledge_received_data(
+                unacknowledged, event.stream_id)
+        # Finish the body before the stream is released, which may make the
+        # connection quiescent or close it.
+        if stream.response is None:
+            stream._fail(Failure(ConnectionLost(
+                "HTTP/2 stream ended without a response")))
+        else:
+            stream.response._bodyDataFinished()
+        if bodyUnsent:
+            self._resetStream(stream, h2.errors.ErrorCodes.NO_ERROR)
+        elif self._streams.pop(event.stream_id, None) is not None:
+            self._streamClosed()
+
+
+    def _streamReset(self, event):
+        """
+        Fail the request whose stream the server reset.
+
+        @param event: The event.
+        @type event: L{h2.events.StreamReset}
+        """
+        stream = self._streams.pop(event.stream_id, None)
+        if stream is None:
+            return
+        stream._fail(Failure(ConnectionLost(
+            "HTTP/2 stream reset by server: %s" % (event.error_code,))))
+        self._streamClosed()
+
+
+    def _windowUpdated(self, event):
+        """
+        Resume sending request bodies blocked on flow control.
+
+        @param event: The event.
+        @type event: L{h2.events.WindowUpdated}
+        """
+        self._sendBlockedBodies(event.stream_id)
+
+
+    def _sendBlockedBodies(self, streamID=None):
+        """
+        Send the request bodies waiting for flow control window.
+
+        @param streamID: The ID of the only stream whose body to send, or
+            L{None} to send those of all streams.
+        """
+        if streamID:
+            streams = [self._streams.get(streamID)]
+        else:
+            streams = list(self._streams.values())
+        for stream in streams:
+            if stream is not None and stream._outbound:
+                self._sendBody(stream)
+
+
+    def _remoteSettingsChanged(self, event):
+        """
+        React to changes of the server's concurrency and window limits.
+
+        @param event: The event.
+        @type event: L{h2.events.RemoteSettingsChanged}
+        """
+        self._startQueued()
+        changed = event.changed_settings
+        if h2.settings.SettingCodes.INITIAL_WINDOW_SIZE in changed:
+            self._sendBlockedBodies()
+
+
+    def _connectionTerminated(self, event):
+        """
+        Stop using the connection when the server sends I{GOAWAY}.
+
+        The h2 state machine accepts no further frames once I{GOAWAY} has been
+        received, so even requests the server has undertaken to complete are
+        failed, and the connection is closed.
+
+        @param event: The event.
+        @type event: L{h2.events.ConnectionTerminated}
+        """
+        self._closed = True
+        reason = Failure(ConnectionLost(
+            "HTTP/2 connection terminated by server: %s" %
+            (event.error_code,)))
+        streams, self._streams = self._streams, {}
+        for streamID in sorted(streams):
+            streams[streamID]._fail(reason)
+        self._failQueued()
+        self.transport.loseConnection()
+
+
+    def _failQueued(self):
+        """
+        Fail all queued requests with L{RequestNotSent}.
+        """
+        while self._queued:
+            self._queued.popleft()._responseDeferred.errback(
+                Failure(RequestNotSent()))
+
+
+    def connectionLost(self, reason):
+        """
+        Fail every request in progress.
+        """
+        self._closed = self._lost = True
+        if self._aborting:
+            reason = Failure(ConnectionAborted())
+        streams, self._streams = self._streams, {}
+        for streamID in sorted(streams):
+            streams[streamID]._fail(reason)
+        self._failQueued()
+        abortDeferreds, self._abortDeferreds = self._abortDeferreds, []
+        for d in abortDeferreds:
+            d.callback(None)
+
+
+    def abort(self):
+        """
+        Close the connection and cause all outstanding L{request} L{Deferred}s
+        to fire with an error.
+
+        @return: A L{Deferred} which fires when the connection has been lost.
+        """
+        if self._lost:
+            return succeed(None)
+        self._closed = True
+        self._aborting = True
+        self.transport.loseConnection()
+        d = Deferred()
+        self._abortDeferreds.append(d)
+        return d
@@ -265,6 +265,105 @@ class HTTPParser(LineReceiver):
         self.setRawMode()
 
 
+    def dataReceived(self, data):
+        """
+        Parse the status line and header block of a message in bulk when they
+        are received whole, which is the common case, rather than a line at a
+        time.  Everything else is left to L{LineReceiver}.
+        """
+        if (not self.line_mode or self._busyReceiving or self.paused or
+                self._partialHeader is not None):
+            return LineReceiver.dataReceived(self, data)
+
+        self._busyReceiving = True
+        try:
+            self._buffer += data
+            self._headReceived()
+        finally:
+            self._busyReceiving = False
+        if self._buffer and not (self.transport and
+                                 self.transport.disconnecting):
+            return LineReceiver.dataReceived(self, b'')
+
+
+    def _headReceived(self):
+        """
+        Deliver the complete status line and header block at the start of
+        C{self._buffer}, if there are any, to C{statusReceived},
+        C{headerReceived} and C{allHeadersReceived}, leaving the bytes which
+        follow them in C{self._buffer}.
+
+        Header blocks which arrive in pieces, and lines which are too long,
+        are left for L{lineReceived} to handle.
+        """
+        data = self._buffer
+        start = 0
+        maxLength = self.MAX_LENGTH
+        while self.line_mode and not self.paused:
+            if self.state == STATUS:
+                end = data.find(b'\n', start)
+                if end == -1 or end - start > maxLength:
+                    break
+                line = data[start:end]
+                start = end + 1
+                if line[-1:] == b'\r':
+                    line = line[:-1]
+                self.statusReceived(line)
+                self.state = HEADER
+            elif self.state == HEADER:
+                if data.startswith(b'\n', start):
+                    lines = ()
+                    after = start + 1
+                elif data.startswith(b'\r\n', start):
+                    lines = ()
+                    after = start + 2
+                else:
+                    # The block ends with a blank line, terminated by either
+                    # CR LF or a bare LF.
+                    end = data.find(b'\n\r\n', start)
+                    bare = data.find(b'\n\n', start,
+                                     len(data) if end == -1 else end)
+                    if bare != -1:
+                        end, after = bare, bare + 2
+                    elif end != -1:
+                        after = end + 3
+                    else:
+                        break
+                    lines = data[start:end].split(b'\n')
+                    if max(map(len, lines)) > maxLength:
+                        break
+
+                header = None
+                headerReceived = self.headerReceived
+                for line in lines:
+                    if line[-1:] == b'\r':
+                        line = line[:-1]
+                    if line[:1] in (b' ', b'\t'):
+                        # A line beginning with LWS is a continuation of a
+                        # header begun on a previous line.
+                        header += line
+                        continue
+                    if header is not None:
+                        name, value = header.split(b':', 1)
+                        headerReceived(name, value.strip())
+                    header = line
+                if header is not None:
+                    name, value = header.split(b':', 1)
+                    headerReceived(name, value.strip())
+
+                # allHeadersReceived may consume what follows the headers
+                # with clearLineBuffer.
+                self._buffer = data[after:]
+                self.allHeadersReceived()
+                data = self._buffer
+                start = 0
+            else:
+                break
+            if self.transport and self.transport.disconnecting:
+                break
+        self._buffer = data[start:]
+
+
     def lineReceived(self, line):
         """
         Handle one line from a response.
@@ -383,10 +482,14 @@ class HTTPClientParser(HTTPParser):
 
     def dataReceived(self, data):
         """
-        Override so that we know if any response has been received.
+        Override so that we know if any response has been received, and to
+        pass the bytes of the response body straight to the body decoder.
         """
         self._everReceivedData = True
-        HTTPParser.dataReceived(self, data)
+        if self.state == BODY and not self._busyReceiving:
+            self.bodyDecoder.dataReceived(data)
+        else:
+            HTTPParser.dataReceived(self, data)
 
 
     def parseVersion(self, strversion):
@@ -965,8 +1068,9 @@ def makeStatefulDispatcher(name, template):
 
     @return: The dispatcher function.
     """
+    prefix = '_' + name + '_'
     def dispatcher(self, *args, **kwargs):
-        func = getattr(self, '_' + name + '_' + self._state, None)
+        func = getattr(self, prefix + self._state, None)
         if func is None:
             raise RuntimeError(
                 u"%r has no %s method in state %s" % (self, name, self._state))
@@ -22,6 +22,7 @@ except ImportError:
         return result.encode("charmap")
 
 import zlib
+from collections import deque
 from functools import wraps
 
 from zope.interface import implementer
@@ -37,7 +38,10 @@ from twisted.python.deprecate import getDeprecationWarningString
 from twisted.web import http
 from twisted.internet import defer, protocol, task, reactor
 from twisted.internet.abstract import isIPv6Address
+from twisted.internet.error import ConnectionAborted
 from twisted.internet.interfaces import IProtocol, IOpenSSLContextFactory
+from twisted.internet.interfaces import IHandshakeListener, INegotiated
+from twisted.internet.interfaces import IConsumer
 from twisted.internet.endpoints import HostnameEndpoint, wrapClientTLS
 from twisted.python.util import InsensitiveDict
 from twisted.python.components import proxyForInterface
@@ -55,6 +59,20 @@ class PartialDownloadError(error.Error):
     """
 
 
+
+class ResponseBodyTooLarge(error.Error):
+    """
+    A response body was larger than the caller was prepared to accept, so the
+    connection it was arriving on was aborted.
+
+    @ivar maxSize: The largest body, in bytes, which would have been accepted.
+    @type maxSize: L{int}
+    """
+    def __init__(self, code, message, maxSize):
+        error.Error.__init__(self, code, message)
+        self.maxSize = maxSize
+
+
 class HTTPPageGetter(http.HTTPClient):
     """
     Gets a resource via HTTP, then quits.
@@ -826,6 +844,11 @@ from twisted.web._newclient import (
     _WrapperException,
     )
 
+try:
+    from twisted.web._http2client import H2ClientConnection
+except ImportError:
+    H2ClientConnection = None
+
 
 
 try:
@@ -915,9 +938,38 @@ class WebClientContextFactory(object):
 class BrowserLikePolicyForHTTPS(object):
     """
     SSL connection creator for web clients.
+
+    @ivar _acceptableProtocols: The application protocols offered to servers
+        during the TLS handshake, using ALPN or NPN, or L{None} to offer none.
+        Include C{b"h2"} to allow L{Agent} to use HTTP/2 with servers which
+        support it.
+
+    @ivar sessionCache: The TLS sessions negotiated with each host, so that
+        new connections to it can resume them with an abbreviated handshake,
+        or L{None} (the default) not to resume sessions.  Its C{statistics}
+        show how often sessions are resumed.
+    @type sessionCache: L{twisted.internet.ssl.ClientTLSSessionCache} or
+        L{None}
     """
-    def __init__(self, trustRoot=None):
+    def __init__(self, trustRoot=None, acceptableProtocols=None,
+                 sessionCache=None):
+        """
+        @param trustRoot: The trust root used to verify servers' certificates;
+            see L{optionsForClientTLS}.
+
+        @param acceptableProtocols: The application protocols to offer, in
+            order of preference, such as C{[b"h2", b"http/1.1"]}.
+        @type acceptableProtocols: L{list} of L{bytes}
+
+        @param sessionCache: The session cache to use to resume sessions,
+            which may be shared between several policies with the same
+            C{trustRoot}, or L{None} not to resume them.
+        @type sessionCache: L{twisted.internet.ssl.ClientTLSSessionCache} or
+            L{None}
+        """
         self._trustRoot = trustRoot
+        self._acceptableProtocols = acceptableProtocols
+        self.sessionCache = sessionCache
 
 
     @_requireSSL
@@ -941,8 +993,14 @@ class BrowserLikePolicyForHTTPS(object):
         @rtype: L{client connection creator
             <twisted.internet.interfaces.IOpenSSLClientConnectionCreator>}
         """
-        return optionsForClientTLS(hostname.decode("ascii"),
-                                   trustRoot=self._trustRoot)
+        if self._acceptableProtocols is None:
+            return optionsForClientTLS(hostname.decode("ascii"),
+                                       trustRoot=self._trustRoot,
+                                       sessionCache=self.sessionCache)
+        return optionsForClientTLS(
+            hostname.decode("ascii"), trustRoot=self._trustRoot,
+            acceptableProtocols=self._acceptableProtocols,
+            sessionCache=self.sessionCache)
 
 
 
@@ -1165,6 +1223,114 @@ class _HTTP11ClientFactory(protocol.Factory):
 
 
 
+class _HTTPClientFactory(_HTTP11ClientFactory):
+    """
+    A factory for L{_NegotiatingHTTPClientProtocol}, used by
+    L{HTTPConnectionPool} to speak HTTP/2 to servers which select it during
+    the TLS handshake and HTTP/1.1 to others.
+    """
+    def __repr__(self):
+        return '_HTTPClientFactory({}, {})'.format(
+            self._quiescentCallback,
+            self._metadata)
+
+
+    def buildProtocol(self, addr):
+        return _NegotiatingHTTPClientProtocol(self._quiescentCallback)
+
+
+
+@implementer(IHandshakeListener)
+class _NegotiatingHTTPClientProtocol(protocol.Protocol):
+    """
+    A protocol which delegates to an L{H2ClientConnection} if the server
+    selects HTTP/2 during the TLS handshake, and to an L{HTTP11ClientProtocol}
+    otherwise, including for connections which do not use TLS.
+
+    @ivar _quiescentCallback: The quiescent callback passed to the protocol
+        delegated to.
+
+    @ivar _protocol: The protocol delegated to, once it has been chosen.
+
+    @ivar _waiting: L{Deferred}s returned by L{whenNegotiated} which have not
+        yet fired.
+
+    @ivar _connectionLostCallback: If not L{None}, a callable which is called
+        with the protocol delegated to when the connection is lost after one
+        has been chosen.
+    """
+    _protocol = None
+    _connectionLostCallback = None
+
+    def __init__(self, quiescentCallback):
+        self._quiescentCallback = quiescentCallback
+        self._waiting = []
+
+
+    def whenNegotiated(self):
+        """
+        Wait for the protocol to be chosen.
+
+        @return: A L{Deferred} which fires with the L{HTTP11ClientProtocol} or
+            L{H2ClientConnection} to issue requests with, or fails with
+            L{ResponseNeverReceived} if the connection is lost first.
+        """
+        if self._protocol is not None:
+            return defer.succeed(self._protocol)
+        d = defer.Deferred()
+        self._waiting.append(d)
+        return d
+
+
+    def _choose(self, protocol):
+        """
+        Connect C{protocol} to the transport and delegate to it from now on.
+        """
+        self._protocol = protocol
+        protocol.makeConnection(self.transport)
+        waiting, self._waiting = self._waiting, []
+        for d in waiting:
+            d.callback(protocol)
+
+
+    def connectionMade(self):
+        """
+        Choose HTTP/1.1 immediately if the connection does not use TLS;
+        otherwise wait for the handshake.
+        """
+        if not INegotiated.providedBy(self.transport):
+            self._choose(HTTP11ClientProtocol(self._quiescentCallback))
+
+
+    def handshakeCompleted(self):
+        """
+        Choose the protocol the server selected.
+        """
+        if self.transport.negotiatedProtocol != b'h2':
+            self._choose(HTTP11ClientProtocol(self._quiescentCallback))
+        elif H2ClientConnection is None:
+            # HTTP/2 was offered but is not available.
+            self.transport.abortConnection()
+        else:
+            self._choose(H2ClientConnection(self._quiescentCallback))
+
+
+    def dataReceived(self, data):
+        self._protocol.dataReceived(data)
+
+
+    def connectionLost(self, reason):
+        if self._protocol is not None:
+            self._protocol.connectionLost(reason)
+            if self._connectionLostCallback is not None:
+                self._connectionLostCallback(self._protocol)
+            return
+        waiting, self._waiting = self._waiting, []
+        for d in waiting:
+            d.errback(Failure(ResponseNeverReceived([reason])))
+
+
+
 class _RetryingHTTP11ClientProtocol(object):
     """
     A wrapper for L{HTTP11ClientProtocol} that automatically retries requests.
@@ -1230,6 +1396,74 @@ class _RetryingHTTP11ClientProtocol(object):
 
 
 
+class HTTPConnectionPoolStatistics(object):
+    """
+    Counters describing the use an L{HTTPConnectionPool} has seen, for
+    monitoring.
+
+    @ivar hits: The number of connections supplied from the pool: idle cached
+        connections and shared HTTP/2 connections.
+    @type hits: L{int}
+
+    @ivar misses: The number of connections which had to be newly created to
+        be supplied.
+    @type misses: L{int}
+
+    @ivar waits: The number of requests for a connection which had to wait
+        because C{maxActivePerHost} connections were already active.
+    @type waits: L{int}
+
+    @ivar connects: The number of connections successfully established,
+        including those made to pre-warm the pool.
+    @type connects: L{int}
+
+    @ivar connectFailures: The number of connection attempts which failed.
+    @type connectFailures: L{int}
+
+    @ivar totalConnectTime: The total number of seconds spent establishing
+        the connections counted by C{connects}.
+    @type totalConnectTime: L{float}
+
+    @ivar maxConnectTime: The longest time, in seconds, taken to establish a
+        connection.
+    @type maxConnectTime: L{float}
+
+    @ivar evictions: The number of cached connections discarded because they
+        were lost or too old, rather than because they timed out or the pool
+        was full.
+    @type evictions: L{int}
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.connects = 0
+        self.connectFailures = 0
+        self.totalConnectTime = 0.0
+        self.maxConnectTime = 0.0
+        self.evictions = 0
+
+
+    @property
+    def averageConnectTime(self):
+        """
+        The mean number of seconds taken to establish a connection, or L{None}
+        if none has been established yet.
+        """
+        if not self.connects:
+            return None
+        return self.totalConnectTime / self.connects
+
+
+    def __repr__(self):
+        return (
+            '<HTTPConnectionPoolStatistics hits={} misses={} waits={} '
+            'connects={} connectFailures={} evictions={}>'.format(
+                self.hits, self.misses, self.waits, self.connects,
+                self.connectFailures, self.evictions))
+
+
+
 class HTTPConnectionPool(object):
     """
     A pool of persistent HTTP connections.
@@ -1237,6 +1471,9 @@ class HTTPConnectionPool(object):
     Features:
      - Cached connections will eventually time out.
      - Limits on maximum number of persistent connections.
+     - Optional limits on the number of connections in use at once, with
+       requests for further connections waiting their turn.
+     - Optional pre-warming, to keep some connections ready for use.
 
     Connections are stored using keys, which should be chosen such that any
     connections stored under a given key can be used interchangeably.
@@ -1245,6 +1482,11 @@ class HTTPConnectionPool(object):
     once if they use an idempotent method (e.g. GET), in case the HTTP server
     timed them out.
 
+    If the server selects HTTP/2 during the TLS handshake (see
+    L{BrowserLikePolicyForHTTPS}), the connection is shared by all requests
+    for its key, each on its own stream, rather than being used for one
+    request at a time.
+
     @ivar persistent: Boolean indicating whether connections should be
         persistent. Connections are persistent by default.
 
@@ -1252,34 +1494,93 @@ class HTTPConnectionPool(object):
         connections for a C{host:port} destination.
     @type maxPersistentPerHost: C{int}
 
+    @ivar maxActivePerHost: The maximum number of connections for a
+        C{host:port} destination which may be in use or being established at
+        once, or L{None} for no limit. Further requests for a connection wait,
+        first come first served, for one of these to be returned to the pool
+        or lost. A shared HTTP/2 connection counts as one.
+    @type maxActivePerHost: C{int} or L{None}
+
+    @ivar minIdlePerHost: The number of idle connections to keep ready for a
+        C{host:port} destination once it has been used: whenever connections
+        are taken from the pool or lost, new ones are established in the
+        background to replace them, up to C{maxPersistentPerHost}. Unused
+        connections still time out after C{cachedConnectionTimeout}.
+    @type minIdlePerHost: C{int}
+
+    @ivar maxConnectionAge: The number of seconds after which a connection is
+        closed rather than reused, or L{None} to reuse connections for as long
+        as they stay open.
+    @type maxConnectionAge: C{float} or L{None}
+
     @ivar cachedConnectionTimeout: Number of seconds a cached persistent
         connection will stay open before disconnecting.
 
     @ivar retryAutomatically: C{boolean} indicating whether idempotent
         requests should be retried once if no response was received.
 
+    @ivar statistics: Counters describing the use of the pool.
+    @type statistics: L{HTTPConnectionPoolStatistics}
+
     @ivar _factory: The factory used to connect to the proxy.
 
     @ivar _connections: Map (scheme, host, port) to lists of
-        L{HTTP11ClientProtocol} instances.
+        L{HTTP11ClientProtocol} instances, oldest first. The most recently
+        cached connection is reused first.
+
+    @ivar _timeouts: Map L{HTTP11ClientProtocol} and L{H2ClientConnection}
+        instances to a C{IDelayedCall} instance of their timeout.
+
+    @ivar _http2Connections: Map (scheme, host, port) to the
+        L{H2ClientConnection} shared by requests for that key.
+
+    @ivar _active: Map (scheme, host, port) to the number of connections in
+        use or being established for it.
+
+    @ivar _inUse: Map connections in use to their key.
+
+    @ivar _waiting: Map (scheme, host, port) to a C{deque} of
+        C{(Deferred, endpoint)} tuples for the calls to L{getConnection}
+        waiting for a connection, in the order they were made.
 
-    @ivar _timeouts: Map L{HTTP11ClientProtocol} instances to a
-        C{IDelayedCall} instance of their timeout.
+    @ivar _created: Map connections to the time they were established.
+
+    @ivar _endpoints: Map (scheme, host, port) to the endpoint most recently
+        used to connect to it, with which connections are pre-warmed.
+
+    @ivar _warming: Map (scheme, host, port) to the number of connections
+        being established to pre-warm the pool.
+
+    @ivar _generation: The number of times L{closeCachedConnections} has been
+        called, so that connection attempts started before then are not
+        counted in C{_active} or C{_warming} once they complete.
 
     @since: 12.1
     """
 
-    _factory = _HTTP11ClientFactory
+    _factory = _HTTPClientFactory
     maxPersistentPerHost = 2
+    maxActivePerHost = None
+    minIdlePerHost = 0
+    maxConnectionAge = None
     cachedConnectionTimeout = 240
     retryAutomatically = True
+    _generation = 0
     _log = Logger()
 
     def __init__(self, reactor, persistent=True):
         self._reactor = reactor
         self.persistent = persistent
+        self.statistics = HTTPConnectionPoolStatistics()
         self._connections = {}
         self._timeouts = {}
+        self._http2Connections = {}
+        self._active = {}
+        self._inUse = {}
+        self._waiting = {}
+        self._created = {}
+        self._endpoints = {}
+        self._warming = {}
 
 
     def getConnection(self, key, endpoint):
@@ -1294,6 +1595,10 @@ class HTTPConnectionPool(object):
         Afterwards, if the connection is still open, it will automatically be
         added to the pool.
 
+        If C{maxActivePerHost} connections for C{key} are already in use, the
+        returned C{Deferred} does not fire until one of them is released.
+        Cancelling it gives up the place in the queue.
+
         @param key: A unique key identifying connections that can be used
             interchangeably.
 
@@ -1301,35 +1606,416 @@ class HTTPConnectionPool(object):
             if no cached connection is available.
 
         @return: A C{Deferred} that will fire with a L{HTTP11ClientProtocol}
-           (or a wrapper) that can be used to send a single HTTP request.
+           (or a wrapper) that can be used to send a single HTTP request, or
+           with a shared L{H2ClientConnection}.
+        """
+        if self.minIdlePerHost:
+            self._endpoints[key] = endpoint
+        if self._waiting.get(key):
+            # Others are already waiting their turn.
+            d = None
+        else:
+            d = self._takeConnection(key, endpoint)
+        if d is None:
+            d = self._wait(key, endpoint)
+        self._maintainIdle(key)
+        return d
+
+
+    def _wait(self, key, endpoint, first=False):
         """
-        # Try to get cached version:
-        connections = self._connections.get(key)
-        while connections:
-            connection = connections.pop(0)
-            # Cancel timeout:
-            self._timeouts[connection].cancel()
-            del self._timeouts[connection]
-            if connection.state == "QUIESCENT":
-                if self.retryAutomatically:
-                    newConnection = lambda: self._newConnection(key, endpoint)
-                    connection = _RetryingHTTP11ClientProtocol(
-                        connection, newConnection)
+        Queue a request for a connection for C{key} until C{maxActivePerHost}
+        allows one to be supplied.
+
+        @param first: Whether to queue the request ahead of those already
+            waiting, rather than behind them.
+
+        @return: A L{Deferred} firing with the connection.  Cancelling it
+            gives up the place in the queue.
+        """
+        self.statistics.waits += 1
+        def cancel(d):
+            waiting = self._waiting.get(key, ())
+            if (d, endpoint) in waiting:
+                waiting.remove((d, endpoint))
+        d = defer.Deferred(cancel)
+        waiting = self._waiting.setdefault(key, deque())
+        if first:
+            waiting.appendleft((d, endpoint))
+        else:
+            waiting.append((d, endpoint))
+        return d
+
+
+    def _retryConnection(self, key, endpoint):
+        """
+        Supply a connection to retry a failed request with, subject to
+        C{maxActivePerHost} like any other, but ahead of the requests already
+        waiting for one.
+
+        @return: A L{Deferred} firing with the connection.
+        """
+        d = self._takeConnection(key, endpoint)
+        if d is None:
+            d = self._wait(key, endpoint, first=True)
+        return d
+
+
+    def prewarm(self, key, endpoint, count=1):
+        """
+        Establish connections in advance, so that later requests do not have
+        to wait for them.
+
+        The new connections are cached like connections returned to the pool,
+        up to C{maxPersistentPerHost} for C{key}, and time out in the same
+        way. Nothing is done for a pool whose connections are not persistent.
+
+        @param key: A unique key identifying connections that can be used
+            interchangeably.
+
+        @param endpoint: An endpoint that can be used to open the new
+            connections.
+
+        @param count: The number of idle connections to have ready for
+            C{key}, including those already cached. A single HTTP/2
+            connection suffices for any number.
+        @type count: L{int}
+
+        @return: A C{Deferred} that fires with L{None} once the connections
+            have been established, or fails with the first connection error.
+        """
+        if not self.persistent or key in self._http2Connections:
+            return defer.succeed(None)
+        count = min(count, self.maxPersistentPerHost)
+        missing = (count - len(self._connections.get(key, ())) -
+                   self._warming.get(key, 0))
+        return defer.gatherResults(
+            [self._warmConnection(key, endpoint) for i in range(missing)],
+            consumeErrors=True,
+        ).addCallbacks(lambda ignored: None, lambda f: f.value.subFailure)
+
+
+    def _takeConnection(self, key, endpoint):
+        """
+        Supply a connection for L{getConnection}, unless C{maxActivePerHost}
+        connections for C{key} are in use.
+
+        @return: A L{Deferred} firing with the connection, or L{None} if the
+            caller must wait.
+        """
+        connection = self._http2Connections.get(key)
+        if connection is not None:
+            if not connection._canRequest() or self._tooOld(connection):
+                self._discardHTTP2Connection(key, connection)
+            elif connection in self._inUse:
+                self.statistics.hits += 1
+                return defer.succeed(connection)
+            elif self._hasCapacity(key):
+                timeout = self._timeouts.pop(connection, None)
+                if timeout is not None:
+                    timeout.cancel()
+                self._checkOut(key, connection)
+                self.statistics.hits += 1
                 return defer.succeed(connection)
+            else:
+                return None
 
+        if not self._hasCapacity(key):
+            return None
+
+        # Try to get cached version, most recently used first:
+        connections = self._connections.get(key)
+        if connections:
+            for connection in connections[:]:
+                if connection.state != "QUIESCENT":
+                    self._evictConnection(key, connection)
+                elif self._tooOld(connection):
+                    connection.transport.loseConnection()
+                    self._evictConnection(key, connection)
+        if connections:
+            connection = connections.pop()
+            # Cancel timeout:
+            self._timeouts.pop(connection).cancel()
+            self._checkOut(key, connection)
+            self.statistics.hits += 1
+            if self.retryAutomatically:
+                newConnection = lambda: self._retryConnection(key, endpoint)
+                connection = _RetryingHTTP11ClientProtocol(
+                    connection, newConnection)
+            return defer.succeed(connection)
+
+        self.statistics.misses += 1
         return self._newConnection(key, endpoint)
 
 
-    def _newConnection(self, key, endpoint):
+    def _hasCapacity(self, key):
         """
-        Create a new connection.
+        Determine whether another connection for C{key} may be put to use.
+        """
+        return (self.maxActivePerHost is None or
+                self._active.get(key, 0) < self.maxActivePerHost)
 
-        This implements the new connection code path for L{getConnection}.
+
+    def _checkOut(self, key, connection):
+        """
+        Count C{connection} as in use for C{key}.
+        """
+        self._inUse[connection] = key
+        self._active[key] = self._active.get(key, 0) + 1
+
+
+    def _release(self, key, connection=None):
+        """
+        Stop counting C{connection}, or a connection attempt if it is L{None},
+        as in use for C{key}, and let the next request waiting for a
+        connection have one.
+        """
+        if connection is not None:
+            del self._inUse[connection]
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+        self._serveWaiting(key)
+
+
+    def _serveWaiting(self, key):
+        """
+        Supply connections to as many of the requests waiting for one for
+        C{key} as possible, in the order they were made.
+        """
+        waiting = self._waiting.get(key)
+        while waiting:
+            d = self._takeConnection(key, waiting[0][1])
+            if d is None:
+                break
+            waiter = waiting.popleft()[0]
+            d.addBoth(self._supplyWaiting, key, waiter)
+        if key in self._waiting and not self._waiting[key]:
+            del self._waiting[key]
+
+
+    def _supplyWaiting(self, result, key, waiter):
+        """
+        Fire the L{Deferred} of a request which waited for a connection with
+        C{result}; if it was cancelled in the meantime, return the connection
+        to the pool instead.
+        """
+        if not waiter.called:
+            waiter.callback(result)
+        elif not isinstance(result, Failure):
+            if isinstance(result, _RetryingHTTP11ClientProtocol):
+                result = result._clientProtocol
+            if (H2ClientConnection is not None and
+                    isinstance(result, H2ClientConnection) and
+                    (result._streams or result._queued)):
+                # Other requests are using it, and it will be returned to
+                # the pool when they are done.
+                return
+            self._putConnection(key, result)
+
+
+    def _seconds(self):
+        """
+        Get the current time, from the global reactor if the pool was not
+        given one.
+        """
+        return (self._reactor or reactor).seconds()
+
+
+    def _tooOld(self, connection):
+        """
+        Determine whether C{connection} has been open longer than
+        C{maxConnectionAge}.
+        """
+        if self.maxConnectionAge is None:
+            return False
+        created = self._created.get(connection)
+        return (created is not None and
+                self._seconds() - created >= self.maxConnectionAge)
+
+
+    def _connect(self, key, endpoint):
+        """
+        Connect to C{endpoint}, recording how long it takes.
+
+        @return: A L{Deferred} firing with the connection, once it has chosen
+            between HTTP/1.1 and HTTP/2.
         """
         def quiescentCallback(protocol):
             self._putConnection(key, protocol)
         factory = self._factory(quiescentCallback, repr(endpoint))
-        return endpoint.connect(factory)
+        started = self._seconds()
+
+        def connected(connection):
+            now = self._seconds()
+            if IProtocol.providedBy(connection):
+                self._created[connection] = now
+            elapsed = now - started
+            self.statistics.connects += 1
+            self.statistics.totalConnectTime += elapsed
+            self.statistics.maxConnectTime = max(
+                self.statistics.maxConnectTime, elapsed)
+            return connection
+
+        def failed(reason):
+            self.statistics.connectFailures += 1
+            return reason
+
+        d = endpoint.connect(factory).addCallback(self._negotiated, key)
+        return d.addCallbacks(connected, failed)
+
+
+    def _newConnection(self, key, endpoint):
+        """
+        Create a new connection.
+
+        This implements the new connection code path for L{getConnection}.
+        """
+        self._active[key] = self._active.get(key, 0) + 1
+        generation = self._generation
+
+        def connected(connection):
+            if generation != self._generation:
+                # The pool has forgotten about this attempt.
+                return connection
+            if not IProtocol.providedBy(connection):
+                # It cannot be tracked, or returned to the pool.
+                self._release(key)
+                return connection
+            self._inUse[connection] = key
+            if self._http2Connections.get(key) is connection:
+                # Requests waiting for a connection can share this one.
+                self._serveWaiting(key)
+            return connection
+
+        def failed(reason):
+            if generation == self._generation:
+                self._release(key)
+            return reason
+
+        return self._connect(key, endpoint).addCallbacks(connected, failed)
+
+
+    def _warmConnection(self, key, endpoint):
+        """
+        Create a new connection and cache it for later use.
+
+        @return: A L{Deferred} firing with L{None} when the connection has
+            been cached.
+        """
+        self._warming[key] = self._warming.get(key, 0) + 1
+        generation = self._generation
+
+        def connected(connection):
+            if generation != self._generation:
+                # The pool was closed while it was being established.
+                connection.transport.loseConnection()
+            elif (H2ClientConnection is None or
+                    not isinstance(connection, H2ClientConnection) or
+                    not connection._streams):
+                self._putConnection(key, connection)
+
+        def done(result):
+            if generation == self._generation:
+                self._warming[key] -= 1
+                if not self._warming[key]:
+                    del self._warming[key]
+            return result
+
+        return self._connect(key, endpoint).addBoth(done).addCallback(
+            connected)
+
+
+    def _maintainIdle(self, key):
+        """
+        Start pre-warming connections for C{key}, if it has fewer than
+        C{minIdlePerHost} idle connections ready.
+        """
+        endpoint = self._endpoints.get(key)
+        if endpoint is None or not self.minIdlePerHost:
+            return
+        d = self.prewarm(key, endpoint, self.minIdlePerHost)
+        d.addErrback(
+            lambda f: self._log.failure(
+                "Pre-warming a connection for {key} failed", f, key=key))
+
+
+    def _negotiated(self, protocol, key):
+        """
+        Wait for a new connection to choose between HTTP/1.1 and HTTP/2, and
+        share it if it chose HTTP/2.
+
+        @param protocol: The protocol the endpoint connected.
+
+        @param key: The key of the connection.
+
+        @return: The protocol to issue the request with, or a L{Deferred}
+            firing with it.
+        """
+        if not isinstance(protocol, _NegotiatingHTTPClientProtocol):
+            return protocol
+        protocol._connectionLostCallback = (
+            lambda connection: self._connectionLost(key, connection))
+
+        def negotiated(connection):
+            if (H2ClientConnection is not None and
+                    isinstance(connection, H2ClientConnection)):
+                if not self.persistent:
+                    connection._closeWhenIdle = True
+                else:
+                    existing = self._http2Connections.get(key)
+                    if existing is None or not existing._canRequest():
+                        self._http2Connections[key] = connection
+                    else:
+                        # Another connection for this key negotiated HTTP/2
+                        # first; finish this request, then close.
+                        connection._closeWhenIdle = True
+            return connection
+        return protocol.whenNegotiated().addCallback(negotiated)
+
+
+    def _connectionLost(self, key, connection):
+        """
+        Forget about a connection which has been lost.
+        """
+        self._created.pop(connection, None)
+        if self._http2Connections.get(key) is connection:
+            del self._http2Connections[key]
+        timeout = self._timeouts.pop(connection, None)
+        if timeout is not None:
+            # It was idle in the pool.
+            timeout.cancel()
+            if connection in self._connections.get(key, ()):
+                self._connections[key].remove(connection)
+            self.statistics.evictions += 1
+            self._maintainIdle(key)
+        if connection in self._inUse:
+            self._release(key, connection)
+
+
+    def _evictConnection(self, key, connection):
+        """
+        Remove an unusable connection from the cache.
+        """
+        self._connections[key].remove(connection)
+        self._timeouts.pop(connection).cancel()
+        self._created.pop(connection, None)
+        self.statistics.evictions += 1
+
+
+    def _discardHTTP2Connection(self, key, connection):
+        """
+        Stop sharing an HTTP/2 connection which can no longer be used or is
+        too old, closing it once its requests are complete.
+        """
+        del self._http2Connections[key]
+        timeout = self._timeouts.pop(connection, None)
+        if timeout is not None:
+            timeout.cancel()
+            connection.transport.loseConnection()
+        else:
+            connection._closeWhenIdle = True
+        self.statistics.evictions += 1
 
 
     def _removeConnection(self, key, connection):
@@ -1339,13 +2025,51 @@ class HTTPConnectionPool(object):
         connection.transport.loseConnection()
         self._connections[key].remove(connection)
         del self._timeouts[connection]
+        self._created.pop(connection, None)
+
+
+    def _removeHTTP2Connection(self, key, connection):
+        """
+        Remove an idle HTTP/2 connection from the pool and disconnect it.
+        """
+        connection.transport.loseConnection()
+        del self._http2Connections[key]
+        del self._timeouts[connection]
+        self._created.pop(connection, None)
 
 
     def _putConnection(self, key, connection):
         """
         Return a persistent connection to the pool. This will be called by
-        L{HTTP11ClientProtocol} when the connection becomes quiescent.
+        L{HTTP11ClientProtocol} when the connection becomes quiescent, and by
+        L{H2ClientConnection} when it has no requests in progress.
+        """
+        self._cacheConnection(key, connection)
+        if connection in self._inUse:
+            self._release(key, connection)
+
+
+    def _cacheConnection(self, key, connection):
+        """
+        Add a connection returned to the pool to the cache, unless it should
+        be closed instead.
         """
+        if (H2ClientConnection is not None and
+                isinstance(connection, H2ClientConnection)):
+            if self._http2Connections.get(key) is not connection:
+                connection.transport.loseConnection()
+                return
+            timeout = self._timeouts.pop(connection, None)
+            if timeout is not None:
+                timeout.cancel()
+            if self._tooOld(connection):
+                self._discardHTTP2Connection(key, connection)
+                connection.transport.loseConnection()
+                return
+            self._timeouts[connection] = self._reactor.callLater(
+                self.cachedConnectionTimeout, self._removeHTTP2Connection,
+                key, connection)
+            return
         if connection.state != "QUIESCENT":
             # Log with traceback for debugging purposes:
             try:
@@ -1355,12 +2079,18 @@ class HTTPConnectionPool(object):
                 self._log.failure(
                     "BUG: Non-quiescent protocol added to connection pool.")
             return
+        if self._tooOld(connection):
+            connection.transport.loseConnection()
+            self._created.pop(connection, None)
+            self.statistics.evictions += 1
+            return
         connections = self._connections.setdefault(key, [])
         if len(connections) == self.maxPersistentPerHost:
             dropped = connections.pop(0)
             dropped.transport.loseConnection()
             self._timeouts[dropped].cancel()
             del self._timeouts[dropped]
+            self._created.pop(dropped, None)
         connections.append(connection)
         cid = self._reactor.callLater(self.cachedConnectionTimeout,
                                       self._removeConnection,
@@ -1372,14 +2102,31 @@ class HTTPConnectionPool(object):
         """
         Close all persistent connections and remove them from the pool.
 
+        Requests waiting for a connection because of C{maxActivePerHost}
+        fail with L{ConnectionAborted}, and connections in use or being
+        established no longer count towards it.
+
         @return: L{defer.Deferred} that fires when all connections have been
             closed.
         """
+        self._generation += 1
+        self._active = {}
+        self._inUse = {}
+        self._warming = {}
+        waiting, self._waiting = self._waiting, {}
+        for queue in itervalues(waiting):
+            for d, endpoint in queue:
+                d.errback(ConnectionAborted())
         results = []
         for protocols in itervalues(self._connections):
             for p in protocols:
                 results.append(p.abort())
+                self._created.pop(p, None)
         self._connections = {}
+        for p in itervalues(self._http2Connections):
+            results.append(p.abort())
+        self._http2Connections = {}
+        self._endpoints = {}
         for dc in itervalues(self._timeouts):
             dc.cancel()
         self._timeouts = {}
@@ -2122,6 +2869,60 @@ class BrowserLikeRedirectAgent(RedirectAgent):
 
 
 
+def _abortBody(transport):
+    """
+    Close the connection a response body is being received over as quickly as
+    possible.
+
+    @param transport: The transport given to the protocol passed to
+        L{IResponse.deliverBody}, or L{None} if the body has already been
+        completely delivered.
+    """
+    if transport is None:
+        return
+    abort = getattr(transport, 'abortConnection', None)
+    if abort is not None:
+        abort()
+    else:
+        transport.stopProducing()
+
+
+
+def _checkLength(response, maxSize):
+    """
+    Determine whether the declared length of C{response} already rules out
+    receiving its body within C{maxSize} bytes.
+
+    @param response: The response whose body is about to be read.
+    @type response: L{IResponse} provider
+
+    @param maxSize: The largest acceptable body, in bytes, or L{None} for no
+        limit.
+    @type maxSize: L{int} or L{None}
+
+    @return: A L{Failure} wrapping L{ResponseBodyTooLarge} if the body is
+        known to be too large, otherwise L{None}.
+    """
+    length = getattr(response, 'length', UNKNOWN_LENGTH)
+    if (maxSize is not None and length is not UNKNOWN_LENGTH and
+            length > maxSize):
+        return Failure(
+            ResponseBodyTooLarge(response.code, response.phrase, maxSize))
+    return None
+
+
+
+class _DiscardBodyProtocol(protocol.Protocol):
+    """
+    Protocol that aborts the connection a response body is arriving on as
+    soon as it is given that connection, and ignores anything it receives.
+    """
+
+    def connectionMade(self):
+        _abortBody(self.transport)
+
+
+
 class _ReadBodyProtocol(protocol.Protocol):
     """
     Protocol that collects data sent to it.
@@ -2132,12 +2933,16 @@ class _ReadBodyProtocol(protocol.Protocol):
     @ivar deferred: See L{__init__}.
     @ivar status: See L{__init__}.
     @ivar message: See L{__init__}.
+    @ivar maxSize: See L{__init__}.
 
-    @ivar dataBuffer: list of byte-strings received
+    @ivar dataBuffer: list of byte-strings received, or L{None} once the body
+        has been given up on for being larger than C{maxSize}.
     @type dataBuffer: L{list} of L{bytes}
+
+    @ivar _received: The number of bytes received so far.
     """
 
-    def __init__(self, status, message, deferred):
+    def __init__(self, status, message, deferred, maxSize=None):
         """
         @param status: Status of L{IResponse}
         @ivar status: L{int}
@@ -2147,17 +2952,34 @@ class _ReadBodyProtocol(protocol.Protocol):
 
         @param deferred: deferred to fire when response is complete
         @type deferred: L{Deferred} firing with L{bytes}
+
+        @param maxSize: The largest body, in bytes, to collect before giving
+            up and aborting the connection, or L{None} for no limit.
+        @type maxSize: L{int} or L{None}
         """
         self.deferred = deferred
         self.status = status
         self.message = message
+        self.maxSize = maxSize
         self.dataBuffer = []
+        self._received = 0
 
 
     def dataReceived(self, data):
         """
-        Accumulate some more bytes from the response.
+        Accumulate some more bytes from the response, unless that takes the
+        body beyond C{maxSize}, in which case the connection is aborted and
+        the L{Deferred} fails with L{ResponseBodyTooLarge}.
         """
+        if self.dataBuffer is None:
+            return
+        self._received += len(data)
+        if self.maxSize is not None and self._received > self.maxSize:
+            self.dataBuffer = None
+            self.deferred.errback(
+                ResponseBodyTooLarge(self.status, self.message, self.maxSize))
+            _abortBody(self.transport)
+            return
         self.dataBuffer.append(data)
 
 
@@ -2166,6 +2988,8 @@ class _ReadBodyProtocol(protocol.Protocol):
         Deliver the accumulated response bytes to the waiting L{Deferred}, if
         the response body has been completely received without error.
         """
+        if self.dataBuffer is None:
+            return
         if reason.check(ResponseDone):
             self.deferred.callback(b''.join(self.dataBuffer))
         elif reason.check(PotentialDataLoss):
@@ -2177,7 +3001,7 @@ class _ReadBodyProtocol(protocol.Protocol):
 
 
 
-def readBody(response):
+def readBody(response, maxSize=None):
     """
     Get the body of an L{IResponse} and return it as a byte string.
 
@@ -2187,9 +3011,20 @@ def readBody(response):
     @param response: The HTTP response for which the body will be read.
     @type response: L{IResponse} provider
 
-    @return: A L{Deferred} which will fire with the body of the response.
+    @param maxSize: The largest body, in bytes, to accept, or L{None} for no
+        limit.  If the response declares a longer body, or more than this
+        many bytes arrive, the connection to the server is aborted.
+    @type maxSize: L{int} or L{None}
+
+    @return: A L{Deferred} which will fire with the body of the response, or
+        fail with L{ResponseBodyTooLarge} if it is larger than C{maxSize}.
         Cancelling it will close the connection to the server immediately.
     """
+    tooLarge = _checkLength(response, maxSize)
+    if tooLarge is not None:
+        response.deliverBody(_DiscardBodyProtocol())
+        return defer.fail(tooLarge)
+
     def cancel(deferred):
         """
         Cancel a L{readBody} call, close the connection to the HTTP server
@@ -2202,7 +3037,7 @@ def readBody(response):
             abort()
 
     d = defer.Deferred(cancel)
-    protocol = _ReadBodyProtocol(response.code, response.phrase, d)
+    protocol = _ReadBodyProtocol(response.code, response.phrase, d, maxSize)
     def getAbort():
         return getattr(protocol.transport, 'abortConnection', None)
 
@@ -2219,6 +3054,420 @@ def readBody(response):
 
 
 
+class _WriteBodyProtocol(protocol.Protocol):
+    """
+    Protocol that writes a response body to a destination as it arrives.
+
+    If the destination is an L{IConsumer}, the transport the body arrives
+    over is registered with it as a streaming producer, so a destination
+    which cannot keep up pauses the connection rather than the body piling up
+    in memory.
+
+    @ivar _status: The status code of the response.
+    @ivar _message: The status phrase of the response.
+    @ivar _destination: See L{writeBody}.
+    @ivar _maxSize: See L{writeBody}.
+    @ivar _deferred: The L{Deferred} returned by L{writeBody}.
+
+    @ivar _streaming: C{True} if C{_destination} provides L{IConsumer} and so
+        has the transport registered with it.
+
+    @ivar _written: The number of bytes written to C{_destination} so far, or
+        L{None} once the body has been given up on.
+    """
+
+    def __init__(self, status, message, destination, maxSize, deferred):
+        self._status = status
+        self._message = message
+        self._destination = destination
+        self._maxSize = maxSize
+        self._deferred = deferred
+        self._streaming = IConsumer.providedBy(destination)
+        self._written = 0
+
+
+    def connectionMade(self):
+        """
+        Let the destination pause the delivery of the body, if it is able to.
+        """
+        if self._streaming:
+            self._destination.registerProducer(self.transport, True)
+
+
+    def dataReceived(self, data):
+        """
+        Write some more of the response body to the destination, or give up
+        on it if that would take the body beyond C{_maxSize}.
+        """
+        if self._written is None:
+            return
+        written = self._written + len(data)
+        if self._maxSize is not None and written > self._maxSize:
+            self._finish(Failure(ResponseBodyTooLarge(
+                self._status, self._message, self._maxSize)))
+            _abortBody(self.transport)
+            return
+        self._written = written
+        self._destination.write(data)
+
+
+    def connectionLost(self, reason):
+        """
+        Fire the L{Deferred} returned by L{writeBody} with the number of bytes
+        written if the response body was completely received, or with the
+        reason it was not.
+        """
+        if self._written is None:
+            return
+        if reason.check(ResponseDone):
+            self._finish(self._written)
+        elif reason.check(PotentialDataLoss):
+            self._finish(Failure(
+                PartialDownloadError(self._status, self._message)))
+        else:
+            self._finish(reason)
+
+
+    def _stop(self):
+        """
+        Stop writing the body to the destination, and detach from it.
+        """
+        if self._written is not None:
+            self._written = None
+            if self._streaming:
+                self._destination.unregisterProducer()
+
+
+    def _finish(self, result):
+        """
+        Stop writing the body and deliver C{result} to the waiting
+        L{Deferred}.
+
+        @param result: The number of bytes written, or a L{Failure}.
+        """
+        self._stop()
+        self._deferred.callback(result)
+
+
+
+def writeBody(response, destination, maxSize=None):
+    """
+    Write the body of an L{IResponse} to C{destination} as it arrives, rather
+    than collecting all of it in memory first.
+
+    This is a helper function for clients which want to save a possibly large
+    response body to a file, or pass it on to another connection.
+
+    @param response: The HTTP response for which the body will be written.
+    @type response: L{IResponse} provider
+
+    @param destination: Where to write the body.  An L{IConsumer} provider,
+        such as another connection's transport, is given the transport the
+        body is arriving over as a streaming producer, so that receiving the
+        body is paused whenever the consumer is.  Otherwise, any object with
+        a C{write} method accepting L{bytes}, such as a file opened for
+        writing in binary mode.  C{destination} is not closed.
+
+    @param maxSize: The largest body, in bytes, to accept, or L{None} for no
+        limit.  If the response declares a longer body, or more than this
+        many bytes arrive, the connection to the server is aborted.
+    @type maxSize: L{int} or L{None}
+
+    @return: A L{Deferred} which fires with the number of bytes written once
+        the body has been completely received.  It fails with
+        L{PartialDownloadError} if the end of the body could not be
+        determined, or L{ResponseBodyTooLarge} if it was larger than
+        C{maxSize}.  Cancelling it will close the connection to the server
+        immediately.
+    """
+    tooLarge = _checkLength(response, maxSize)
+    if tooLarge is not None:
+        response.deliverBody(_DiscardBodyProtocol())
+        return defer.fail(tooLarge)
+
+    def cancel(deferred):
+        """
+        Cancel a L{writeBody} call, close the connection to the HTTP server
+        immediately, if it is still open.
+
+        @param deferred: The cancelled L{defer.Deferred}.
+        """
+        protocol._stop()
+        _abortBody(protocol.transport)
+
+    d = defer.Deferred(cancel)
+    protocol = _WriteBodyProtocol(
+        response.code, response.phrase, destination, maxSize, d)
+    response.deliverBody(protocol)
+    return d
+
+
+
+try:
+    _StopAsyncIteration = StopAsyncIteration
+except NameError:
+    # There is no asynchronous iteration before Python 3.5, so nothing will
+    # expect the real exception.
+    class _StopAsyncIteration(Exception):
+        """
+        The end of an asynchronous iteration.
+        """
+
+
+
+class _BodyStream(protocol.Protocol):
+    """
+    Protocol which buffers a response body until it is read, pausing the
+    transport it arrives over while too much of it is unread.
+
+    See L{streamBody} for the public interface.
+
+    @ivar _status: The status code of the response.
+    @ivar _message: The status phrase of the response.
+    @ivar _bufferSize: See L{streamBody}.
+
+    @ivar _chunks: The unread parts of the body, oldest first.
+    @type _chunks: L{deque} of L{bytes}
+
+    @ivar _buffered: The total length of C{_chunks}.
+
+    @ivar _reads: Reads waiting for more of the body to arrive, oldest first,
+        as lists of a L{Deferred} and a method which returns the result of
+        the read, or L{None} if it cannot complete yet.
+    @type _reads: L{deque}
+
+    @ivar _end: L{None} while the body is still arriving, then the result of
+        any read made after all of it has been read: C{b''}, or a L{Failure}.
+
+    @ivar _paused: C{True} if the transport has been paused because too much
+        of the body is buffered.
+    """
+
+    def __init__(self, status, message, bufferSize):
+        self._status = status
+        self._message = message
+        self._bufferSize = bufferSize
+        self._chunks = deque()
+        self._buffered = 0
+        self._reads = deque()
+        self._end = None
+        self._paused = False
+
+
+    def dataReceived(self, data):
+        """
+        Buffer some more of the body, and complete any waiting reads.
+        """
+        if not data:
+            # An empty part would look like the end of the body to read().
+            return
+        self._chunks.append(data)
+        self._buffered += len(data)
+        if self._reads:
+            self._completeReads()
+        if self._buffered > self._bufferSize and self._end is None:
+            self._paused = True
+            self.transport.pauseProducing()
+
+
+    def connectionLost(self, reason):
+        """
+        Remember how the body ended, and complete any waiting reads.
+        """
+        if reason.check(ResponseDone):
+            self._end = b''
+        elif reason.check(PotentialDataLoss):
+            self._end = Failure(
+                PartialDownloadError(self._status, self._message))
+        else:
+            self._end = reason
+        self._paused = False
+        self._completeReads()
+
+
+    def read(self):
+        """
+        Read the next part of the body.
+
+        @return: A L{Deferred} which fires with the next non-empty part of
+            the body, in whatever size it arrived, or with C{b''} once all of
+            it has been read.  See L{streamBody} for the ways it can fail.
+        """
+        return self._read(self._readChunk)
+
+
+    def readLine(self):
+        """
+        Read the next line of the body.
+
+        @return: A L{Deferred} which fires with the next line of the body,
+            including its terminating C{b'\\n'} (the last line may lack one),
+            or with C{b''} once all of it has been read.
+        """
+        return self._read(self._readLine)
+
+
+    def __aiter__(self):
+        """
+        Iterate over the parts of the body, for C{async for}.
+        """
+        return self
+
+
+    def __anext__(self):
+        """
+        Read the next part of the body, for C{async for}.
+
+        @return: A L{Deferred} like that returned by L{read}, except that it
+            fails with L{StopAsyncIteration} at the end of the body.
+        """
+        return self._read(self._iterateChunk)
+
+
+    def _read(self, method):
+        """
+        Start a read, completing it immediately if possible.
+
+        @param method: A method returning the result of the read, or L{None}
+            if more of the body is needed first.
+
+        @return: A L{Deferred} firing with the result of the read.
+            Cancelling it aborts the connection.
+        """
+        def cancel(deferred):
+            """
+            Cancel a read, and close the connection to the HTTP server
+            immediately, if it is still open.
+
+            @param deferred: The cancelled L{defer.Deferred}.
+            """
+            self._reads.remove(entry)
+            _abortBody(self.transport)
+
+        entry = [defer.Deferred(cancel), method]
+        self._reads.append(entry)
+        self._completeReads()
+        return entry[0]
+
+
+    def _completeReads(self):
+        """
+        Complete as many waiting reads as possible, in order, then resume the
+        transport if enough of the body has been read.
+        """
+        while self._reads:
+            d, method = self._reads[0]
+            result = method()
+            if result is None:
+                break
+            self._reads.popleft()
+            d.callback(result)
+        if self._paused and self._buffered <= self._bufferSize // 2:
+            self._paused = False
+            self.transport.resumeProducing()
+
+
+    def _readChunk(self):
+        """
+        Take the oldest unread part of the body.
+
+        @return: The part of the body, or C{_end} if there is none.
+        """
+        if self._chunks:
+            data = self._chunks.popleft()
+            self._buffered -= len(data)
+            return data
+        return self._end
+
+
+    def _iterateChunk(self):
+        """
+        Take the oldest unread part of the body, for L{__anext__}.
+
+        @return: The part of the body, L{None} if there is none yet, or a
+            L{Failure} if the body ended: with L{StopAsyncIteration} once all
+            of it has been read.
+        """
+        if self._chunks or self._end is None:
+            return self._readChunk()
+        if isinstance(self._end, Failure):
+            return self._end
+        return Failure(_StopAsyncIteration())
+
+
+    def _readLine(self):
+        """
+        Take the oldest unread line of the body, if all of it has arrived.
+
+        @return: The line, C{_end} if there is nothing left, or L{None} if
+            more of the body is needed.
+        """
+        chunks = self._chunks
+        for i, chunk in enumerate(chunks):
+            end = chunk.find(b'\n') + 1
+            if end:
+                break
+        else:
+            if self._end is None:
+                return None
+            if not chunks:
+                return self._end
+            end = len(chunk)
+        line = [chunks.popleft() for j in range(i)]
+        line.append(chunk[:end])
+        if end < len(chunk):
+            chunks[0] = chunk[end:]
+        else:
+            chunks.popleft()
+        line = b''.join(line)
+        self._buffered -= len(line)
+        return line
+
+
+
+def streamBody(response, bufferSize=2 ** 18):
+    """
+    Read the body of an L{IResponse} incrementally, as it arrives.
+
+    This is a helper function for clients which want to process a large or
+    long-lived response body, such as a stream of newline delimited JSON
+    documents, without collecting all of it in memory first.
+
+    The returned object has these methods:
+
+      - C{read()}, which returns a L{Deferred} firing with the next part of
+        the body, or with C{b''} once all of it has been read.
+
+      - C{readLine()}, which returns a L{Deferred} firing with the next line
+        of the body, including its terminating C{b'\\n'}, or with C{b''} once
+        all of it has been read.
+
+    On Python 3 it is also an asynchronous iterator over the parts of the
+    body, for use with C{async for} in a coroutine driven by
+    L{defer.ensureDeferred}.
+
+    Reads may be started before earlier ones complete, and complete in the
+    order they were started.  Once the body has been read, reads fail with
+    L{PartialDownloadError} if the end of the body could not be determined,
+    or with the reason the body was not completely received.  Cancelling a
+    read closes the connection to the server immediately.
+
+    @param response: The HTTP response for which the body will be read.
+    @type response: L{IResponse} provider
+
+    @param bufferSize: The number of unread bytes of the body to buffer
+        before pausing the connection it is arriving on.  The connection is
+        resumed when half of them have been read.
+    @type bufferSize: L{int}
+
+    @return: The stream of the body of C{response}.
+    """
+    stream = _BodyStream(response.code, response.phrase, bufferSize)
+    response.deliverBody(stream)
+    return stream
+
+
+
 __all__ = [
     'Agent',
     'BrowserLikeRedirectAgent',
@@ -2229,6 +3478,7 @@ __all__ = [
     'GzipDecoder',
     'HTTPClientFactory',
     'HTTPConnectionPool',
+    'HTTPConnectionPoolStatistics',
     'HTTPDownloader',
     'HTTPPageDownloader',
     'HTTPPageGetter',
@@ -2239,8 +3489,11 @@ __all__ = [
     'RequestGenerationFailed',
     'RequestTransmissionFailed',
     'Response',
+    'ResponseBodyTooLarge',
     'ResponseDone',
     'ResponseFailed',
     'ResponseNeverReceived',
+    'streamBody',
     'URI',
+    'writeBody',
     ]
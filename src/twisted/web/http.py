@@ -64,8 +64,14 @@ import time
 import calendar
 import warnings
 import os
+import threading
 from io import BytesIO as StringIO
 
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
 try:
     from urlparse import (
         ParseResult as ParseResultBytes, urlparse as _urlparse)
@@ -102,6 +108,7 @@ from twisted.internet.defer import Deferred
 from twisted.internet.interfaces import IProtocol
 from twisted.internet._producer_helpers import _PullToPush
 from twisted.protocols import policies, basic
+from twisted._threads import ThreadWorker
 
 from twisted.web.iweb import (
     IRequest, IAccessLogFormatter, INonQueuedRequestFactory)
@@ -2581,6 +2588,43 @@ def _escape(s):
 
 
 
+# The format of a line in the combined log format, using the fields returned by
+# _accessLogFields.
+_COMBINED_LOG_FORMAT = (
+    u'"{ip}" - - {timestamp} "{method} {uri} {protocol}" '
+    u'{code} {length} "{referrer}" "{agent}"')
+
+
+
+def _accessLogFields(timestamp, request):
+    """
+    Extract the fields of an access log entry from a request.
+
+    @param timestamp: The time at which the request was completed in the
+        standard format for access logs.
+    @type timestamp: L{unicode}
+
+    @param request: The request object about which to log.
+    @type request: L{twisted.web.server.Request}
+
+    @return: A L{dict} mapping the names of the fields of
+        C{_COMBINED_LOG_FORMAT} to L{unicode} values, apart from C{code},
+        which is an L{int}.  Bytes which are not printable ASCII are escaped.
+    """
+    return dict(
+        ip=_escape(request.getClientIP() or b"-"),
+        timestamp=timestamp,
+        method=_escape(request.method),
+        uri=_escape(request.uri),
+        protocol=_escape(request.clientproto),
+        code=request.code,
+        length=u"%s" % (request.sentLength or u"-",),
+        referrer=_escape(request.getHeader(b"referer") or b"-"),
+        agent=_escape(request.getHeader(b"user-agent") or b"-"),
+        )
+
+
+
 @provider(IAccessLogFormatter)
 def combinedLogFormatter(timestamp, request):
     """
@@ -2588,22 +2632,7 @@ def combinedLogFormatter(timestamp, request):
 
     @see: L{IAccessLogFormatter}
     """
-    referrer = _escape(request.getHeader(b"referer") or b"-")
-    agent = _escape(request.getHeader(b"user-agent") or b"-")
-    line = (
-        u'"%(ip)s" - - %(timestamp)s "%(method)s %(uri)s %(protocol)s" '
-        u'%(code)d %(length)s "%(referrer)s" "%(agent)s"' % dict(
-            ip=_escape(request.getClientIP() or b"-"),
-            timestamp=timestamp,
-            method=_escape(request.method),
-            uri=_escape(request.uri),
-            protocol=_escape(request.clientproto),
-            code=request.code,
-            length=request.sentLength or u"-",
-            referrer=referrer,
-            agent=agent,
-            ))
-    return line
+    return _COMBINED_LOG_FORMAT.format(**_accessLogFields(timestamp, request))
 
 
 
@@ -2861,6 +2890,141 @@ def _genericHTTPChannelProtocolFactory(self):
 
 
 
+class _BufferedLogFile(object):
+    """
+    A wrapper around a log file which collects the lines written to it and
+    writes them to the file in batches, either when enough bytes have been
+    collected or a short time after the first line of a batch.
+
+    @ivar _logFile: The file to write to.
+
+    @ivar _buffer: The lines collected since the last batch was written.
+    @type _buffer: L{list} of L{bytes}
+
+    @ivar _bufferedBytes: The number of bytes in C{_buffer}.
+    @type _bufferedBytes: L{int}
+
+    @ivar _flushCall: The delayed call which will write the lines in
+        C{_buffer}, or L{None} if C{_buffer} is empty.
+    @type _flushCall: L{IDelayedCall} provider
+
+    @ivar _worker: The worker which writes batches on a dedicated thread, or
+        L{None} if they are written on the reactor thread.
+    @type _worker: L{ThreadWorker}
+
+    @ivar _thread: The thread owned by C{_worker}.
+    @type _thread: L{threading.Thread}
+    """
+    _log = Logger()
+    _worker = None
+    _thread = None
+
+    def __init__(self, logFile, reactor, bufferSize, flushInterval,
+                 inThread=False):
+        """
+        @param logFile: The file to write to.  Once wrapped, it must only be
+            used through this wrapper.
+
+        @param reactor: An L{IReactorTime} provider used to schedule writes.
+
+        @param bufferSize: The number of bytes to collect before writing them.
+        @type bufferSize: L{int}
+
+        @param flushInterval: The longest time, in seconds, to keep a line
+            before writing it.
+        @type flushInterval: L{float}
+
+        @param inThread: If C{True}, write to C{logFile} on a dedicated thread
+            so that slow disks do not block the reactor.
+        @type inThread: L{bool}
+        """
+        self._logFile = logFile
+        self._reactor = reactor
+        self._bufferSize = bufferSize
+        self._flushInterval = flushInterval
+        self._buffer = []
+        self._bufferedBytes = 0
+        self._flushCall = None
+        if inThread:
+            self._worker = ThreadWorker(self._startThread, Queue())
+
+
+    def _startThread(self, target):
+        """
+        Start the thread used by C{_worker}.
+
+        @param target: The function to run on the thread.
+        """
+        self._thread = threading.Thread(
+            target=target, name="HTTP access log writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def write(self, data):
+        """
+        Add some data to the current batch.
+
+        @param data: The data to write.
+        @type data: L{bytes}
+        """
+        self._buffer.append(data)
+        self._bufferedBytes += len(data)
+        if self._bufferedBytes >= self._bufferSize:
+            self.flush()
+        elif self._flushCall is None:
+            self._flushCall = self._reactor.callLater(
+                self._flushInterval, self.flush)
+
+
+    def flush(self):
+        """
+        Write the current batch to the log file.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        del self._buffer[:]
+        self._bufferedBytes = 0
+        if self._worker is None:
+            self._writeBatch(data)
+        else:
+            self._worker.do(lambda: self._writeBatch(data))
+
+
+    def _writeBatch(self, data):
+        """
+        Write a batch of lines to the log file and flush it.
+
+        @param data: The lines to write.
+        @type data: L{bytes}
+        """
+        try:
+            self._logFile.write(data)
+            self._logFile.flush()
+        except:
+            self._log.failure("Unable to write to the access log")
+
+
+    def close(self):
+        """
+        Write the current batch, wait for all batches to be written and close
+        the log file.
+        """
+        self.flush()
+        if self._worker is None:
+            self._logFile.close()
+        else:
+            self._worker.do(self._logFile.close)
+            self._worker.quit()
+            self._thread.join()
+
+
+
 class HTTPFactory(protocol.ServerFactory):
     """
     Factory for HTTP server.
@@ -2882,12 +3046,72 @@ class HTTPFactory(protocol.ServerFactory):
 
     @ivar _reactor: An L{IReactorTime} provider used to compute logging
         timestamps.
+
+    @ivar h2InitialWindowSize: The initial flow control window, in bytes, of
+        each stream of an HTTP/2 connection, or L{None} to use the protocol
+        default of 65535 bytes.
+    @type h2InitialWindowSize: L{int} or L{None}
+
+    @ivar h2ConnectionWindowSize: The flow control window, in bytes, of an
+        HTTP/2 connection as a whole, or L{None} to use the protocol default
+        of 65535 bytes.
+    @type h2ConnectionWindowSize: L{int} or L{None}
+
+    @ivar h2MaxWindowSize: If not L{None}, the stream and connection flow
+        control windows of HTTP/2 connections are grown, up to this many
+        bytes, when the rate at which clients send request bodies suggests
+        that the windows are throttling them.  This avoids stalling uploads
+        from clients with high latency links.
+    @type h2MaxWindowSize: L{int} or L{None}
+
+    @ivar h2MaxConcurrentStreams: The number of streams a client may have open
+        at once on an HTTP/2 connection, or L{None} for the default of 100.
+    @type h2MaxConcurrentStreams: L{int} or L{None}
+
+    @ivar h2MaxFrameSize: The largest HTTP/2 frame payload, in bytes, which
+        clients may send, or L{None} to use the protocol default of 16384
+        bytes.
+    @type h2MaxFrameSize: L{int} or L{None}
+
+    @ivar logBufferSize: If not zero, lines for the access log file are
+        collected and written in batches of at least this many bytes, rather
+        than being written as each request completes.
+    @type logBufferSize: L{int}
+
+    @ivar logFlushInterval: The longest time, in seconds, for which a line is
+        kept before being written when C{logBufferSize} is not zero.
+    @type logFlushInterval: L{float}
+
+    @ivar logInThread: If C{True} and C{logBufferSize} is not zero, batches of
+        lines are written to the access log file on a dedicated thread, so
+        that slow disks do not stall the reactor.
+    @type logInThread: L{bool}
+
+    @ivar accessLogger: If not L{None}, an event is emitted to this
+        L{twisted.logger.Logger} for each request, with the fields of a
+        combined log format line (C{ip}, C{timestamp}, C{method}, C{uri},
+        C{protocol}, C{code}, C{length}, C{referrer} and C{agent}) as
+        separate keys, suitable for observers such as
+        L{twisted.logger.jsonFileLogObserver}.  Unless C{logPath} is also
+        given, requests are then not written to the legacy log.
+    @type accessLogger: L{twisted.logger.Logger} or L{None}
     """
 
     protocol = _genericHTTPChannelProtocolFactory
 
     logPath = None
 
+    h2InitialWindowSize = None
+    h2ConnectionWindowSize = None
+    h2MaxWindowSize = None
+    h2MaxConcurrentStreams = None
+    h2MaxFrameSize = None
+
+    logBufferSize = 0
+    logFlushInterval = 1
+    logInThread = False
+    accessLogger = None
+
     timeOut = _REQUEST_TIMEOUT
 
     def __init__(self, logPath=None, timeout=_REQUEST_TIMEOUT,
@@ -2950,6 +3174,10 @@ class HTTPFactory(protocol.ServerFactory):
 
         if self.logPath:
             self.logFile = self._openLogFile(self.logPath)
+            if self.logBufferSize:
+                self.logFile = _BufferedLogFile(
+                    self.logFile, self._reactor, self.logBufferSize,
+                    self.logFlushInterval, self.logInThread)
         else:
             self.logFile = log.logfile
 
@@ -2980,6 +3208,12 @@ class HTTPFactory(protocol.ServerFactory):
         @param request: The request object about which to log.
         @type request: L{Request}
         """
+        if self.accessLogger is not None:
+            self.accessLogger.info(
+                _COMBINED_LOG_FORMAT,
+                **_accessLogFields(self._logDateTime, request))
+            if not self.logPath:
+                return
         try:
             logFile = self.logFile
         except AttributeError:
@@ -213,14 +213,8 @@ class Headers(object):
         @type value: L{bytes} or L{unicode}
         @param value: The value to set for the named header.
         """
-        values = self.getRawHeaders(name)
-
-        if values is not None:
-            values.append(value)
-        else:
-            values = [value]
-
-        self.setRawHeaders(name, values)
+        self._rawHeaders.setdefault(
+            self._encodeName(name), []).append(self._encodeValue(value))
 
 
     def getRawHeaders(self, name, default=None):
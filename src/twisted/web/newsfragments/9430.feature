@@ -0,0 +1 @@
+twisted.web.template.flatten now writes its output in chunks of up to 64KiB rather than one write per fragment, and twisted.web.template.renderElement now registers a streaming producer so rendering pauses while the request's transport is applying backpressure.
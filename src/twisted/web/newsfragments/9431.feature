@@ -0,0 +1 @@
+twisted.web.routing.RoutingResource dispatches requests using a compiled table of routes, optionally containing parameter segments, resolving the resource for a request in a single pass over its path.
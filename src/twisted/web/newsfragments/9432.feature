@@ -0,0 +1 @@
+twisted.web.http.HTTPFactory, and so twisted.web.server.Site, now has h2InitialWindowSize, h2ConnectionWindowSize, h2MaxWindowSize, h2MaxConcurrentStreams and h2MaxFrameSize attributes to tune HTTP/2 flow control, and HTTP/2 connections now send the response data for many streams in a single write.
@@ -0,0 +1 @@
+twisted.web.http.HTTPFactory and twisted.web.server.Site can now buffer access log lines and write them in batches, optionally on a dedicated thread, using the new logBufferSize, logFlushInterval and logInThread attributes, and can emit structured access log events to a twisted.logger.Logger set as accessLogger.
@@ -0,0 +1 @@
+twisted.web.server now provides BrotliEncoderFactory and ZstdEncoderFactory alongside GzipEncoderFactory; all of them honour Accept-Encoding quality values, accept compression levels for complete and streamed responses, can skip small or incompressible responses by size and Content-Type, and can compress large responses in a thread pool.
@@ -0,0 +1 @@
+twisted.web.client.Agent can now use HTTP/2: when the server selects h2 during the TLS handshake (offered by passing acceptableProtocols to BrowserLikePolicyForHTTPS), HTTPConnectionPool multiplexes concurrent requests for the same host over one shared connection, with per-stream flow control driven by the protocols given to IResponse.deliverBody.
@@ -0,0 +1 @@
+twisted.web.client.HTTPConnectionPool can now limit the connections in use per host with maxActivePerHost, queueing further requests in order, pre-warm connections with prewarm() and minIdlePerHost, close connections older than maxConnectionAge, and reports hits, misses, waits and connect times in its new statistics attribute; cached connections are now reused most recent first.
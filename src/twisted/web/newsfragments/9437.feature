@@ -0,0 +1 @@
+twisted.web._newclient.HTTPClientParser now parses a status line and header block received together in a single pass and passes response body bytes straight to the body decoder, making HTTP/1.1 responses cheaper to parse for twisted.web.client.Agent.
@@ -0,0 +1 @@
+twisted.web.client.readBody now accepts maxSize to abort responses whose bodies are too large, and the new twisted.web.client.writeBody and twisted.web.client.streamBody write a body to a file or IConsumer, or read it incrementally by chunk, line or async iteration, without collecting it in memory.
@@ -0,0 +1,207 @@
+# -*- test-case-name: twisted.web.test.test_routing -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+A resource which dispatches requests to other resources using a compiled table
+of routes, rather than by asking each resource along the path for its child.
+
+For example::
+
+    root = RoutingResource()
+    root.addRoute(b"/", HomePage())
+    root.addRoute(b"/users/{userID}/posts", UserPosts())
+    root.addRoute(b"/static", File("/var/www/static"))
+
+A request for C{/users/alice/posts} is dispatched to the C{UserPosts} resource
+with C{request.routeArguments} set to C{{"userID": b"alice"}}, after a single
+lookup in the route table.
+"""
+
+from __future__ import division, absolute_import
+
+__all__ = ['RoutingResource']
+
+from twisted.python.compat import nativeString
+from twisted.web.resource import Resource
+
+
+
+class _RouteNode(object):
+    """
+    A node in the trie built by L{RoutingResource}, corresponding to one path
+    segment.
+
+    @ivar static: A mapping from literal path segments to child nodes.
+    @type static: L{dict} of L{bytes} to L{_RouteNode}
+
+    @ivar parameter: The child node which matches any path segment, or L{None}.
+    @type parameter: L{_RouteNode}
+
+    @ivar parameterName: The name under which the segment matched by
+        C{parameter} is recorded, or L{None}.
+    @type parameterName: native L{str}
+
+    @ivar resource: The resource for the route which ends at this node, or
+        L{None} if no route ends here.
+    @type resource: L{IResource} provider
+    """
+    __slots__ = ('static', 'parameter', 'parameterName', 'resource')
+
+    def __init__(self):
+        self.static = {}
+        self.parameter = None
+        self.parameterName = None
+        self.resource = None
+
+
+
+def _parseRoute(route):
+    """
+    Split a route into the path segments it matches.
+
+    @param route: A C{/}-separated path, in which a segment of the form
+        C{{name}} matches any single path segment.
+    @type route: L{bytes}
+
+    @return: A L{list} of 2-L{tuple}s of a flag indicating whether the segment
+        is a parameter and either the literal segment (as L{bytes}) or the
+        parameter name (as a native L{str}).
+
+    @raise ValueError: If C{route} is not L{bytes} or contains a malformed
+        parameter.
+    """
+    if not isinstance(route, bytes):
+        raise ValueError("Routes must be bytes, not %r" % (route,))
+    if route.startswith(b'/'):
+        route = route[1:]
+    segments = []
+    for segment in route.split(b'/'):
+        if segment.startswith(b'{') and segment.endswith(b'}'):
+            name = segment[1:-1]
+            if not name or b'{' in name or b'}' in name:
+                raise ValueError(
+                    "Invalid route parameter %r in %r" % (segment, route))
+            segments.append((True, nativeString(name)))
+        else:
+            segments.append((False, segment))
+    return segments
+
+
+
+class RoutingResource(Resource):
+    """
+    A resource which resolves the resource for a request by looking up the
+    request's path in a table of routes.
+
+    Routes are compiled into a trie keyed on path segments, so the resource for
+    a request is found in a single pass over its path, however deep the route
+    and however many routes there are.  Each route may contain parameter
+    segments, written C{{name}}, which match any one path segment; the values
+    matched are made available to the resource as C{request.routeArguments},
+    a L{dict} mapping parameter names to L{bytes}.
+
+    Literal segments are preferred over parameters.  If no route matches all
+    of the remaining path, the longest route which matches a prefix of it is
+    used and traversal of the rest of the path continues from its resource as
+    usual.  If no route matches at all, children registered with
+    L{Resource.putChild} and L{Resource.getChild} are consulted as for any
+    other L{Resource}.
+    """
+
+    def __init__(self):
+        Resource.__init__(self)
+        self._routes = _RouteNode()
+
+
+    def addRoute(self, route, resource):
+        """
+        Register a resource to handle requests for a route.
+
+        @param route: A C{/}-separated path, relative to this resource, such as
+            C{b"/users/{userID}/posts"}.  Registering a route which is already
+            registered replaces its resource.
+        @type route: L{bytes}
+
+        @param resource: The resource to which matching requests are
+            dispatched.
+        @type resource: L{IResource} provider
+
+        @raise ValueError: If C{route} is malformed or gives a parameter
+            segment a different name to a route already registered with a
+            parameter in the same position.
+        """
+        node = self._routes
+        for isParameter, segment in _parseRoute(route):
+            if isParameter:
+                if node.parameter is None:
+                    node.parameter = _RouteNode()
+                    node.parameterName = segment
+                elif node.parameterName != segment:
+                    raise ValueError(
+                        "Route %r names parameter %r, which is already "
+                        "named %r" % (route, segment, node.parameterName))
+                node = node.parameter
+            else:
+                child = node.static.get(segment)
+                if child is None:
+                    child = node.static[segment] = _RouteNode()
+                node = child
+        node.resource = resource
+        resource.server = self.server
+
+
+    def _match(self, segments):
+        """
+        Find the longest route matching a prefix of C{segments}.
+
+        @param segments: The path segments to match.
+        @type segments: L{list} of L{bytes}
+
+        @return: L{None} if no route matches, otherwise a 3-L{tuple} of the
+            resource for the route, the number of segments it matched, and the
+            L{dict} of parameters it extracted.
+        """
+        best = None
+        # A stack of (node, depth, arguments) still to be explored.  Static
+        # children are pushed last so that they are explored first.
+        pending = [(self._routes, 0, {})]
+        length = len(segments)
+        while pending:
+            node, depth, arguments = pending.pop()
+            if node.resource is not None:
+                if depth == length:
+                    return node.resource, depth, arguments
+                if best is None or depth > best[1]:
+                    best = (node.resource, depth, arguments)
+            if depth == length:
+                continue
+            segment = segments[depth]
+            if node.parameter is not None:
+                parameterArguments = arguments.copy()
+                parameterArguments[node.parameterName] = segment
+                pending.append(
+                    (node.parameter, depth + 1, parameterArguments))
+            child = node.static.get(segment)
+            if child is not None:
+                pending.append((child, depth + 1, arguments))
+        return best
+
+
+    def getChildWithDefault(self, path, request):
+        """
+        Resolve the resource for C{path} and as many of the segments which
+        follow it in C{request.postpath} as the routes allow, moving the
+        segments consumed from C{request.postpath} to C{request.prepath}.
+
+        @see: L{IResource.getChildWithDefault}
+        """
+        match = self._match([path] + request.postpath)
+        if match is None:
+            return Resource.getChildWithDefault(self, path, request)
+        resource, depth, arguments = match
+        consumed = request.postpath[:depth - 1]
+        del request.postpath[:depth - 1]
+        request.prepath.extend(consumed)
+        request.routeArguments = arguments
+        return resource
@@ -29,11 +29,22 @@ except ImportError:
 import zlib
 from binascii import hexlify
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 from zope.interface import implementer
 
 from twisted.python.compat import networkString, nativeString, intToBytes
 from twisted.spread.pb import Copyable, ViewPoint
-from twisted.internet import address, interfaces
+from twisted.internet import address, interfaces, defer
+from twisted.internet.threads import deferToThreadPool
 from twisted.web import iweb, http, util
 from twisted.web.http import unquote
 from twisted.python import reflect, failure, components
@@ -55,7 +66,9 @@ __all__ = [
     'Site',
     'version',
     'NOT_DONE_YET',
-    'GzipEncoderFactory'
+    'GzipEncoderFactory',
+    'BrotliEncoderFactory',
+    'ZstdEncoderFactory',
 ]
 
 
@@ -242,11 +255,44 @@ class Request(Copyable, http.Request, components.Componentized):
         """
         if self._encoder:
             data = self._encoder.finish()
+            if isinstance(data, defer.Deferred):
+                # The encoder is still compressing in a thread; finish once it
+                # has produced the last of the body.
+                data.addCallbacks(self._finishEncoded, self._encodingFailed)
+                return
             if data:
                 http.Request.write(self, data)
         return http.Request.finish(self)
 
 
+    def _finishEncoded(self, data):
+        """
+        Write the final output of an encoder which completed asynchronously,
+        then finish the request.
+
+        @param data: The remaining encoded data.
+        @type data: L{bytes}
+        """
+        if self._disconnected or self._encoder._failed:
+            return
+        if data:
+            http.Request.write(self, data)
+        http.Request.finish(self)
+
+
+    def _encodingFailed(self, reason):
+        """
+        Log a failure of an encoder which completed asynchronously, and drop
+        the connection, since the body sent so far cannot be completed.
+
+        @param reason: The failure.
+        @type reason: L{failure.Failure}
+        """
+        self._log.failure("Encoding response body failed", failure=reason)
+        if not self._disconnected:
+            self.loseConnection()
+
+
     def render(self, resrc):
         """
         Ask a resource to render itself.
@@ -560,8 +606,187 @@ class Request(Copyable, http.Request, components.Componentized):
         self.finish()
 
 
+def _acceptedEncodings(request):
+    """
+    Parse the I{Accept-Encoding} headers of a request.
+
+    @param request: The request.
+    @type request: L{IRequest} provider
+
+    @return: A mapping from lower-cased content-codings (including C{b"*"}) to
+        their quality values.
+    @rtype: L{dict} of L{bytes} to L{float}
+    """
+    accepted = {}
+    for header in request.requestHeaders.getRawHeaders(
+            b'accept-encoding', []):
+        for element in header.split(b','):
+            parameters = element.split(b';')
+            coding = parameters[0].strip().lower()
+            if not coding:
+                continue
+            quality = 1.0
+            for parameter in parameters[1:]:
+                name, _, value = parameter.partition(b'=')
+                if name.strip().lower() == b'q':
+                    try:
+                        quality = float(value.strip())
+                    except ValueError:
+                        quality = 0.0
+            accepted[coding] = quality
+    return accepted
+
+
+
 @implementer(iweb._IRequestEncoderFactory)
-class GzipEncoderFactory(object):
+class _CompressingEncoderFactory(object):
+    """
+    Base class for factories of encoders which compress response bodies with
+    a particular content-coding, if the client accepts it.
+
+    Whether a response is compressed is decided when its body is first
+    written, once the resource has set its headers: responses shorter than
+    C{minimumSize} (according to their I{Content-Length}) and responses whose
+    I{Content-Type} is not in C{compressibleTypes} are sent unchanged.
+
+    Subclasses must set C{contentEncoding} and implement
+    C{_createCompressor}.
+
+    @cvar contentEncoding: The content-coding produced by the encoder, such as
+        C{b"gzip"}.
+    @type contentEncoding: L{bytes}
+
+    @ivar compressLevel: The compression level used for responses of known
+        length.
+    @type compressLevel: L{int}
+
+    @ivar streamingCompressLevel: The compression level used for responses
+        without a I{Content-Length}, which are typically streamed as they are
+        produced and so benefit more from lower latency than from a better
+        ratio, or L{None} to use C{compressLevel}.
+    @type streamingCompressLevel: L{int} or L{None}
+
+    @ivar minimumSize: The size, in bytes, below which responses with a
+        I{Content-Length} are not compressed.
+    @type minimumSize: L{int}
+
+    @ivar compressibleTypes: The media types of responses to compress, or
+        L{None} to compress responses of any type.  A type ending in C{b"/"},
+        such as C{b"text/"}, matches every type with that prefix.
+    @type compressibleTypes: L{None} or iterable of L{bytes}
+
+    @ivar threadThreshold: The size, in bytes, of a single write above which
+        compression of that write and the rest of the response is performed in
+        a thread rather than in the reactor thread, or L{None} to always
+        compress in the reactor thread.
+    @type threadThreshold: L{int} or L{None}
+
+    @ivar threadPool: The thread pool used when compressing in a thread, or
+        L{None} to use the reactor's thread pool.
+    @type threadPool: L{twisted.python.threadpool.ThreadPool}
+
+    @ivar reactor: The reactor used when compressing in a thread, or L{None}
+        to use the global reactor.
+    """
+    contentEncoding = None
+    compressLevel = None
+    streamingCompressLevel = None
+    minimumSize = 0
+    compressibleTypes = None
+    threadThreshold = None
+    threadPool = None
+    reactor = None
+
+    def __init__(self, compressLevel=None, streamingCompressLevel=None,
+                 minimumSize=None, compressibleTypes=None,
+                 threadThreshold=None, threadPool=None, reactor=None):
+        if compressLevel is not None:
+            self.compressLevel = compressLevel
+        if streamingCompressLevel is not None:
+            self.streamingCompressLevel = streamingCompressLevel
+        if minimumSize is not None:
+            self.minimumSize = minimumSize
+        if compressibleTypes is not None:
+            self.compressibleTypes = compressibleTypes
+        if threadThreshold is not None:
+            self.threadThreshold = threadThreshold
+        if threadPool is not None:
+            self.threadPool = threadPool
+        if reactor is not None:
+            self.reactor = reactor
+
+
+    def _isAvailable(self):
+        """
+        Determine whether the library implementing the content-coding can be
+        imported.
+
+        @rtype: L{bool}
+        """
+        return True
+
+
+    def _createCompressor(self, compressLevel):
+        """
+        Create the state for compressing a single response.
+
+        @param compressLevel: The compression level to use.
+        @type compressLevel: L{int}
+
+        @return: A 2-L{tuple} of a callable which takes L{bytes} and returns
+            the compressed L{bytes} available so far, and a callable which
+            takes no arguments and returns the remainder of the compressed
+            stream.
+        """
+        raise NotImplementedError()
+
+
+    def _isCompressible(self, contentType):
+        """
+        Determine whether a response of the given type should be compressed.
+
+        @param contentType: The values of the response's I{Content-Type}
+            header, or L{None}.
+
+        @rtype: L{bool}
+        """
+        if self.compressibleTypes is None or not contentType:
+            return True
+        mediaType = contentType[0].split(b';', 1)[0].strip().lower()
+        for compressible in self.compressibleTypes:
+            if compressible.endswith(b'/'):
+                if mediaType.startswith(compressible):
+                    return True
+            elif mediaType == compressible:
+                return True
+        return False
+
+
+    def encoderForRequest(self, request):
+        """
+        Return an encoder for C{request} if the client accepts this factory's
+        content-coding and its library is available.
+        """
+        if not self._isAvailable():
+            return None
+        accepted = _acceptedEncodings(request)
+        quality = accepted.get(self.contentEncoding, accepted.get(b'*', 0))
+        if quality > 0:
+            return self._encoderForRequest(request)
+
+
+    def _encoderForRequest(self, request):
+        """
+        Create the encoder for a request whose client accepts this factory's
+        content-coding.
+
+        @rtype: L{_CompressingEncoder}
+        """
+        return _CompressingEncoder(self, request)
+
+
+
+class GzipEncoderFactory(_CompressingEncoderFactory):
     """
     @cvar compressLevel: The compression level used by the compressor, default
         to 9 (highest).
@@ -569,70 +794,297 @@ class GzipEncoderFactory(object):
     @since: 12.3
     """
 
+    contentEncoding = b'gzip'
     compressLevel = 9
 
-    def encoderForRequest(self, request):
-        """
-        Check the headers if the client accepts gzip encoding, and encodes the
-        request if so.
-        """
-        acceptHeaders = request.requestHeaders.getRawHeaders(
-            'accept-encoding', [])
-        supported = ','.join(acceptHeaders).split(',')
-        if 'gzip' in supported:
-            encoding = request.responseHeaders.getRawHeaders(
-                'content-encoding')
-            if encoding:
-                encoding = '%s,gzip' % ','.join(encoding)
-            else:
-                encoding = 'gzip'
+    def _createCompressor(self, compressLevel):
+        compressor = zlib.compressobj(
+            compressLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
 
-            request.responseHeaders.setRawHeaders('content-encoding',
-                                                  [encoding])
-            return _GzipEncoder(self.compressLevel, request)
+
+    def _encoderForRequest(self, request):
+        return _GzipEncoder(self.compressLevel, request, self)
+
+
+
+class BrotliEncoderFactory(_CompressingEncoderFactory):
+    """
+    A factory of encoders compressing responses with I{br}, if the C{brotli}
+    library is installed; otherwise it never encodes responses.
+
+    @cvar compressLevel: The brotli quality, from 0 to 11, default to 11.
+
+    @cvar streamingCompressLevel: The brotli quality used for responses
+        without a I{Content-Length}, default to 4.
+
+    @since: Twisted NEXT
+    """
+
+    contentEncoding = b'br'
+    compressLevel = 11
+    streamingCompressLevel = 4
+
+    def _isAvailable(self):
+        return brotli is not None
+
+
+    def _createCompressor(self, compressLevel):
+        compressor = brotli.Compressor(quality=compressLevel)
+        return compressor.process, compressor.finish
+
+
+
+class ZstdEncoderFactory(_CompressingEncoderFactory):
+    """
+    A factory of encoders compressing responses with I{zstd}, if the
+    C{zstandard} library is installed; otherwise it never encodes responses.
+
+    @cvar compressLevel: The zstd compression level, default to 9.
+
+    @cvar streamingCompressLevel: The zstd compression level used for
+        responses without a I{Content-Length}, default to 3.
+
+    @since: Twisted NEXT
+    """
+
+    contentEncoding = b'zstd'
+    compressLevel = 9
+    streamingCompressLevel = 3
+
+    def _isAvailable(self):
+        return zstandard is not None
+
+
+    def _createCompressor(self, compressLevel):
+        compressor = zstandard.ZstdCompressor(level=compressLevel).compressobj()
+        return compressor.compress, compressor.flush
 
 
 
 @implementer(iweb._IRequestEncoder)
-class _GzipEncoder(object):
+class _CompressingEncoder(object):
     """
-    An encoder which supports gzip.
+    An encoder which compresses a response body on the fly.
 
-    @ivar _zlibCompressor: The zlib compressor instance used to compress the
-        stream.
+    @ivar _factory: The factory which created this encoder, and which holds
+        its configuration.
+    @type _factory: L{_CompressingEncoderFactory}
 
     @ivar _request: A reference to the originating request.
 
-    @since: 12.3
-    """
+    @ivar _decided: Whether the decision to compress the response has been
+        made yet.
 
-    _zlibCompressor = None
+    @ivar _compress: The callable compressing a chunk of the body, or L{None}
+        if the body is not compressed.
 
-    def __init__(self, compressLevel, request):
-        self._zlibCompressor = zlib.compressobj(
-            compressLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    @ivar _flush: The callable returning the end of the compressed body.
+
+    @ivar _pending: Once compression has moved to a thread, a L{Deferred}
+        which fires when all of the data written so far has been compressed
+        and written; otherwise L{None}.
+
+    @ivar _inFlight: How many chunks of the body are waiting to be compressed
+        in a thread and written.
+
+    @ivar _maxInFlight: How many chunks may be waiting to be compressed in a
+        thread before the request's streaming producer is paused.
+
+    @ivar _pausedProducer: The producer paused because too many chunks were
+        waiting, or L{None}.
+
+    @ivar _failed: Whether compression in a thread has failed, after which
+        the rest of the body is not compressed.
+    """
+    _decided = False
+    _compress = None
+    _flush = None
+    _pending = None
+    _inFlight = 0
+    _maxInFlight = 4
+    _pausedProducer = None
+    _failed = False
+
+    def __init__(self, factory, request):
+        self._factory = factory
         self._request = request
 
 
-    def encode(self, data):
+    def _decide(self):
         """
-        Write to the request, automatically compressing data on the fly.
+        Decide whether to compress the response from its headers, and if so
+        update them to reflect the encoding.
         """
-        if not self._request.startedWriting:
-            # Remove the content-length header, we can't honor it
-            # because we compress on the fly.
-            self._request.responseHeaders.removeHeader(b'content-length')
-        return self._zlibCompressor.compress(data)
+        self._decided = True
+        factory = self._factory
+        headers = self._request.responseHeaders
+        size = None
+        contentLength = headers.getRawHeaders(b'content-length')
+        if contentLength:
+            try:
+                size = int(contentLength[0])
+            except ValueError:
+                pass
+        if size is not None and size < factory.minimumSize:
+            return
+        if not factory._isCompressible(headers.getRawHeaders(b'content-type')):
+            return
+
+        compressLevel = factory.compressLevel
+        if size is None and factory.streamingCompressLevel is not None:
+            compressLevel = factory.streamingCompressLevel
+        self._compress, self._flush = factory._createCompressor(compressLevel)
+
+        encoding = headers.getRawHeaders(b'content-encoding')
+        if encoding:
+            encoding = b','.join(encoding + [factory.contentEncoding])
+        else:
+            encoding = factory.contentEncoding
+        headers.setRawHeaders(b'content-encoding', [encoding])
+        # Remove the content-length header, we can't honor it because we
+        # compress on the fly.
+        headers.removeHeader(b'content-length')
+
+
+    def _inThread(self, f, *args):
+        """
+        Call C{f} in a thread once all previously queued work has completed,
+        unless compression has failed by then.
+
+        @return: The L{Deferred} which fires with the result of C{f}, or with
+            L{None} if it was not called.
+        """
+        factory = self._factory
+        reactor = factory.reactor
+        if reactor is None:
+            from twisted.internet import reactor
+        threadPool = factory.threadPool
+        if threadPool is None:
+            threadPool = reactor.getThreadPool()
+        if self._pending is None:
+            self._pending = defer.succeed(None)
+
+        def call(ignored):
+            if self._failed:
+                return None
+            return deferToThreadPool(reactor, threadPool, f, *args)
+        return self._pending.addCallback(call)
+
+
+    def _writeCompressed(self, data):
+        """
+        Write data compressed in a thread to the request, unless the
+        connection has since been lost.
+        """
+        self._inFlight -= 1
+        request = self._request
+        if data and not request._disconnected:
+            http.Request.write(request, data)
+        self._resumeProducer()
+
+
+    def _compressFailed(self, reason):
+        """
+        Report a failure to compress a chunk in a thread to the request,
+        which drops the connection, and compress nothing more.
+
+        @param reason: The failure.
+        @type reason: L{failure.Failure}
+        """
+        self._inFlight -= 1
+        if not self._failed:
+            self._failed = True
+            self._request._encodingFailed(reason)
+        self._resumeProducer()
+
+
+    def _resumeProducer(self):
+        """
+        Resume the producer paused because too many chunks were waiting, once
+        few enough are, unless the request's channel wants it paused because
+        the transport is not keeping up.
+        """
+        producer = self._pausedProducer
+        if producer is None or self._inFlight >= self._maxInFlight:
+            return
+        self._pausedProducer = None
+        request = self._request
+        if producer is not request.producer or request._disconnected:
+            return
+        channel = request.channel
+        if (getattr(channel, "_waitingForTransport", False) or
+                not getattr(channel, "_producerProducing", True)):
+            # HTTPChannel or H2Stream, which resume it themselves.
+            return
+        producer.resumeProducing()
+
+
+    def encode(self, data):
+        """
+        Compress C{data} if the response is being compressed.
+
+        @return: The data to write to the request; this is empty if C{data}
+            is being compressed in a thread, which writes the result to the
+            request itself when it is ready.  While too many chunks are
+            waiting for that, the request's streaming producer is paused.
+        """
+        if not self._decided:
+            self._decide()
+        if self._compress is None:
+            return data
+        threshold = self._factory.threadThreshold
+        if self._pending is None and (
+                threshold is None or len(data) < threshold or
+                self._request.method == b'HEAD'):
+            return self._compress(data)
+        self._inFlight += 1
+        self._inThread(self._compress, data).addCallbacks(
+            self._writeCompressed, self._compressFailed)
+        request = self._request
+        if (self._inFlight >= self._maxInFlight and
+                request.producer is not None and request.streamingProducer):
+            # Pause it again even if it was already paused here, since the
+            # channel may have resumed it in the meantime.
+            self._pausedProducer = request.producer
+            request.producer.pauseProducing()
+        return b''
 
 
     def finish(self):
         """
-        Finish handling the request request, flushing any data from the zlib
-        buffer.
+        Finish compressing the response.
+
+        @return: The remainder of the compressed body, or, if compression has
+            moved to a thread, a L{Deferred} firing with it once all of the
+            body has been compressed and written.
         """
-        remain = self._zlibCompressor.flush()
-        self._zlibCompressor = None
-        return remain
+        if not self._decided:
+            self._decide()
+        if self._compress is None:
+            return b''
+        flush = self._flush
+        self._compress = self._flush = None
+        if self._pending is not None:
+            return self._inThread(flush)
+        return flush()
+
+
+
+class _GzipEncoder(_CompressingEncoder):
+    """
+    An encoder which supports gzip.
+
+    @since: 12.3
+    """
+
+    def __init__(self, compressLevel, request, factory=None):
+        if factory is None:
+            factory = GzipEncoderFactory(compressLevel=compressLevel)
+        elif factory.compressLevel != compressLevel:
+            factory = copy.copy(factory)
+            factory.compressLevel = compressLevel
+        _CompressingEncoder.__init__(self, factory, request)
 
 
 
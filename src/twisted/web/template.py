@@ -536,6 +536,12 @@ def renderElement(request, element,
         should not include a trailing newline and will default to the HTML5
         doctype C{'<!DOCTYPE html>'}.
 
+    The rendered output is written to C{request} in chunks of up to
+    L{twisted.web._flatten.BUFFER_SIZE} bytes, and rendering is paused
+    whenever the request's transport asks its producer to pause.  If a
+    producer is already registered with C{request}, the output is written
+    without registering one, and rendering is not paused.
+
     @returns: NOT_DONE_YET
 
     @since: 12.1
@@ -547,7 +553,19 @@ def renderElement(request, element,
     if _failElement is None:
         _failElement = twisted.web.util.FailureElement
 
-    d = flatten(request, element, request.write)
+    # IRequest does not require a producer attribute.
+    if getattr(request, 'producer', None) is None:
+        producer = _FlattenerProducer()
+        request.registerProducer(producer, True)
+    else:
+        producer = None
+    d = _flatten(request, element, request.write, producer)
+
+    def unregister(result):
+        if producer is not None:
+            request.unregisterProducer()
+        return result
+    d.addBoth(unregister)
 
     def eb(failure):
         _moduleLog.failure(
@@ -564,12 +582,17 @@ def renderElement(request, element,
                  b'color:#F00'
                  b'">An error occurred while rendering the response.</div>'))
 
+    def finish(_):
+        if producer is None or not producer._stopped:
+            request.finish()
+
     d.addErrback(eb)
-    d.addBoth(lambda _: request.finish())
+    d.addBoth(finish)
     return NOT_DONE_YET
 
 
 
 from twisted.web._element import Element, renderer
 from twisted.web._flatten import flatten, flattenString
+from twisted.web._flatten import _flatten, _FlattenerProducer
 import twisted.web.util
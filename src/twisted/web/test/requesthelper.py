@@ -161,19 +161,24 @@ class DummyRequest(object):
     uri = b'http://dummy/'
     method = b'GET'
     client = None
+    producer = None
 
 
     def registerProducer(self, prod, s):
         """
         Call an L{IPullProducer}'s C{resumeProducing} method in a
-        loop until it unregisters itself.
+        loop until it unregisters itself.  An L{IPushProducer} is only
+        recorded, as it is expected to write on its own.
 
         @param prod: The producer.
-        @type prod: L{IPullProducer}
+        @type prod: L{IPullProducer} or L{IPushProducer}
 
         @param s: Whether or not the producer is streaming.
         """
-        # XXX: Handle IPushProducers
+        self.producer = prod
+        self.streamingProducer = s
+        if s:
+            return
         self.go = 1
         while self.go:
             prod.resumeProducing()
@@ -181,6 +186,7 @@ class DummyRequest(object):
 
     def unregisterProducer(self):
         self.go = 0
+        self.producer = None
 
 
     def __init__(self, postpath, session=None, client=None):
@@ -18,13 +18,13 @@ from twisted.web._newclient import ResponseNeverReceived, ResponseFailed
 from twisted.web._newclient import PotentialDataLoss
 from twisted.internet import defer, task
 from twisted.python.failure import Failure
-from twisted.python.compat import cookielib, intToBytes
+from twisted.python.compat import _PY3, cookielib, intToBytes
 from twisted.python.components import proxyForInterface
 from twisted.test.proto_helpers import (StringTransport, MemoryReactorClock,
                                         EventLoggingObserver)
 from twisted.internet.task import Clock
 from twisted.internet.error import ConnectionRefusedError, ConnectionDone
-from twisted.internet.error import ConnectionLost
+from twisted.internet.error import ConnectionLost, ConnectionAborted
 from twisted.internet.protocol import Protocol, Factory
 from twisted.internet.defer import Deferred, succeed, CancelledError
 from twisted.internet.endpoints import TCP4ClientEndpoint
@@ -63,7 +63,8 @@ else:
     skipWhenSSLPresent = "SSL present."
     skipWhenNoSSL = None
     from twisted.internet._sslverify import ClientTLSOptions, IOpenSSLTrustRoot
-    from twisted.internet.ssl import optionsForClientTLS
+    from twisted.internet.ssl import (
+        ClientTLSSessionCache, optionsForClientTLS)
     from twisted.protocols.tls import TLSMemoryBIOProtocol, TLSMemoryBIOFactory
 
 
@@ -739,6 +740,382 @@ class HTTPConnectionPoolTests(TestCase, FakeReactorAndConnectMixin):
 
 
 
+class RecordingEndpoint(object):
+    """
+    An endpoint that uses a fake transport and records the protocols it
+    connects.
+
+    @ivar protocols: The protocols connected, in order.
+
+    @ivar pending: If not L{None}, a list to which the L{Deferred} returned
+        from each call to C{connect} is appended, rather than connecting.
+    """
+
+    def __init__(self, pending=None):
+        self.protocols = []
+        self.pending = pending
+
+
+    def connect(self, factory):
+        if self.pending is not None:
+            d = Deferred()
+            self.pending.append(d)
+            return d.addCallback(lambda ignored: self._connect(factory))
+        return succeed(self._connect(factory))
+
+
+    def _connect(self, factory):
+        protocol = factory.buildProtocol(None)
+        protocol.makeConnection(StringTransport())
+        self.protocols.append(protocol)
+        return protocol
+
+
+
+class HTTPConnectionPoolLimitsTests(TestCase, FakeReactorAndConnectMixin):
+    """
+    Tests for the limits, pre-warming and statistics of
+    L{HTTPConnectionPool}.
+    """
+    def setUp(self):
+        self.fakeReactor = self.createReactor()
+        self.pool = HTTPConnectionPool(self.fakeReactor)
+        self.pool.retryAutomatically = False
+        self.endpoint = RecordingEndpoint()
+        self.key = ("http", b"example.com", 80)
+
+
+    def test_maxActivePerHostWaits(self):
+        """
+        Once C{maxActivePerHost} connections for a key are in use,
+        L{HTTPConnectionPool.getConnection} returns a L{Deferred} which fires
+        when one is returned to the pool.
+        """
+        self.pool.maxActivePerHost = 1
+        first = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        d = self.pool.getConnection(self.key, BadEndpoint())
+        self.assertNoResult(d)
+        self.assertEqual(self.pool.statistics.waits, 1)
+
+        first._quiescentCallback(first)
+        self.assertIs(self.successResultOf(d), first)
+        self.assertEqual(len(self.endpoint.protocols), 1)
+
+
+    def test_maxActivePerHostIsPerKey(self):
+        """
+        C{maxActivePerHost} limits the connections for each key separately.
+        """
+        self.pool.maxActivePerHost = 1
+        self.pool.getConnection(self.key, self.endpoint)
+        d = self.pool.getConnection(
+            ("http", b"example.org", 80), self.endpoint)
+        self.successResultOf(d)
+        self.assertEqual(self.pool.statistics.waits, 0)
+
+
+    def test_waitingFirstComeFirstServed(self):
+        """
+        Requests waiting for a connection are given one in the order they
+        were made, and new requests queue behind them.
+        """
+        self.pool.maxActivePerHost = 1
+        first = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        results = []
+        for i in range(3):
+            self.pool.getConnection(self.key, self.endpoint).addCallback(
+                lambda connection, i=i: results.append((i, connection)))
+
+        first._quiescentCallback(first)
+        self.assertEqual(results, [(0, first)])
+        first._quiescentCallback(first)
+        self.assertEqual(results, [(0, first), (1, first)])
+
+
+    def test_cancelWaiting(self):
+        """
+        Cancelling the L{Deferred} of a waiting request removes it from the
+        queue.
+        """
+        self.pool.maxActivePerHost = 1
+        first = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        d = self.pool.getConnection(self.key, self.endpoint)
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+
+        first._quiescentCallback(first)
+        self.assertEqual(self.pool._waiting, {})
+        self.assertEqual(self.pool._connections[self.key], [first])
+
+
+    def test_cancelWhileConnecting(self):
+        """
+        If the L{Deferred} of a waiting request is cancelled after a new
+        connection was started for it, the connection is cached once it has
+        been established.
+        """
+        self.pool.maxActivePerHost = 1
+        pending = []
+        self.endpoint.pending = pending
+        first = self.pool.getConnection(self.key, self.endpoint)
+        d = self.pool.getConnection(self.key, self.endpoint)
+        pending.pop(0).errback(Failure(ConnectionRefusedError()))
+        self.failureResultOf(first, ConnectionRefusedError)
+
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        pending.pop(0).callback(None)
+        self.assertEqual(self.pool._connections[self.key],
+                         [self.endpoint.protocols[0]._protocol])
+        self.assertEqual(self.pool._active, {})
+
+
+    def test_connectionLostReleases(self):
+        """
+        A connection which is lost while in use no longer counts towards
+        C{maxActivePerHost}.
+        """
+        self.pool.maxActivePerHost = 1
+        self.pool.getConnection(self.key, self.endpoint)
+        d = self.pool.getConnection(self.key, self.endpoint)
+
+        self.endpoint.protocols[0].connectionLost(
+            Failure(ConnectionDone()))
+        connection = self.successResultOf(d)
+        self.assertIs(connection, self.endpoint.protocols[1]._protocol)
+
+
+    def test_connectFailureReleases(self):
+        """
+        A failed connection attempt no longer counts towards
+        C{maxActivePerHost}.
+        """
+        self.pool.maxActivePerHost = 1
+        pending = []
+        self.endpoint.pending = pending
+        first = self.pool.getConnection(self.key, self.endpoint)
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.assertEqual(len(pending), 1)
+
+        pending.pop(0).errback(Failure(ConnectionRefusedError()))
+        self.failureResultOf(first, ConnectionRefusedError)
+        self.assertEqual(len(pending), 1)
+        pending.pop(0).callback(None)
+        self.successResultOf(d)
+        self.assertEqual(self.pool.statistics.connectFailures, 1)
+        self.assertEqual(self.pool.statistics.connects, 1)
+
+
+    def test_retryWaits(self):
+        """
+        A connection for retrying a request is subject to
+        C{maxActivePerHost}, but is supplied ahead of the requests already
+        waiting for one.
+        """
+        self.pool.retryAutomatically = True
+        self.pool.maxActivePerHost = 1
+        cached = StubHTTPProtocol()
+        cached.makeConnection(StringTransport())
+        self.pool._putConnection(self.key, cached)
+        connection = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        waiting = self.pool.getConnection(self.key, self.endpoint)
+
+        retry = connection._newConnection()
+        self.assertNoResult(retry)
+        self.assertEqual(self.endpoint.protocols, [])
+        self.assertEqual(self.pool.statistics.waits, 2)
+
+        self.pool._putConnection(self.key, cached)
+        self.assertIs(self.successResultOf(retry)._clientProtocol, cached)
+        self.assertNoResult(waiting)
+
+
+    def test_closeCachedConnectionsFailsWaiting(self):
+        """
+        L{HTTPConnectionPool.closeCachedConnections} fails the requests
+        waiting for a connection, and connections in use or being
+        established no longer count towards C{maxActivePerHost}.
+        """
+        self.pool.maxActivePerHost = 1
+        pending = []
+        self.endpoint.pending = pending
+        self.pool.getConnection(self.key, self.endpoint)
+        self.pool.prewarm(self.key, self.endpoint)
+        d = self.pool.getConnection(self.key, self.endpoint)
+
+        self.pool.closeCachedConnections()
+        self.failureResultOf(d, ConnectionAborted)
+        self.assertEqual(self.pool._waiting, {})
+        self.assertEqual(self.pool._active, {})
+        self.assertEqual(self.pool._warming, {})
+
+        for connecting in pending[:]:
+            connecting.callback(None)
+        self.assertEqual(self.pool._active, {})
+        self.assertEqual(self.pool._warming, {})
+        self.assertEqual(self.pool._connections.get(self.key, []), [])
+        self.assertTrue(self.endpoint.protocols[1].transport.disconnecting)
+
+
+    def test_lastInFirstOut(self):
+        """
+        The most recently cached connection is reused first.
+        """
+        connections = [StubHTTPProtocol(), StubHTTPProtocol()]
+        for connection in connections:
+            connection.makeConnection(StringTransport())
+            self.pool._putConnection(self.key, connection)
+        self.assertIs(
+            self.successResultOf(
+                self.pool.getConnection(self.key, BadEndpoint())),
+            connections[1])
+
+
+    def test_idleConnectionLost(self):
+        """
+        A cached connection which is lost is removed from the cache.
+        """
+        connection = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        connection._quiescentCallback(connection)
+        self.endpoint.protocols[0].connectionLost(Failure(ConnectionDone()))
+
+        self.assertEqual(self.pool._connections[self.key], [])
+        self.assertEqual(self.pool._timeouts, {})
+        self.assertEqual(self.pool.statistics.evictions, 1)
+
+
+    def test_maxConnectionAgeReturned(self):
+        """
+        A connection older than C{maxConnectionAge} is closed rather than
+        cached when it is returned to the pool.
+        """
+        self.pool.maxConnectionAge = 60
+        connection = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        self.fakeReactor.advance(60)
+        connection._quiescentCallback(connection)
+
+        self.assertEqual(self.pool._connections.get(self.key, []), [])
+        self.assertTrue(connection.transport.disconnecting)
+
+
+    def test_maxConnectionAgeCached(self):
+        """
+        A cached connection older than C{maxConnectionAge} is closed rather
+        than reused.
+        """
+        self.pool.maxConnectionAge = 60
+        old = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        old._quiescentCallback(old)
+        self.fakeReactor.advance(60)
+
+        connection = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        self.assertIsNot(connection, old)
+        self.assertTrue(old.transport.disconnecting)
+        self.assertEqual(self.pool.statistics.evictions, 1)
+
+
+    def test_prewarm(self):
+        """
+        L{HTTPConnectionPool.prewarm} establishes connections and caches them.
+        """
+        d = self.pool.prewarm(self.key, self.endpoint, 2)
+        self.assertIsNone(self.successResultOf(d))
+        self.assertEqual(
+            self.pool._connections[self.key],
+            [p._protocol for p in self.endpoint.protocols])
+
+        self.successResultOf(self.pool.getConnection(self.key, BadEndpoint()))
+
+
+    def test_prewarmCountsCached(self):
+        """
+        L{HTTPConnectionPool.prewarm} counts connections already cached, and
+        does not exceed C{maxPersistentPerHost}.
+        """
+        self.pool.prewarm(self.key, self.endpoint, 1)
+        self.pool.prewarm(self.key, self.endpoint, 5)
+        self.assertEqual(len(self.endpoint.protocols), 2)
+
+
+    def test_prewarmFailure(self):
+        """
+        The L{Deferred} returned by L{HTTPConnectionPool.prewarm} fails if a
+        connection cannot be established.
+        """
+        pending = []
+        self.endpoint.pending = pending
+        d = self.pool.prewarm(self.key, self.endpoint)
+        pending[0].errback(Failure(ConnectionRefusedError()))
+        self.failureResultOf(d, ConnectionRefusedError)
+        self.assertEqual(self.pool._warming, {})
+
+
+    def test_prewarmNotPersistent(self):
+        """
+        L{HTTPConnectionPool.prewarm} does nothing if connections are not
+        persistent.
+        """
+        self.pool.persistent = False
+        self.successResultOf(self.pool.prewarm(self.key, BadEndpoint()))
+
+
+    def test_minIdlePerHost(self):
+        """
+        With C{minIdlePerHost} set, connections taken from the pool or lost
+        are replaced in the background.
+        """
+        self.pool.minIdlePerHost = 1
+        connection = self.successResultOf(
+            self.pool.getConnection(self.key, self.endpoint))
+        self.assertEqual(len(self.endpoint.protocols), 2)
+        self.assertEqual(len(self.pool._connections[self.key]), 1)
+
+        idle = self.pool._connections[self.key][0]
+        self.endpoint.protocols[1].connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(len(self.endpoint.protocols), 3)
+        self.assertNotIn(idle, self.pool._connections[self.key])
+        self.assertNotIn(connection, self.pool._connections[self.key])
+
+
+    def test_statistics(self):
+        """
+        L{HTTPConnectionPool.statistics} counts cache hits and misses and the
+        time taken to connect.
+        """
+        pending = []
+        self.endpoint.pending = pending
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.fakeReactor.advance(2)
+        pending.pop().callback(None)
+        connection = self.successResultOf(d)
+        connection._quiescentCallback(connection)
+        self.pool.getConnection(self.key, self.endpoint)
+
+        statistics = self.pool.statistics
+        self.assertEqual((statistics.hits, statistics.misses), (1, 1))
+        self.assertEqual(statistics.connects, 1)
+        self.assertEqual(statistics.totalConnectTime, 2)
+        self.assertEqual(statistics.maxConnectTime, 2)
+        self.assertEqual(statistics.averageConnectTime, 2)
+
+
+    def test_statisticsInitial(self):
+        """
+        L{HTTPConnectionPoolStatistics.averageConnectTime} is L{None} before
+        any connection has been established.
+        """
+        self.assertIsNone(self.pool.statistics.averageConnectTime)
+
+
+
 class AgentTestsMixin(object):
     """
     Tests for any L{IAgent} implementation.
@@ -1477,6 +1854,26 @@ class AgentHTTPSTests(TestCase, FakeReactorAndConnectMixin,
         self.assertIs(trustRoot.context, connection.get_context())
 
 
+    def test_sessionCache(self):
+        """
+        The L{IOpenSSLClientConnectionCreator} providers returned by
+        L{BrowserLikePolicyForHTTPS.creatorForNetloc} all resume sessions
+        from the L{ClientTLSSessionCache} given to the policy, and resume none
+        if it was not given one.
+        """
+        policy = BrowserLikePolicyForHTTPS()
+        creator = policy.creatorForNetloc(b"example.com", 443)
+        self.assertIsNone(policy.sessionCache)
+        self.assertIsNone(creator._sessionCache)
+
+        sessionCache = ClientTLSSessionCache()
+        policy = BrowserLikePolicyForHTTPS(sessionCache=sessionCache)
+        first = policy.creatorForNetloc(b"example.com", 443)
+        second = policy.creatorForNetloc(b"example.org", 443)
+        self.assertIs(sessionCache, first._sessionCache)
+        self.assertIs(sessionCache, second._sessionCache)
+
+
     def integrationTest(self, hostName, expectedAddress, addressType):
         """
         Wrap L{AgentTestsMixin.integrationTest} with TLS.
@@ -1812,6 +2209,7 @@ class HTTPConnectionPoolRetryTests(TestCase, FakeReactorAndConnectMixin):
         # Override the pool's _newConnection:
         def newConnection(k, e):
             newConnections.append((k, e))
+            return Deferred()
         pool._newConnection = newConnection
 
         # Add a connection to the cache:
@@ -2929,6 +3327,7 @@ class DummyResponse(object):
 
     code = 200
     phrase = b"OK"
+    length = UNKNOWN_LENGTH
 
     def __init__(self, headers=None, transportFactory=AbortableStringTransport):
         """
@@ -3067,3 +3466,359 @@ class ReadBodyTests(TestCase):
 
         warnings = self.flushWarnings()
         self.assertEqual(len(warnings), 0)
+
+
+    def test_maxSize(self):
+        """
+        L{client.readBody} accepts a body of up to C{maxSize} bytes.
+        """
+        response = DummyResponse()
+        d = client.readBody(response, maxSize=11)
+        response.protocol.dataReceived(b"first")
+        response.protocol.dataReceived(b"second")
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual(self.successResultOf(d), b"firstsecond")
+
+
+    def test_maxSizeExceeded(self):
+        """
+        If more than C{maxSize} bytes of the body arrive, the connection is
+        aborted and the L{Deferred} returned by L{client.readBody} fails with
+        L{client.ResponseBodyTooLarge}.  The end of the body is then ignored.
+        """
+        response = DummyResponse()
+        d = client.readBody(response, maxSize=10)
+        response.protocol.dataReceived(b"first")
+        self.assertNoResult(d)
+        response.protocol.dataReceived(b"second")
+        self.assertTrue(response.transport.aborting)
+        failure = self.failureResultOf(d, client.ResponseBodyTooLarge)
+        self.assertEqual(
+            (failure.value.status, failure.value.message,
+             failure.value.maxSize),
+            (b"200", b"OK", 10))
+        response.protocol.dataReceived(b"third")
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+
+
+    def test_maxSizeExceededWithoutAbort(self):
+        """
+        If the transport a body too large for L{client.readBody} arrives over
+        cannot abort the connection, it is told to stop producing instead.
+        """
+        response = DummyResponse(transportFactory=StringTransport)
+        response.transport.abortConnection = None
+        d = self.assertWarns(
+            DeprecationWarning,
+            'Using readBody with a transport that does not have an '
+            'abortConnection method',
+            __file__,
+            lambda: client.readBody(response, maxSize=1))
+        response.protocol.dataReceived(b"first")
+        self.failureResultOf(d, client.ResponseBodyTooLarge)
+        self.assertEqual(response.transport.producerState, "stopped")
+
+
+    def test_declaredLengthTooLarge(self):
+        """
+        If a response declares a body longer than C{maxSize}, the L{Deferred}
+        returned by L{client.readBody} fails with
+        L{client.ResponseBodyTooLarge} straight away, and the connection is
+        aborted without any of the body being read.
+        """
+        response = DummyResponse()
+        response.length = 11
+        d = client.readBody(response, maxSize=10)
+        self.failureResultOf(d, client.ResponseBodyTooLarge)
+        self.assertTrue(response.transport.aborting)
+
+
+
+class DestinationFile(object):
+    """
+    A file-like object to write a response body to.
+
+    @ivar written: The bytes written.
+    """
+    def __init__(self):
+        self.written = []
+
+
+    def write(self, data):
+        self.written.append(data)
+
+
+
+class WriteBodyTests(TestCase):
+    """
+    Tests for L{client.writeBody}.
+    """
+    def test_file(self):
+        """
+        L{client.writeBody} writes the body of the L{IResponse} passed to it
+        to a file-like object as it arrives, and returns a L{Deferred} which
+        fires with the number of bytes written.
+        """
+        response = DummyResponse()
+        destination = DestinationFile()
+        d = client.writeBody(response, destination)
+        response.protocol.dataReceived(b"first")
+        self.assertEqual(destination.written, [b"first"])
+        response.protocol.dataReceived(b"second")
+        self.assertEqual(destination.written, [b"first", b"second"])
+        self.assertNoResult(d)
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual(self.successResultOf(d), 11)
+
+
+    def test_consumer(self):
+        """
+        The transport the body arrives over is registered with an
+        L{IConsumer} destination as a streaming producer until the body has
+        been completely received.
+        """
+        response = DummyResponse()
+        destination = StringTransport()
+        d = client.writeBody(response, destination)
+        self.assertIs(destination.producer, response.transport)
+        self.assertTrue(destination.streaming)
+        response.protocol.dataReceived(b"first")
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual(destination.value(), b"first")
+        self.assertIsNone(destination.producer)
+        self.assertEqual(self.successResultOf(d), 5)
+
+
+    def test_withPotentialDataLoss(self):
+        """
+        If the full body is not definitely received, the L{Deferred} returned
+        by L{client.writeBody} fails with L{client.PartialDownloadError}.
+        """
+        response = DummyResponse()
+        d = client.writeBody(response, DestinationFile())
+        response.protocol.connectionLost(Failure(PotentialDataLoss()))
+        self.failureResultOf(d, client.PartialDownloadError)
+
+
+    def test_otherErrors(self):
+        """
+        If the body is not completely received for any other reason, the
+        L{Deferred} returned by L{client.writeBody} fails with that reason.
+        """
+        response = DummyResponse()
+        destination = StringTransport()
+        d = client.writeBody(response, destination)
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+        self.failureResultOf(d, ConnectionLost)
+        self.assertIsNone(destination.producer)
+
+
+    def test_maxSizeExceeded(self):
+        """
+        If more than C{maxSize} bytes of the body arrive, none of them are
+        written, the connection is aborted and the L{Deferred} returned by
+        L{client.writeBody} fails with L{client.ResponseBodyTooLarge}.
+        """
+        response = DummyResponse()
+        destination = StringTransport()
+        d = client.writeBody(response, destination, maxSize=10)
+        response.protocol.dataReceived(b"first")
+        response.protocol.dataReceived(b"second")
+        self.assertTrue(response.transport.aborting)
+        self.assertEqual(destination.value(), b"first")
+        self.assertIsNone(destination.producer)
+        self.failureResultOf(d, client.ResponseBodyTooLarge)
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+
+
+    def test_declaredLengthTooLarge(self):
+        """
+        If a response declares a body longer than C{maxSize}, the L{Deferred}
+        returned by L{client.writeBody} fails straight away and the
+        connection is aborted.
+        """
+        response = DummyResponse()
+        response.length = 11
+        destination = DestinationFile()
+        d = client.writeBody(response, destination, maxSize=10)
+        self.failureResultOf(d, client.ResponseBodyTooLarge)
+        self.assertTrue(response.transport.aborting)
+        self.assertEqual(destination.written, [])
+
+
+    def test_cancel(self):
+        """
+        When cancelling the L{Deferred} returned by L{client.writeBody}, the
+        connection is aborted and nothing more is written.
+        """
+        response = DummyResponse()
+        destination = StringTransport()
+        d = client.writeBody(response, destination)
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertTrue(response.transport.aborting)
+        self.assertIsNone(destination.producer)
+        response.protocol.dataReceived(b"first")
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+        self.assertEqual(destination.value(), b"")
+
+
+
+class StreamBodyTests(TestCase):
+    """
+    Tests for L{client.streamBody}.
+    """
+    def test_read(self):
+        """
+        C{read} returns a L{Deferred} which fires with the next part of the
+        body as it arrives, and with C{b''} once all of it has been read.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        response.protocol.dataReceived(b"first")
+        self.assertEqual(self.successResultOf(stream.read()), b"first")
+        d = stream.read()
+        self.assertNoResult(d)
+        response.protocol.dataReceived(b"second")
+        self.assertEqual(self.successResultOf(d), b"second")
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual(self.successResultOf(stream.read()), b"")
+        self.assertEqual(self.successResultOf(stream.read()), b"")
+
+
+    def test_readsInOrder(self):
+        """
+        Reads started before earlier ones have completed complete in the
+        order they were started.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        reads = [stream.read(), stream.readLine(), stream.read()]
+        response.protocol.dataReceived(b"first")
+        response.protocol.dataReceived(b"sec")
+        response.protocol.dataReceived(b"ond\nthird")
+        self.assertEqual([self.successResultOf(d) for d in reads],
+                         [b"first", b"second\n", b"third"])
+
+
+    def test_readLine(self):
+        """
+        C{readLine} returns a L{Deferred} which fires with the next complete
+        line of the body, however it was split up, followed by any last
+        unterminated line, and then with C{b''}.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        response.protocol.dataReceived(b'{"a": 1}\n{"b"')
+        self.assertEqual(self.successResultOf(stream.readLine()),
+                         b'{"a": 1}\n')
+        d = stream.readLine()
+        response.protocol.dataReceived(b': ')
+        self.assertNoResult(d)
+        response.protocol.dataReceived(b'2}\n\n{"c": 3}')
+        self.assertEqual(self.successResultOf(d), b'{"b": 2}\n')
+        self.assertEqual(self.successResultOf(stream.readLine()), b'\n')
+        d = stream.readLine()
+        self.assertNoResult(d)
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual(self.successResultOf(d), b'{"c": 3}')
+        self.assertEqual(self.successResultOf(stream.readLine()), b'')
+
+
+    def test_flowControl(self):
+        """
+        The transport the body arrives over is paused while more than
+        C{bufferSize} bytes of it are unread, and resumed once no more than
+        half that many are.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response, bufferSize=10)
+        response.protocol.dataReceived(b"first")
+        response.protocol.dataReceived(b"second")
+        self.assertEqual(response.transport.producerState, "paused")
+        stream.read()
+        self.assertEqual(response.transport.producerState, "paused")
+        stream.read()
+        self.assertEqual(response.transport.producerState, "producing")
+
+
+    def test_errorAfterBufferedData(self):
+        """
+        If the body is not completely received, the parts of it which were
+        are read first, and then reads fail with the reason.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        response.protocol.dataReceived(b"first")
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+        self.assertEqual(self.successResultOf(stream.read()), b"first")
+        self.failureResultOf(stream.read(), ConnectionLost)
+        self.failureResultOf(stream.readLine(), ConnectionLost)
+
+
+    def test_withPotentialDataLoss(self):
+        """
+        If the full body is not definitely received, reads made after it has
+        been read fail with L{client.PartialDownloadError}.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        response.protocol.connectionLost(Failure(PotentialDataLoss()))
+        self.failureResultOf(stream.read(), client.PartialDownloadError)
+
+
+    def test_cancel(self):
+        """
+        Cancelling a read aborts the connection, and leaves later reads
+        waiting.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        first = stream.read()
+        second = stream.read()
+        first.cancel()
+        self.failureResultOf(first, CancelledError)
+        self.assertTrue(response.transport.aborting)
+        response.protocol.dataReceived(b"first")
+        self.assertEqual(self.successResultOf(second), b"first")
+
+
+    def test_asyncIteration(self):
+        """
+        The stream is an asynchronous iterator over the parts of the body,
+        whose end is signalled by L{StopAsyncIteration}.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        self.assertIs(stream.__aiter__(), stream)
+        response.protocol.dataReceived(b"first")
+        self.assertEqual(self.successResultOf(stream.__anext__()), b"first")
+        d = stream.__anext__()
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.failureResultOf(d, client._StopAsyncIteration)
+        if _PY3:
+            self.assertIs(client._StopAsyncIteration, StopAsyncIteration)
+
+
+    def test_asyncIterationFailed(self):
+        """
+        If the body could not be received, the iteration fails the same way
+        reads do.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+        self.failureResultOf(stream.__anext__(), ConnectionLost)
+
+
+    def test_emptyData(self):
+        """
+        Empty parts of the body are not mistaken for its end.
+        """
+        response = DummyResponse()
+        stream = client.streamBody(response)
+        d = stream.read()
+        response.protocol.dataReceived(b"")
+        self.assertNoResult(d)
+        response.protocol.dataReceived(b"first")
+        self.assertEqual(self.successResultOf(d), b"first")
@@ -14,19 +14,24 @@ from xml.etree.cElementTree import XML
 from collections import OrderedDict
 
 from zope.interface import implementer
+from zope.interface.verify import verifyObject
 
 from twisted.python.compat import _PY35PLUS
 
 from twisted.trial.unittest import TestCase
 from twisted.test.testutils import XMLAssertionMixin
 
-from twisted.internet.defer import passthru, succeed, gatherResults
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.defer import Deferred, passthru, succeed, gatherResults
 
+from twisted.web import _flatten as _flatten_module
 from twisted.web.iweb import IRenderable
 from twisted.web.error import UnfilledSlot, UnsupportedType, FlattenerError
 
 from twisted.web.template import tags, Tag, Comment, CDATA, CharRef, slot
 from twisted.web.template import Element, renderer, TagLoader, flattenString
+from twisted.web.template import flatten
+from twisted.web._flatten import _flatten, _FlattenerProducer
 
 from twisted.web.test._util import FlattenTestCase
 
@@ -451,6 +456,125 @@ class SerializationTests(FlattenTestCase, XMLAssertionMixin):
 HERE = (lambda: None).__code__.co_filename
 
 
+class BufferingTests(TestCase):
+    """
+    Tests for the coalescing of small pieces of output into larger writes by
+    L{flatten}.
+    """
+    def setUp(self):
+        self.patch(_flatten_module, 'BUFFER_SIZE', 8)
+
+
+    def test_smallFragmentsCoalesced(self):
+        """
+        Output smaller than L{BUFFER_SIZE} is passed to C{write} in a single
+        call once flattening is complete.
+        """
+        written = []
+        flatten(None, [u'a', b'b', tags.br()], written.append)
+        self.assertEqual(written, [b'ab<br />'])
+
+
+    def test_bufferSizeExceeded(self):
+        """
+        Output is passed to C{write} as soon as at least L{BUFFER_SIZE} bytes
+        have accumulated.
+        """
+        written = []
+        flatten(None, [b'abcde', b'fghij', b'k'], written.append)
+        self.assertEqual(written, [b'abcdefghij', b'k'])
+
+
+    def test_flushedBeforeDeferred(self):
+        """
+        Output accumulated before a L{Deferred} is encountered is written
+        before waiting on that L{Deferred}.
+        """
+        written = []
+        d = Deferred()
+        flatten(None, [b'a', d, b'c'], written.append)
+        self.assertEqual(written, [b'a'])
+        d.callback(b'b')
+        self.assertEqual(written, [b'a', b'bc'])
+
+
+    def test_flushedBeforeError(self):
+        """
+        Output accumulated before an exception is raised while flattening is
+        written before the L{Deferred} returned by L{flatten} fails.
+        """
+        def broken():
+            yield b'a'
+            raise RuntimeError("broken")
+        written = []
+        d = flatten(None, broken(), written.append)
+        self.assertEqual(written, [b'a'])
+        self.failureResultOf(d, FlattenerError)
+
+
+
+class FlattenerProducerTests(TestCase):
+    """
+    Tests for pausing and resuming L{_flatten} with a L{_FlattenerProducer}.
+    """
+    def setUp(self):
+        self.patch(_flatten_module, 'BUFFER_SIZE', 1)
+        self.producer = _FlattenerProducer()
+        self.written = []
+
+
+    def test_interface(self):
+        """
+        L{_FlattenerProducer} provides L{IPushProducer}.
+        """
+        self.assertTrue(verifyObject(IPushProducer, self.producer))
+
+
+    def test_pauseAndResume(self):
+        """
+        Once L{_FlattenerProducer.pauseProducing} is called no more output is
+        written until L{_FlattenerProducer.resumeProducing} is called.
+        """
+        def write(data):
+            self.written.append(data)
+            self.producer.pauseProducing()
+        d = _flatten(None, [b'a', b'b', b'c'], write, self.producer)
+        self.assertEqual(self.written, [b'a'])
+        self.assertNoResult(d)
+        self.producer.resumeProducing()
+        self.assertEqual(self.written, [b'a', b'b'])
+        self.producer.resumeProducing()
+        self.producer.resumeProducing()
+        self.assertEqual(self.written, [b'a', b'b', b'c'])
+        self.assertIsNone(self.successResultOf(d))
+
+
+    def test_resumeUnpaused(self):
+        """
+        L{_FlattenerProducer.resumeProducing} has no effect if flattening is
+        not paused.
+        """
+        self.producer.resumeProducing()
+        d = _flatten(None, [b'a', b'b'], self.written.append, self.producer)
+        self.assertEqual(self.written, [b'a', b'b'])
+        self.assertIsNone(self.successResultOf(d))
+
+
+    def test_stop(self):
+        """
+        After L{_FlattenerProducer.stopProducing} is called no more output is
+        written and the L{Deferred} returned by L{_flatten} fires.
+        """
+        def write(data):
+            self.written.append(data)
+            self.producer.pauseProducing()
+        d = _flatten(None, [b'a', b'b'], write, self.producer)
+        self.producer.stopProducing()
+        self.assertEqual(self.written, [b'a'])
+        self.assertIsNone(self.successResultOf(d))
+
+
+
 class FlattenerErrorTests(TestCase):
     """
     Tests for L{FlattenerError}.
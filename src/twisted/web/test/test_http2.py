@@ -2857,3 +2857,233 @@ class HTTP2TimeoutTests(unittest.TestCase, HTTP2TestHelpers):
         # transports, including TCP and TLS. We don't have anything we can
         # assert on here: this just must not explode.
         conn.connectionLost(error.ConnectionDone)
+
+
+
+class H2TuningTests(unittest.TestCase, HTTP2TestHelpers):
+    """
+    Tests for the HTTP/2 flow control and batching parameters of
+    L{H2Connection}, and their configuration through
+    L{http.HTTPFactory}.
+    """
+    getRequestHeaders = [
+        (b':method', b'GET'),
+        (b':authority', b'localhost'),
+        (b':path', b'/'),
+        (b':scheme', b'https'),
+    ]
+
+
+    postRequestHeaders = [
+        (b':method', b'POST'),
+        (b':authority', b'localhost'),
+        (b':path', b'/'),
+        (b':scheme', b'https'),
+    ]
+
+
+    def connect(self, **settings):
+        """
+        Connect a new L{H2Connection}, using a L{task.Clock}, to a
+        L{StringTransport}, with a factory which has the given HTTP/2
+        settings.
+
+        @return: A 3-L{tuple} of the clock, the connection and the transport.
+        """
+        factory = http.HTTPFactory()
+        for name, value in settings.items():
+            setattr(factory, name, value)
+        reactor = task.Clock()
+        conn = H2Connection(reactor)
+        conn.factory = factory
+        conn.requestFactory = DummyHTTPHandlerProxy
+        transport = StringTransport()
+        conn.makeConnection(transport)
+        return reactor, conn, transport
+
+
+    def test_defaultSettings(self):
+        """
+        By default, the only SETTINGS L{H2Connection} sends are those in its
+        initial SETTINGS frame, and it does not open the connection flow
+        control window.
+        """
+        reactor, conn, transport = self.connect()
+        frames = framesFromBytes(transport.value())
+        self.assertEqual(len(frames), 1)
+        self.assertIsInstance(frames[0], hyperframe.frame.SettingsFrame)
+
+
+    def test_factorySettings(self):
+        """
+        L{H2Connection} sends the window sizes, concurrent stream limit and
+        frame size configured on its factory to the client, and opens its
+        connection flow control window to the configured size.
+        """
+        reactor, conn, transport = self.connect(
+            h2InitialWindowSize=2 ** 20,
+            h2MaxConcurrentStreams=10,
+            h2MaxFrameSize=2 ** 15,
+            h2ConnectionWindowSize=2 ** 22,
+        )
+        frames = framesFromBytes(transport.value())
+        self.assertEqual(len(frames), 3)
+        settingsFrame, windowUpdateFrame = frames[1:]
+
+        codes = h2.settings.SettingCodes
+        self.assertEqual(settingsFrame.settings, {
+            codes.INITIAL_WINDOW_SIZE: 2 ** 20,
+            codes.MAX_CONCURRENT_STREAMS: 10,
+            codes.MAX_FRAME_SIZE: 2 ** 15,
+        })
+        self.assertIsInstance(
+            windowUpdateFrame, hyperframe.frame.WindowUpdateFrame)
+        self.assertEqual(windowUpdateFrame.stream_id, 0)
+        self.assertEqual(windowUpdateFrame.window_increment, 2 ** 22 - 65535)
+        self.assertEqual(conn.conn.inbound_flow_control_window, 2 ** 22)
+
+
+    def test_dataBatchedAcrossStreams(self):
+        """
+        Each iteration of the data sending loop passes data frames for all
+        streams with data to send to the transport in one write.
+        """
+        reactor, conn, transport = self.connect()
+        f = FrameFactory()
+        requestBytes = f.clientConnectionPreface()
+        requestBytes += buildRequestBytes(self.getRequestHeaders, [], f)
+        requestBytes += buildRequestBytes(
+            self.getRequestHeaders, [], f, streamID=3)
+        conn.dataReceived(requestBytes)
+        transport.clear()
+
+        writes = []
+        transport.write = writes.append
+        reactor.advance(0)
+
+        dataFrames = [
+            frame for frame in framesFromBytes(writes[0])
+            if isinstance(frame, hyperframe.frame.DataFrame)
+            and frame.data
+        ]
+        self.assertEqual(
+            sorted(frame.stream_id for frame in dataFrames), [1, 3])
+
+
+    def sendUpload(self, conn, f, sizes):
+        """
+        Deliver data frames of the given sizes on stream 1 to C{conn}.
+        """
+        for size in sizes:
+            conn.dataReceived(
+                f.buildDataFrame(b'x' * size, streamID=1).serialize())
+
+
+    def startUpload(self, **settings):
+        """
+        Connect a new L{H2Connection} and start a POST request on stream 1,
+        sending one byte of its body.
+
+        @return: A 3-L{tuple} of the connection, the transport and the
+            L{FrameFactory} used to build the request.
+        """
+        reactor, conn, transport = self.connect(**settings)
+        f = FrameFactory()
+        conn.dataReceived(
+            f.clientConnectionPreface() +
+            f.buildSettingsFrame({}).serialize() +
+            f.buildHeadersFrame(self.postRequestHeaders).serialize())
+        self.sendUpload(conn, f, [1])
+        return conn, transport, f
+
+
+    def pingFrames(self, transport):
+        """
+        Return the PING frames written to C{transport}.
+        """
+        return [
+            frame for frame in framesFromBytes(transport.value())
+            if isinstance(frame, hyperframe.frame.PingFrame)
+        ]
+
+
+    def acknowledgePing(self, conn, f, ping):
+        """
+        Deliver the acknowledgement of C{ping} to C{conn}.
+        """
+        ack = hyperframe.frame.PingFrame(0)
+        ack.flags.add('ACK')
+        ack.opaque_data = ping.opaque_data
+        conn.dataReceived(ack.serialize())
+
+
+    def test_noWindowTuningByDefault(self):
+        """
+        Unless C{h2MaxWindowSize} is set, L{H2Connection} does not send PINGs
+        to measure the bandwidth-delay product of the connection.
+        """
+        conn, transport, f = self.startUpload()
+        self.assertEqual(self.pingFrames(transport), [])
+
+
+    def test_windowGrowsWithBandwidthDelayProduct(self):
+        """
+        If nearly a whole window of data arrives while a bandwidth-delay
+        product PING is outstanding, L{H2Connection} grows the connection and
+        stream flow control windows to twice the data received, and sends
+        another PING when more data arrives.
+        """
+        conn, transport, f = self.startUpload(h2MaxWindowSize=2 ** 20)
+        [ping] = self.pingFrames(transport)
+
+        self.sendUpload(conn, f, [12500] * 4)
+        transport.clear()
+        self.acknowledgePing(conn, f, ping)
+
+        frames = framesFromBytes(transport.value())
+        windowUpdates = [
+            frame for frame in frames
+            if isinstance(frame, hyperframe.frame.WindowUpdateFrame)
+            and frame.stream_id == 0
+        ]
+        settings = [
+            frame.settings for frame in frames
+            if isinstance(frame, hyperframe.frame.SettingsFrame)
+        ]
+        self.assertEqual(len(windowUpdates), 1)
+        self.assertEqual(conn.conn.inbound_flow_control_window, 100000)
+        self.assertEqual(
+            settings,
+            [{h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: 100000}])
+        self.assertEqual(conn._windowSize, 100000)
+
+        self.sendUpload(conn, f, [1])
+        self.assertEqual(len(self.pingFrames(transport)), 1)
+
+
+    def test_windowGrowthLimited(self):
+        """
+        The flow control windows are never grown beyond C{h2MaxWindowSize},
+        and no more PINGs are sent once they reach it.
+        """
+        conn, transport, f = self.startUpload(h2MaxWindowSize=80000)
+        [ping] = self.pingFrames(transport)
+        self.sendUpload(conn, f, [12500] * 4)
+        self.acknowledgePing(conn, f, ping)
+        self.assertEqual(conn._windowSize, 80000)
+
+        transport.clear()
+        self.sendUpload(conn, f, [1])
+        self.assertEqual(self.pingFrames(transport), [])
+
+
+    def test_windowUnchangedForSlowClients(self):
+        """
+        If much less than a window of data arrives while a bandwidth-delay
+        product PING is outstanding, the flow control windows are not grown.
+        """
+        conn, transport, f = self.startUpload(h2MaxWindowSize=2 ** 20)
+        [ping] = self.pingFrames(transport)
+        self.sendUpload(conn, f, [1000])
+        self.acknowledgePing(conn, f, ping)
+        self.assertEqual(conn._windowSize, 65535)
@@ -0,0 +1,835 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.web._http2client} and its use by
+L{twisted.web.client.HTTPConnectionPool}.
+"""
+
+from __future__ import absolute_import, division
+
+from zope.interface import implementer
+
+from twisted.internet.defer import CancelledError, Deferred, succeed
+from twisted.internet.interfaces import INegotiated
+from twisted.internet.protocol import Protocol
+from twisted.internet.task import Clock
+from twisted.python.failure import Failure
+from twisted.test.iosim import FakeTransport, connect
+from twisted.test.proto_helpers import StringTransport
+from twisted.trial.unittest import TestCase
+from twisted.web import client
+from twisted.web._newclient import (
+    ConnectionAborted, HTTP11ClientProtocol, Request, RequestGenerationFailed,
+    RequestNotSent, ResponseDone, ResponseFailed, ResponseNeverReceived)
+from twisted.web.http_headers import Headers
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.settings
+    from twisted.web._http2 import H2Connection
+    from twisted.web._http2client import H2ClientConnection
+except ImportError:
+    skipH2 = "HTTP/2 support not enabled"
+else:
+    skipH2 = None
+
+
+
+class BodyCollector(Protocol):
+    """
+    A protocol which collects a response body.
+
+    @ivar data: The body data received so far.
+
+    @ivar reason: The reason passed to C{connectionLost}, once called.
+    """
+    reason = None
+
+    def __init__(self):
+        self.data = []
+
+
+    def dataReceived(self, data):
+        self.data.append(data)
+
+
+    def connectionLost(self, reason):
+        self.reason = reason
+
+
+
+class BytesProducer(object):
+    """
+    A body producer which writes its data in one go and records whether it
+    was paused.
+
+    @ivar paused: Whether the consumer has paused the producer.
+    """
+    paused = False
+    stopped = False
+
+    def __init__(self, data):
+        self.data = data
+        self.length = len(data)
+
+
+    def startProducing(self, consumer):
+        consumer.write(self.data)
+        return succeed(None)
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+
+
+    def stopProducing(self):
+        self.stopped = True
+
+
+
+def makeRequest(method=b'GET', uri=b'/', headers=None, bodyProducer=None,
+                persistent=True):
+    """
+    Create a request for C{example.com}.
+    """
+    if headers is None:
+        headers = Headers()
+    headers.setRawHeaders(b'host', [b'example.com'])
+    return Request._construct(method, uri, headers, bodyProducer, persistent)
+
+
+
+class H2ClientConnectionTests(TestCase):
+    """
+    Tests for L{H2ClientConnection}, driven by a server-side h2 state machine.
+    """
+    skip = skipH2
+
+    def setUp(self):
+        self.quiescent = []
+        self.client, self.transport = self.connectClient()
+        self.server = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False,
+                                      header_encoding=None))
+        self.server.initiate_connection()
+        self.exchange()
+
+
+    def connectClient(self, **attributes):
+        """
+        Create an L{H2ClientConnection} connected to a L{StringTransport}.
+
+        @param attributes: Attributes to set on the connection before it is
+            connected.
+        """
+        connection = H2ClientConnection(self.quiescent.append)
+        for name, value in attributes.items():
+            setattr(connection, name, value)
+        transport = StringTransport()
+        connection.makeConnection(transport)
+        return connection, transport
+
+
+    def exchange(self):
+        """
+        Deliver data between the client and the server until neither has any
+        more to send.
+
+        @return: The events the server received.
+        @rtype: L{list}
+        """
+        events = []
+        while True:
+            toServer = self.transport.value()
+            self.transport.clear()
+            if toServer:
+                events.extend(self.server.receive_data(toServer))
+            toClient = self.server.data_to_send()
+            if toClient:
+                self.client.dataReceived(toClient)
+            if not toServer and not toClient:
+                return events
+
+
+    def respond(self, streamID, body=b'', status=b'200', end=True,
+                headers=()):
+        """
+        Send a response from the server.
+        """
+        self.server.send_headers(
+            streamID, [(b':status', status)] + list(headers),
+            end_stream=not body and end)
+        if body:
+            self.server.send_data(streamID, body, end_stream=end)
+        return self.exchange()
+
+
+    def test_request(self):
+        """
+        L{H2ClientConnection.request} sends the request on a new stream with
+        the I{Host} header as the C{:authority} and without connection-specific
+        headers, and fires with a L{Response} to which the stream's data is
+        delivered.
+        """
+        headers = Headers({b'connection': [b'close'], b'x-foo': [b'bar']})
+        d = self.client.request(makeRequest(headers=headers))
+        events = self.exchange()
+
+        [received] = [e for e in events
+                      if isinstance(e, h2.events.RequestReceived)]
+        self.assertEqual(received.headers, [
+            (b':method', b'GET'),
+            (b':scheme', b'https'),
+            (b':authority', b'example.com'),
+            (b':path', b'/'),
+            (b'x-foo', b'bar'),
+        ])
+
+        self.respond(1, b'hello', headers=[(b'content-length', b'5')])
+        response = self.successResultOf(d)
+        self.assertEqual(response.version, (b'HTTP', 2, 0))
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.phrase, b'OK')
+        self.assertEqual(response.length, 5)
+        self.assertEqual(response.headers.getRawHeaders(b'content-length'),
+                         [b'5'])
+        self.assertEqual(self.successResultOf(client.readBody(response)),
+                         b'hello')
+        self.assertEqual(self.quiescent, [self.client])
+        self.assertFalse(self.transport.disconnecting)
+
+
+    def test_concurrentRequests(self):
+        """
+        Concurrent requests are multiplexed on separate streams, and their
+        responses may arrive in any order.
+        """
+        first = self.client.request(makeRequest(uri=b'/1'))
+        second = self.client.request(makeRequest(uri=b'/2'))
+        self.exchange()
+
+        self.respond(3, b'two')
+        self.assertNoResult(first)
+        self.assertEqual(self.quiescent, [])
+        self.respond(1, b'one')
+
+        self.assertEqual(
+            self.successResultOf(client.readBody(self.successResultOf(first))),
+            b'one')
+        self.assertEqual(
+            self.successResultOf(
+                client.readBody(self.successResultOf(second))),
+            b'two')
+        self.assertEqual(self.quiescent, [self.client])
+
+
+    def test_queuedBeyondConcurrencyLimit(self):
+        """
+        Requests beyond the server's limit on concurrent streams are queued
+        until a stream closes.
+        """
+        self.server.update_settings(
+            {h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1})
+        self.exchange()
+
+        first = self.client.request(makeRequest())
+        second = self.client.request(makeRequest())
+        events = self.exchange()
+        self.assertEqual(
+            [e.stream_id for e in events
+             if isinstance(e, h2.events.RequestReceived)], [1])
+
+        events = self.respond(1)
+        self.successResultOf(first)
+        self.assertEqual(
+            [e.stream_id for e in events
+             if isinstance(e, h2.events.RequestReceived)], [3])
+        self.respond(3)
+        self.successResultOf(second)
+
+
+    def test_headResponseLength(self):
+        """
+        The length of the response to a I{HEAD} request is zero.
+        """
+        d = self.client.request(makeRequest(method=b'HEAD'))
+        self.exchange()
+        self.respond(1, headers=[(b'content-length', b'10')])
+        self.assertEqual(self.successResultOf(d).length, 0)
+
+
+    def test_pauseWithholdsWindow(self):
+        """
+        While the transport of a response is paused, the data received for it
+        is not acknowledged, so the server's send window for the stream is not
+        replenished until it is resumed.
+        """
+        self.client, self.transport = self.connectClient(
+            initialWindowSize=65535)
+        self.server = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False,
+                                      header_encoding=None))
+        self.server.initiate_connection()
+        self.exchange()
+
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, end=False)
+        response = self.successResultOf(d)
+        body = BodyCollector()
+        response.deliverBody(body)
+
+        body.transport.pauseProducing()
+        for i in range(4):
+            self.server.send_data(1, b'x' * 10000)
+        self.exchange()
+        self.assertEqual(b''.join(body.data), b'x' * 40000)
+        self.assertEqual(self.server.local_flow_control_window(1), 25535)
+
+        body.transport.resumeProducing()
+        self.exchange()
+        self.assertEqual(self.server.local_flow_control_window(1), 65535)
+
+
+    def test_windowWithheldUntilDeliverBody(self):
+        """
+        The data received for a response before a protocol is given its body
+        is not acknowledged until L{Response.deliverBody} is called.
+        """
+        self.client, self.transport = self.connectClient(
+            initialWindowSize=65535)
+        self.server = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False,
+                                      header_encoding=None))
+        self.server.initiate_connection()
+        self.exchange()
+
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'x' * 30000, end=False)
+        response = self.successResultOf(d)
+        self.assertEqual(self.server.local_flow_control_window(1), 35535)
+
+        body = BodyCollector()
+        response.deliverBody(body)
+        self.exchange()
+        self.assertEqual(b''.join(body.data), b'x' * 30000)
+        self.assertEqual(self.server.local_flow_control_window(1), 65535)
+
+
+    def test_bodyFinishedBeforeQuiescent(self):
+        """
+        The response body is finished before the connection is reported
+        quiescent.
+        """
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'x', end=False)
+        body = BodyCollector()
+        self.successResultOf(d).deliverBody(body)
+        finished = []
+        self.client._quiescentCallback = (
+            lambda connection: finished.append(body.reason is not None))
+        self.server.end_stream(1)
+        self.exchange()
+        self.assertEqual(finished, [True])
+
+
+    def test_stopProducing(self):
+        """
+        If the protocol receiving a response body stops its transport, the
+        stream is cancelled and the protocol is disconnected with
+        L{ResponseFailed} wrapping L{ConnectionAborted}.
+        """
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'partial', end=False)
+        body = BodyCollector()
+        self.successResultOf(d).deliverBody(body)
+
+        body.transport.stopProducing()
+        events = self.exchange()
+
+        [reset] = [e for e in events if isinstance(e, h2.events.StreamReset)]
+        self.assertEqual(reset.error_code, h2.errors.ErrorCodes.CANCEL)
+        body.reason.trap(ResponseFailed)
+        body.reason.value.reasons[0].trap(ConnectionAborted)
+        self.assertEqual(self.quiescent, [self.client])
+
+
+    def test_cancel(self):
+        """
+        Cancelling the L{Deferred} returned by L{H2ClientConnection.request}
+        resets the stream and fails the L{Deferred} with
+        L{ResponseNeverReceived} wrapping L{CancelledError}.
+        """
+        d = self.client.request(makeRequest())
+        self.exchange()
+        d.cancel()
+        events = self.exchange()
+
+        self.assertTrue(
+            [e for e in events if isinstance(e, h2.events.StreamReset)])
+        failure = self.failureResultOf(d, ResponseNeverReceived)
+        failure.value.reasons[0].trap(CancelledError)
+
+
+    def test_streamReset(self):
+        """
+        If the server resets a stream before responding, the request fails
+        with L{ResponseNeverReceived}.
+        """
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.server.reset_stream(1, h2.errors.ErrorCodes.REFUSED_STREAM)
+        self.exchange()
+
+        self.failureResultOf(d, ResponseNeverReceived)
+        self.assertEqual(self.quiescent, [self.client])
+
+
+    def test_streamResetDuringBody(self):
+        """
+        If the server resets a stream after responding, the protocol receiving
+        the body is disconnected with L{ResponseFailed}.
+        """
+        d = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'partial', end=False)
+        body = BodyCollector()
+        self.successResultOf(d).deliverBody(body)
+        self.server.reset_stream(1)
+        self.exchange()
+
+        body.reason.trap(ResponseFailed)
+
+
+    def test_goAway(self):
+        """
+        When the server sends I{GOAWAY}, requests in progress fail, no new
+        requests are accepted and the connection is closed.
+        """
+        first = self.client.request(makeRequest())
+        second = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'partial', end=False)
+        body = BodyCollector()
+        self.successResultOf(first).deliverBody(body)
+        self.server.close_connection(last_stream_id=1)
+        self.exchange()
+
+        body.reason.trap(ResponseFailed)
+        self.failureResultOf(second, ResponseNeverReceived)
+        self.assertFalse(self.client._canRequest())
+        self.failureResultOf(
+            self.client.request(makeRequest()), RequestNotSent)
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(self.quiescent, [])
+
+
+    def test_connectionLost(self):
+        """
+        When the connection is lost, requests awaiting a response fail with
+        L{ResponseNeverReceived} and protocols receiving response bodies are
+        disconnected with L{ResponseFailed}.
+        """
+        first = self.client.request(makeRequest())
+        second = self.client.request(makeRequest())
+        self.exchange()
+        self.respond(1, b'partial', end=False)
+        body = BodyCollector()
+        self.successResultOf(first).deliverBody(body)
+
+        self.client.connectionLost(Failure(ResponseDone()))
+
+        body.reason.trap(ResponseFailed)
+        self.failureResultOf(second, ResponseNeverReceived)
+        self.failureResultOf(
+            self.client.request(makeRequest()), RequestNotSent)
+
+
+    def test_abort(self):
+        """
+        L{H2ClientConnection.abort} closes the connection and returns a
+        L{Deferred} which fires once it has been lost, failing outstanding
+        requests with L{ConnectionAborted}.
+        """
+        request = self.client.request(makeRequest())
+        d = self.client.abort()
+        self.assertTrue(self.transport.disconnecting)
+        self.assertNoResult(d)
+
+        self.client.connectionLost(Failure(ResponseDone()))
+
+        self.successResultOf(d)
+        failure = self.failureResultOf(request, ResponseNeverReceived)
+        failure.value.reasons[0].trap(ConnectionAborted)
+        self.successResultOf(self.client.abort())
+
+
+    def test_nonPersistent(self):
+        """
+        Once a non-persistent request completes, the connection is closed.
+        """
+        d = self.client.request(makeRequest(persistent=False))
+        self.assertFalse(self.client._canRequest())
+        self.exchange()
+        self.respond(1)
+
+        self.successResultOf(d)
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(self.quiescent, [])
+
+
+    def test_missingHost(self):
+        """
+        A request without a I{Host} header fails with
+        L{RequestGenerationFailed}.
+        """
+        request = Request._construct(b'GET', b'/', Headers(), None)
+        self.failureResultOf(
+            self.client.request(request), RequestGenerationFailed)
+
+
+    def test_requestBody(self):
+        """
+        The request body is sent within the server's flow control window,
+        pausing the body producer until the window is reopened, and its length
+        is sent as I{Content-Length}.
+        """
+        data = b'x' * 100000
+        producer = BytesProducer(data)
+        d = self.client.request(makeRequest(
+            method=b'POST', bodyProducer=producer))
+        self.assertTrue(producer.paused)
+
+        received = []
+        ended = []
+        while not ended:
+            for event in self.exchange():
+                if isinstance(event, h2.events.RequestReceived):
+                    self.assertIn((b'content-length', b'100000'),
+                                  event.headers)
+                elif isinstance(event, h2.events.DataReceived):
+                    received.append(event.data)
+                    self.server.acknowledge_received_data(
+                        event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    ended.append(event)
+
+        self.assertEqual(b''.join(received), data)
+        self.assertFalse(producer.paused)
+        self.respond(1)
+        self.successResultOf(d)
+
+
+    def test_earlyResponseStopsBody(self):
+        """
+        If the server completes its response before the request body has been
+        sent, the body producer is stopped.
+        """
+        producer = BytesProducer(b'x' * 100000)
+        producer.startProducing = lambda consumer: (
+            consumer.write(producer.data), Deferred())[1]
+        d = self.client.request(makeRequest(
+            method=b'POST', bodyProducer=producer))
+        self.exchange()
+        self.respond(1, b'too large', status=b'413')
+
+        self.assertEqual(self.successResultOf(d).code, 413)
+        self.assertTrue(producer.stopped)
+        self.assertEqual(self.quiescent, [self.client])
+
+
+    def test_interoperability(self):
+        """
+        L{H2ClientConnection} can make requests to the HTTP/2 server in
+        L{twisted.web._http2}.
+        """
+        root = Resource()
+        leaf = Resource()
+        leaf.isLeaf = True
+        leaf.render_GET = lambda request: b'hello ' + request.uri
+        root.putChild(b'greeting', leaf)
+        site = Site(root)
+        clock = Clock()
+        server = H2Connection(clock)
+        server.site = site
+        server.factory = site
+        server.requestFactory = site.requestFactory
+        server.timeOut = None
+
+        clientConnection = H2ClientConnection()
+        pump = connect(server, FakeTransport(server, True),
+                       clientConnection, FakeTransport(clientConnection, False))
+
+        results = [clientConnection.request(
+            makeRequest(uri=b'/greeting/' + str(i).encode('ascii')))
+            for i in range(3)]
+        for i in range(10):
+            pump.pump()
+            clock.advance(0)
+
+        bodies = [client.readBody(self.successResultOf(d)) for d in results]
+        for i in range(10):
+            pump.pump()
+            clock.advance(0)
+        self.assertEqual([self.successResultOf(d) for d in bodies],
+                         [b'hello /greeting/0', b'hello /greeting/1',
+                          b'hello /greeting/2'])
+
+
+
+@implementer(INegotiated)
+class NegotiatedTransport(StringTransport):
+    """
+    A L{StringTransport} which claims to have negotiated a protocol.
+    """
+    negotiatedProtocol = None
+
+
+
+class NegotiatingEndpoint(object):
+    """
+    An endpoint which connects the protocols of the factories given to it to
+    L{NegotiatedTransport}s.
+
+    @ivar protocols: The protocols connected.
+    """
+    def __init__(self):
+        self.protocols = []
+
+
+    def connect(self, factory):
+        protocol = factory.buildProtocol(None)
+        protocol.makeConnection(NegotiatedTransport())
+        self.protocols.append(protocol)
+        return succeed(protocol)
+
+
+
+class HTTPConnectionPoolHTTP2Tests(TestCase):
+    """
+    Tests for the use of HTTP/2 by L{client.HTTPConnectionPool}.
+    """
+    skip = skipH2
+
+    def setUp(self):
+        self.clock = Clock()
+        self.pool = client.HTTPConnectionPool(self.clock)
+        self.endpoint = NegotiatingEndpoint()
+        self.key = (b'https', b'example.com', 443)
+
+
+    def negotiate(self, protocol):
+        """
+        Complete the TLS handshake of the most recent connection, with the
+        server selecting C{protocol}.
+        """
+        negotiator = self.endpoint.protocols[-1]
+        negotiator.transport.negotiatedProtocol = protocol
+        negotiator.handshakeCompleted()
+
+
+    def test_http2Shared(self):
+        """
+        If the server selects HTTP/2, the pool returns the same
+        L{H2ClientConnection} for every request with the same key, until it
+        can no longer be used.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.assertNoResult(d)
+        self.negotiate(b'h2')
+        connection = self.successResultOf(d)
+        self.assertIsInstance(connection, H2ClientConnection)
+
+        self.assertIs(
+            self.successResultOf(
+                self.pool.getConnection(self.key, self.endpoint)),
+            connection)
+        self.assertEqual(len(self.endpoint.protocols), 1)
+
+        connection.connectionLost(Failure(ResponseDone()))
+        self.pool.getConnection(self.key, self.endpoint)
+        self.assertEqual(len(self.endpoint.protocols), 2)
+
+
+    def test_http11Negotiated(self):
+        """
+        If the server does not select HTTP/2, the pool returns an
+        L{HTTP11ClientProtocol}.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(None)
+        self.assertIsInstance(self.successResultOf(d), HTTP11ClientProtocol)
+
+
+    def test_withoutTLS(self):
+        """
+        Connections which do not use TLS use HTTP/1.1 as soon as they are
+        made.
+        """
+        protocol = client._HTTPClientFactory(
+            lambda c: None, '').buildProtocol(None)
+        protocol.makeConnection(StringTransport())
+        self.assertIsInstance(
+            self.successResultOf(protocol.whenNegotiated()),
+            HTTP11ClientProtocol)
+
+
+    def test_connectionLostBeforeNegotiation(self):
+        """
+        If the connection is lost before the handshake completes, the
+        L{Deferred} returned by L{client.HTTPConnectionPool.getConnection}
+        fails with L{ResponseNeverReceived}.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.endpoint.protocols[-1].connectionLost(Failure(ResponseDone()))
+        self.failureResultOf(d, ResponseNeverReceived)
+
+
+    def test_idleTimeout(self):
+        """
+        A shared HTTP/2 connection with no requests in progress is closed
+        after C{cachedConnectionTimeout} seconds, unless it is used again.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(b'h2')
+        connection = self.successResultOf(d)
+        connection._quiescentCallback(connection)
+
+        self.clock.advance(self.pool.cachedConnectionTimeout - 1)
+        self.pool.getConnection(self.key, self.endpoint)
+        self.clock.advance(1)
+        self.assertFalse(connection.transport.disconnecting)
+
+        connection._quiescentCallback(connection)
+        self.clock.advance(self.pool.cachedConnectionTimeout)
+        self.assertTrue(connection.transport.disconnecting)
+        self.assertEqual(self.pool._http2Connections, {})
+
+
+    def test_duplicateConnection(self):
+        """
+        If two connections for the same key both negotiate HTTP/2, only the
+        first is shared, and the second is closed once idle.
+        """
+        first = self.pool.getConnection(self.key, self.endpoint)
+        second = self.pool.getConnection(self.key, self.endpoint)
+        self.endpoint.protocols[0].transport.negotiatedProtocol = b'h2'
+        self.endpoint.protocols[0].handshakeCompleted()
+        self.negotiate(b'h2')
+
+        shared = self.successResultOf(first)
+        extra = self.successResultOf(second)
+        self.assertIs(self.pool._http2Connections[self.key], shared)
+        self.assertFalse(extra._canRequest())
+
+
+    def test_notPersistent(self):
+        """
+        A pool which is not persistent does not share HTTP/2 connections.
+        """
+        self.pool.persistent = False
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(b'h2')
+        self.assertFalse(self.successResultOf(d)._canRequest())
+        self.assertEqual(self.pool._http2Connections, {})
+
+
+    def test_closeCachedConnections(self):
+        """
+        L{client.HTTPConnectionPool.closeCachedConnections} aborts shared
+        HTTP/2 connections.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(b'h2')
+        connection = self.successResultOf(d)
+
+        closed = self.pool.closeCachedConnections()
+        self.assertTrue(connection.transport.disconnecting)
+        connection.connectionLost(Failure(ResponseDone()))
+        self.successResultOf(closed)
+
+
+    def test_waitingShareNegotiated(self):
+        """
+        Requests waiting because of C{maxActivePerHost} share the connection
+        they were waiting on if it negotiates HTTP/2, which counts as a
+        single active connection.
+        """
+        self.pool.maxActivePerHost = 1
+        first = self.pool.getConnection(self.key, self.endpoint)
+        second = self.pool.getConnection(self.key, self.endpoint)
+        self.assertNoResult(second)
+        self.negotiate(b'h2')
+
+        connection = self.successResultOf(first)
+        self.assertIs(self.successResultOf(second), connection)
+        self.assertEqual(len(self.endpoint.protocols), 1)
+        self.assertEqual(self.pool._active, {self.key: 1})
+
+        connection._quiescentCallback(connection)
+        self.assertEqual(self.pool._active, {})
+
+
+    def test_lostWhileShared(self):
+        """
+        A shared HTTP/2 connection which is lost is no longer shared, and no
+        longer counts as active.
+        """
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(b'h2')
+        self.successResultOf(d)
+
+        self.endpoint.protocols[0].connectionLost(Failure(ResponseDone()))
+        self.assertEqual(self.pool._http2Connections, {})
+        self.assertEqual(self.pool._active, {})
+
+
+    def test_maxConnectionAge(self):
+        """
+        A shared HTTP/2 connection older than C{maxConnectionAge} is no longer
+        shared, and is closed once its requests are complete.
+        """
+        self.pool.maxConnectionAge = 60
+        d = self.pool.getConnection(self.key, self.endpoint)
+        self.negotiate(b'h2')
+        old = self.successResultOf(d)
+        self.clock.advance(60)
+
+        self.pool.getConnection(self.key, self.endpoint)
+        self.assertEqual(len(self.endpoint.protocols), 2)
+        self.assertFalse(old._canRequest())
+
+
+
+class BrowserLikePolicyForHTTPSTests(TestCase):
+    """
+    Tests for the C{acceptableProtocols} of
+    L{client.BrowserLikePolicyForHTTPS}.
+    """
+    def test_acceptableProtocols(self):
+        """
+        The application protocols given to L{client.BrowserLikePolicyForHTTPS}
+        are offered by the connection creators it returns.
+        """
+        calls = []
+        self.patch(client, "optionsForClientTLS",
+                   lambda *args, **kwargs: calls.append((args, kwargs)))
+        policy = client.BrowserLikePolicyForHTTPS(
+            acceptableProtocols=[b'h2', b'http/1.1'])
+        policy.creatorForNetloc(b'example.com', 443)
+        self.assertEqual(calls, [((u'example.com',), {
+            'trustRoot': None, 'acceptableProtocols': [b'h2', b'http/1.1'],
+            'sessionCache': None})])
@@ -311,6 +311,53 @@ class _HTTPParserTests(object):
             "a connection control header, but was.")
 
 
+    def test_headerBlockInOneChunk(self):
+        """
+        L{HTTPParser} parses a status line and header block received all at
+        once, including continuation lines, exactly as it parses them received
+        a line at a time.
+        """
+        status = []
+        header = []
+        protocol = HTTPParser()
+        protocol.statusReceived = status.append
+        protocol.headerReceived = lambda *args: header.append(args)
+        protocol.makeConnection(StringTransport())
+        protocol.dataReceived(self.sep.join([
+            b'HTTP/1.1 200 OK', b'X-Foo: bar', b' baz', b'\tquux',
+            b'X-Bar:  qux ', b'X-Foo: quux', b'', b'']))
+        self.assertEqual(status, [b'HTTP/1.1 200 OK'])
+        self.assertEqual(header, [(b'X-Foo', b'bar baz\tquux'),
+                                  (b'X-Bar', b'qux'),
+                                  (b'X-Foo', b'quux')])
+        self.assertEqual(protocol.state, BODY)
+
+
+    def test_headerBlockInPieces(self):
+        """
+        L{HTTPParser} parses a header block received in pieces which do not
+        end on line boundaries.
+        """
+        header, protocol = self._headerTestSetup()
+        protocol.dataReceived(b'X-Foo: ba')
+        protocol.dataReceived(b'r' + self.sep + b'X-Bar: b')
+        protocol.dataReceived(b'az' + self.sep + self.sep)
+        self.assertEqual(header, {b'X-Foo': b'bar', b'X-Bar': b'baz'})
+        self.assertEqual(protocol.state, BODY)
+
+
+    def test_headerLineTooLongInOneChunk(self):
+        """
+        If a line of a header block received all at once is longer than
+        C{MAX_LENGTH}, L{HTTPParser} closes the connection.
+        """
+        header, protocol = self._headerTestSetup()
+        protocol.dataReceived(
+            b'X-Foo: ' + b'x' * protocol.MAX_LENGTH + self.sep + self.sep)
+        self.assertEqual(header, {})
+        self.assertTrue(protocol.transport.disconnecting)
+
+
     def test_switchToBodyMode(self):
         """
         L{HTTPParser.switchToBodyMode} raises L{RuntimeError} if called more
@@ -922,6 +969,46 @@ class HTTPClientParserTests(TestCase):
         self.assertEqual(protocol.response.length, 123)
 
 
+    def test_responseInOneChunk(self):
+        """
+        When a whole response and the bytes following it are received at once,
+        L{HTTPClientParser} delivers the body to the response and passes the
+        extra bytes to the finisher.
+        """
+        finished = []
+        protocol = HTTPClientParser(
+            Request(b'GET', b'/', _boringHeaders, None), finished.append)
+        protocol.makeConnection(StringTransport())
+        protocol.dataReceived(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/plain\r\n'
+            b'Content-Length: 5\r\n'
+            b'\r\n'
+            b'hello'
+            b'HTTP/1.1 200 OK\r\n')
+        self.assertEqual(protocol.response.headers,
+                         Headers({b'content-type': [b'text/plain']}))
+        self.assertEqual(protocol.response._bodyBuffer, [b'hello'])
+        self.assertEqual(finished, [b'HTTP/1.1 200 OK\r\n'])
+
+
+    def test_bodyDataNotCopied(self):
+        """
+        Once the headers have been received, L{HTTPClientParser} passes the
+        bytes it receives to the response without copying them.
+        """
+        protocol = HTTPClientParser(
+            Request(b'GET', b'/', _boringHeaders, None), lambda rest: None)
+        protocol.makeConnection(StringTransport())
+        protocol.dataReceived(b'HTTP/1.1 200 OK\r\n')
+        body = []
+        protocol.response._bodyDataReceived = body.append
+        protocol.dataReceived(b'Content-Length: 20000\r\n\r\n')
+        data = b'x' * 10000
+        protocol.dataReceived(data)
+        self.assertIs(body[0], data)
+
+
     def test_multiple1XXResponsesAreIgnored(self):
         """
         It is acceptable for multiple 1XX responses to come through, all of
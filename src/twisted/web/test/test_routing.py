@@ -0,0 +1,187 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.web.routing}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.trial.unittest import TestCase
+from twisted.web.resource import Resource, NoResource, getChildForRequest
+from twisted.web.routing import RoutingResource
+from twisted.web.test.requesthelper import DummyRequest
+
+
+
+class RoutingResourceTests(TestCase):
+    """
+    Tests for L{RoutingResource}.
+    """
+    def setUp(self):
+        self.root = RoutingResource()
+
+
+    def resolve(self, path):
+        """
+        Traverse C{self.root} for a request for C{path}.
+
+        @param path: The path of the request, without a leading C{/}.
+        @type path: L{bytes}
+
+        @return: A 2-L{tuple} of the resource found and the request.
+        """
+        request = DummyRequest(path.split(b'/'))
+        return getChildForRequest(self.root, request), request
+
+
+    def test_staticRoute(self):
+        """
+        A request for a path matching a route with only literal segments is
+        dispatched to that route's resource, and all of its segments are moved
+        to C{prepath}.
+        """
+        leaf = Resource()
+        self.root.addRoute(b"/a/b/c", leaf)
+        self.root.addRoute(b"/a/b/d", Resource())
+
+        resource, request = self.resolve(b"a/b/c")
+
+        self.assertIs(resource, leaf)
+        self.assertEqual(request.prepath, [b"a", b"b", b"c"])
+        self.assertEqual(request.postpath, [])
+        self.assertEqual(request.routeArguments, {})
+
+
+    def test_rootRoute(self):
+        """
+        The route C{b"/"} matches a request for the root of the resource.
+        """
+        leaf = Resource()
+        self.root.addRoute(b"/", leaf)
+
+        resource, request = self.resolve(b"")
+
+        self.assertIs(resource, leaf)
+
+
+    def test_parameters(self):
+        """
+        Path segments matched by parameter segments of a route are made
+        available as C{request.routeArguments}.
+        """
+        leaf = Resource()
+        self.root.addRoute(b"/users/{user}/posts/{post}", leaf)
+
+        resource, request = self.resolve(b"users/alice/posts/17")
+
+        self.assertIs(resource, leaf)
+        self.assertEqual(
+            request.routeArguments, {"user": b"alice", "post": b"17"})
+        self.assertEqual(request.postpath, [])
+
+
+    def test_staticPreferred(self):
+        """
+        A literal segment is preferred over a parameter segment in the same
+        position.
+        """
+        static = Resource()
+        dynamic = Resource()
+        self.root.addRoute(b"/users/{user}", dynamic)
+        self.root.addRoute(b"/users/me", static)
+
+        self.assertIs(self.resolve(b"users/me")[0], static)
+        self.assertIs(self.resolve(b"users/bob")[0], dynamic)
+
+
+    def test_backtracking(self):
+        """
+        If following a literal segment leads to no match, a parameter segment
+        in the same position is tried instead.
+        """
+        dynamic = Resource()
+        self.root.addRoute(b"/users/me/settings", Resource())
+        self.root.addRoute(b"/users/{user}/posts", dynamic)
+
+        resource, request = self.resolve(b"users/me/posts")
+
+        self.assertIs(resource, dynamic)
+        self.assertEqual(request.routeArguments, {"user": b"me"})
+
+
+    def test_prefixRoute(self):
+        """
+        If no route matches the whole path, the longest route matching a prefix
+        of it is used and traversal continues from its resource.
+        """
+        mount = Resource()
+        child = Resource()
+        mount.putChild(b"style.css", child)
+        self.root.addRoute(b"/static", mount)
+
+        resource, request = self.resolve(b"static/style.css")
+
+        self.assertIs(resource, child)
+        self.assertEqual(request.prepath, [b"static", b"style.css"])
+
+
+    def test_leafRoute(self):
+        """
+        If the resource for a route matching a prefix of the path is a leaf,
+        the unmatched segments are left in C{postpath}.
+        """
+        leaf = Resource()
+        leaf.isLeaf = True
+        self.root.addRoute(b"/files", leaf)
+
+        resource, request = self.resolve(b"files/x/y")
+
+        self.assertIs(resource, leaf)
+        self.assertEqual(request.prepath, [b"files"])
+        self.assertEqual(request.postpath, [b"x", b"y"])
+
+
+    def test_fallbackToChildren(self):
+        """
+        If no route matches, children registered with C{putChild} are used.
+        """
+        child = Resource()
+        self.root.putChild(b"legacy", child)
+        self.root.addRoute(b"/other", Resource())
+
+        self.assertIs(self.resolve(b"legacy")[0], child)
+        self.assertIsInstance(self.resolve(b"missing")[0], NoResource)
+
+
+    def test_replaceRoute(self):
+        """
+        Adding a route which is already registered replaces its resource.
+        """
+        replacement = Resource()
+        self.root.addRoute(b"/a", Resource())
+        self.root.addRoute(b"/a", replacement)
+
+        self.assertIs(self.resolve(b"a")[0], replacement)
+
+
+    def test_conflictingParameterNames(self):
+        """
+        L{RoutingResource.addRoute} raises L{ValueError} if a route names a
+        parameter differently from an existing route with a parameter in the
+        same position.
+        """
+        self.root.addRoute(b"/users/{user}", Resource())
+        self.assertRaises(
+            ValueError, self.root.addRoute, b"/users/{name}/x", Resource())
+
+
+    def test_invalidRoutes(self):
+        """
+        L{RoutingResource.addRoute} raises L{ValueError} for routes which are
+        not L{bytes} or which contain malformed parameters.
+        """
+        self.assertRaises(ValueError, self.root.addRoute, u"/a", Resource())
+        self.assertRaises(ValueError, self.root.addRoute, b"/{}", Resource())
+        self.assertRaises(
+            ValueError, self.root.addRoute, b"/{a{b}", Resource())
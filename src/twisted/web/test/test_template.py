@@ -10,6 +10,7 @@ from __future__ import division, absolute_import
 from zope.interface.verify import verifyObject
 
 from twisted.internet.defer import succeed, gatherResults
+from twisted.internet.interfaces import IPushProducer
 from twisted.python.filepath import FilePath
 from twisted.trial.unittest import TestCase
 from twisted.trial.util import suppress as SUPPRESS
@@ -21,6 +22,7 @@ from twisted.web.error import (FlattenerError, MissingTemplateLoader,
     MissingRenderMethod)
 
 from twisted.web.template import renderElement
+from twisted.web import _flatten
 from twisted.web._element import UnexposedMethodError
 from twisted.web.test._util import FlattenTestCase
 from twisted.web.test.test_web import DummyRequest
@@ -778,6 +780,116 @@ class RenderElementTests(TestCase):
         return d
 
 
+    def test_producerRegistered(self):
+        """
+        L{renderElement} registers a streaming producer with the request while
+        rendering and unregisters it before finishing the request.
+        """
+        producers = []
+        self.request.write = lambda data: producers.append(
+            (self.request.producer, self.request.streamingProducer))
+
+        renderElement(self.request, TestElement(), doctype=None)
+
+        [(producer, streaming)] = producers
+        self.assertTrue(verifyObject(IPushProducer, producer))
+        self.assertTrue(streaming)
+        self.assertIsNone(self.request.producer)
+        self.assertTrue(self.request.finished)
+
+
+    def test_producerAlreadyRegistered(self):
+        """
+        If a producer is already registered with the request, L{renderElement}
+        writes the rendered output without registering another, and leaves
+        that one registered.
+        """
+        other = object()
+        self.request.registerProducer(other, True)
+
+        renderElement(self.request, TestElement(), doctype=None)
+
+        self.assertEqual(
+            b"".join(self.request.written), b'<p>Hello, world.</p>')
+        self.assertIs(self.request.producer, other)
+        self.assertTrue(self.request.finished)
+
+
+    def test_requestWithoutProducer(self):
+        """
+        L{renderElement} registers a streaming producer with a request which
+        has no C{producer} attribute, since L{IRequest} does not require one.
+        """
+        registered = []
+
+        class RequestWithoutProducer(DummyRequest):
+            @property
+            def producer(self):
+                raise AttributeError("producer")
+
+            def registerProducer(self, producer, streaming):
+                registered.append((producer, streaming))
+
+            def unregisterProducer(self):
+                registered.append(None)
+
+        request = RequestWithoutProducer([""])
+        request.site = FakeSite()
+        renderElement(request, TestElement(), doctype=None)
+
+        [(producer, streaming), unregistered] = registered
+        self.assertTrue(verifyObject(IPushProducer, producer))
+        self.assertTrue(streaming)
+        self.assertIsNone(unregistered)
+        self.assertEqual(b"".join(request.written), b'<p>Hello, world.</p>')
+        self.assertTrue(request.finished)
+
+
+    def test_pausedRendering(self):
+        """
+        While the producer registered by L{renderElement} is paused nothing
+        more is written to the request, and the request is only finished once
+        it has been resumed and rendering completes.
+        """
+        self.patch(_flatten, 'BUFFER_SIZE', 1)
+        write = self.request.write
+
+        def pausingWrite(data):
+            write(data)
+            self.request.producer.pauseProducing()
+        self.request.write = pausingWrite
+
+        renderElement(self.request, TestElement(), doctype=None)
+        self.assertEqual(b"".join(self.request.written), b'<p>')
+        self.assertFalse(self.request.finished)
+
+        while self.request.producer is not None:
+            self.request.producer.resumeProducing()
+        self.assertEqual(
+            b"".join(self.request.written), b'<p>Hello, world.</p>')
+        self.assertTrue(self.request.finished)
+
+
+    def test_stoppedRendering(self):
+        """
+        If the producer registered by L{renderElement} is stopped, rendering is
+        abandoned and the request is not finished.
+        """
+        self.patch(_flatten, 'BUFFER_SIZE', 1)
+        write = self.request.write
+
+        def stoppingWrite(data):
+            write(data)
+            self.request.producer.pauseProducing()
+        self.request.write = stoppingWrite
+
+        renderElement(self.request, TestElement(), doctype=None)
+        self.request.producer.stopProducing()
+        self.assertEqual(b"".join(self.request.written), b'<p>')
+        self.assertIsNone(self.request.producer)
+        self.assertFalse(self.request.finished)
+
+
     def test_nonDefaultDoctype(self):
         """
         L{renderElement} will write the doctype string specified by the
@@ -12,7 +12,7 @@ from zope.interface import implementer
 from zope.interface.verify import verifyObject
 
 from twisted.python import reflect, failure
-from twisted.python.compat import unichr
+from twisted.python.compat import unichr, intToBytes
 from twisted.python.filepath import FilePath
 from twisted.trial import unittest
 from twisted.internet import reactor
@@ -23,8 +23,10 @@ from twisted.web import iweb, http, error
 
 from twisted.web.test.requesthelper import DummyChannel, DummyRequest
 from twisted.web.static import Data
-from twisted.logger import globalLogPublisher, LogLevel
-from twisted.test.proto_helpers import EventLoggingObserver
+from twisted.logger import globalLogPublisher, LogLevel, Logger, formatEvent
+from twisted.test.proto_helpers import EventLoggingObserver, StringTransport
+from twisted.test.proto_helpers import (
+    _ImmediateReactor, _QueueingThreadPool)
 
 
 class ResourceTests(unittest.TestCase):
@@ -989,6 +991,367 @@ class GzipEncoderTests(unittest.TestCase):
 
 
 
+class _PauseCountingProducer(object):
+    """
+    A streaming producer which counts how many more times it has been paused
+    than resumed.
+    """
+    paused = 0
+
+    def pauseProducing(self):
+        self.paused += 1
+
+
+    def resumeProducing(self):
+        self.paused -= 1
+
+
+    def stopProducing(self):
+        pass
+
+
+
+class CompressingEncoderTests(unittest.TestCase):
+    """
+    Tests for L{server.GzipEncoderFactory}, L{server.BrotliEncoderFactory} and
+    L{server.ZstdEncoderFactory} and the content-type, size and threading
+    options they share.
+    """
+    body = b"Some data " * 100
+
+    def render(self, factory, acceptEncoding=b"gzip",
+               contentType="text/plain", body=None):
+        """
+        Request a L{Data} resource wrapped to be encoded by C{factory}, over
+        a channel which is saved as C{self.channel}.
+
+        @return: A 2-L{tuple} of the request and the bytes written to the
+            transport so far.
+        """
+        if body is None:
+            body = self.body
+        channel = self.channel = DummyChannel()
+        wrapped = resource.EncodingResourceWrapper(
+            Data(body, contentType), [factory])
+        channel.site.resource.putChild(b"foo", wrapped)
+        request = server.Request(channel, False)
+        request.gotLength(0)
+        request.requestHeaders.setRawHeaders(
+            b"Accept-Encoding", [acceptEncoding])
+        request.requestReceived(b'GET', b'/foo', b'HTTP/1.0')
+        return request, channel.transport.written.getvalue()
+
+
+    def splitResponse(self, data):
+        """
+        Split a response into its headers and body.
+        """
+        index = data.find(b"\r\n\r\n")
+        return data[:index], data[index + 4:]
+
+
+    def test_gzipLevel(self):
+        """
+        L{server.GzipEncoderFactory} accepts a compression level.
+        """
+        request, data = self.render(server.GzipEncoderFactory(compressLevel=1))
+        headers, body = self.splitResponse(data)
+        self.assertIn(b"Content-Encoding: gzip", headers)
+        self.assertEqual(
+            self.body, zlib.decompress(body, 16 + zlib.MAX_WBITS))
+
+
+    def test_brotli(self):
+        """
+        If the client accepts I{br}, L{server.BrotliEncoderFactory} compresses
+        the response with brotli.
+        """
+        import brotli
+        request, data = self.render(
+            server.BrotliEncoderFactory(), acceptEncoding=b"gzip, br")
+        headers, body = self.splitResponse(data)
+        self.assertIn(b"Content-Encoding: br", headers)
+        self.assertNotIn(b"Content-Length", headers)
+        self.assertEqual(self.body, brotli.decompress(body))
+
+    if server.brotli is None:
+        test_brotli.skip = "brotli is not installed"
+
+
+    def test_zstd(self):
+        """
+        If the client accepts I{zstd}, L{server.ZstdEncoderFactory} compresses
+        the response with zstd.
+        """
+        import zstandard
+        request, data = self.render(
+            server.ZstdEncoderFactory(), acceptEncoding=b"zstd")
+        headers, body = self.splitResponse(data)
+        self.assertIn(b"Content-Encoding: zstd", headers)
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self.assertEqual(self.body, decompressor.decompress(body))
+
+    if server.zstandard is None:
+        test_zstd.skip = "zstandard is not installed"
+
+
+    def test_libraryUnavailable(self):
+        """
+        If the library implementing an encoding is not installed, its factory
+        does not encode responses.
+        """
+        self.patch(server, "brotli", None)
+        self.patch(server, "zstandard", None)
+        request = DummyRequest([b""])
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"br,zstd"])
+        self.assertIsNone(
+            server.BrotliEncoderFactory().encoderForRequest(request))
+        self.assertIsNone(
+            server.ZstdEncoderFactory().encoderForRequest(request))
+
+
+    def test_acceptEncodingParsing(self):
+        """
+        Codings in I{Accept-Encoding} are matched with surrounding whitespace
+        and parameters removed, and codings with a quality of zero, explicitly
+        or through C{*}, are not used.
+        """
+        factory = server.GzipEncoderFactory()
+        for accept, accepted in [(b"deflate, gzip;q=0.5", True),
+                                 (b"GZIP", True),
+                                 (b"gzip;q=0, deflate", False),
+                                 (b"*", True),
+                                 (b"*;q=0", False),
+                                 (b"gzip;q=0.2, *;q=0", True),
+                                 (b"gzipped", False)]:
+            request = DummyRequest([b""])
+            request.requestHeaders.setRawHeaders(b"Accept-Encoding", [accept])
+            self.assertEqual(
+                factory.encoderForRequest(request) is not None, accepted,
+                accept)
+
+
+    def test_minimumSize(self):
+        """
+        Responses whose I{Content-Length} is less than C{minimumSize} are not
+        compressed.
+        """
+        factory = server.GzipEncoderFactory(minimumSize=len(self.body) + 1)
+        request, data = self.render(factory)
+        headers, body = self.splitResponse(data)
+        self.assertNotIn(b"Content-Encoding", headers)
+        self.assertIn(
+            b"Content-Length: " + intToBytes(len(self.body)), headers)
+        self.assertEqual(self.body, body)
+
+        factory.minimumSize = len(self.body)
+        request, data = self.render(factory)
+        headers, body = self.splitResponse(data)
+        self.assertIn(b"Content-Encoding: gzip", headers)
+
+
+    def test_compressibleTypes(self):
+        """
+        Only responses whose I{Content-Type} matches one of
+        C{compressibleTypes}, exactly or by prefix, are compressed.
+        """
+        factory = server.GzipEncoderFactory(
+            compressibleTypes=[b"text/", b"application/json"])
+        for contentType, compressed in [("text/html; charset=utf-8", True),
+                                        ("application/json", True),
+                                        ("application/jsonp", False),
+                                        ("image/png", False)]:
+            request, data = self.render(factory, contentType=contentType)
+            headers, body = self.splitResponse(data)
+            self.assertEqual(
+                b"Content-Encoding: gzip" in headers, compressed, contentType)
+            if not compressed:
+                self.assertEqual(self.body, body)
+
+
+    def test_streamingCompressLevel(self):
+        """
+        Responses without a I{Content-Length} are compressed at
+        C{streamingCompressLevel}, and others at C{compressLevel}.
+        """
+        levels = []
+        factory = server.GzipEncoderFactory(
+            compressLevel=9, streamingCompressLevel=1)
+        createCompressor = factory._createCompressor
+
+        def recordLevel(compressLevel):
+            levels.append(compressLevel)
+            return createCompressor(compressLevel)
+        factory._createCompressor = recordLevel
+
+        request = DummyRequest([b""])
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"gzip"])
+        encoder = factory.encoderForRequest(request)
+        encoder.encode(b"x")
+        request.responseHeaders.setRawHeaders(b"Content-Length", [b"1"])
+        encoder = factory.encoderForRequest(request)
+        encoder.encode(b"x")
+
+        self.assertEqual(levels, [1, 9])
+
+
+    def test_threadThreshold(self):
+        """
+        Once a write is at least C{threadThreshold} bytes long, it and the rest
+        of the response are compressed in the thread pool, and the request is
+        finished only once the compressed body has been written.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=len(self.body), threadPool=threadPool,
+            reactor=_ImmediateReactor())
+        request, data = self.render(factory)
+        headers, body = self.splitResponse(data)
+        self.assertIn(b"Content-Encoding: gzip", headers)
+        self.assertEqual(b"", body)
+        self.assertFalse(request.finished)
+
+        threadPool.runAll()
+
+        self.assertTrue(request.finished)
+        headers, body = self.splitResponse(
+            self.channel.transport.written.getvalue())
+        self.assertEqual(
+            self.body, zlib.decompress(body, 16 + zlib.MAX_WBITS))
+
+
+    def test_belowThreadThreshold(self):
+        """
+        Writes shorter than C{threadThreshold} are compressed in the reactor
+        thread.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=len(self.body) + 1, threadPool=threadPool,
+            reactor=_ImmediateReactor())
+        request, data = self.render(factory)
+        self.assertEqual(threadPool.calls, [])
+        self.assertTrue(request.finished)
+
+
+    def test_threadBackpressure(self):
+        """
+        While too many chunks are waiting to be compressed in a thread, the
+        request's streaming producer is paused, and once some of them have
+        been compressed and written it is resumed.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=1, threadPool=threadPool,
+            reactor=_ImmediateReactor())
+        channel = DummyChannel()
+        request = server.Request(channel, False)
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"gzip"])
+        request._encoder = factory.encoderForRequest(request)
+        producer = _PauseCountingProducer()
+        request.registerProducer(producer, True)
+
+        for i in range(request._encoder._maxInFlight - 1):
+            request.write(self.body)
+        self.assertEqual(producer.paused, 0)
+        request.write(self.body)
+        self.assertEqual(producer.paused, 1)
+
+        threadPool.runAll()
+        self.assertEqual(producer.paused, 0)
+        request.unregisterProducer()
+        request.finish()
+        threadPool.runAll()
+        self.assertTrue(request.finished)
+        headers, body = self.splitResponse(
+            channel.transport.written.getvalue())
+        self.assertEqual(self.body * request._encoder._maxInFlight,
+                         zlib.decompress(body, 16 + zlib.MAX_WBITS))
+
+
+    def test_threadFailure(self):
+        """
+        If compression in a thread fails, the failure is logged and the
+        connection is dropped.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=1, threadPool=threadPool,
+            reactor=_ImmediateReactor())
+
+        def brokenCompressor(compressLevel):
+            return (lambda data: 1 // 0), (lambda: b"")
+        factory._createCompressor = brokenCompressor
+
+        request, data = self.render(factory)
+        threadPool.runAll()
+
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        self.assertFalse(request.finished)
+        self.assertTrue(self.channel.transport.disconnected)
+
+
+    def test_threadFailureBackpressure(self):
+        """
+        If compression in a thread fails, the failure is logged and the
+        connection dropped at once, rather than when the request finishes,
+        and the chunks which were waiting no longer keep the request's
+        producer paused.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=1, threadPool=threadPool,
+            reactor=_ImmediateReactor())
+
+        def brokenCompressor(compressLevel):
+            return (lambda data: 1 // 0), (lambda: b"")
+        factory._createCompressor = brokenCompressor
+        channel = DummyChannel()
+        request = server.Request(channel, False)
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"gzip"])
+        request._encoder = factory.encoderForRequest(request)
+        producer = _PauseCountingProducer()
+        request.registerProducer(producer, True)
+
+        for i in range(request._encoder._maxInFlight):
+            request.write(self.body)
+        self.assertEqual(producer.paused, 1)
+        threadPool.runAll()
+
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        self.assertTrue(channel.transport.disconnected)
+        self.assertEqual(request._encoder._inFlight, 0)
+        self.assertEqual(producer.paused, 0)
+
+
+    def test_threadBackpressureTransportPaused(self):
+        """
+        A producer paused while too many chunks were waiting to be compressed
+        is not resumed once they have been if the channel has also paused it,
+        because the transport is not keeping up.
+        """
+        threadPool = _QueueingThreadPool()
+        factory = server.GzipEncoderFactory(
+            threadThreshold=1, threadPool=threadPool,
+            reactor=_ImmediateReactor())
+        channel = http.HTTPChannel()
+        channel.makeConnection(StringTransport())
+        request = server.Request(channel, False)
+        request.requestHeaders.setRawHeaders(b"Accept-Encoding", [b"gzip"])
+        request._encoder = factory.encoderForRequest(request)
+        producer = _PauseCountingProducer()
+        request.registerProducer(producer, True)
+
+        for i in range(request._encoder._maxInFlight):
+            request.write(self.body)
+        self.assertEqual(producer.paused, 1)
+        channel.pauseProducing()
+        self.assertEqual(producer.paused, 2)
+        threadPool.runAll()
+        self.assertEqual(producer.paused, 2)
+
+
+
 class RootResource(resource.Resource):
     isLeaf = 0
 
@@ -1430,6 +1793,144 @@ class SiteAccessLogTests(AccessLogTestsMixin, unittest.TestCase):
 
 
 
+class BufferedAccessLogTests(unittest.TestCase):
+    """
+    Tests for the buffered and structured access logging of
+    L{http.HTTPFactory}.
+    """
+    def setUp(self):
+        self.reactor = Clock()
+        self.reactor.advance(1234567890)
+        self.logPath = self.mktemp()
+
+
+    def startFactory(self, factoryClass=http.HTTPFactory, **attributes):
+        """
+        Create and start a factory logging to C{self.logPath}, with the given
+        attributes.
+        """
+        factory = factoryClass(logPath=self.logPath, reactor=self.reactor)
+        for name, value in attributes.items():
+            setattr(factory, name, value)
+        factory.startFactory()
+        return factory
+
+
+    def logRequests(self, factory, count):
+        """
+        Log C{count} requests with C{factory}.
+        """
+        for i in range(count):
+            request = DummyRequestForLogTest(factory)
+            request.uri = b'/' + intToBytes(i)
+            factory.log(request)
+
+
+    def content(self):
+        """
+        Get the content of the log file, or L{None} if it does not exist.
+        """
+        path = FilePath(self.logPath)
+        if not path.exists():
+            return None
+        return path.getContent()
+
+
+    def test_bufferedUntilSize(self):
+        """
+        When C{logBufferSize} is set, lines are not written until at least that
+        many bytes have been logged.
+        """
+        factory = self.startFactory(logBufferSize=300)
+        self.addCleanup(factory.stopFactory)
+        self.logRequests(factory, 3)
+        self.assertEqual(self.content(), b'')
+        self.logRequests(factory, 1)
+        self.assertEqual(self.content().count(b'\n'), 4)
+
+
+    def test_bufferedUntilInterval(self):
+        """
+        Buffered lines are written C{logFlushInterval} seconds after the first
+        of them is logged.
+        """
+        factory = self.startFactory(logBufferSize=2 ** 16, logFlushInterval=5)
+        self.addCleanup(factory.stopFactory)
+        self.logRequests(factory, 1)
+        self.reactor.advance(4)
+        self.logRequests(factory, 1)
+        self.assertEqual(self.content(), b'')
+        self.reactor.advance(1)
+        self.assertEqual(self.content().count(b'\n'), 2)
+
+
+    def test_flushedOnStop(self):
+        """
+        Buffered lines are written when the factory is stopped.
+        """
+        factory = self.startFactory(logBufferSize=2 ** 16)
+        self.logRequests(factory, 2)
+        factory.stopFactory()
+        self.assertEqual(self.content().count(b'\n'), 2)
+        self.assertEqual(self.reactor.getDelayedCalls(), [])
+
+
+    def test_writerThread(self):
+        """
+        When C{logInThread} is set, batches are written on another thread, all
+        of which have been written once the factory is stopped.
+        """
+        factory = self.startFactory(logBufferSize=100, logInThread=True)
+        self.logRequests(factory, 10)
+        factory.stopFactory()
+        self.assertEqual(self.content().count(b'\n'), 10)
+
+
+    def test_rotation(self):
+        """
+        No lines are lost when a L{server.Site} buffering its log rotates the
+        log file.
+        """
+        def site(**kwargs):
+            return server.Site(resource.Resource(), **kwargs)
+        factory = self.startFactory(site, logBufferSize=200)
+        factory.logFile._logFile.rotateLength = 500
+        self.logRequests(factory, 20)
+        factory.stopFactory()
+
+        logFile = FilePath(self.logPath)
+        content = b''.join(
+            sibling.getContent() for sibling in logFile.parent().children()
+            if sibling.basename().startswith(logFile.basename()))
+        self.assertEqual(content.count(b'\n'), 20)
+        for i in range(20):
+            self.assertIn(b' /' + intToBytes(i) + b' ', content)
+
+
+    def test_accessLogger(self):
+        """
+        When C{accessLogger} is set, an event is emitted for each request with
+        the fields of a combined log format line.
+        """
+        events = []
+        factory = http.HTTPFactory(reactor=self.reactor)
+        factory.accessLogger = Logger(observer=events.append)
+        factory.startFactory()
+        self.addCleanup(factory.stopFactory)
+
+        self.logRequests(factory, 1)
+
+        [event] = events
+        self.assertEqual(event['ip'], u'1.2.3.4')
+        self.assertEqual(event['uri'], u'/0')
+        self.assertEqual(event['code'], 123)
+        self.assertEqual(
+            formatEvent(event),
+            u'"1.2.3.4" - - [13/Feb/2009:23:31:30 +0000] '
+            u'"GET /0 HTTP/1.0" 123 - "-" "-"')
+
+
+
 class CombinedLogFormatterTests(unittest.TestCase):
     """
     Tests for L{twisted.web.http.combinedLogFormatter}.